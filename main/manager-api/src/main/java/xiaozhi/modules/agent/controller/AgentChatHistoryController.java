@@ -24,6 +24,7 @@ import io.swagger.v3.oas.annotations.tags.Tag;
 import jakarta.servlet.http.HttpServletResponse;
 import jakarta.validation.Valid;
 import lombok.RequiredArgsConstructor;
+import lombok.extern.slf4j.Slf4j;
 import xiaozhi.common.constant.Constant;
 import xiaozhi.common.exception.ErrorCode;
 import xiaozhi.common.exception.RenException;
@@ -34,6 +35,7 @@ import xiaozhi.common.user.UserDetail;
 import xiaozhi.common.utils.DateUtils;
 import xiaozhi.common.utils.MessageUtils;
 import xiaozhi.common.utils.Result;
+import xiaozhi.common.validator.ValidatorUtils;
 import xiaozhi.modules.agent.dto.AgentChatHistoryDTO;
 import xiaozhi.modules.agent.dto.AgentChatHistoryReportDTO;
 import xiaozhi.modules.agent.dto.AgentChatSessionDTO;
@@ -43,6 +45,7 @@ import xiaozhi.modules.agent.service.biz.AgentChatHistoryBizService;
 import xiaozhi.modules.security.user.SecurityUser;
 
 @Tag(name = "智能体聊天历史管理")
+@Slf4j
 @RequiredArgsConstructor
 @RestController
 @RequestMapping("/agent/chat-history")
@@ -66,6 +69,33 @@ public class AgentChatHistoryController {
         return new Result<Boolean>().ok(result);
     }
 
+    /**
+     * 小智服务聊天批量上报请求
+     * <p>
+     * 一次上报多条聊天记录，逐条处理，单条失败不影响其他记录。
+     *
+     * @param requests 聊天上报请求列表
+     * @return 处理失败的记录下标，由调用方逐条重试
+     */
+    @Operation(summary = "小智服务聊天批量上报请求")
+    @PostMapping("/report/batch")
+    public Result<List<Integer>> uploadBatch(@RequestBody List<AgentChatHistoryReportDTO> requests) {
+        List<Integer> failed = new ArrayList<>();
+        for (int i = 0; i < requests.size(); i++) {
+            AgentChatHistoryReportDTO request = requests.get(i);
+            try {
+                ValidatorUtils.validateEntity(request);
+                if (!Boolean.TRUE.equals(agentChatHistoryBizService.report(request))) {
+                    failed.add(i);
+                }
+            } catch (Exception e) {
+                log.error("聊天记录批量上报失败: macAddress={}", request.getMacAddress(), e);
+                failed.add(i);
+            }
+        }
+        return new Result<List<Integer>>().ok(failed);
+    }
+
     /**
      * 获取聊天记录下载链接
      * 
@@ -293,9 +293,13 @@ public class AgentController {
             return ResponseEntity.notFound().build();
         }
         redisUtils.delete(RedisKeys.getAgentAudioIdKey(uuid));
+        // 服务端可按Ogg/Opus上报音频，根据文件头区分格式
+        boolean isOgg = audioData.length >= 4 && audioData[0] == 'O' && audioData[1] == 'g'
+                && audioData[2] == 'g' && audioData[3] == 'S';
         return ResponseEntity.ok()
-                .contentType(MediaType.APPLICATION_OCTET_STREAM)
-                .header(HttpHeaders.CONTENT_DISPOSITION, "attachment; filename=\"play.wav\"")
+                .contentType(isOgg ? MediaType.parseMediaType("audio/ogg") : MediaType.APPLICATION_OCTET_STREAM)
+                .header(HttpHeaders.CONTENT_DISPOSITION,
+                        "attachment; filename=\"" + (isOgg ? "play.ogg" : "play.wav") + "\"")
                 .body(audioData);
     }
 
@@ -26,7 +26,7 @@ public class AgentChatHistoryReportDTO {
     @Schema(description = "聊天内容", example = "你好呀")
     @NotBlank
     private String content;
-    @Schema(description = "base64编码的opus音频数据", example = "")
+    @Schema(description = "base64编码的音频数据（WAV或Ogg/Opus）", example = "")
     private String audioBase64;
     @Schema(description = "上报时间，十位时间戳，空时默认使用当前时间", example = "1745657732")
     private Long reportTime;
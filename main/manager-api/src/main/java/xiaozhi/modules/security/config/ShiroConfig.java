@@ -93,6 +93,7 @@ public class ShiroConfig {
         filterMap.put("/config/**", "server");
         filterMap.put("/device/address-book/call", "server");
         filterMap.put("/agent/chat-history/report", "server");
+        filterMap.put("/agent/chat-history/report/batch", "server");
         filterMap.put("/agent/chat-history/download/**", "anon");
         filterMap.put("/agent/chat-summary/**", "server");
         filterMap.put("/agent/chat-title/**", "server");
@@ -10,6 +10,10 @@ from core.http_server import SimpleHttpServer
 from core.websocket_server import WebSocketServer
 from core.utils.util import check_ffmpeg_installed
 from core.utils.gc_manager import get_gc_manager
+from core.providers.tools.server_mcp import get_server_mcp_pool
+from core.utils.http_client import close_async_http_client
+from core.utils.report_pipeline import get_report_pipeline
+from core.utils.server_stats import ServerStatsReporter
 
 TAG = __name__
 logger = setup_logging()
@@ -68,6 +72,12 @@ async def main():
     gc_manager = get_gc_manager(interval_seconds=300)
     await gc_manager.start()
 
+    # 定期输出服务运行统计（0为不输出，统计也可通过 /xiaozhi/stats 接口查询）
+    stats_reporter = ServerStatsReporter(
+        config.get("server_stats", {}).get("log_interval", 0)
+    )
+    stats_reporter.start()
+
     # 启动 WebSocket 服务器
     ws_server = WebSocketServer(config)
     ws_task = asyncio.create_task(ws_server.start())
@@ -88,6 +98,11 @@ async def main():
         get_local_ip(),
         port,
     )
+    logger.bind(tag=TAG).info(
+        "服务统计接口是\thttp://{}:{}/xiaozhi/stats",
+        get_local_ip(),
+        port,
+    )
     mcp_endpoint = config.get("mcp_endpoint", None)
     if mcp_endpoint is not None and "你" not in mcp_endpoint:
         # 校验MCP接入点格式
@@ -129,6 +144,25 @@ async def main():
     finally:
         # 停止全局GC管理器
         await gc_manager.stop()
+        await stats_reporter.stop()
+
+        # 关闭共享的服务端MCP服务
+        try:
+            await asyncio.wait_for(get_server_mcp_pool().shutdown(), timeout=5)
+        except Exception:
+            pass
+
+        # 停止聊天记录上报管道，未上报的记录写入磁盘，下次启动后补报
+        try:
+            await asyncio.wait_for(get_report_pipeline().stop(), timeout=5)
+        except Exception:
+            pass
+
+        # 关闭共享的HTTP连接池
+        try:
+            await asyncio.wait_for(close_async_http_client(), timeout=3)
+        except Exception:
+            pass
 
         # 取消所有任务（关键修复点）
         stdin_task.cancel()
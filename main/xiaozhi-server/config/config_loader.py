@@ -85,7 +85,18 @@ async def get_config_from_api_async(config):
 
 
 async def get_private_config_from_api(config, device_id, client_id):
-    """从Java API获取私有配置"""
+    """从Java API获取私有配置，开启 private_config_cache 时优先使用缓存"""
+    from core.utils.private_config_cache import get_private_config_cache
+
+    return await get_private_config_cache().get(
+        device_id,
+        client_id,
+        config["selected_module"],
+        lambda: _fetch_private_config(config, device_id, client_id),
+    )
+
+
+async def _fetch_private_config(config, device_id, client_id):
     results = await asyncio.gather(
         get_agent_models(device_id, client_id, config["selected_module"]),
         get_correct_words(device_id),
@@ -1,6 +1,6 @@
 import os
 import base64
-from typing import Optional, Dict
+from typing import Optional, Dict, List
 
 import httpx
 
@@ -246,6 +246,24 @@ async def report(
         return None
 
 
+async def report_payload(record: Dict) -> Optional[Dict]:
+    """上报一条已编码的聊天记录，失败时抛出异常由调用方重试"""
+    if not ManageApiClient._instance:
+        return None
+    return await ManageApiClient._instance._async_request(
+        "POST", "/agent/chat-history/report", json=record
+    )
+
+
+async def report_batch(records: List[Dict]) -> Optional[List[int]]:
+    """批量上报已编码的聊天记录，返回处理失败的记录下标，请求失败时抛出异常由调用方重试"""
+    if not records or not ManageApiClient._instance:
+        return None
+    return await ManageApiClient._instance._async_request(
+        "POST", "/agent/chat-history/report/batch", json=records
+    )
+
+
 async def lookup_address_book(caller_mac: str, nickname: str) -> Optional[Dict]:
     """根据昵称查找目标设备"""
     if not ManageApiClient._instance:
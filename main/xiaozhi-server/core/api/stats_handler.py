@@ -0,0 +1,45 @@
+import json
+import hmac
+from aiohttp import web
+from core.api.base_handler import BaseHandler
+from core.utils.server_stats import collect_server_stats
+
+TAG = __name__
+
+
+class StatsHandler(BaseHandler):
+    """服务运行统计接口，需使用 Authorization: Bearer <server.auth_key> 访问"""
+
+    def __init__(self, config: dict):
+        super().__init__(config)
+        self.auth_key = config["server"].get("auth_key", "")
+
+    def _verify(self, request) -> bool:
+        auth_header = request.headers.get("Authorization", "")
+        if not self.auth_key or not auth_header.startswith("Bearer "):
+            return False
+        return hmac.compare_digest(auth_header[7:], self.auth_key)
+
+    async def handle_get(self, request):
+        if not self._verify(request):
+            response = web.Response(
+                text=json.dumps({"success": False, "message": "无效的认证信息"}),
+                content_type="application/json",
+                status=401,
+            )
+        else:
+            try:
+                stats = collect_server_stats()
+                response = web.Response(
+                    text=json.dumps(stats, ensure_ascii=False, default=str),
+                    content_type="application/json",
+                )
+            except Exception as e:
+                self.logger.bind(tag=TAG).error(f"获取服务统计失败: {e}")
+                response = web.Response(
+                    text=json.dumps({"success": False, "message": str(e)}),
+                    content_type="application/json",
+                    status=500,
+                )
+        self._add_cors_headers(response)
+        return response
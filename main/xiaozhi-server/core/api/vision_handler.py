@@ -1,13 +1,12 @@
 import json
-import copy
 from aiohttp import web
 from config.logger import setup_logging
 from core.api.base_handler import BaseHandler
 from core.utils.util import get_vision_url, is_valid_image_file
-from core.utils.vllm import create_instance
 from config.config_loader import get_private_config_from_api
 from core.utils.auth import AuthToken
-import base64
+from core.utils.cow_config import CopyOnWriteDict
+from core.utils.vision_pipeline import get_vision_pipeline
 from typing import Tuple, Optional
 from plugins_func.register import Action
 
@@ -22,6 +21,8 @@ class VisionHandler(BaseHandler):
         super().__init__(config)
         # 初始化认证工具
         self.auth = AuthToken(config["server"]["auth_key"])
+        # 视觉分析管道：共享VLLM实例、限制并发、图片预处理和结果缓存
+        self.pipeline = get_vision_pipeline(config.get("vision_pipeline", {}))
 
     def _create_error_response(self, message: str) -> dict:
         """创建统一的错误响应格式"""
@@ -97,11 +98,8 @@ class VisionHandler(BaseHandler):
                     "不支持的文件格式，请上传有效的图片文件（支持JPEG、PNG、GIF、BMP、TIFF、WEBP格式）"
                 )
 
-            # 将图片转换为base64编码
-            image_base64 = base64.b64encode(image_data).decode("utf-8")
-
             # 如果开启了智控台，则从智控台获取模型配置
-            current_config = copy.deepcopy(self.config)
+            current_config = CopyOnWriteDict(self.config)
             read_config_from_api = current_config.get("read_config_from_api", False)
             if read_config_from_api:
                 current_config = await get_private_config_from_api(
@@ -123,12 +121,14 @@ class VisionHandler(BaseHandler):
             if not vllm_type:
                 raise ValueError(f"无法找到VLLM模块对应的供应器{vllm_type}")
 
-            vllm = create_instance(
-                vllm_type, current_config["VLLM"][select_vllm_module]
+            result = await self.pipeline.explain(
+                device_id,
+                question,
+                image_data,
+                vllm_type,
+                current_config["VLLM"][select_vllm_module],
             )
 
-            result = vllm.response(question, image_base64)
-
             return_json = {
                 "success": True,
                 "action": Action.RESPONSE.name,
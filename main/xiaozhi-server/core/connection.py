@@ -1,6 +1,5 @@
 import os
 import sys
-import copy
 import json
 import re
 import uuid
@@ -12,7 +11,6 @@ import traceback
 import subprocess
 import websockets
 import opuslib_next
-import numpy as np
 
 from core.utils.util import (
     extract_json_from_string,
@@ -27,10 +25,10 @@ from core.utils.modules_initialize import (
     initialize_tts,
     initialize_asr,
 )
-from core.handle.reportHandle import report, enqueue_tool_report
+from core.handle.reportHandle import enqueue_tool_report
 from core.providers.tts.default import DefaultTTS
-from concurrent.futures import ThreadPoolExecutor
 from core.utils.dialogue import Message, Dialogue
+from core.utils.dialogue_context import DialogueContextManager
 from core.providers.asr.dto.dto import InterfaceType
 from core.handle.textHandle import handleTextMessage
 from core.providers.tools.unified_tool_handler import UnifiedToolHandler
@@ -43,6 +41,10 @@ from config.logger import setup_logging, build_module_string, create_connection_
 from config.manage_api_client import DeviceNotFoundException, DeviceBindException, generate_and_save_chat_title
 from core.utils.prompt_manager import PromptManager
 from core.utils.voiceprint_provider import VoiceprintProvider
+from core.utils.pcm_buffer import PCMFrameBuffer
+from core.utils.audio_ingest import create_audio_queue, get_audio_ingest_monitor
+from core.utils.provider_pool import get_provider_pool
+from core.utils.cow_config import CopyOnWriteDict
 from core.utils.util import get_system_error_response
 from core.utils import textUtils
 
@@ -88,7 +90,8 @@ class ConnectionHandler:
             server=None,
     ):
         self.common_config = config
-        self.config = copy.deepcopy(config)
+        # 写时复制：只复制本连接实际修改的配置段，其余与服务端配置共享
+        self.config = CopyOnWriteDict(config)
         self.session_id = str(uuid.uuid4())
         self.logger = setup_logging()
         self.server = server  # 保存server实例的引用
@@ -117,15 +120,19 @@ class ConnectionHandler:
         self.client_is_speaking = False
         self.client_listen_mode = "auto"
         self.client_aec = False  # 是否启用了服务端AEC
+        self.aec_processor = None  # 服务端AEC处理器，首次下发参考音频时创建
 
         # 线程任务相关
         self.loop = None  # 在 handle_connection 中获取运行中的事件循环
         self.stop_event = threading.Event()
-        self.executor = ThreadPoolExecutor(max_workers=5)
-
-        # 添加上报线程池
-        self.report_queue = queue.Queue()
-        self.report_thread = None
+        # 进行中的对话和意图处理任务，在事件循环上运行，不占用线程
+        self.chat_tasks = set()
+        # 基于流式ASR中间结果的LLM预测请求，开启llm_speculation且收到中间结果时创建
+        self.llm_speculator = None
+        # 对话上下文窗口，开启dialogue_context时首轮对话创建
+        self.dialogue_context = None
+
+        # 聊天记录通过全局上报管道异步批量上报（core/utils/report_pipeline.py）
         # 未来可以通过修改此处，调节asr的上报和tts的上报，目前默认都开启
         self.report_asr_enable = self.read_config_from_api
         self.report_tts_enable = self.read_config_from_api
@@ -139,12 +146,13 @@ class ConnectionHandler:
         self.llm = _llm
         self.memory = _memory
         self.intent = _intent
+        # 从实例池获取的共享实例，连接关闭时释放引用
+        self._pooled_providers = []
 
         # 为每个连接单独管理声纹识别
         self.voiceprint_provider = None
 
         # vad相关变量
-        self.client_audio_buffer = bytearray()
         self.client_have_voice = False
         self.client_voice_window = deque(maxlen=5)
         self.first_activity_time = 0.0  # 记录首次活动的时间（毫秒）
@@ -156,8 +164,12 @@ class ConnectionHandler:
         # asr相关变量
         # 因为实际部署时可能会用到公共的本地ASR，不能把变量暴露给公共ASR
         # 所以涉及到ASR的变量，需要在这里定义，属于connection的私有变量
-        self.asr_audio = []  # 存储PCM帧列表，供VAD和ASR共享
-        self.asr_audio_queue = queue.Queue()
+        # PCM帧缓冲区，VAD、ASR、声纹识别和上报共用，每帧只写入一次
+        self.asr_audio = PCMFrameBuffer()
+        self.vad_audio_reader = self.asr_audio.reader()  # VAD按块读取的游标
+        self.asr_audio_queue = create_audio_queue()
+        self.asr_priority_task = None
+        self.asr_stream_state = None  # 本地流式ASR的解码状态（在线解码缓存、中间结果），每句话重新创建
         self.current_speaker = None  # 存储当前说话人
         self.introduced_speakers = set()  # 已"首次引入"的说话人，控制只在首轮带名字
         self.system_introduced_speakers = set()  # 已在 system 注入过身份的说话人，控制 system 身份只首轮出现
@@ -167,6 +179,8 @@ class ConnectionHandler:
 
         # tts相关变量
         self.sentence_id = None
+        # 本轮对话开始时间，用于统计首句语音延迟，发出第一个音频包后清空
+        self.first_audio_start = None
         # 处理TTS响应没有文本返回
         self.tts_MessageText = ""
 
@@ -236,9 +250,6 @@ class ConnectionHandler:
             # 启动超时检查任务
             self.timeout_task = asyncio.create_task(self._check_timeout())
 
-            # 启动AEC缓存清理任务
-            self._aec_cache_cleanup_task = asyncio.create_task(self._check_aec_cache_expiry())
-
             self.welcome_msg = self.config["xiaozhi"]
             self.welcome_msg["session_id"] = self.session_id
 
@@ -307,7 +318,7 @@ class ConnectionHandler:
                         asyncio.set_event_loop(loop)
                         loop.run_until_complete(
                             self.memory.save_memory(
-                                self.dialogue.dialogue, self.session_id
+                                self.dialogue.full_dialogue(), self.session_id
                             )
                         )
                     except Exception as e:
@@ -374,10 +385,10 @@ class ConnectionHandler:
                 if handled:
                     return
 
-            # 入口处直接解码PCM，避免VAD和ASR重复解码
+            # 入口处直接解码PCM，避免VAD和ASR重复解码；同时保留原始Opus数据包用于上报和声纹识别
             pcm_frame = self._decode_opus_packet(message)
             if pcm_frame:
-                self.asr_audio_queue.put(pcm_frame)
+                get_audio_ingest_monitor().put_frame(self, (pcm_frame, message))
 
     async def _process_mqtt_audio_message(self, message):
         """
@@ -399,11 +410,13 @@ class ConnectionHandler:
             if not pcm_frame:
                 return True
 
-            # AEC处理：如果timestamp>0且启用了AEC
+            # AEC处理：如果timestamp>0且启用了AEC，处理后的PCM与原始数据包不再一致，不保留数据包
+            opus_packet = audio_data
             if timestamp > 0 and self.client_aec:
                 pcm_frame = self._apply_aec(timestamp, pcm_frame)
+                opus_packet = None
 
-            self.asr_audio_queue.put(pcm_frame)
+            get_audio_ingest_monitor().put_frame(self, (pcm_frame, opus_packet))
             return True
         except Exception as e:
             self.logger.bind(tag=TAG).error(f"解析WebSocket音频包失败: {e}")
@@ -412,116 +425,11 @@ class ConnectionHandler:
         return False
 
     def _apply_aec(self, timestamp: int, pcm_frame: bytes) -> bytes:
-        """应用AEC处理 - 综合算法：互相关延迟估计 + Wiener滤波 + 频谱减法"""
+        """应用AEC处理 - 对数功率谱匹配参考帧 + 频域谱减法"""
+        if self.aec_processor is None:
+            return pcm_frame
         try:
-            if not pcm_frame or len(pcm_frame) == 0:
-                return pcm_frame
-
-            if not hasattr(self, "aec_audio_cache") or not self.aec_audio_cache:
-                return pcm_frame
-
-            mic_audio = np.frombuffer(pcm_frame, dtype=np.int16).astype(np.float32)
-            mic_rms = np.sqrt(np.mean(mic_audio ** 2))
-
-            if mic_rms < 100:
-                return pcm_frame
-
-            sorted_timestamps = sorted(self.aec_audio_cache.keys())
-            if len(sorted_timestamps) < 2:
-                return pcm_frame
-
-            # ========== 匹配参考帧（对数功率谱匹配） ==========
-            n = len(mic_audio)
-
-            # 找最接近的timestamp作为起点
-            closest_idx = min(range(len(sorted_timestamps)), key=lambda i: abs(sorted_timestamps[i] - timestamp))
-
-            # 预计算 mic_audio 的对数功率谱（循环内共用，避免重复FFT）
-            mic_window = np.hanning(n)
-            mic_fft = np.fft.rfft(mic_audio * mic_window)
-            mic_psd = np.abs(mic_fft) ** 2
-            mic_log_psd = 10 * np.log10(mic_psd + 1e-8)
-            mic_P_xx = np.dot(mic_log_psd, mic_log_psd)
-
-            # 用对数功率谱匹配找最佳帧：前后各找2帧
-            best_corr = -1
-            best_ref_idx = closest_idx
-            best_ref_rms = 0.0
-
-            for offset in range(-2, 3):  # T-2, T-1, T, T+1, T+2
-                test_idx = closest_idx + offset
-                if test_idx < 0 or test_idx >= len(sorted_timestamps):
-                    continue
-                test_ts = sorted_timestamps[test_idx]
-                test_ref = np.frombuffer(self.aec_audio_cache[test_ts], dtype=np.int16).astype(np.float32)
-                test_ref_rms = np.sqrt(np.mean(test_ref ** 2))
-                if test_ref_rms < 50:
-                    continue
-
-                # 对数功率谱相关性
-                test_window = np.hanning(len(test_ref))
-                test_fft = np.fft.rfft(test_ref * test_window)
-                test_psd = np.abs(test_fft) ** 2
-                test_log_psd = 10 * np.log10(test_psd + 1e-8)
-                P_xy = np.dot(mic_log_psd, test_log_psd)
-                P_yy = np.dot(test_log_psd, test_log_psd)
-                corr = abs(P_xy) / (np.sqrt(mic_P_xx) * np.sqrt(P_yy) + 1e-8)
-
-                if corr > best_corr:
-                    best_corr = corr
-                    best_ref_idx = test_idx
-                    best_ref_rms = test_ref_rms
-
-            best_ts = sorted_timestamps[best_ref_idx]
-            best_ref = np.frombuffer(self.aec_audio_cache[best_ts], dtype=np.int16).astype(np.float32)
-            ref_rms = best_ref_rms
-
-            if ref_rms < 50:
-                return pcm_frame
-
-            # 对齐参考信号（直接截取相同长度）
-            aligned_ref = best_ref[:n]
-            if len(aligned_ref) < n:
-                aligned_ref = np.pad(aligned_ref, (0, n - len(aligned_ref)))
-
-            # ========== 频域 AEC 处理（谱减法） ==========
-            # 时域信号经过声学路径后相位失真，导致时域相关性低且P_xy正负不定
-            # 频域幅度谱不受相位影响，对数功率谱相关性稳定在0.97+
-            # 公式：result_mag = max(|mic_fft| - |ref_fft| * scale * coef, 0)
-
-            mic_mag = np.abs(mic_fft)
-            mic_phase = np.angle(mic_fft)
-            ref_fft = np.fft.rfft(aligned_ref * np.hanning(n))
-            ref_mag = np.abs(ref_fft)
-
-            # 频域计算回声比例 scale
-            scale = np.sum(mic_mag * ref_mag) / (np.dot(ref_mag, ref_mag) + 1e-8)
-
-            # 自适应系数：根据scale和coh动态调整
-            # scale大（回声强）-> coef大；coh高（匹配准）-> coef大
-            raw_coef = 1.0 + scale * 3 + (best_corr - 0.97) * 30
-            coef = max(0.5, min(3.0, raw_coef))
-
-            # 谱减法（过减 + 半波整流）
-            echo_mag = ref_mag * scale * coef
-            result_mag = np.maximum(mic_mag - echo_mag * 1.5, mic_mag * 0.1)
-
-            # 保留相位重建信号
-            result_fft = result_mag * np.exp(1j * mic_phase)
-            output = np.fft.irfft(result_fft, n)
-
-            # 高置信度是纯回声时，再压一下确保VAD检测不到
-            if best_corr >= 0.97 and ref_rms > 500:
-                output = output * 0.3
-
-            # 后处理：限幅
-            output = np.clip(output, -32768, 32767)
-
-            # 转换为bytes
-            result = output.astype(np.int16).tobytes()
-
-            return result
-
+            return self.aec_processor.process(timestamp, pcm_frame)
         except Exception as e:
             self.logger.bind(tag=TAG).warning(f"[AEC] 处理失败: {e}")
             return pcm_frame
@@ -643,8 +551,6 @@ class ConnectionHandler:
             self._initialize_memory()
             """加载意图识别"""
             self._initialize_intent()
-            """初始化上报线程"""
-            self._init_report_threads()
             """更新系统提示词"""
             self._init_prompt_enhancement()
             """注入工具调用few-shot示例（仅function_call模式）"""
@@ -727,19 +633,6 @@ class ConnectionHandler:
 
         self.logger.bind(tag=TAG).debug("已注入工具调用 few-shot 示例")
 
-    def _init_report_threads(self):
-        """初始化ASR和TTS上报线程"""
-        if not self.read_config_from_api or self.need_bind:
-            return
-        if self.chat_history_conf == 0:
-            return
-        if self.report_thread is None or not self.report_thread.is_alive():
-            self.report_thread = threading.Thread(
-                target=self._report_worker, daemon=True
-            )
-            self.report_thread.start()
-            self.logger.bind(tag=TAG).info("TTS上报线程已启动")
-
     def _initialize_tts(self):
         """初始化TTS"""
         tts = None
@@ -756,7 +649,8 @@ class ConnectionHandler:
         if (
                 self._asr is not None
                 and hasattr(self._asr, "interface_type")
-                and self._asr.interface_type == InterfaceType.LOCAL
+                and self._asr.interface_type
+                in (InterfaceType.LOCAL, InterfaceType.LOCAL_STREAM)
         ):
             # 如果公共ASR是本地服务，则直接返回
             # 因为本地一个实例ASR，可以被多个连接共享
@@ -789,8 +683,8 @@ class ConnectionHandler:
         try:
             # 异步获取差异化配置
             await self._initialize_private_config_async()
-            # 在线程池中初始化组件
-            self.executor.submit(self._initialize_components)
+            # 在共享线程池中初始化组件（加载模型等阻塞操作）
+            self.loop.run_in_executor(None, self._initialize_components)
         except Exception as e:
             self.logger.bind(tag=TAG).error(f"后台初始化失败: {e}")
 
@@ -924,6 +818,7 @@ class ConnectionHandler:
             ]
 
         # 使用 run_in_executor 在线程池中执行 initialize_modules，避免阻塞主循环
+        provider_pool = get_provider_pool()
         try:
             modules = await self.loop.run_in_executor(
                 None,  # 使用默认线程池
@@ -936,10 +831,15 @@ class ConnectionHandler:
                 init_tts,
                 init_memory,
                 init_intent,
+                provider_pool if provider_pool.enabled else None,
             )
         except Exception as e:
             self.logger.bind(tag=TAG).error(f"初始化组件失败: {e}")
             modules = {}
+        if provider_pool.enabled:
+            for name in ("vad", "asr", "llm", "intent"):
+                if modules.get(name) is not None:
+                    self._pooled_providers.append(modules[name])
         if modules.get("tts", None) is not None:
             self.tts = modules["tts"]
         if modules.get("vad", None) is not None:
@@ -979,11 +879,9 @@ class ConnectionHandler:
             ]
             if memory_llm_name and memory_llm_name in self.config["LLM"]:
                 # 如果配置了专用LLM，则创建独立的LLM实例
-                from core.utils import llm as llm_utils
-
                 memory_llm_config = self.config["LLM"][memory_llm_name]
                 memory_llm_type = memory_llm_config.get("type", memory_llm_name)
-                memory_llm = llm_utils.create_instance(
+                memory_llm = self._create_dedicated_llm(
                     memory_llm_type, memory_llm_config
                 )
                 self.logger.bind(tag=TAG).info(
@@ -995,6 +893,19 @@ class ConnectionHandler:
                 self.memory.set_llm(self.llm)
                 self.logger.bind(tag=TAG).info("使用主LLM作为意图识别模型")
 
+    def _create_dedicated_llm(self, llm_type, llm_config):
+        """创建意图识别/记忆总结的专用LLM，开启实例池时共享相同配置的实例"""
+        from core.utils import llm as llm_utils
+
+        provider_pool = get_provider_pool()
+        if not provider_pool.enabled:
+            return llm_utils.create_instance(llm_type, llm_config)
+        instance = provider_pool.acquire(
+            "llm", llm_config, lambda: llm_utils.create_instance(llm_type, llm_config)
+        )
+        self._pooled_providers.append(instance)
+        return instance
+
     def _initialize_intent(self):
         if self.intent is None:
             return
@@ -1021,11 +932,9 @@ class ConnectionHandler:
 
             if intent_llm_name and intent_llm_name in self.config["LLM"]:
                 # 如果配置了专用LLM，则创建独立的LLM实例
-                from core.utils import llm as llm_utils
-
                 intent_llm_config = self.config["LLM"][intent_llm_name]
                 intent_llm_type = intent_llm_config.get("type", intent_llm_name)
-                intent_llm = llm_utils.create_instance(
+                intent_llm = self._create_dedicated_llm(
                     intent_llm_type, intent_llm_config
                 )
                 self.logger.bind(tag=TAG).info(
@@ -1049,7 +958,29 @@ class ConnectionHandler:
         # 更新系统prompt至上下文
         self.dialogue.update_system_message(self.prompt)
 
-    def chat(self, query, depth=0):
+    def submit_chat(self, query):
+        """在事件循环上启动一轮对话，LLM流式请求不再占用线程"""
+        task = self.loop.create_task(self.chat_async(query))
+        self.chat_tasks.add(task)
+        task.add_done_callback(self.chat_tasks.discard)
+        return task
+
+    def get_chat_functions(self, depth=0, force_final_answer=False):
+        """本轮请求LLM时携带的工具列表，非function_call模式返回None"""
+        if (
+                self.intent_type != "function_call"
+                or not hasattr(self, "func_handler")
+                or force_final_answer
+        ):
+            return None
+        functions = list(self.func_handler.get_functions())
+        # 仅在第一层调用时注入 direct_answer 虚拟工具
+        # 递归调用（depth>0）不注入，避免模型在生成文本回复时再次调 direct_answer 导致循环
+        if functions is not None and depth == 0:
+            functions.append(DIRECT_ANSWER_TOOL)
+        return functions
+
+    async def chat_async(self, query, depth=0):
         # 保存当前任务的sentence_id到局部变量，避免被新任务覆盖
         current_sentence_id = None
 
@@ -1061,6 +992,10 @@ class ConnectionHandler:
             current_sentence_id = str(uuid.uuid4().hex)
             self.sentence_id = current_sentence_id  # 更新共享属性
             self.dialogue.put(Message(role="user", content=query))
+            # 对话历史超出token预算时在后台压缩早期对话
+            dialogue_context = DialogueContextManager.for_conn(self)
+            if dialogue_context is not None:
+                dialogue_context.maintain()
             self.tts.tts_text_queue.put(
                 TTSMessageDTO(
                     sentence_id=current_sentence_id,
@@ -1090,31 +1025,12 @@ class ConnectionHandler:
             )
 
         # Define intent functions
-        functions = None
         # 达到最大深度时，禁用工具调用，强制 LLM 直接回答
-        if (
-                self.intent_type == "function_call"
-                and hasattr(self, "func_handler")
-                and not force_final_answer
-        ):
-            functions = list(self.func_handler.get_functions())
-            # 仅在第一层调用时注入 direct_answer 虚拟工具
-            # 递归调用（depth>0）不注入，避免模型在生成文本回复时再次调 direct_answer 导致循环
-            if functions is not None and depth == 0:
-                functions.append(DIRECT_ANSWER_TOOL)
+        functions = self.get_chat_functions(depth, force_final_answer)
 
         response_message = []
 
         try:
-            # 使用带记忆的对话
-            memory_str = None
-            # 仅当query非空（代表用户询问）时查询记忆
-            if self.memory is not None and query:
-                future = asyncio.run_coroutine_threadsafe(
-                    self.memory.query_memory(query), self.loop
-                )
-                memory_str = future.result()
-
             # 仅在该说话人首次出现时把身份注入 system，之后靠对话历史首轮保留，
             # 避免每轮在 system 重复出现名字诱导模型反复称呼
             speaker_for_system = None
@@ -1123,22 +1039,28 @@ class ConnectionHandler:
                 self.system_introduced_speakers.add(cs)
                 speaker_for_system = cs
 
-            if self.intent_type == "function_call" and functions is not None:
-                # 使用支持functions的streaming接口
-                llm_responses = self.llm.response_with_functions(
-                    self.session_id,
-                    self.dialogue.get_llm_dialogue_with_memory(
-                        memory_str, self.config.get("voiceprint", {}), speaker_for_system
-                    ),
-                    functions=functions,
-                )
-            else:
-                llm_responses = self.llm.response(
-                    self.session_id,
-                    self.dialogue.get_llm_dialogue_with_memory(
-                        memory_str, self.config.get("voiceprint", {}), speaker_for_system
-                    ),
+            # 流式ASR说话过程中已基于中间识别结果发起的预测请求，与最终结果一致时直接使用
+            llm_responses = None
+            if depth == 0 and self.llm_speculator is not None:
+                llm_responses = self.llm_speculator.commit(query, speaker_for_system)
+
+            if llm_responses is None:
+                # 使用带记忆的对话
+                memory_str = None
+                # 仅当query非空（代表用户询问）时查询记忆
+                if self.memory is not None and query:
+                    memory_str = await self.memory.query_memory(query)
+                dialogue = self.dialogue.get_llm_dialogue_with_memory(
+                    memory_str, self.config.get("voiceprint", {}), speaker_for_system
                 )
+
+                if self.intent_type == "function_call" and functions is not None:
+                    # 使用支持functions的streaming接口
+                    llm_responses = self.llm.response_with_functions_async(
+                        self.session_id, dialogue, functions=functions
+                    )
+                else:
+                    llm_responses = self.llm.response_async(self.session_id, dialogue)
         except Exception as e:
             self.logger.bind(tag=TAG).error(f"LLM 处理出错 {query}: {e}")
             return None
@@ -1150,7 +1072,7 @@ class ConnectionHandler:
         content_arguments = ""
         emotion_flag = True
         try:
-            for response in llm_responses:
+            async for response in llm_responses:
                 if self.client_abort:
                     break
                 if self.intent_type == "function_call" and functions is not None:
@@ -1184,7 +1106,7 @@ class ConnectionHandler:
                                     new_part = self._clean_response_garbage(new_part)
                                     if new_part:
                                         tc["_da_sent"] = safe_end
-                                        self.tts.tts_text_queue.put(
+                                        await self.tts.tts_text_queue.put_async(
                                             TTSMessageDTO(
                                                 sentence_id=current_sentence_id,
                                                 sentence_type=SentenceType.MIDDLE,
@@ -1198,16 +1120,13 @@ class ConnectionHandler:
                 # 在llm回复中获取情绪表情，一轮对话只在开头获取一次
                 if emotion_flag and content is not None and content.strip():
                     if (self.features or {}).get("emoji", True):
-                        asyncio.run_coroutine_threadsafe(
-                            textUtils.get_emotion(self, content),
-                            self.loop,
-                        )
+                        asyncio.create_task(textUtils.get_emotion(self, content))
                     emotion_flag = False
 
                 if content is not None and len(content) > 0:
                     if not tool_call_flag:
                         response_message.append(content)
-                        self.tts.tts_text_queue.put(
+                        await self.tts.tts_text_queue.put_async(
                             TTSMessageDTO(
                                 sentence_id=current_sentence_id,
                                 sentence_type=SentenceType.MIDDLE,
@@ -1234,6 +1153,9 @@ class ConnectionHandler:
                     )
                 )
             return
+        finally:
+            # 提前退出（如被打断）时关闭流，释放上游连接
+            await llm_responses.aclose()
         # 处理function call
         if tool_call_flag:
             bHasError = False
@@ -1332,11 +1254,10 @@ class ConnectionHandler:
                     tool_input = json.loads(tool_call_data.get("arguments") or "{}")
                     enqueue_tool_report(self, tool_call_data['name'], tool_input)
 
-                    future = asyncio.run_coroutine_threadsafe(
+                    future = asyncio.create_task(
                         self.func_handler.handle_llm_function_call(
                             self, tool_call_data
-                        ),
-                        self.loop,
+                        )
                     )
                     futures_with_data.append((future, tool_call_data, tool_input))
 
@@ -1347,7 +1268,7 @@ class ConnectionHandler:
 
                 for future, tool_call_data, tool_input in futures_with_data:
                     try:
-                        result = future.result(timeout=tool_call_timeout)
+                        result = await asyncio.wait_for(future, timeout=tool_call_timeout)
                         tool_results.append((result, tool_call_data))
                         # 使用公共方法上报工具调用结果
                         enqueue_tool_report(self, tool_call_data['name'], tool_input, str(result.result) if result.result else None, report_tool_call=False)
@@ -1366,7 +1287,7 @@ class ConnectionHandler:
 
                 # 统一处理工具调用结果
                 if tool_results:
-                    self._handle_function_result(tool_results, depth=depth, streamed_text=streamed_text)
+                    await self._handle_function_result(tool_results, depth=depth, streamed_text=streamed_text)
 
         # 存储对话内容
         if len(response_message) > 0:
@@ -1391,7 +1312,7 @@ class ConnectionHandler:
 
         return True
 
-    def _handle_function_result(self, tool_results, depth, streamed_text=""):
+    async def _handle_function_result(self, tool_results, depth, streamed_text=""):
         need_llm_tools = []
         record_tools = []
 
@@ -1497,41 +1418,7 @@ class ConnectionHandler:
                         )
                     )
 
-            self.chat(None, depth=depth + 1)
-
-    def _report_worker(self):
-        """聊天记录上报工作线程"""
-        while not self.stop_event.is_set():
-            try:
-                # 从队列获取数据，设置超时以便定期检查停止事件
-                item = self.report_queue.get(timeout=1)
-                if item is None:  # 检测毒丸对象
-                    break
-                try:
-                    # 检查线程池状态
-                    if self.executor is None:
-                        continue
-                    # 提交任务到线程池
-                    self.executor.submit(self._process_report, *item)
-                except Exception as e:
-                    self.logger.bind(tag=TAG).error(f"聊天记录上报线程异常: {e}")
-            except queue.Empty:
-                continue
-            except Exception as e:
-                self.logger.bind(tag=TAG).error(f"聊天记录上报工作线程异常: {e}")
-
-        self.logger.bind(tag=TAG).info("聊天记录上报线程已退出")
-
-    def _process_report(self, type, text, audio_data, report_time):
-        """处理上报任务"""
-        try:
-            # 执行异步上报（在事件循环中运行）
-            asyncio.run(report(self, type, text, audio_data, report_time))
-        except Exception as e:
-            self.logger.bind(tag=TAG).error(f"上报处理异常: {e}")
-        finally:
-            # 标记任务完成
-            self.report_queue.task_done()
+            await self.chat_async(None, depth=depth + 1)
 
     def clearSpeakStatus(self):
         self.client_is_speaking = False
@@ -1548,6 +1435,13 @@ class ConnectionHandler:
             ):
                 self.vad.release_conn_resources(self)
 
+            # 释放实例池中的共享实例
+            if self._pooled_providers:
+                provider_pool = get_provider_pool()
+                for instance in self._pooled_providers:
+                    provider_pool.release(instance)
+                self._pooled_providers = []
+
             # 清理opus解码器
             if hasattr(self, "_connection_opus_decoder"):
                 try:
@@ -1568,19 +1462,17 @@ class ConnectionHandler:
                     pass
                 self.timeout_task = None
 
-            # 取消AEC缓存清理任务
-            if hasattr(self, "_aec_cache_cleanup_task") and self._aec_cache_cleanup_task and not self._aec_cache_cleanup_task.done():
-                self._aec_cache_cleanup_task.cancel()
-                try:
-                    await self._aec_cache_cleanup_task
-                except asyncio.CancelledError:
-                    pass
-                self._aec_cache_cleanup_task = None
+            # 停止ASR音频处理任务（close可能由该任务自身触发，此时由stop_event让其自然退出）
+            if (
+                    self.asr_priority_task
+                    and not self.asr_priority_task.done()
+                    and self.asr_priority_task is not asyncio.current_task()
+            ):
+                self.asr_priority_task.cancel()
 
-            # 清理AEC缓存
-            if hasattr(self, "aec_audio_cache"):
-                self.aec_audio_cache.clear()
-                self.aec_audio_cache_time.clear()
+            # 清理AEC参考信号
+            if self.aec_processor is not None:
+                self.aec_processor.clear()
 
             # 清理工具处理器资源
             if hasattr(self, "func_handler") and self.func_handler:
@@ -1634,20 +1526,18 @@ class ConnectionHandler:
             except Exception as ws_error:
                 self.logger.bind(tag=TAG).error(f"关闭WebSocket连接时出错: {ws_error}")
 
+            # 取消进行中的对话、预测请求和对话摘要
+            for task in list(self.chat_tasks):
+                task.cancel()
+            if self.llm_speculator is not None:
+                self.llm_speculator.discard()
+            if self.dialogue_context is not None:
+                self.dialogue_context.cancel()
+
             if self.tts:
                 await self.tts.close()
             if self.asr:
                 await self.asr.close()
-
-            # 最后关闭线程池（避免阻塞）
-            if self.executor:
-                try:
-                    self.executor.shutdown(wait=False)
-                except Exception as executor_error:
-                    self.logger.bind(tag=TAG).error(
-                        f"关闭线程池时出错: {executor_error}"
-                    )
-                self.executor = None
             self.logger.bind(tag=TAG).info("连接资源已释放")
         except Exception as e:
             self.logger.bind(tag=TAG).error(f"关闭连接时出错: {e}")
@@ -1667,7 +1557,6 @@ class ConnectionHandler:
             for q in [
                 self.tts.tts_text_queue,
                 self.tts.tts_audio_queue,
-                self.report_queue,
             ]:
                 if not q:
                     continue
@@ -1691,23 +1580,23 @@ class ConnectionHandler:
         重置所有音频相关状态(VAD + ASR)
         """
         # Reset VAD states
-        self.client_audio_buffer.clear()
         self.client_have_voice = False
         self.client_voice_stop = False
         self.client_voice_window.clear()
         self.last_is_voice = False
         self.vad_last_voice_time = 0.0
 
-        # Clear ASR buffers
+        # Clear ASR buffers (VAD读游标同时归零)
         self.asr_audio.clear()
+        self.asr_stream_state = None
 
         self.logger.bind(tag=TAG).debug("All audio states reset.")
 
-    def chat_and_close(self, text):
+    async def chat_and_close(self, text):
         """Chat with the user and then close the connection"""
         try:
             # Use the existing chat method
-            self.chat(text)
+            await self.chat_async(text)
 
             # After chat is complete, close the connection
             self.close_after_chat = True
@@ -1745,26 +1634,6 @@ class ConnectionHandler:
         finally:
             self.logger.bind(tag=TAG).info("超时检查任务已退出")
 
-    async def _check_aec_cache_expiry(self):
-        """定期清理过期的AEC缓存"""
-        try:
-            while not self.stop_event.is_set():
-                if hasattr(self, "aec_audio_cache") and self.aec_audio_cache:
-                    current_time = time.time()
-                    expired_keys = [
-                        ts for ts, cache_time in list(self.aec_audio_cache_time.items())
-                        if current_time - cache_time > 120  # 2分钟过期
-                    ]
-                    for ts in expired_keys:
-                        self.aec_audio_cache.pop(ts, None)
-                        self.aec_audio_cache_time.pop(ts, None)
-                    if expired_keys:
-                        self.logger.bind(tag=TAG).debug(f"[AEC] 清理过期缓存 {len(expired_keys)} 条")
-                # 每30秒检查一次
-                await asyncio.sleep(30)
-        except Exception as e:
-            self.logger.bind(tag=TAG).error(f"AEC缓存清理任务出错: {e}")
-
     @staticmethod
     def _extract_direct_answer_response(arguments_str):
         """从 direct_answer 的参数中提取 response 值。
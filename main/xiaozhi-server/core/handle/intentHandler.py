@@ -12,6 +12,7 @@ from plugins_func.register import Action, ActionResponse
 from core.handle.sendAudioHandle import send_stt_message
 from core.handle.reportHandle import enqueue_tool_report
 from core.utils.util import remove_punctuation_and_length
+from core.utils.intent_matcher import get_intent_fast_path
 from core.providers.tts.dto.dto import TTSMessageDTO, SentenceType
 
 TAG = __name__
@@ -40,8 +41,11 @@ async def handle_user_intent(conn: "ConnectionHandler", text):
     if conn.intent_type == "function_call":
         # 使用支持function calling的聊天方法,不再进行意图分析
         return False
-    # 使用LLM进行意图分析
-    intent_result = await analyze_intent_with_llm(conn, text)
+    # 先用规则快速匹配，命中时不再请求意图识别LLM
+    intent_result = match_fast_intent(conn, filtered_text)
+    if not intent_result:
+        # 使用LLM进行意图分析
+        intent_result = await analyze_intent_with_llm(conn, text)
     if not intent_result:
         return False
     # 会话开始时生成sentence_id
@@ -63,6 +67,22 @@ async def check_direct_exit(conn: "ConnectionHandler", text):
     return False
 
 
+def match_fast_intent(conn: "ConnectionHandler", text):
+    """规则快速意图匹配，未开启或未命中时返回None"""
+    if conn.intent_type != "intent_llm":
+        return None
+    intent_config = conn.config["Intent"].get(
+        conn.config["selected_module"]["Intent"], {}
+    )
+    if str(intent_config.get("fast_path", False)).lower() not in ("true", "1", "yes"):
+        return None
+    try:
+        return get_intent_fast_path().match(conn, text)
+    except Exception as e:
+        conn.logger.bind(tag=TAG).error(f"快速意图匹配失败: {e}")
+        return None
+
+
 async def analyze_intent_with_llm(conn: "ConnectionHandler", text):
     """使用LLM分析用户意图"""
     if not hasattr(conn, "intent") or not conn.intent:
@@ -102,7 +122,7 @@ async def process_intent_result(
                 await send_stt_message(conn, original_text)
                 conn.client_abort = False
 
-                def process_context_result():
+                async def process_context_result():
                     conn.dialogue.put(Message(role="user", content=original_text))
 
                     from core.utils.current_time import get_current_time_info
@@ -118,19 +138,17 @@ async def process_intent_result(
 
                                         请根据以上信息回答用户的问题：{original_text}"""
 
-                    # 使用异步调用避免阻塞事件循环，影响其他设备的音频播放
                     try:
-                        response = asyncio.run_coroutine_threadsafe(
-                            conn.intent.replyResult(context_prompt, original_text),
-                            conn.loop,
-                        ).result()
+                        response = await conn.intent.replyResult(
+                            context_prompt, original_text
+                        )
                     except Exception as e:
                         conn.logger.bind(tag=TAG).error(f"LLM生成回复失败: {e}")
                         response = None
                     if response:
                         speak_txt(conn, response)
 
-                conn.executor.submit(process_context_result)
+                _start_task(conn, process_context_result())
                 return True
 
             function_args = {}
@@ -162,20 +180,20 @@ async def process_intent_result(
             # 上报工具调用
             enqueue_tool_report(conn, function_name, tool_input)
 
-            # 使用executor执行函数调用和结果处理
-            def process_function_call():
+            # 在事件循环上异步执行函数调用和结果处理
+            async def process_function_call():
                 conn.dialogue.put(Message(role="user", content=original_text))
                 
                 # 工具调用超时时间
                 tool_call_timeout = int(conn.config.get("tool_call_timeout", 30))
                 # 使用统一工具处理器处理所有工具调用
                 try:
-                    result = asyncio.run_coroutine_threadsafe(
+                    result = await asyncio.wait_for(
                         conn.func_handler.handle_llm_function_call(
                             conn, function_call_data
                         ),
-                        conn.loop,
-                    ).result(timeout=tool_call_timeout)
+                        timeout=tool_call_timeout,
+                    )
                 except Exception as e:
                     conn.logger.bind(tag=TAG).error(f"工具调用失败: {e}")
                     result = ActionResponse(
@@ -193,12 +211,10 @@ async def process_intent_result(
                     elif result.action == Action.REQLLM:  # 调用函数后再请求llm生成回复
                         text = result.result
                         conn.dialogue.put(Message(role="tool", content=text))
-                        # 使用异步调用避免阻塞事件循环，影响其他设备的音频播放
                         try:
-                            llm_result = asyncio.run_coroutine_threadsafe(
-                                conn.intent.replyResult(text, original_text),
-                                conn.loop,
-                            ).result()
+                            llm_result = await conn.intent.replyResult(
+                                text, original_text
+                            )
                         except Exception as e:
                             conn.logger.bind(tag=TAG).error(f"LLM生成回复失败: {e}")
                             llm_result = text
@@ -221,8 +237,7 @@ async def process_intent_result(
                         if text is not None:
                             speak_txt(conn, text)
 
-            # 将函数执行放在线程池中
-            conn.executor.submit(process_function_call)
+            _start_task(conn, process_function_call())
             return True
         return False
     except json.JSONDecodeError as e:
@@ -230,6 +245,14 @@ async def process_intent_result(
         return False
 
 
+def _start_task(conn: "ConnectionHandler", coro):
+    """在事件循环上后台执行意图处理，与对话任务一起在连接关闭时取消"""
+    task = conn.loop.create_task(coro)
+    conn.chat_tasks.add(task)
+    task.add_done_callback(conn.chat_tasks.discard)
+    return task
+
+
 def speak_txt(conn: "ConnectionHandler", text):
     # 记录文本到 sentence_id 映射
     conn.tts.store_tts_text(conn.sentence_id, text)
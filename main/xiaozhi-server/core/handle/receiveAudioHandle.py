@@ -9,17 +9,22 @@ from core.utils.util import audio_to_data
 from core.handle.abortHandle import handleAbortMessage
 from core.handle.intentHandler import handle_user_intent
 from core.utils.output_counter import check_device_output_limit
+from core.utils.llm_speculation import discard_speculation
+from core.utils.latency_stats import get_latency_stats
 from core.handle.sendAudioHandle import send_stt_message, SentenceType
 
 TAG = __name__
 
 
-async def handleAudioMessage(conn: "ConnectionHandler", pcm_frame):
+async def handleAudioMessage(conn: "ConnectionHandler", pcm_frame, opus_packet=None):
+    # 音频帧只写入一次，VAD和ASR都从连接的缓冲区读取
+    conn.asr_audio.append(pcm_frame, opus_packet)
     # 当前片段是否有人说话
-    have_voice = conn.vad.is_vad(conn, pcm_frame)
+    have_voice = await conn.vad.is_vad_async(conn, pcm_frame)
     # 如果设备刚刚被唤醒，短暂忽略VAD检测
     if hasattr(conn, "just_woken_up") and conn.just_woken_up:
         have_voice = False
+        conn.asr_audio.keep_last(10)
         # 设置一个短暂延迟后恢复VAD检测
         if not hasattr(conn, "vad_resume_task") or conn.vad_resume_task.done():
             conn.vad_resume_task = asyncio.create_task(resume_vad_detection(conn))
@@ -41,6 +46,9 @@ async def resume_vad_detection(conn: "ConnectionHandler"):
 
 
 async def startToChat(conn: "ConnectionHandler", text):
+    # 首句语音延迟从这里开始计时，到第一个音频包发出为止
+    get_latency_stats().mark_chat_start(conn)
+
     # 检查输入是否是JSON格式（包含说话人信息）
     speaker_name = None
     actual_text = text
@@ -91,7 +99,8 @@ async def startToChat(conn: "ConnectionHandler", text):
     intent_handled = await handle_user_intent(conn, actual_text)
 
     if intent_handled:
-        # 如果意图已被处理，不再进行聊天
+        # 如果意图已被处理，不再进行聊天，丢弃基于中间识别结果的LLM预测请求
+        discard_speculation(conn)
         return
 
     # 意图未被处理，继续常规聊天流程，使用实际文本内容
@@ -100,7 +109,7 @@ async def startToChat(conn: "ConnectionHandler", text):
     # 准备开始新会话
     conn.client_abort = False
 
-    conn.executor.submit(conn.chat, actual_text)
+    conn.submit_chat(actual_text)
 
 
 async def no_voice_close_connect(conn: "ConnectionHandler", have_voice):
@@ -1,12 +1,11 @@
 """
-TTS上报功能已集成到ConnectionHandler类中。
+聊天记录上报
 
 上报功能包括：
-1. 每个连接对象拥有自己的上报队列和处理线程
-2. 上报线程的生命周期与连接对象绑定
-3. 使用ConnectionHandler.enqueue_tts_report方法进行上报
-
-具体实现请参考core/connection.py中的相关代码。
+1. 所有连接共用进程级上报管道（core/utils/report_pipeline.py），在主事件循环上批量上报
+2. 音频转WAV在管道的线程池中完成，不占用连接的线程
+3. 使用 enqueue_asr_report / enqueue_tts_report / enqueue_tool_report 加入上报队列
+4. 上报音频格式可选WAV或Ogg/Opus（report_pipeline.audio_format），Ogg/Opus直接封装原始数据包
 """
 
 import time
@@ -17,45 +16,11 @@ from typing import TYPE_CHECKING
 if TYPE_CHECKING:
     from core.connection import ConnectionHandler
 
-from config.manage_api_client import report as manage_report
+from core.utils.report_pipeline import get_report_pipeline
 
 TAG = __name__
 
 
-async def report(conn: "ConnectionHandler", chat_type, text, audio_data, report_time):
-    """执行聊天记录上报操作
-
-    Args:
-        conn: 连接对象
-        chat_type: 上报类型，1为用户(ASR/PCM)，2为智能体(TTS/Opus)，3为工具调用
-        text: 合成文本
-        audio_data: 音频数据（chat_type=1时为PCM格式，chat_type=2时为Opus格式）
-        report_time: 上报时间
-    """
-    try:
-        if audio_data:
-
-            if chat_type == 1:
-                wav_data = pcm_to_wav(conn, audio_data)
-            elif chat_type == 2:
-                wav_data = opus_to_wav(conn, audio_data)
-            else:
-                wav_data = None
-        else:
-            wav_data = None
-        # 执行异步上报
-        await manage_report(
-            mac_address=conn.device_id,
-            session_id=conn.session_id,
-            chat_type=chat_type,
-            content=text,
-            audio=wav_data,
-            report_time=report_time,
-        )
-    except Exception as e:
-        conn.logger.bind(tag=TAG).error(f"聊天记录上报失败: {e}")
-
-
 def pcm_to_wav(conn: "ConnectionHandler", pcm_data):
     """将PCM数据转换为WAV格式的字节流
 
@@ -75,6 +40,9 @@ def pcm_to_wav(conn: "ConnectionHandler", pcm_data):
 
         if not pcm_data_bytes:
             raise ValueError("没有有效的PCM数据")
+        # 声纹识别已生成的WAV直接复用
+        if pcm_data_bytes[:4] == b"RIFF":
+            return pcm_data_bytes
 
         # 创建WAV文件头
         num_samples = len(pcm_data_bytes) // 2  # 16-bit samples
@@ -170,14 +138,14 @@ def enqueue_tts_report(conn: "ConnectionHandler", text, opus_data):
     if conn.chat_history_conf == 0:
         return
     try:
-        # 使用连接对象的队列，传入文本和二进制数据而非文件路径
+        # 加入全局上报管道，传入文本和二进制数据而非文件路径
         if conn.chat_history_conf == 2:
-            conn.report_queue.put((2, text, opus_data, int(time.time() * 1000)))
+            get_report_pipeline().enqueue(conn, 2, text, opus_data, int(time.time() * 1000))
             conn.logger.bind(tag=TAG).debug(
                 f"TTS数据已加入上报队列: {conn.device_id}, 音频大小: {len(opus_data)} "
             )
         else:
-            conn.report_queue.put((2, text, None, int(time.time() * 1000)))
+            get_report_pipeline().enqueue(conn, 2, text, None, int(time.time() * 1000))
             conn.logger.bind(tag=TAG).debug(
                 f"TTS数据已加入上报队列: {conn.device_id}, 不上报音频"
             )
@@ -213,38 +181,41 @@ def enqueue_tool_report(conn: "ConnectionHandler", tool_name: str, tool_input: d
                     }
                 ]
             )
-            conn.report_queue.put((3, tool_text, None, timestamp))
+            get_report_pipeline().enqueue(conn, 3, tool_text, None, timestamp)
 
         # 构建工具结果内容
         if tool_result:
             result_display = f'{{"result":"{str(tool_result)}"}}'
             result_content = json.dumps([{"type": "tool_result", "text": result_display}], ensure_ascii=False)
-            conn.report_queue.put((3, result_content, None, timestamp + 1))
+            get_report_pipeline().enqueue(conn, 3, result_content, None, timestamp + 1)
     except Exception as e:
         conn.logger.bind(tag=TAG).error(f"加入工具上报队列失败: {e}")
 
 
-def enqueue_asr_report(conn: "ConnectionHandler", text, opus_data):
+def enqueue_asr_report(conn: "ConnectionHandler", text, opus_data, opus_packets=None):
     """将ASR数据加入上报队列
 
     Args:
         conn: 连接对象
         text: 合成文本
-        opus_data: opus音频数据
+        opus_data: 整句PCM音频数据（或已生成的WAV）
+        opus_packets: 整句对应的原始Opus数据包（可选），上报Ogg/Opus时直接封装
     """
     if not conn.read_config_from_api or conn.need_bind or not conn.report_asr_enable:
         return
     if conn.chat_history_conf == 0:
         return
     try:
-        # 使用连接对象的队列，传入文本和二进制数据而非文件路径
+        # 加入全局上报管道，传入文本和二进制数据而非文件路径
         if conn.chat_history_conf == 2:
-            conn.report_queue.put((1, text, opus_data, int(time.time() * 1000)))
+            get_report_pipeline().enqueue(
+                conn, 1, text, opus_data, int(time.time() * 1000), opus_packets
+            )
             conn.logger.bind(tag=TAG).debug(
                 f"ASR数据已加入上报队列: {conn.device_id}, 音频大小: {len(opus_data)} "
             )
         else:
-            conn.report_queue.put((1, text, None, int(time.time() * 1000)))
+            get_report_pipeline().enqueue(conn, 1, text, None, int(time.time() * 1000))
             conn.logger.bind(tag=TAG).debug(
                 f"ASR数据已加入上报队列: {conn.device_id}, 不上报音频"
             )
@@ -10,6 +10,8 @@ from core.utils import textUtils
 from core.utils.util import audio_to_data
 from core.providers.tts.dto.dto import SentenceType
 from core.utils.audioRateController import AudioRateController
+from core.utils.aec import ServerAEC
+from core.utils.latency_stats import get_latency_stats
 
 TAG = __name__
 # 音频帧时长（毫秒）
@@ -89,16 +91,13 @@ async def _send_to_mqtt_gateway(
         timestamp: 时间戳
         sequence: 序列号
     """
-    # 如果启用了服务端AEC，缓存PCM数据用于后续AEC处理
+    # 如果启用了服务端AEC，解码PCM作为参考信号，写入时即计算好频谱
     if conn.client_aec and timestamp > 0:
-        if not hasattr(conn, "aec_audio_cache"):
-            conn.aec_audio_cache = {}
-            conn.aec_audio_cache_time = {}
+        if conn.aec_processor is None:
+            conn.aec_processor = ServerAEC()
             conn._send_opus_decoder = opuslib_next.Decoder(16000, 1)
-        # 解码opus为PCM后缓存
         pcm_data = conn._send_opus_decoder.decode(bytes(opus_packet), 960)
-        conn.aec_audio_cache[timestamp] = bytes(pcm_data)
-        conn.aec_audio_cache_time[timestamp] = time.time()
+        conn.aec_processor.add_reference(timestamp, pcm_data)
 
     # 为opus数据包添加16字节头部
     header = bytearray(16)
@@ -121,14 +120,14 @@ async def sendAudio(
 
     Args:
         conn: 连接对象
-        audios: 单个opus包(bytes) 或 opus包列表
+        audios: 单个opus包(bytes/memoryview) 或 opus包列表
         frame_duration: 帧时长（毫秒），默认使用全局常量AUDIO_FRAME_DURATION
     """
     if audios is None or len(audios) == 0:
         return
 
     send_delay = conn.config.get("tts_audio_send_delay", -1) / 1000.0
-    is_single_packet = isinstance(audios, bytes)
+    is_single_packet = isinstance(audios, (bytes, memoryview))
 
     # 初始化或获取 RateController
     rate_controller, flow_control = _get_or_create_rate_controller(
@@ -271,6 +270,9 @@ async def _do_send_audio(conn: "ConnectionHandler", opus_packet, flow_control):
         # 直接发送opus数据包
         await conn.websocket.send(opus_packet)
 
+    if conn.first_audio_start is not None:
+        get_latency_stats().on_audio_sent(conn)
+
     # 更新流控状态
     flow_control["packet_count"] = packet_index + 1
     flow_control["sequence"] = sequence + 1
@@ -312,8 +314,27 @@ async def send_tts_message(conn: "ConnectionHandler", state, text=None):
     await conn.websocket.send(json.dumps(message))
 
 
-async def send_stt_message(conn: "ConnectionHandler", text):
-    """发送 STT 状态消息"""
+async def send_stt_message(conn: "ConnectionHandler", text, partial=False):
+    """
+    发送 STT 状态消息
+
+    partial为True时表示用户仍在说话，只下发中间识别结果（state为partial），
+    不发送tts start，也不改变客户端的说话状态
+    """
+    if partial:
+        stt_text = textUtils.get_string_no_punctuation_or_emoji(text)
+        await conn.websocket.send(
+            json.dumps(
+                {
+                    "type": "stt",
+                    "state": "partial",
+                    "text": stt_text,
+                    "session_id": conn.session_id,
+                }
+            )
+        )
+        return
+
     end_prompt_str = conn.config.get("end_prompt", {}).get("prompt")
     if end_prompt_str and end_prompt_str == text:
         await send_tts_message(conn, "start")
@@ -48,10 +48,13 @@ class ListenTextMessageHandler(TextMessageHandler):
                 # 非流式模式：直接触发ASR识别
                 if len(conn.asr_audio) > 0:
                     asr_audio_task = conn.asr_audio.copy()
+                    opus_packets = conn.asr_audio.packets()
                     conn.reset_audio_states()
 
                     if len(asr_audio_task) > 0:
-                        await conn.asr.handle_voice_stop(conn, asr_audio_task)
+                        await conn.asr.handle_voice_stop(
+                            conn, asr_audio_task, opus_packets
+                        )
         elif msg_json["state"] == "detect":
             conn.client_have_voice = False
             conn.reset_audio_states()
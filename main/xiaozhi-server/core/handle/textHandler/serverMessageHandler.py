@@ -5,6 +5,7 @@ from typing import Dict, Any
 from core.handle.textMessageHandler import TextMessageHandler
 from core.handle.textMessageType import TextMessageType
 from core.providers.tools.device_mcp import handle_mcp_message
+from core.utils.private_config_cache import get_private_config_cache
 
 TAG = __name__
 
@@ -87,6 +88,22 @@ class ServerTextMessageHandler(TextMessageHandler):
                         }
                     )
                 )
+        # 失效设备差异化配置缓存，未指定设备时全部失效
+        elif msg_json["action"] == "invalidate_config":
+            device_ids = msg_json.get("content", {}).get("device_ids") or [None]
+            count = 0
+            for device_id in device_ids:
+                count += get_private_config_cache().invalidate(device_id)
+            await conn.websocket.send(
+                json.dumps(
+                    {
+                        "type": "server",
+                        "status": "success",
+                        "message": f"已失效 {count} 条配置缓存",
+                        "content": {"action": "invalidate_config"},
+                    }
+                )
+            )
         # 重启服务器
         elif msg_json["action"] == "restart":
             await conn.handle_restart(msg_json)
\ No newline at end of file
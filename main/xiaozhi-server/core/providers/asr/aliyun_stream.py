@@ -12,6 +12,7 @@ from datetime import datetime
 from config.logger import setup_logging
 from core.providers.asr.base import ASRProviderBase
 from core.providers.asr.dto.dto import InterfaceType
+from core.utils.llm_speculation import notify_partial_transcript
 from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
@@ -236,6 +237,11 @@ class ASRProvider(ASRProviderBase):
                                     logger.bind(tag=TAG).warning(f"发送缓存音频失败: {e}")
                                     break
                         continue
+                    elif message_name == "TranscriptionResultChanged":
+                        # 中间识别结果，用于提前发起LLM预测请求
+                        if conn.client_listen_mode != "manual":
+                            notify_partial_transcript(conn, payload.get("result", ""))
+                        continue
                     elif message_name == "SentenceEnd":
                         # 句子结束（每个句子都会触发）
                         text = payload.get("result", "")
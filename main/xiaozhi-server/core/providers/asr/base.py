@@ -1,15 +1,12 @@
 import os
-import io
 import wave
 import uuid
 import json
 import time
-import queue
 import shutil
 import asyncio
 import tempfile
 import traceback
-import threading
 
 from abc import ABC, abstractmethod
 from config.logger import setup_logging
@@ -17,6 +14,10 @@ from core.providers.asr.dto.dto import InterfaceType
 from core.handle.receiveAudioHandle import startToChat
 from core.handle.reportHandle import enqueue_asr_report
 from core.utils.util import remove_punctuation_and_length
+from core.utils.audio_ingest import get_audio_ingest_monitor
+from core.utils.llm_speculation import discard_speculation
+from core.utils.pcm_buffer import PCMFrameBuffer, wav_header
+from core.utils.ogg_opus import pack_ogg_opus
 from core.handle.receiveAudioHandle import handleAudioMessage
 from typing import Optional, Tuple, List, NamedTuple, TYPE_CHECKING
 
@@ -34,75 +35,99 @@ class ASRProviderBase(ABC):
 
     # 打开音频通道
     async def open_audio_channels(self, conn: "ConnectionHandler"):
-        conn.asr_priority_thread = threading.Thread(
-            target=self.asr_text_priority_thread, args=(conn,), daemon=True
-        )
-        conn.asr_priority_thread.start()
+        # 在事件循环中用一个任务按顺序消费音频，不再为每个连接创建线程
+        get_audio_ingest_monitor().register(conn)
+        conn.asr_priority_task = asyncio.create_task(self.asr_audio_priority_task(conn))
 
     # 有序处理ASR音频
-    def asr_text_priority_thread(self, conn: "ConnectionHandler"):
-        while not conn.stop_event.is_set():
-            try:
-                message = conn.asr_audio_queue.get(timeout=1)
-                future = asyncio.run_coroutine_threadsafe(
-                    handleAudioMessage(conn, message),
-                    conn.loop,
-                )
-                future.result()
-            except queue.Empty:
-                continue
-            except Exception as e:
-                logger.bind(tag=TAG).error(
-                    f"处理ASR文本失败: {str(e)}, 类型: {type(e).__name__}, 堆栈: {traceback.format_exc()}"
-                )
-                continue
+    async def asr_audio_priority_task(self, conn: "ConnectionHandler"):
+        monitor = get_audio_ingest_monitor()
+        try:
+            while not conn.stop_event.is_set():
+                message = await conn.asr_audio_queue.get()
+                if message is None:  # 检测毒丸对象
+                    break
+                monitor.record_frame(conn)
+                try:
+                    await handleAudioMessage(conn, *message)
+                except Exception as e:
+                    logger.bind(tag=TAG).error(
+                        f"处理ASR文本失败: {str(e)}, 类型: {type(e).__name__}, 堆栈: {traceback.format_exc()}"
+                    )
+        finally:
+            monitor.unregister(conn)
 
     # 接收音频
     async def receive_audio(self, conn: "ConnectionHandler", pcm_frame, audio_have_voice):
-        if conn.client_listen_mode == "manual":
-            # 手动模式：缓存音频用于ASR识别
-            conn.asr_audio.append(pcm_frame)
-        else:
-            # 自动/实时模式：使用VAD检测
-            conn.asr_audio.append(pcm_frame)
-
+        # pcm_frame已经在handleAudioMessage中写入conn.asr_audio
+        # 手动模式：缓存全部音频用于ASR识别；自动/实时模式：使用VAD检测
+        if conn.client_listen_mode != "manual":
             # 如果没有语音，且之前也没有声音，缓存部分音频
             if not audio_have_voice and not conn.client_have_voice:
-                conn.asr_audio = conn.asr_audio[-10:]
+                conn.asr_audio.keep_last(10)
                 return
 
             # 自动模式下通过VAD检测到语音停止时触发识别
             if conn.asr.interface_type != InterfaceType.STREAM and conn.client_voice_stop:
-                # 直接使用asr_audio中的PCM数据
-                pcm_bytes = b"".join(conn.asr_audio)
+                # 直接使用asr_audio中的连续PCM数据
+                pcm_bytes = conn.asr_audio.tobytes()
                 # 检查是否有足够的音频数据（每帧1920字节，15帧约28800字节）
                 if len(pcm_bytes) > 1920 * 15:
-                    await self.handle_voice_stop(conn, [pcm_bytes])
+                    await self.handle_voice_stop(
+                        conn, [pcm_bytes], conn.asr_audio.packets()
+                    )
                 conn.reset_audio_states()
 
     # 处理语音停止
-    async def handle_voice_stop(self, conn: "ConnectionHandler", asr_audio_task: List[bytes]):
-        """并行处理ASR和声纹识别"""
+    async def handle_voice_stop(
+        self,
+        conn: "ConnectionHandler",
+        asr_audio_task: List[bytes],
+        opus_packets: Optional[List[bytes]] = None,
+    ):
+        """并行处理ASR和声纹识别
+
+        Args:
+            asr_audio_task: 整句PCM音频
+            opus_packets: 整句对应的原始Opus数据包，用于上报和声纹识别，不完整时为None
+        """
         try:
             total_start_time = time.monotonic()
 
-            # 数据已经是PCM直接使用
-            pcm_data = asr_audio_task
-            combined_pcm_data = b"".join(pcm_data)
+            # 取一次整句PCM快照，ASR、声纹识别和上报共用，流式ASR传入的连接缓冲区之后会被继续写入
+            if isinstance(asr_audio_task, PCMFrameBuffer):
+                combined_pcm_data = asr_audio_task.tobytes()
+                opus_packets = asr_audio_task.packets()
+            else:
+                combined_pcm_data = b"".join(asr_audio_task)
+            asr_audio_task = [combined_pcm_data] if combined_pcm_data else []
 
-            # 预先准备WAV数据
+            # 预先准备声纹识别音频：声纹服务支持Ogg/Opus且原始数据包完整时直接封装，否则拼接WAV
+            voiceprint_audio = None
+            voiceprint_format = "wav"
             wav_data = None
             if conn.voiceprint_provider and combined_pcm_data:
-                wav_data = self._pcm_to_wav(combined_pcm_data)
+                if conn.voiceprint_provider.audio_format == "ogg_opus" and opus_packets:
+                    # 长句封装耗时数十毫秒，放到线程中执行避免阻塞事件循环
+                    voiceprint_audio = await asyncio.to_thread(pack_ogg_opus, opus_packets)
+                    voiceprint_format = "ogg_opus"
+                if not voiceprint_audio:
+                    wav_data = self._pcm_to_wav(combined_pcm_data)
+                    voiceprint_audio = wav_data
+                    voiceprint_format = "wav"
 
             # 定义ASR任务
             asr_task = self.speech_to_text_wrapper(
                 asr_audio_task, conn.session_id
             )
 
-            if conn.voiceprint_provider and wav_data:
+            if conn.voiceprint_provider and voiceprint_audio:
                 voiceprint_task = conn.voiceprint_provider.identify_speaker(
-                    wav_data, conn.session_id
+                    voiceprint_audio,
+                    conn.session_id,
+                    voiceprint_format,
+                    pcm_data=combined_pcm_data,
+                    device_id=conn.device_id,
                 )
                 # 并发等待两个结果
                 asr_result, voiceprint_result = await asyncio.gather(
@@ -164,10 +189,13 @@ class ASRProviderBase(ABC):
             self.stop_ws_connection()
 
             if text_len > 0:
-                audio_snapshot = asr_audio_task.copy()
-                enqueue_asr_report(conn, enhanced_text, audio_snapshot)
+                # 已为声纹识别生成的WAV直接复用，上报时不再拼接
+                audio_snapshot = [wav_data] if wav_data else asr_audio_task.copy()
+                enqueue_asr_report(conn, enhanced_text, audio_snapshot, opus_packets)
                 # 使用自定义模块进行上报
                 await startToChat(conn, enhanced_text)
+            else:
+                discard_speculation(conn)
         except Exception as e:
             logger.bind(tag=TAG).error(f"处理语音停止失败: {e}")
             import traceback
@@ -191,21 +219,11 @@ class ASRProviderBase(ABC):
 
         # 确保数据长度是偶数（16位音频）
         if len(pcm_data) % 2 != 0:
-            pcm_data = pcm_data[:-1]
+            pcm_data = memoryview(pcm_data)[:-1]
 
-        # 创建WAV文件头
-        wav_buffer = io.BytesIO()
+        # 直接拼接WAV文件头，只复制一次PCM数据
         try:
-            with wave.open(wav_buffer, "wb") as wav_file:
-                wav_file.setnchannels(1)  # 单声道
-                wav_file.setsampwidth(2)  # 16位
-                wav_file.setframerate(16000)  # 16kHz采样率
-                wav_file.writeframes(pcm_data)
-
-            wav_buffer.seek(0)
-            wav_data = wav_buffer.read()
-
-            return wav_data
+            return wav_header(len(pcm_data)) + pcm_data
         except Exception as e:
             logger.bind(tag=TAG).error(f"WAV转换失败: {e}")
             return b""
@@ -0,0 +1,188 @@
+"""
+本地ASR批量推理调度器
+本地ASR模型（FunASR、Sherpa-ONNX、Vosk）的实例被所有连接共享，原来每句话单独在默认线程池中识别，
+并发的句子互相争抢CPU，模型也从不批量推理。调度器在一个很短的时间窗口内收集各连接提交的整句音频，
+按时长分桶（同一批内最长与最短的句子相差不超过bucket_ratio倍，减少补零浪费）后合并成一次批量推理。
+模型忙时新到的句子继续排队，推理完成后立即组下一批，负载越高批量越大。
+"""
+
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from config.logger import setup_logging
+
+TAG = __name__
+logger = setup_logging()
+
+# 16kHz 16bit 单声道，每秒字节数
+BYTES_PER_SECOND = 16000 * 2
+
+
+class _Request:
+    __slots__ = ("pcm_bytes", "future", "submit_time")
+
+    def __init__(self, pcm_bytes, future):
+        self.pcm_bytes = pcm_bytes
+        self.future = future
+        self.submit_time = time.perf_counter()
+
+
+class LocalASRBatchScheduler:
+    """
+    跨连接的本地ASR批量推理调度器
+
+    batch_fn(pcm_list) 在推理线程中执行，接收若干句PCM（16kHz 16bit），按相同顺序返回识别结果列表
+    """
+
+    def __init__(
+        self,
+        name,
+        batch_fn,
+        window_ms=20,
+        max_batch_size=8,
+        max_batch_seconds=60,
+        bucket_ratio=1.5,
+        workers=1,
+    ):
+        self.name = name
+        self.batch_fn = batch_fn
+        self.window_seconds = max(float(window_ms), 0.0) / 1000
+        self.max_batch_size = max(int(max_batch_size), 1)
+        self.max_batch_bytes = max(float(max_batch_seconds), 0.0) * BYTES_PER_SECOND
+        self.bucket_ratio = max(float(bucket_ratio), 1.0)
+        self.workers = max(int(workers), 1)
+        self._pending = []
+        self._inflight = 0
+        self._flush_handle = None
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix="asr-batch"
+        )
+
+        # 统计信息
+        self.total_utterances = 0
+        self.total_batches = 0
+        self.max_batch_seen = 0
+        self.total_wait_seconds = 0.0
+        self.total_infer_seconds = 0.0
+        self.total_audio_bytes = 0
+        self.total_padded_bytes = 0
+
+    async def submit(self, pcm_bytes):
+        """提交一句PCM音频，返回该句的识别结果"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append(_Request(pcm_bytes, future))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush(loop)
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.window_seconds, self._flush, loop)
+        return await future
+
+    def _flush(self, loop):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        # 推理线程都在忙时继续排队，等当前批次完成后再组批
+        while self._pending and self._inflight < self.workers:
+            batch = self._take_batch()
+            self._inflight += 1
+            task = loop.run_in_executor(
+                self._executor, self._run_batch, [r.pcm_bytes for r in batch]
+            )
+            task.add_done_callback(lambda f, b=batch: self._scatter(loop, b, f))
+
+    def _take_batch(self):
+        """以最早提交的句子为基准，取时长相近的句子组成一批，其余留在队列中"""
+        anchor = len(self._pending[0].pcm_bytes) or 1
+        low, high = anchor / self.bucket_ratio, anchor * self.bucket_ratio
+        batch, rest = [], []
+        batch_bytes = 0
+        for request in self._pending:
+            size = len(request.pcm_bytes)
+            if (
+                not batch
+                or (
+                    len(batch) < self.max_batch_size
+                    and low <= size <= high
+                    and batch_bytes + size <= self.max_batch_bytes
+                )
+            ):
+                batch.append(request)
+                batch_bytes += size
+            else:
+                rest.append(request)
+        self._pending = rest
+        return batch
+
+    def _run_batch(self, pcm_list):
+        start = time.perf_counter()
+        results = self.batch_fn(pcm_list)
+        return results, time.perf_counter() - start
+
+    def _scatter(self, loop, batch, task):
+        self._inflight -= 1
+        try:
+            results, cost = task.result()
+            if len(results) != len(batch):
+                raise RuntimeError(f"批量识别结果数量不匹配: {len(results)} != {len(batch)}")
+        except Exception as e:
+            logger.bind(tag=TAG).error(f"{self.name}批量识别失败: {e}")
+            for request in batch:
+                if not request.future.done():
+                    request.future.set_exception(e)
+        else:
+            now = time.perf_counter()
+            sizes = [len(r.pcm_bytes) for r in batch]
+            self.total_utterances += len(batch)
+            self.total_batches += 1
+            self.max_batch_seen = max(self.max_batch_seen, len(batch))
+            self.total_infer_seconds += cost
+            self.total_wait_seconds += sum(now - cost - r.submit_time for r in batch)
+            self.total_audio_bytes += sum(sizes)
+            self.total_padded_bytes += max(sizes) * len(sizes)
+            for request, result in zip(batch, results):
+                # 连接可能在等待期间被取消
+                if not request.future.done():
+                    request.future.set_result(result)
+
+        # 排队中的句子已经等待过，不再等时间窗口
+        if self._pending:
+            self._flush(loop)
+
+    def get_stats(self):
+        batches = self.total_batches or 1
+        utterances = self.total_utterances or 1
+        return {
+            "utterances": self.total_utterances,
+            "batches": self.total_batches,
+            "pending": len(self._pending),
+            "avg_batch_size": round(self.total_utterances / batches, 2),
+            "max_batch_size": self.max_batch_seen,
+            "avg_wait_ms": round(self.total_wait_seconds * 1000 / utterances, 3),
+            "avg_infer_ms": round(self.total_infer_seconds * 1000 / batches, 3),
+            "padding_ratio": round(
+                self.total_padded_bytes / self.total_audio_bytes, 3
+            )
+            if self.total_audio_bytes
+            else 0.0,
+        }
+
+
+def create_batch_scheduler(config, batch_fn, name):
+    """按ASR配置创建批量推理调度器，未开启batch_enabled时返回None"""
+    if str(config.get("batch_enabled", False)).lower() not in ("true", "1", "yes"):
+        return None
+    scheduler = LocalASRBatchScheduler(
+        name,
+        batch_fn,
+        window_ms=config.get("batch_window_ms", 20),
+        max_batch_size=config.get("batch_max_size", 8),
+        max_batch_seconds=config.get("batch_max_seconds", 60),
+        bucket_ratio=config.get("batch_bucket_ratio", 1.5),
+        workers=config.get("batch_workers", 1),
+    )
+    logger.bind(tag=TAG).info(
+        f"{name}已启用批量识别模式，窗口{scheduler.window_seconds * 1000}ms，"
+        f"最大批量{scheduler.max_batch_size}"
+    )
+    return scheduler
@@ -6,6 +6,7 @@ import websockets
 from core.providers.asr.base import ASRProviderBase
 from config.logger import setup_logging
 from core.providers.asr.dto.dto import InterfaceType
+from core.utils.llm_speculation import notify_partial_transcript
 from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
@@ -201,6 +202,14 @@ class ASRProvider(ASRProviderBase):
                                     await self.handle_voice_stop(conn, audio_data)
                                     break
 
+                            # 中间识别结果，用于提前发起LLM预测请求
+                            if conn.client_listen_mode != "manual" and not any(
+                                u.get("definite", False) for u in utterances
+                            ):
+                                notify_partial_transcript(
+                                    conn, payload["result"].get("text", "")
+                                )
+
                             for utterance in utterances:
                                 if utterance.get("definite", False):
                                     current_text = utterance["text"]
@@ -7,3 +7,4 @@ class InterfaceType(Enum):
     STREAM = "STREAM"  # 流式接口
     NON_STREAM = "NON_STREAM"  # 非流式接口
     LOCAL = "LOCAL"  # 本地服务
+    LOCAL_STREAM = "LOCAL_STREAM"  # 本地流式服务
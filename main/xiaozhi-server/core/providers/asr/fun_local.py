@@ -4,20 +4,30 @@ import sys
 import time
 import shutil
 import psutil
+import weakref
 import asyncio
+import numpy as np
 
 from funasr import AutoModel
 from config.logger import setup_logging
-from typing import Optional, Tuple, List
+from typing import Optional, Tuple, List, TYPE_CHECKING
 from core.providers.asr.utils import lang_tag_filter
 from core.providers.asr.base import ASRProviderBase
 from core.providers.asr.dto.dto import InterfaceType
+from core.providers.asr.batch_scheduler import create_batch_scheduler
+from core.handle.sendAudioHandle import send_stt_message
+from core.utils.llm_speculation import notify_partial_transcript
+
+if TYPE_CHECKING:
+    from core.connection import ConnectionHandler
 
 TAG = __name__
 logger = setup_logging()
 
 MAX_RETRIES = 2
 RETRY_DELAY = 1  # 重试延迟（秒）
+# 流式解码：每个chunk_size[1]对应60ms（960个采样）
+STREAM_SAMPLES_PER_UNIT = 960
 
 
 # 捕获标准输出
@@ -37,6 +47,21 @@ class CaptureOutput:
             logger.bind(tag=TAG).info(self.output.strip())
 
 
+class StreamSession:
+    """单个连接一句话的在线解码状态，挂在 conn.asr_stream_state 上，随音频状态重置释放"""
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        # FunASR在线解码缓存，整句话持续复用
+        self.cache = {}
+        # 尚未送入模型的PCM数据
+        self.pending = bytearray()
+        self.text = ""
+        self.sent_text = ""
+        self.task: Optional[asyncio.Task] = None
+        self.finalizing = False
+
+
 class ASRProvider(ASRProviderBase):
     def __init__(self, config: dict, delete_audio_file: bool):
         super().__init__()
@@ -57,16 +82,143 @@ class ASRProvider(ASRProviderBase):
         self.language = config.get("language", "auto")
         self.delete_audio_file = delete_audio_file
 
+        # 流式识别配置
+        self.streaming = str(config.get("streaming", False)).lower() == "true"
+        self.streaming_model_dir = config.get(
+            "streaming_model_dir", "models/paraformer-zh-streaming"
+        )
+        self.chunk_size = [int(x) for x in config.get("chunk_size", [0, 10, 5])]
+        self.encoder_chunk_look_back = int(config.get("encoder_chunk_look_back", 4))
+        self.decoder_chunk_look_back = int(config.get("decoder_chunk_look_back", 1))
+        # 每次送入模型的字节数（16bit PCM）
+        self.chunk_stride_bytes = self.chunk_size[1] * STREAM_SAMPLES_PER_UNIT * 2
+        # session_id -> StreamSession，供speech_to_text找到本句的在线解码状态
+        self._stream_sessions = weakref.WeakValueDictionary()
+
         # 确保输出目录存在
         os.makedirs(self.output_dir, exist_ok=True)
         with CaptureOutput():
-            self.model = AutoModel(
-                model=self.model_dir,
-                vad_kwargs={"max_single_segment_time": 30000},
-                disable_update=True,
-                hub="hf",
-                # device="cuda:0",  # 启用GPU加速
+            if self.streaming:
+                self.interface_type = InterfaceType.LOCAL_STREAM
+                self.model = AutoModel(
+                    model=self.streaming_model_dir,
+                    disable_update=True,
+                    hub="hf",
+                )
+            else:
+                self.model = AutoModel(
+                    model=self.model_dir,
+                    vad_kwargs={"max_single_segment_time": 30000},
+                    disable_update=True,
+                    hub="hf",
+                    # device="cuda:0",  # 启用GPU加速
+                )
+
+        # 批量识别模式：跨连接合并整句识别（流式模式下每个连接有独立的解码缓存，不参与批量）
+        self.batch_scheduler = None
+        if not self.streaming:
+            self.batch_scheduler = create_batch_scheduler(
+                config, self._recognize_batch, "FunASR"
+            )
+
+    def _recognize_batch(self, pcm_list: List[bytes]) -> List[str]:
+        """一次批量识别多句音频，按输入顺序返回带标签的原始文本"""
+        inputs = [
+            np.frombuffer(pcm, dtype=np.int16).astype(np.float32) / 32768.0
+            for pcm in pcm_list
+        ]
+        result = self.model.generate(
+            input=inputs,
+            cache={},
+            language=self.language,
+            use_itn=True,
+            batch_size=len(inputs),
+        )
+        return [item["text"] for item in result]
+
+    async def receive_audio(self, conn: "ConnectionHandler", pcm_frame, audio_have_voice):
+        if self.streaming:
+            self._feed_stream(conn, pcm_frame, audio_have_voice)
+        await super().receive_audio(conn, pcm_frame, audio_have_voice)
+
+    def _feed_stream(self, conn: "ConnectionHandler", pcm_frame, audio_have_voice):
+        """说话过程中把新音频写入在线解码状态，凑够一块就在后台解码"""
+        # 手动模式在停止时整句解码
+        if conn.client_listen_mode == "manual":
+            return
+        state = conn.asr_stream_state
+        if state is None:
+            if not audio_have_voice:
+                return
+            # 检测到说话：从缓存的前置音频开始解码（当前帧已写入conn.asr_audio）
+            state = StreamSession(conn.session_id)
+            state.pending += conn.asr_audio.tobytes()
+            conn.asr_stream_state = state
+            self._stream_sessions[conn.session_id] = state
+        elif state.finalizing:
+            return
+        else:
+            state.pending += pcm_frame
+
+        if len(state.pending) >= self.chunk_stride_bytes and (
+            state.task is None or state.task.done()
+        ):
+            state.task = asyncio.create_task(self._decode_stream(conn, state))
+
+    def _generate_chunk(self, state: StreamSession, pcm: bytes, is_final: bool) -> str:
+        audio = np.frombuffer(pcm, dtype=np.int16).astype(np.float32) / 32768.0
+        result = self.model.generate(
+            input=audio,
+            cache=state.cache,
+            is_final=is_final,
+            chunk_size=self.chunk_size,
+            encoder_chunk_look_back=self.encoder_chunk_look_back,
+            decoder_chunk_look_back=self.decoder_chunk_look_back,
+        )
+        return result[0]["text"] if result else ""
+
+    async def _decode_stream(self, conn: "ConnectionHandler", state: StreamSession):
+        """后台逐块解码，文本有变化时下发中间结果"""
+        try:
+            while len(state.pending) >= self.chunk_stride_bytes and not state.finalizing:
+                chunk = bytes(state.pending[: self.chunk_stride_bytes])
+                del state.pending[: self.chunk_stride_bytes]
+                state.text += await asyncio.to_thread(
+                    self._generate_chunk, state, chunk, False
+                )
+                if (
+                    state.text != state.sent_text
+                    and not state.finalizing
+                    and conn.asr_stream_state is state
+                ):
+                    state.sent_text = state.text
+                    await send_stt_message(conn, state.text, partial=True)
+                    notify_partial_transcript(conn, state.text)
+        except Exception as e:
+            logger.bind(tag=TAG).error(f"流式语音识别失败: {e}")
+
+    async def _finalize_stream(self, state: StreamSession) -> str:
+        """VAD判停后等待在途的解码，再只解码剩余音频得到最终结果"""
+        state.finalizing = True
+        if state.task is not None:
+            await state.task
+        pending = bytes(state.pending) or b"\x00" * (STREAM_SAMPLES_PER_UNIT * 2)
+        state.pending.clear()
+        stride = self.chunk_stride_bytes
+        for offset in range(0, len(pending), stride):
+            is_final = offset + stride >= len(pending)
+            state.text += await asyncio.to_thread(
+                self._generate_chunk, state, pending[offset : offset + stride], is_final
             )
+        return state.text
+
+    async def _stream_speech_to_text(self, session_id: str, pcm_bytes: bytes) -> str:
+        state = self._stream_sessions.get(session_id)
+        if state is None or state.finalizing:
+            # 没有进行中的在线解码（如手动模式），整句按块解码
+            state = StreamSession(session_id)
+            state.pending += pcm_bytes
+        return await self._finalize_stream(state)
 
     async def speech_to_text(
         self, opus_data: List[bytes], session_id: str, artifacts=None
@@ -81,6 +233,24 @@ class ASRProvider(ASRProviderBase):
 
                 # 语音识别 - 使用线程池避免阻塞事件循环
                 start_time = time.time()
+                if self.streaming:
+                    text = lang_tag_filter(
+                        await self._stream_speech_to_text(session_id, artifacts.pcm_bytes)
+                    )
+                    logger.bind(tag=TAG).debug(
+                        f"流式语音识别收尾耗时: {time.time() - start_time:.3f}s | 结果: {text}"
+                    )
+                    return text, artifacts.file_path
+
+                if self.batch_scheduler is not None:
+                    text = lang_tag_filter(
+                        await self.batch_scheduler.submit(artifacts.pcm_bytes)
+                    )
+                    logger.bind(tag=TAG).debug(
+                        f"语音识别耗时: {time.time() - start_time:.3f}s | 结果: {text}"
+                    )
+                    return text, artifacts.file_path
+
                 result = await asyncio.to_thread(
                     self.model.generate,
                     input=artifacts.pcm_bytes,
@@ -7,6 +7,7 @@ from config.logger import setup_logging
 from typing import Optional, Tuple, List
 from core.providers.asr.dto.dto import InterfaceType
 from core.providers.asr.base import ASRProviderBase
+from core.providers.asr.batch_scheduler import create_batch_scheduler
 
 import numpy as np
 import sherpa_onnx
@@ -96,6 +97,11 @@ class ASRProvider(ASRProviderBase):
                     use_itn=True,
                 )
 
+        # 批量识别模式：跨连接合并整句识别，一次decode_streams解码多句
+        self.batch_scheduler = create_batch_scheduler(
+            config, self._recognize_batch, "SherpaASR"
+        )
+
     def read_wave(self, wave_filename: str) -> Tuple[np.ndarray, int]:
         """
         Args:
@@ -120,6 +126,16 @@ class ASRProvider(ASRProviderBase):
             samples_float32 = samples_float32 / 32768
             return samples_float32, f.getframerate()
 
+    def _recognize_batch(self, pcm_list: List[bytes]) -> List[str]:
+        streams = []
+        for pcm in pcm_list:
+            s = self.model.create_stream()
+            samples = np.frombuffer(pcm, dtype=np.int16).astype(np.float32) / 32768
+            s.accept_waveform(16000, samples)
+            streams.append(s)
+        self.model.decode_streams(streams)
+        return [s.result.text for s in streams]
+
     def requires_file(self) -> bool:
         return True
 
@@ -134,6 +150,13 @@ class ASRProvider(ASRProviderBase):
             file_path = artifacts.file_path
 
             start_time = time.time()
+            if self.batch_scheduler is not None:
+                text = await self.batch_scheduler.submit(artifacts.pcm_bytes)
+                logger.bind(tag=TAG).debug(
+                    f"语音识别耗时: {time.time() - start_time:.3f}s | 结果: {text}"
+                )
+                return text, file_path
+
             s = self.model.create_stream()
             samples, sample_rate = self.read_wave(file_path)
             s.accept_waveform(sample_rate, samples)
@@ -5,6 +5,7 @@ from typing import Optional, Tuple, List
 from .base import ASRProviderBase
 from config.logger import setup_logging
 from core.providers.asr.dto.dto import InterfaceType
+from core.providers.asr.batch_scheduler import create_batch_scheduler
 import vosk
 
 TAG = __name__
@@ -26,6 +27,12 @@ class ASRProvider(ASRProviderBase):
         # 确保输出目录存在
         os.makedirs(self.output_dir, exist_ok=True)
 
+        # 批量识别模式：VOSK没有批量解码接口，调度器把多句音频交给推理线程依次识别，
+        # 不再阻塞事件循环，每句使用独立的识别器
+        self.batch_scheduler = create_batch_scheduler(
+            config, self._recognize_batch, "VoskASR"
+        )
+
     def _load_model(self):
         """加载VOSK模型"""
         try:
@@ -43,6 +50,33 @@ class ASRProvider(ASRProviderBase):
             logger.bind(tag=TAG).error(f"加载VOSK模型失败: {e}")
             raise
 
+    def _recognize_batch(self, pcm_list: List[bytes]) -> List[str]:
+        results = []
+        for pcm in pcm_list:
+            recognizer = vosk.KaldiRecognizer(self.model, 16000)
+            results.append(self._recognize(recognizer, pcm))
+        return results
+
+    def _recognize(self, recognizer, pcm_bytes: bytes) -> str:
+        # 进行识别（VOSK推荐每次送入2000字节的数据）
+        chunk_size = 2000
+        text_result = ""
+
+        for i in range(0, len(pcm_bytes), chunk_size):
+            chunk = pcm_bytes[i:i+chunk_size]
+            if recognizer.AcceptWaveform(chunk):
+                result = json.loads(recognizer.Result())
+                text = result.get('text', '')
+                if text:
+                    text_result += text + " "
+
+        # 获取最终结果
+        final_result = json.loads(recognizer.FinalResult())
+        final_text = final_result.get('text', '')
+        if final_text:
+            text_result += final_text
+        return text_result.strip()
+
     async def speech_to_text(
         self, opus_data: List[bytes], session_id: str, artifacts=None
     ) -> Tuple[Optional[str], Optional[str]]:
@@ -60,31 +94,16 @@ class ASRProvider(ASRProviderBase):
                 return "", None
 
             start_time = time.time()
-            
-            
-            # 进行识别（VOSK推荐每次送入2000字节的数据）
-            chunk_size = 2000
-            text_result = ""
-            
-            for i in range(0, len(artifacts.pcm_bytes), chunk_size):
-                chunk = artifacts.pcm_bytes[i:i+chunk_size]
-                if self.recognizer.AcceptWaveform(chunk):
-                    result = json.loads(self.recognizer.Result())
-                    text = result.get('text', '')
-                    if text:
-                        text_result += text + " "
-            
-            # 获取最终结果
-            final_result = json.loads(self.recognizer.FinalResult())
-            final_text = final_result.get('text', '')
-            if final_text:
-                text_result += final_text
-            
+            if self.batch_scheduler is not None:
+                text_result = await self.batch_scheduler.submit(artifacts.pcm_bytes)
+            else:
+                text_result = self._recognize(self.recognizer, artifacts.pcm_bytes)
+
             logger.bind(tag=TAG).debug(
-                f"VOSK语音识别耗时: {time.time() - start_time:.3f}s | 结果: {text_result.strip()}"
+                f"VOSK语音识别耗时: {time.time() - start_time:.3f}s | 结果: {text_result}"
             )
             
-            return text_result.strip(), artifacts.file_path
+            return text_result, artifacts.file_path
             
         except Exception as e:
             logger.bind(tag=TAG).error(f"VOSK语音识别失败: {e}")
@@ -8,7 +8,7 @@ import gc
 from time import mktime
 from datetime import datetime
 from urllib.parse import urlencode
-from typing import List, TYPE_CHECKING
+from typing import List, Optional, TYPE_CHECKING
 
 if TYPE_CHECKING:
     from core.connection import ConnectionHandler
@@ -16,6 +16,7 @@ from config.logger import setup_logging
 from wsgiref.handlers import format_date_time
 from core.providers.asr.base import ASRProviderBase
 from core.providers.asr.dto.dto import InterfaceType
+from core.utils.llm_speculation import notify_partial_transcript
 
 TAG = __name__
 logger = setup_logging()
@@ -220,6 +221,9 @@ class ASRProvider(ASRProviderBase):
                                 for j in i.get("cw", []):
                                     w = j.get("w", "")
                                     self.text += w
+                            # 中间识别结果，用于提前发起LLM预测请求
+                            if status != 2 and conn.client_listen_mode != "manual":
+                                notify_partial_transcript(conn, self.text)
 
                     if status == 2:
                         logger.bind(tag=TAG).debug("收到最终识别结果，触发处理")
@@ -250,7 +254,10 @@ class ASRProvider(ASRProviderBase):
             conn.reset_audio_states()
 
     async def handle_voice_stop(
-        self, conn: "ConnectionHandler", asr_audio_task: List[bytes]
+        self,
+        conn: "ConnectionHandler",
+        asr_audio_task: List[bytes],
+        opus_packets: Optional[List[bytes]] = None,
     ):
         """处理语音停止，发送最后一帧并处理识别结果"""
         try:
@@ -264,7 +271,7 @@ class ASRProvider(ASRProviderBase):
                 except Exception as e:
                     logger.bind(tag=TAG).error(f"发送停止请求失败: {e}")
 
-            await super().handle_voice_stop(conn, asr_audio_task)
+            await super().handle_voice_stop(conn, asr_audio_task, opus_packets)
         except Exception as e:
             logger.bind(tag=TAG).error(f"处理语音停止失败: {e}")
             import traceback
@@ -0,0 +1,388 @@
+"""
+意图识别引擎
+意图识别模块被多个连接共享，原来每次识别都重新拼接完整的系统提示词（函数列表、音乐列表、HomeAssistant设备），
+缓存也只按 md5(device_id + 文本) 精确命中。引擎在此基础上提供：
+1. 按工具集指纹（函数列表 + 音乐列表 + 设备列表）预编译系统提示词，工具集相同的连接共用同一份
+2. 语义缓存：文本去掉标点、空白和首尾语气词后作为键，工具集相同的设备共享；可选按字符二元组余弦相似度
+   做近似匹配（数字必须完全一致，避免“音量调到50”命中“音量调到60”）
+3. 相同工具集、相同文本的并发请求只调用一次LLM；时间窗口内的其他请求合并成一次批量请求，
+   让LLM按顺序返回JSON数组，解析失败时逐条重试
+"""
+
+import re
+import json
+import time
+import math
+import asyncio
+import hashlib
+import threading
+from collections import Counter, OrderedDict
+
+from config.logger import setup_logging
+from core.utils.cache.config import CacheConfig, CacheType
+
+TAG = __name__
+logger = setup_logging()
+
+# 首尾的语气词，不影响意图
+FILLER_WORDS = (
+    "那个",
+    "就是",
+    "嗯",
+    "啊",
+    "呃",
+    "额",
+    "哦",
+    "喔",
+    "呀",
+    "吧",
+    "呢",
+    "嘛",
+    "哈",
+    "诶",
+)
+_PUNCTUATION_RE = re.compile(r"[^\w]|_", re.UNICODE)
+_DIGITS_RE = re.compile(r"\d+")
+
+
+def normalize_intent_text(text):
+    """去掉标点、空白和首尾语气词并转为小写，作为缓存键"""
+    original = text = _PUNCTUATION_RE.sub("", text or "").lower()
+    changed = True
+    while changed and text:
+        changed = False
+        for word in FILLER_WORDS:
+            if text.startswith(word):
+                text = text[len(word) :]
+                changed = True
+            if text.endswith(word):
+                text = text[: -len(word)]
+                changed = True
+    # 全是语气词时保留原文
+    return text or original
+
+
+def _bigrams(text):
+    if len(text) < 2:
+        return Counter([text])
+    return Counter(text[i : i + 2] for i in range(len(text) - 1))
+
+
+def _cosine(a, b):
+    dot = sum(count * b.get(gram, 0) for gram, count in a.items())
+    if dot == 0:
+        return 0.0
+    norm_a = math.sqrt(sum(c * c for c in a.values()))
+    norm_b = math.sqrt(sum(c * c for c in b.values()))
+    return dot / (norm_a * norm_b)
+
+
+class _CacheEntry:
+    __slots__ = ("intent", "timestamp", "bigrams", "digits")
+
+    def __init__(self, intent, normalized):
+        self.intent = intent
+        self.timestamp = time.time()
+        self.bigrams = _bigrams(normalized)
+        self.digits = _DIGITS_RE.findall(normalized)
+
+
+class IntentSemanticCache:
+    """按工具集指纹分区的意图缓存，TTL与容量沿用 CacheType.INTENT 的配置"""
+
+    def __init__(self, similarity_threshold=0.0):
+        cache_config = CacheConfig.for_type(CacheType.INTENT)
+        self.ttl = cache_config.ttl
+        self.max_size = cache_config.max_size or 1000
+        # 小于等于0表示关闭近似匹配
+        self.similarity_threshold = float(similarity_threshold or 0)
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def _expired(self, entry):
+        return self.ttl is not None and time.time() - entry.timestamp > self.ttl
+
+    def get(self, fingerprint, normalized):
+        """返回 (意图, 命中类型)，命中类型为 exact / similar，未命中返回 (None, None)"""
+        with self._lock:
+            entries = self._entries.get(fingerprint)
+            if not entries:
+                return None, None
+            entry = entries.get(normalized)
+            if entry is not None:
+                if not self._expired(entry):
+                    entries.move_to_end(normalized)
+                    return entry.intent, "exact"
+                del entries[normalized]
+            if self.similarity_threshold <= 0:
+                return None, None
+            return self._nearest(entries, normalized)
+
+    def _nearest(self, entries, normalized):
+        grams = _bigrams(normalized)
+        digits = _DIGITS_RE.findall(normalized)
+        best, best_score = None, self.similarity_threshold
+        for entry in entries.values():
+            if entry.digits != digits or self._expired(entry):
+                continue
+            score = _cosine(grams, entry.bigrams)
+            if score >= best_score:
+                best, best_score = entry, score
+        if best is None:
+            return None, None
+        return best.intent, "similar"
+
+    def set(self, fingerprint, normalized, intent):
+        with self._lock:
+            entries = self._entries.setdefault(fingerprint, OrderedDict())
+            entries[normalized] = _CacheEntry(intent, normalized)
+            entries.move_to_end(normalized)
+            while len(entries) > self.max_size:
+                entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class _IntentRequest:
+    __slots__ = ("dialogue_prompt", "future")
+
+    def __init__(self, dialogue_prompt, future):
+        self.dialogue_prompt = dialogue_prompt
+        self.future = future
+
+
+def extract_intent_json(text):
+    """从LLM返回内容中提取JSON对象部分"""
+    text = (text or "").strip()
+    match = re.search(r"\{.*\}", text, re.DOTALL)
+    return match.group(0) if match else text
+
+
+class IntentEngine:
+    """进程级共享的意图识别引擎"""
+
+    def __init__(self, config=None):
+        config = config or {}
+        self.cache = IntentSemanticCache(config.get("cache_similarity_threshold", 0))
+        self.window_seconds = max(float(config.get("batch_window_ms", 0)), 0.0) / 1000
+        self.max_batch_size = max(int(config.get("batch_max_size", 4)), 1)
+        self.max_concurrency = max(int(config.get("max_concurrency", 16)), 1)
+        self.max_prompts = 64
+        self._prompts = OrderedDict()
+        self._prompt_lock = threading.Lock()
+        self._pending = {}
+        self._timers = {}
+        self._inflight = {}
+        self._semaphore = None
+
+        # 统计信息
+        self._stats_lock = threading.Lock()
+        self.requests = 0
+        self.exact_hits = 0
+        self.similar_hits = 0
+        self.coalesced = 0
+        self.llm_calls = 0
+        self.batched_calls = 0
+        self.batch_fallbacks = 0
+        self.total_llm_seconds = 0.0
+        self.total_miss_seconds = 0.0
+        self.misses = 0
+
+    def _count(self, name, value=1):
+        with self._stats_lock:
+            setattr(self, name, getattr(self, name) + value)
+
+    @staticmethod
+    def fingerprint(functions, music_file_names, devices):
+        """工具集指纹：函数描述、音乐列表和设备列表相同的连接使用同一份提示词和缓存"""
+        payload = json.dumps(
+            [functions or [], music_file_names or [], devices or []],
+            ensure_ascii=False,
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.md5(payload.encode()).hexdigest()
+
+    def get_prompt(self, fingerprint, builder):
+        """获取预编译的系统提示词，不存在时调用 builder() 生成"""
+        with self._prompt_lock:
+            prompt = self._prompts.get(fingerprint)
+            if prompt is not None:
+                self._prompts.move_to_end(fingerprint)
+                return prompt
+        prompt = builder()
+        with self._prompt_lock:
+            self._prompts[fingerprint] = prompt
+            while len(self._prompts) > self.max_prompts:
+                self._prompts.popitem(last=False)
+        return prompt
+
+    async def detect(self, llm, fingerprint, system_prompt, dialogue_prompt, text):
+        """
+        识别一句话的意图，返回LLM给出的JSON字符串（未校验）
+
+        Args:
+            llm: 意图识别使用的LLM
+            fingerprint: 工具集指纹
+            system_prompt: 工具集对应的系统提示词
+            dialogue_prompt: 最近的对话记录（含本句）
+            text: 用户本句文本
+        """
+        start = time.perf_counter()
+        self._count("requests")
+        normalized = normalize_intent_text(text)
+        intent, hit_type = self.cache.get(fingerprint, normalized)
+        if intent is not None:
+            self._count("exact_hits" if hit_type == "exact" else "similar_hits")
+            logger.bind(tag=TAG).debug(f"意图缓存命中({hit_type}): {text} -> {intent}")
+            return intent
+
+        # 相同工具集、相同文本的请求正在识别中，直接等待其结果
+        flight_key = (fingerprint, normalized)
+        future = self._inflight.get(flight_key)
+        if future is not None:
+            self._count("coalesced")
+            return await asyncio.shield(future)
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._inflight[flight_key] = future
+        future.add_done_callback(lambda _: self._inflight.pop(flight_key, None))
+        self._enqueue(loop, llm, fingerprint, system_prompt, dialogue_prompt, future)
+        try:
+            intent = await asyncio.shield(future)
+        finally:
+            with self._stats_lock:
+                self.misses += 1
+                self.total_miss_seconds += time.perf_counter() - start
+        return intent
+
+    def remember(self, fingerprint, text, intent):
+        """缓存校验通过的识别结果"""
+        self.cache.set(fingerprint, normalize_intent_text(text), intent)
+
+    def _enqueue(self, loop, llm, fingerprint, system_prompt, dialogue_prompt, future):
+        key = (id(llm), fingerprint)
+        if key not in self._pending:
+            self._pending[key] = (llm, system_prompt, [])
+        requests = self._pending[key][2]
+        requests.append(_IntentRequest(dialogue_prompt, future))
+        if self.window_seconds <= 0 or len(requests) >= self.max_batch_size:
+            self._dispatch(loop, key)
+        elif key not in self._timers:
+            self._timers[key] = loop.call_later(
+                self.window_seconds, self._dispatch, loop, key
+            )
+
+    def _dispatch(self, loop, key):
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        pending = self._pending.pop(key, None)
+        if pending is None:
+            return
+        llm, system_prompt, requests = pending
+        loop.create_task(self._run(llm, system_prompt, requests))
+
+    async def _run(self, llm, system_prompt, requests):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        if len(requests) > 1:
+            try:
+                intents = await self._call_batch(llm, system_prompt, requests)
+            except Exception as e:
+                self._count("batch_fallbacks")
+                logger.bind(tag=TAG).warning(f"批量意图识别失败，逐条重试: {e}")
+            else:
+                for request, intent in zip(requests, intents):
+                    if not request.future.done():
+                        request.future.set_result(intent)
+                return
+        await asyncio.gather(
+            *(self._run_single(llm, system_prompt, request) for request in requests)
+        )
+
+    async def _run_single(self, llm, system_prompt, request):
+        try:
+            intent = extract_intent_json(
+                await self._call_llm(llm, system_prompt, request.dialogue_prompt)
+            )
+        except Exception as e:
+            if not request.future.done():
+                request.future.set_exception(e)
+        else:
+            if not request.future.done():
+                request.future.set_result(intent)
+
+    async def _call_batch(self, llm, system_prompt, requests):
+        count = len(requests)
+        batch_prompt = (
+            f"{system_prompt}\n\n【批量识别】下面有{count}段相互独立的对话，每段以“### 对话序号”开头。"
+            f"请分别识别每段对话中用户最后一句话的意图，按顺序返回一个包含{count}个元素的JSON数组，"
+            "数组的每个元素都是按上述格式返回的JSON对象，不要包含任何其他文字。"
+        )
+        user_prompt = "\n".join(
+            f"### 对话{i + 1}\n{request.dialogue_prompt}"
+            for i, request in enumerate(requests)
+        )
+        result = (await self._call_llm(llm, batch_prompt, user_prompt)).strip()
+        match = re.search(r"\[.*\]", result, re.DOTALL)
+        items = json.loads(match.group(0) if match else result)
+        if not isinstance(items, list) or len(items) != count:
+            raise ValueError(f"返回结果数量不匹配: {result[:100]}")
+        if not all(isinstance(item, dict) for item in items):
+            raise ValueError(f"返回结果格式错误: {result[:100]}")
+        self._count("batched_calls")
+        return [json.dumps(item, ensure_ascii=False) for item in items]
+
+    async def _call_llm(self, llm, system_prompt, user_prompt):
+        async with self._semaphore:
+            start = time.perf_counter()
+            try:
+                # 使用 to_thread 将同步阻塞调用放到线程池中，避免阻塞事件循环
+                return await asyncio.to_thread(
+                    llm.response_no_stream,
+                    system_prompt=system_prompt,
+                    user_prompt=user_prompt,
+                )
+            finally:
+                with self._stats_lock:
+                    self.llm_calls += 1
+                    self.total_llm_seconds += time.perf_counter() - start
+
+    def get_stats(self):
+        with self._stats_lock:
+            hits = self.exact_hits + self.similar_hits
+            return {
+                "requests": self.requests,
+                "exact_hits": self.exact_hits,
+                "similar_hits": self.similar_hits,
+                "coalesced": self.coalesced,
+                "hit_rate": round(hits / self.requests, 4) if self.requests else 0.0,
+                "llm_calls": self.llm_calls,
+                "batched_calls": self.batched_calls,
+                "batch_fallbacks": self.batch_fallbacks,
+                "prompts": len(self._prompts),
+                "avg_llm_ms": round(self.total_llm_seconds * 1000 / self.llm_calls, 1)
+                if self.llm_calls
+                else 0.0,
+                "avg_miss_ms": round(self.total_miss_seconds * 1000 / self.misses, 1)
+                if self.misses
+                else 0.0,
+            }
+
+
+_intent_engine = None
+_intent_engine_lock = threading.Lock()
+
+
+def get_intent_engine(config=None):
+    """获取全局意图识别引擎实例（单例模式），首次调用时的配置生效"""
+    global _intent_engine
+    if _intent_engine is None:
+        with _intent_engine_lock:
+            if _intent_engine is None:
+                _intent_engine = IntentEngine(config)
+    return _intent_engine
@@ -7,9 +7,8 @@ from ..base import IntentProviderBase
 from plugins_func.functions.play_music import initialize_music_handler
 from config.logger import setup_logging
 from core.utils.util import get_system_error_response
-import re
+from .intent_engine import get_intent_engine
 import json
-import hashlib
 import time
 
 
@@ -22,14 +21,22 @@ class IntentProvider(IntentProviderBase):
     def __init__(self, config):
         super().__init__(config)
         self.llm = None
-        self.promot = ""
-        # 导入全局缓存管理器
-        from core.utils.cache.manager import cache_manager, CacheType
-
-        self.cache_manager = cache_manager
-        self.CacheType = CacheType
+        # 全局意图识别引擎（提示词预编译、语义缓存、批量请求）
+        self.intent_engine = get_intent_engine(config)
         self.history_count = 4  # 默认使用最近4条对话记录
 
+    def build_system_prompt(self, functions_list, music_file_names, devices) -> str:
+        """生成包含音乐列表和HomeAssistant设备的完整系统提示词"""
+        prompt = self.get_intent_system_prompt(functions_list)
+        prompt += f"\n<musicNames>{music_file_names}\n</musicNames>"
+        if len(devices) > 0:
+            hass_prompt = "\n下面是我家智能设备列表（位置，设备名，entity_id），可以通过homeassistant控制\n"
+            for device in devices:
+                hass_prompt += device + "\n"
+            prompt += hass_prompt
+        logger.bind(tag=TAG).debug(f"User prompt: {prompt}")
+        return prompt
+
     def get_intent_system_prompt(self, functions_list: str) -> str:
         """
         根据配置的意图选项和可用函数动态生成系统提示词
@@ -154,45 +161,29 @@ class IntentProvider(IntentProviderBase):
         model_info = getattr(self.llm, "model_name", str(self.llm.__class__.__name__))
         logger.bind(tag=TAG).debug(f"使用意图识别模型: {model_info}")
 
-        # 计算缓存键
-        cache_key = hashlib.md5((conn.device_id + text).encode()).hexdigest()
-
-        # 检查缓存
-        cached_intent = self.cache_manager.get(self.CacheType.INTENT, cache_key)
-        if cached_intent is not None:
-            cache_time = time.time() - total_start_time
-            logger.bind(tag=TAG).debug(
-                f"使用缓存的意图: {cache_key} -> {cached_intent}, 耗时: {cache_time:.4f}秒"
-            )
-            return cached_intent
-
-        if self.promot == "":
-            functions = conn.func_handler.get_functions()
-            if hasattr(conn, "mcp_client"):
-                mcp_tools = conn.mcp_client.get_available_tools()
-                if mcp_tools is not None and len(mcp_tools) > 0:
-                    if functions is None:
-                        functions = []
-                    functions.extend(mcp_tools)
-
-            self.promot = self.get_intent_system_prompt(functions)
+        functions = list(conn.func_handler.get_functions() or [])
+        if hasattr(conn, "mcp_client"):
+            mcp_tools = conn.mcp_client.get_available_tools()
+            if mcp_tools:
+                functions.extend(mcp_tools)
 
         music_config = initialize_music_handler(conn)
         music_file_names = music_config["music_file_names"]
-        prompt_music = f"{self.promot}\n<musicNames>{music_file_names}\n</musicNames>"
 
         home_assistant_cfg = conn.config["plugins"].get("home_assistant")
         if home_assistant_cfg:
             devices = home_assistant_cfg.get("devices", [])
         else:
             devices = []
-        if len(devices) > 0:
-            hass_prompt = "\n下面是我家智能设备列表（位置，设备名，entity_id），可以通过homeassistant控制\n"
-            for device in devices:
-                hass_prompt += device + "\n"
-            prompt_music += hass_prompt
 
-        logger.bind(tag=TAG).debug(f"User prompt: {prompt_music}")
+        # 工具集相同的连接共用预编译的提示词和意图缓存
+        fingerprint = self.intent_engine.fingerprint(
+            functions, music_file_names, devices
+        )
+        system_prompt = self.intent_engine.get_prompt(
+            fingerprint,
+            lambda: self.build_system_prompt(functions, music_file_names, devices),
+        )
 
         # 构建用户对话历史的提示
         msgStr = ""
@@ -209,16 +200,13 @@ class IntentProvider(IntentProviderBase):
         preprocess_time = time.time() - total_start_time
         logger.bind(tag=TAG).debug(f"意图识别预处理耗时: {preprocess_time:.4f}秒")
 
-        # 使用LLM进行意图识别
+        # 使用LLM进行意图识别（命中缓存时不调用LLM）
         llm_start_time = time.time()
         logger.bind(tag=TAG).debug(f"开始LLM意图识别调用, 模型: {model_info}")
 
         try:
-            # 使用 to_thread 将同步阻塞调用放到线程池中，避免阻塞事件循环
-            intent = await asyncio.to_thread(
-                self.llm.response_no_stream,
-                system_prompt=prompt_music,
-                user_prompt=user_prompt,
+            intent = await self.intent_engine.detect(
+                self.llm, fingerprint, system_prompt, user_prompt, text
             )
         except Exception as e:
             logger.bind(tag=TAG).error(f"Error in intent detection LLM call: {e}")
@@ -233,13 +221,6 @@ class IntentProvider(IntentProviderBase):
         # 记录后处理开始时间
         postprocess_start_time = time.time()
 
-        # 清理和解析响应
-        intent = intent.strip()
-        # 尝试提取JSON部分
-        match = re.search(r"\{.*\}", intent, re.DOTALL)
-        if match:
-            intent = match.group(0)
-
         # 记录总处理时间
         total_time = time.time() - total_start_time
         logger.bind(tag=TAG).debug(
@@ -282,7 +263,7 @@ class IntentProvider(IntentProviderBase):
                     logger.bind(tag=TAG).info(f"检测到函数调用意图: {function_name}")
 
             # 统一缓存处理和返回
-            self.cache_manager.set(self.CacheType.INTENT, cache_key, intent)
+            self.intent_engine.remember(fingerprint, text, intent)
             postprocess_time = time.time() - postprocess_start_time
             logger.bind(tag=TAG).debug(f"意图后处理耗时: {postprocess_time:.4f}秒")
             return intent
@@ -1,9 +1,87 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from abc import ABC, abstractmethod
 from config.logger import setup_logging
 
 TAG = __name__
 logger = setup_logging()
 
+_STREAM_END = object()
+
+# 同步LLM流式迭代的共享线程池，所有连接共用，线程数有上限
+_sync_stream_executor = None
+_sync_stream_lock = threading.Lock()
+
+
+def get_llm_sync_stream_executor(max_workers=32):
+    """
+    获取同步LLM流式迭代的共享线程池（单例模式）
+
+    Args:
+        max_workers: 最大线程数，仅首次创建时生效；同时进行的同步流式请求超过上限时排队等待
+    """
+    global _sync_stream_executor
+    if _sync_stream_executor is None:
+        with _sync_stream_lock:
+            if _sync_stream_executor is None:
+                _sync_stream_executor = ThreadPoolExecutor(
+                    max_workers=max(int(max_workers), 1),
+                    thread_name_prefix="llm-sync-stream",
+                )
+    return _sync_stream_executor
+
+
+async def iterate_in_thread(factory):
+    """
+    在共享线程池中迭代同步生成器，把产出的元素转交给事件循环
+
+    用于还没有原生异步实现的LLM，异步迭代方提前退出时通知线程关闭生成器
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    stopped = threading.Event()
+
+    def emit(item, error=None):
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, (item, error))
+        except RuntimeError:
+            # 事件循环已关闭
+            stopped.set()
+
+    def produce():
+        if stopped.is_set():
+            # 排队期间迭代方已退出，不再发起请求
+            return
+        try:
+            generator = factory()
+            try:
+                for item in generator:
+                    if stopped.is_set():
+                        break
+                    emit(item)
+            finally:
+                close = getattr(generator, "close", None)
+                if close is not None:
+                    close()
+        except BaseException as e:
+            emit(_STREAM_END, e)
+        else:
+            emit(_STREAM_END)
+
+    get_llm_sync_stream_executor().submit(produce)
+    try:
+        while True:
+            item, error = await queue.get()
+            if item is _STREAM_END:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        stopped.set()
+
+
 class LLMProviderBase(ABC):
     @abstractmethod
     def response(self, session_id, dialogue):
@@ -20,7 +98,7 @@ class LLMProviderBase(ABC):
         for part in self.response("", dialogue, **kwargs):
             result += part
         return result
-    
+
     def response_with_functions(self, session_id, dialogue, functions=None):
         """
         Default implementation for function calling (streaming)
@@ -32,3 +110,24 @@ class LLMProviderBase(ABC):
         for token in self.response(session_id, dialogue):
             yield token, None
 
+    async def response_async(self, session_id, dialogue, **kwargs):
+        """
+        异步流式生成回复，产出内容与 response 相同
+
+        默认在共享线程池中迭代同步的 response，支持原生异步请求的LLM应覆盖此方法
+        """
+        async for token in iterate_in_thread(
+            lambda: self.response(session_id, dialogue, **kwargs)
+        ):
+            yield token
+
+    async def response_with_functions_async(self, session_id, dialogue, functions=None):
+        """
+        异步流式生成回复（支持function calling），产出内容与 response_with_functions 相同
+
+        默认在共享线程池中迭代同步的 response_with_functions，支持原生异步请求的LLM应覆盖此方法
+        """
+        async for item in iterate_in_thread(
+            lambda: self.response_with_functions(session_id, dialogue, functions=functions)
+        ):
+            yield item
@@ -1,8 +1,10 @@
 import httpx
 import openai
+import asyncio
 from openai.types import CompletionUsage
 from config.logger import setup_logging
 from core.utils.util import check_model_key
+from core.utils.http_client import get_async_http_client
 from core.providers.llm.base import LLMProviderBase
 from urllib.parse import urlparse
 
@@ -69,7 +71,23 @@ class LLMProvider(LLMProviderBase):
         model_key_msg = check_model_key("LLM", self.api_key)
         if model_key_msg:
             logger.bind(tag=TAG).error(model_key_msg)
+        self.timeout = custom_timeout
         self.client = openai.OpenAI(api_key=self.api_key, base_url=self.base_url, timeout=custom_timeout)
+        # 异步客户端复用进程级共享连接池，首次在事件循环中使用时创建
+        self._async_client = None
+        self._async_client_loop = None
+
+    def _get_async_client(self):
+        loop = asyncio.get_running_loop()
+        if self._async_client is None or self._async_client_loop is not loop:
+            self._async_client = openai.AsyncOpenAI(
+                api_key=self.api_key,
+                base_url=self.base_url,
+                timeout=self.timeout,
+                http_client=get_async_http_client(),
+            )
+            self._async_client_loop = loop
+        return self._async_client
 
     @staticmethod
     def normalize_dialogue(dialogue):
@@ -89,14 +107,14 @@ class LLMProvider(LLMProviderBase):
                 logger.bind(tag=TAG).info(f"为域名 {domain} 禁用思考模式，参数: {params}")
                 break
 
-    def response(self, session_id, dialogue, **kwargs):
-        dialogue = self.normalize_dialogue(dialogue)
-
+    def _build_request_params(self, dialogue, functions=None, **kwargs):
         request_params = {
             "model": self.model_name,
-            "messages": dialogue,
+            "messages": self.normalize_dialogue(dialogue),
             "stream": True,
         }
+        if functions is not None:
+            request_params["tools"] = functions
 
         # 添加可选参数,只有当参数不为None时才添加
         optional_params = {
@@ -112,17 +130,33 @@ class LLMProvider(LLMProviderBase):
 
         # 禁用思考模式
         self._apply_thinking_disabled(request_params)
+        return request_params
+
+    @staticmethod
+    def _chunk_content(chunk):
+        try:
+            delta = chunk.choices[0].delta if getattr(chunk, "choices", None) else None
+            return getattr(delta, "content", "") if delta else ""
+        except IndexError:
+            return ""
+
+    @staticmethod
+    def _log_usage(usage_info):
+        logger.bind(tag=TAG).info(
+            f"Token 消耗：输入 {getattr(usage_info, 'prompt_tokens', '未知')}，"
+            f"输出 {getattr(usage_info, 'completion_tokens', '未知')}，"
+            f"共计 {getattr(usage_info, 'total_tokens', '未知')}"
+        )
+
+    def response(self, session_id, dialogue, **kwargs):
+        request_params = self._build_request_params(dialogue, **kwargs)
 
         responses = self.client.chat.completions.create(**request_params)
 
         is_active = True
         try:            
             for chunk in responses:
-                try:
-                    delta = chunk.choices[0].delta if getattr(chunk, "choices", None) else None
-                    content = getattr(delta, "content", "") if delta else ""
-                except IndexError:
-                    content = ""
+                content = self._chunk_content(chunk)
                 if content:
                     if "<think>" in content:
                         is_active = False
@@ -136,44 +170,54 @@ class LLMProvider(LLMProviderBase):
             responses.close()
 
     def response_with_functions(self, session_id, dialogue, functions=None, **kwargs):
-        dialogue = self.normalize_dialogue(dialogue)
+        request_params = self._build_request_params(dialogue, functions=functions, **kwargs)
 
-        request_params = {
-            "model": self.model_name,
-            "messages": dialogue,
-            "stream": True,
-            "tools": functions,
-        }
+        stream = self.client.chat.completions.create(**request_params)
 
-        optional_params = {
-            "max_tokens": kwargs.get("max_tokens", self.max_tokens),
-            "temperature": kwargs.get("temperature", self.temperature),
-            "top_p": kwargs.get("top_p", self.top_p),
-            "frequency_penalty": kwargs.get("frequency_penalty", self.frequency_penalty),
-        }
+        try:
+            for chunk in stream:
+                if getattr(chunk, "choices", None):
+                    delta = chunk.choices[0].delta
+                    content = getattr(delta, "content", "")
+                    tool_calls = getattr(delta, "tool_calls", None)
+                    yield content, tool_calls
+                elif isinstance(getattr(chunk, "usage", None), CompletionUsage):
+                    self._log_usage(chunk.usage)
+        finally:
+            stream.close()
 
-        for key, value in optional_params.items():
-            if value is not None:
-                request_params[key] = value
+    async def response_async(self, session_id, dialogue, **kwargs):
+        request_params = self._build_request_params(dialogue, **kwargs)
+        responses = await self._get_async_client().chat.completions.create(**request_params)
 
-        # 禁用思考模式
-        self._apply_thinking_disabled(request_params)
+        is_active = True
+        try:
+            async for chunk in responses:
+                content = self._chunk_content(chunk)
+                if content:
+                    if "<think>" in content:
+                        is_active = False
+                        content = content.split("<think>")[0]
+                    if "</think>" in content:
+                        is_active = True
+                        content = content.split("</think>")[-1]
+                    if is_active:
+                        yield content
+        finally:
+            await responses.close()
 
-        stream = self.client.chat.completions.create(**request_params)
+    async def response_with_functions_async(self, session_id, dialogue, functions=None, **kwargs):
+        request_params = self._build_request_params(dialogue, functions=functions, **kwargs)
+        stream = await self._get_async_client().chat.completions.create(**request_params)
 
         try:
-            for chunk in stream:
+            async for chunk in stream:
                 if getattr(chunk, "choices", None):
                     delta = chunk.choices[0].delta
                     content = getattr(delta, "content", "")
                     tool_calls = getattr(delta, "tool_calls", None)
                     yield content, tool_calls
                 elif isinstance(getattr(chunk, "usage", None), CompletionUsage):
-                    usage_info = getattr(chunk, "usage", None)
-                    logger.bind(tag=TAG).info(
-                        f"Token 消耗：输入 {getattr(usage_info, 'prompt_tokens', '未知')}，"
-                        f"输出 {getattr(usage_info, 'completion_tokens', '未知')}，"
-                        f"共计 {getattr(usage_info, 'total_tokens', '未知')}"
-                    )
+                    self._log_usage(chunk.usage)
         finally:
-            stream.close()
+            await stream.close()
@@ -0,0 +1,306 @@
+"""进程级服务端MCP服务池"""
+
+import asyncio
+import os
+import json
+import time
+from typing import Dict, Any, List, Optional
+
+from mcp.types import LoggingMessageNotificationParams
+
+from config.config_loader import get_project_dir
+from config.logger import setup_logging
+from .mcp_client import ServerMCPClient
+
+TAG = __name__
+logger = setup_logging()
+
+# 单个MCP服务初始化超时时间(秒)
+INIT_TIMEOUT = 10
+# 健康检查间隔(秒)
+HEALTH_CHECK_INTERVAL = 30
+# 健康检查ping超时时间(秒)
+PING_TIMEOUT = 5
+# 重启失败后的最大退避时间(秒)
+MAX_RESTART_BACKOFF = 300
+
+
+class ServerMCPPool:
+    """进程内共享的服务端MCP服务池
+
+    所有连接共享同一批MCP服务进程/连接，服务只在首次使用时启动一次。
+    MCP会话本身基于JSON-RPC请求ID路由响应，可以安全地被多个连接并发调用。
+    后台任务定期做健康检查，服务崩溃时自动重启并刷新工具列表缓存。
+    """
+
+    def __init__(self) -> None:
+        self.config_path = get_project_dir() + "data/.mcp_server_settings.json"
+        self.clients: Dict[str, ServerMCPClient] = {}
+        self.server_configs: Dict[str, Dict[str, Any]] = {}
+        self.tools: List[Dict[str, Any]] = []
+        self._tool_owner: Dict[str, str] = {}
+        self._config_mtime: Optional[float] = None
+        self._start_task: Optional[asyncio.Task] = None
+        self._health_task: Optional[asyncio.Task] = None
+        self._restart_locks: Dict[str, asyncio.Lock] = {}
+        self._restart_failures: Dict[str, int] = {}
+        self._next_restart_time: Dict[str, float] = {}
+
+        # 统计信息
+        self.total_calls = 0
+        self.failed_calls = 0
+        self.restarts = 0
+
+    def load_config(self) -> Dict[str, Any]:
+        """加载MCP服务配置"""
+        if not os.path.exists(self.config_path):
+            return {}
+
+        try:
+            with open(self.config_path, "r", encoding="utf-8") as f:
+                config = json.load(f)
+            return config.get("mcpServers", {})
+        except Exception as e:
+            logger.bind(tag=TAG).error(
+                f"Error loading MCP config from {self.config_path}: {e}"
+            )
+            return {}
+
+    def _get_config_mtime(self) -> Optional[float]:
+        try:
+            return os.path.getmtime(self.config_path)
+        except OSError:
+            return None
+
+    async def ensure_started(self) -> None:
+        """确保服务池已启动，并发调用会共享同一次启动过程"""
+        mtime = self._get_config_mtime()
+        if self._start_task is not None and mtime != self._config_mtime:
+            # 配置文件发生变化，等待上一次启动结束后重新加载
+            await asyncio.shield(self._start_task)
+            if self._get_config_mtime() != self._config_mtime:
+                self._start_task = None
+
+        if self._start_task is None:
+            self._config_mtime = mtime
+            self._start_task = asyncio.create_task(self._start_servers())
+        await asyncio.shield(self._start_task)
+
+        if self._health_task is None or self._health_task.done():
+            self._health_task = asyncio.create_task(self._health_check_loop())
+
+    async def _start_servers(self) -> None:
+        """按配置启动新增或变化的MCP服务，关闭已移除的服务"""
+        if not os.path.exists(self.config_path):
+            logger.bind(tag=TAG).warning(
+                f"请检查mcp服务配置文件：data/.mcp_server_settings.json"
+            )
+        config = self.load_config()
+        tasks = []
+        for name, srv_config in config.items():
+            if not srv_config.get("command") and not srv_config.get("url"):
+                logger.bind(tag=TAG).warning(
+                    f"Skipping server {name}: neither command nor url specified"
+                )
+                continue
+            if self.server_configs.get(name) == srv_config and name in self.clients:
+                continue
+            self.server_configs[name] = srv_config
+            tasks.append(self._restart_server(name))
+
+        for name in list(self.server_configs.keys()):
+            if name not in config:
+                self.server_configs.pop(name, None)
+                client = self.clients.pop(name, None)
+                if client:
+                    await self._cleanup_client(name, client)
+
+        if tasks:
+            await asyncio.gather(*tasks)
+        self._rebuild_tools()
+
+    async def _init_client(self, name: str) -> Optional[ServerMCPClient]:
+        """创建并初始化单个MCP服务客户端"""
+        client = None
+        try:
+            logger.bind(tag=TAG).info(f"初始化服务端MCP客户端: {name}")
+            client = ServerMCPClient(self.server_configs[name])
+            await asyncio.wait_for(
+                client.initialize(logging_callback=self.logging_callback),
+                timeout=INIT_TIMEOUT,
+            )
+            if not client.is_connected():
+                raise RuntimeError("连接未建立")
+            return client
+        except asyncio.TimeoutError:
+            logger.bind(tag=TAG).error(
+                f"Failed to initialize MCP server {name}: Timeout"
+            )
+        except Exception as e:
+            logger.bind(tag=TAG).error(f"Failed to initialize MCP server {name}: {e}")
+        if client:
+            await client.cleanup()
+        return None
+
+    async def _restart_server(self, name: str, broken: ServerMCPClient = None) -> None:
+        """（重新）启动指定的MCP服务，同一服务的并发重启请求只会执行一次"""
+        lock = self._restart_locks.setdefault(name, asyncio.Lock())
+        async with lock:
+            current = self.clients.get(name)
+            if broken is not None and current is not broken:
+                # 其他调用方已经完成重启
+                return
+            if current is not None:
+                self.clients.pop(name, None)
+                await self._cleanup_client(name, current)
+            if name not in self.server_configs:
+                return
+
+            client = await self._init_client(name)
+            if client is None:
+                failures = self._restart_failures.get(name, 0) + 1
+                self._restart_failures[name] = failures
+                self._next_restart_time[name] = time.monotonic() + min(
+                    INIT_TIMEOUT * 2**failures, MAX_RESTART_BACKOFF
+                )
+            else:
+                self.clients[name] = client
+                self._restart_failures.pop(name, None)
+                self._next_restart_time.pop(name, None)
+                if broken is not None:
+                    self.restarts += 1
+            self._rebuild_tools()
+
+    async def _cleanup_client(self, name: str, client: ServerMCPClient) -> None:
+        try:
+            await asyncio.wait_for(client.cleanup(), timeout=20)
+            logger.bind(tag=TAG).info(f"服务端MCP客户端已关闭: {name}")
+        except (asyncio.TimeoutError, Exception) as e:
+            logger.bind(tag=TAG).error(f"关闭服务端MCP客户端 {name} 时出错: {e}")
+
+    def _rebuild_tools(self) -> None:
+        """重建工具列表缓存"""
+        tools = []
+        tool_owner = {}
+        for name, client in self.clients.items():
+            for tool in client.get_available_tools():
+                tool_name = tool["function"]["name"]
+                if tool_name in tool_owner:
+                    continue
+                tool_owner[tool_name] = name
+                tools.append(tool)
+        self.tools = tools
+        self._tool_owner = tool_owner
+
+    async def _health_check_loop(self) -> None:
+        """定期检查MCP服务健康状态，异常时自动重启"""
+        try:
+            while True:
+                await asyncio.sleep(HEALTH_CHECK_INTERVAL)
+                for name in list(self.server_configs.keys()):
+                    client = self.clients.get(name)
+                    if client is not None and await self._is_healthy(client):
+                        continue
+                    if time.monotonic() < self._next_restart_time.get(name, 0):
+                        continue
+                    logger.bind(tag=TAG).warning(f"服务端MCP服务 {name} 不可用，尝试重启")
+                    await self._restart_server(name, client)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.bind(tag=TAG).error(f"服务端MCP健康检查任务出错: {e}")
+
+    async def _is_healthy(self, client: ServerMCPClient) -> bool:
+        if not client.is_connected():
+            return False
+        try:
+            await asyncio.wait_for(client.session.send_ping(), timeout=PING_TIMEOUT)
+            return True
+        except Exception:
+            return False
+
+    def get_all_tools(self) -> List[Dict[str, Any]]:
+        """获取缓存的所有服务的工具function定义"""
+        return self.tools
+
+    def is_mcp_tool(self, tool_name: str) -> bool:
+        """检查是否是MCP工具"""
+        return tool_name in self._tool_owner
+
+    async def execute_tool(self, tool_name: str, arguments: Dict[str, Any]) -> Any:
+        """执行工具调用，失败时会尝试重启对应服务后重试"""
+        logger.bind(tag=TAG).info(f"执行服务端MCP工具 {tool_name}，参数: {arguments}")
+
+        max_retries = 3  # 最大重试次数
+        retry_interval = 2  # 重试间隔(秒)
+
+        client_name = self._tool_owner.get(tool_name)
+        if client_name is None:
+            raise ValueError(f"工具 {tool_name} 在任意MCP服务中未找到")
+
+        self.total_calls += 1
+        for attempt in range(max_retries):
+            target_client = self.clients.get(client_name)
+            try:
+                if target_client is None:
+                    raise RuntimeError(f"MCP服务 {client_name} 未连接")
+                return await target_client.call_tool(
+                    tool_name, arguments, progress_callback=self.progress_callback
+                )
+            except Exception as e:
+                # 最后一次尝试失败时直接抛出异常
+                if attempt == max_retries - 1:
+                    self.failed_calls += 1
+                    raise
+
+                logger.bind(tag=TAG).warning(
+                    f"执行工具 {tool_name} 失败 (尝试 {attempt+1}/{max_retries}): {e}"
+                )
+                logger.bind(tag=TAG).info(
+                    f"重试前尝试重新连接 MCP 客户端 {client_name}"
+                )
+                await self._restart_server(client_name, target_client)
+
+                # 等待一段时间再重试
+                await asyncio.sleep(retry_interval)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "servers": len(self.server_configs),
+            "connected": sum(1 for c in self.clients.values() if c.is_connected()),
+            "tools": len(self.tools),
+            "total_calls": self.total_calls,
+            "failed_calls": self.failed_calls,
+            "restarts": self.restarts,
+        }
+
+    async def shutdown(self) -> None:
+        """关闭所有MCP服务（进程退出时调用）"""
+        if self._health_task and not self._health_task.done():
+            self._health_task.cancel()
+        for name, client in list(self.clients.items()):
+            await self._cleanup_client(name, client)
+        self.clients.clear()
+        self.tools = []
+        self._tool_owner = {}
+        self._start_task = None
+
+    # 可选回调方法
+
+    async def logging_callback(self, params: LoggingMessageNotificationParams):
+        logger.bind(tag=TAG).info(f"[Server Log - {params.level.upper()}] {params.data}")
+
+    async def progress_callback(self, progress: float, total: float | None, message: str | None) -> None:
+        logger.bind(tag=TAG).info(f"[Progress {progress}/{total}]: {message}")
+
+
+# 全局单例
+_server_mcp_pool: Optional[ServerMCPPool] = None
+
+
+def get_server_mcp_pool() -> ServerMCPPool:
+    """获取全局服务端MCP服务池实例（单例模式）"""
+    global _server_mcp_pool
+    if _server_mcp_pool is None:
+        _server_mcp_pool = ServerMCPPool()
+    return _server_mcp_pool
@@ -1,25 +1,32 @@
 import os
 import re
+import json
 import math
 import uuid
+import time
 import queue
 import asyncio
 import threading
+import hashlib
 import traceback
 import concurrent.futures
 
 from core.utils import p3
 from datetime import datetime
-from core.utils import textUtils
 from typing import Callable, Any
 from abc import ABC, abstractmethod
 from config.logger import setup_logging
 from core.utils import opus_encoder_utils
 from core.utils.tts import MarkdownCleaner, convert_percentage_to_range
+from core.utils.text_segmenter import SentenceSegmenter, StreamingTextFilter
 from core.utils.output_counter import add_device_output
 from core.handle.reportHandle import enqueue_tts_report
 from core.handle.sendAudioHandle import sendAudioMessage
 from core.utils.util import audio_bytes_to_data_stream, audio_to_data_stream
+from core.utils.tts_worker_pool import NotifyQueue, get_tts_worker_pool, run_tts_coroutine
+from core.utils.tts_cache import get_tts_cache
+from core.utils.opus_asset_store import get_opus_asset_store
+from core.utils.latency_stats import get_latency_stats, provider_key
 from core.providers.tts.dto.dto import (
     TTSMessageDTO,
     SentenceType,
@@ -30,6 +37,23 @@ from core.providers.tts.dto.dto import (
 TAG = __name__
 logger = setup_logging()
 
+# 不影响合成音频的配置项，不计入TTS短语缓存的配置指纹
+_FINGERPRINT_IGNORED_KEYS = {"output_dir", "tts_timeout", "correct_words"}
+# 凭据类配置项（密钥、令牌等）不计入配置指纹
+_FINGERPRINT_SECRET_MARKERS = ("key", "token", "secret", "password")
+
+
+def _config_fingerprint(config):
+    """TTS配置中影响合成结果的部分（参考音频、说话人、自定义参数、接口地址等）的哈希"""
+    sanitized = {
+        name: value
+        for name, value in dict(config or {}).items()
+        if name not in _FINGERPRINT_IGNORED_KEYS
+        and not any(marker in str(name).lower() for marker in _FINGERPRINT_SECRET_MARKERS)
+    }
+    raw = json.dumps(sanitized, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
 
 class TTSProviderBase(ABC):
     def __init__(self, config, delete_audio_file):
@@ -39,10 +63,13 @@ class TTSProviderBase(ABC):
         self.audio_file_type = "wav"
         self.output_file = config.get("output_dir", "tmp/")
         self.tts_timeout = float(config.get("tts_timeout", 15))
+        self.config_fingerprint = _config_fingerprint(config)
         if not math.isfinite(self.tts_timeout) or self.tts_timeout <= 0:
             raise ValueError("tts_timeout must be a positive finite number")
-        self.tts_text_queue = queue.Queue()
-        self.tts_audio_queue = queue.Queue()
+        self.tts_text_queue = NotifyQueue()
+        self.tts_audio_queue = NotifyQueue()
+        self._tts_lane = None
+        self.audio_play_priority_task = None
         self.tts_audio_first_sentence = True
         self.before_stop_play_files = []
         self.report_on_last = False
@@ -67,48 +94,20 @@ class TTSProviderBase(ABC):
             reverse_pattern_str = "|".join(re.escape(k) for k in sorted_reverse_keys)
             self._reverse_words_pattern = re.compile(reverse_pattern_str)
             self._reverse_words_map = reverse_map
-            # 流式滑动窗口：按首字分组的替换词字典，用于快速查找
-            self._words_by_first_char = {}
-            for key in sorted_keys:  # 使用已按长度降序排列的keys，确保长词优先匹配
-                first_char = key[0] if key else ""
-                if first_char not in self._words_by_first_char:
-                    self._words_by_first_char[first_char] = []
-                self._words_by_first_char[first_char].append(key)
         else:
             self._correct_words_pattern = None
             self._reverse_words_pattern = None
             self._reverse_words_map = None
 
-        # 流式滑动窗口：待匹配的缓存文本
-        self._pending_prefix = ""
-        self.tts_text_buff = []
-        self.punctuations = (
-            "。",
-            "？",
-            "?",
-            "！",
-            "!",
-            "；",
-            ";",
-            "：",
-        )
-        self.first_sentence_punctuations = (
-            "，",
-            "~",
-            "、",
-            ",",
-            "。",
-            "？",
-            "?",
-            "！",
-            "!",
-            "；",
-            ";",
-            "：",
-        )
+        # 双流式TTS逐片发送前的Markdown过滤和替换词（跨分片的标记和替换词暂存到下一片）
+        self.stream_text_filter = StreamingTextFilter(self.correct_words)
+        # 非双流式TTS的分句器，open_audio_channels时按 tts_segment 配置重建
+        self.segmenter = SentenceSegmenter()
+        # 已设置首句等待超时检查的sentence_id
+        self._first_segment_timer_id = None
+        # 最近一次提交TTS请求的时间，收到第一帧后清空（缓存命中不计入首包延迟）
+        self._tts_request_time = None
         self.tts_stop_request = False
-        self.processed_chars = 0
-        self.is_first_sentence = True
 
     def generate_filename(self, extension=".wav"):
         return os.path.join(
@@ -116,7 +115,21 @@ class TTSProviderBase(ABC):
             f"tts-{datetime.now().date()}@{uuid.uuid4().hex}{extension}",
         )
 
+    def _mark_tts_request(self):
+        """提交一段文本给TTS时调用，收到的第一帧音频记录为首包延迟"""
+        self._tts_request_time = time.monotonic()
+
+    def _record_tts_first_frame(self):
+        request_time = self._tts_request_time
+        if request_time is not None:
+            self._tts_request_time = None
+            get_latency_stats().record_tts_ttfb(
+                provider_key(self), time.monotonic() - request_time
+            )
+
     def handle_opus(self, opus_data: bytes):
+        # 所有TTS的音频帧都经过这里，统一记录首包延迟，供自适应首句切分使用
+        self._record_tts_first_frame()
         logger.bind(tag=TAG).debug(f"推送数据到队列里面帧数～～ {len(opus_data)}")
         self.tts_audio_queue.put((SentenceType.MIDDLE, opus_data, None, getattr(self, 'current_sentence_id', None)))
 
@@ -130,23 +143,47 @@ class TTSProviderBase(ABC):
         # 使用正则一次性替换，避免重复遍历和部分匹配问题
         if self._correct_words_pattern:
             text = self._correct_words_pattern.sub(lambda m: self.correct_words[m.group(0)], text)
+
+        # 短语缓存命中时直接下发已编码的音频帧，跳过TTS请求和音频转码
+        tts_cache = get_tts_cache()
+        cache_key = self._get_tts_cache_key(text)
+        if cache_key:
+            cached_frames = tts_cache.get(cache_key)
+            if cached_frames is not None:
+                logger.bind(tag=TAG).debug(f"TTS缓存命中: {original_text}")
+                self._tts_request_time = None
+                self.tts_audio_queue.put((SentenceType.FIRST, None, original_text, getattr(self, 'current_sentence_id', None)))
+                for frame in cached_frames:
+                    opus_handler(frame)
+                return None
+        cache_frames = []
+        self._mark_tts_request()
+
+        def caching_handler(frame):
+            self._record_tts_first_frame()
+            cache_frames.append(frame)
+            opus_handler(frame)
+
         max_repeat_time = 5
         if self.delete_audio_file:
             # 需要删除文件的直接转为音频数据
             while max_repeat_time > 0:
                 try:
-                    audio_bytes = asyncio.run(self.text_to_speak(text, None))
+                    audio_bytes = run_tts_coroutine(self.text_to_speak(text, None))
                     if audio_bytes:
                         # 使用原始文本用于显示/上报
                         self.tts_audio_queue.put((SentenceType.FIRST, None, original_text, getattr(self, 'current_sentence_id', None)))
+                        cache_frames.clear()
                         audio_bytes_to_data_stream(
                             audio_bytes,
                             file_type=self.audio_file_type,
                             is_opus=True,
-                            callback=opus_handler,
+                            callback=caching_handler,
                             sample_rate=self.conn.sample_rate,
                             opus_encoder=self.opus_encoder,
                         )
+                        if cache_key:
+                            tts_cache.put(cache_key, cache_frames)
                         break
                     else:
                         max_repeat_time -= 1
@@ -169,7 +206,7 @@ class TTSProviderBase(ABC):
             try:
                 while not os.path.exists(tmp_file) and max_repeat_time > 0:
                     try:
-                        asyncio.run(self.text_to_speak(text, tmp_file))
+                        run_tts_coroutine(self.text_to_speak(text, tmp_file))
                     except Exception as e:
                         logger.bind(tag=TAG).warning(
                             f"语音生成失败{5 - max_repeat_time + 1}次: {original_text}，错误: {e}"
@@ -188,7 +225,9 @@ class TTSProviderBase(ABC):
                         f"语音生成失败: {original_text}，请检查网络或服务是否正常"
                     )
                 self.tts_audio_queue.put((SentenceType.FIRST, None, original_text, getattr(self, 'current_sentence_id', None)))
-                self._process_audio_file_stream(tmp_file, callback=opus_handler)
+                self._process_audio_file_stream(tmp_file, callback=caching_handler)
+                if cache_key:
+                    tts_cache.put(cache_key, cache_frames)
             except Exception as e:
                 logger.bind(tag=TAG).error(f"Failed to generate TTS file: {e}")
                 return None
@@ -201,10 +240,17 @@ class TTSProviderBase(ABC):
             text = self._correct_words_pattern.sub(lambda m: self.correct_words[m.group(0)], text)
         max_repeat_time = 5
         if self.delete_audio_file:
+            # 短语缓存只用于直接返回音频帧的场景，文件场景需要返回文件路径
+            tts_cache = get_tts_cache()
+            cache_key = self._get_tts_cache_key(text, audio_format="opus")
+            if cache_key:
+                cached_frames = tts_cache.get(cache_key)
+                if cached_frames is not None:
+                    return list(cached_frames)
             # 需要删除文件的直接转为音频数据
             while max_repeat_time > 0:
                 try:
-                    audio_bytes = asyncio.run(self.text_to_speak(text, None))
+                    audio_bytes = run_tts_coroutine(self.text_to_speak(text, None))
                     if audio_bytes:
                         audio_datas = []
                         audio_bytes_to_data_stream(
@@ -214,6 +260,8 @@ class TTSProviderBase(ABC):
                             callback=lambda data: audio_datas.append(data),
                             sample_rate=self.conn.sample_rate,
                         )
+                        if cache_key:
+                            tts_cache.put(cache_key, audio_datas)
                         return audio_datas
                     else:
                         max_repeat_time -= 1
@@ -236,7 +284,7 @@ class TTSProviderBase(ABC):
             try:
                 while not os.path.exists(tmp_file) and max_repeat_time > 0:
                     try:
-                        asyncio.run(self.text_to_speak(text, tmp_file))
+                        run_tts_coroutine(self.text_to_speak(text, tmp_file))
                     except Exception as e:
                         logger.bind(tag=TAG).warning(
                             f"语音生成失败{5 - max_repeat_time + 1}次: {original_text}，错误: {e}"
@@ -264,6 +312,31 @@ class TTSProviderBase(ABC):
     async def text_to_speak(self, text, output_file):
         pass
 
+    def get_voice_fingerprint(self):
+        """
+        返回影响合成结果的提供者和音色参数，用于TTS短语缓存键
+
+        包括提供者类、完整配置的指纹，以及初始化后可能被调整的音色属性（如按百分比换算的语速音调），参数特殊的子类可覆盖
+        """
+        attr_names = ["model", "voice", "speed", "pitch", "volume", "emotion", "language"]
+        attr_names.extend(item[1] for item in getattr(self, "TTS_PARAM_CONFIG", []))
+        params = tuple(
+            (name, repr(getattr(self, name))) for name in attr_names if hasattr(self, name)
+        )
+        provider = f"{type(self).__module__}.{type(self).__qualname__}"
+        return (provider, self.config_fingerprint, self.audio_file_type, params)
+
+    def _get_tts_cache_key(self, text, audio_format=None):
+        """生成TTS短语缓存键，缓存未开启或文本不适合缓存时返回None"""
+        if self.conn is None:
+            return None
+        return get_tts_cache().make_key(
+            self.get_voice_fingerprint(),
+            self.conn.sample_rate,
+            audio_format or self.conn.audio_format,
+            text,
+        )
+
     def audio_to_pcm_data_stream(
         self, audio_file_path, callback: Callable[[Any], Any] = None
     ):
@@ -306,6 +379,7 @@ class TTSProviderBase(ABC):
 
     async def open_audio_channels(self, conn):
         self.conn = conn
+        self.segmenter = SentenceSegmenter.from_config(conn.config.get("tts_segment", {}))
 
         # 根据conn的sample_rate创建编码器，如果子类已经创建则不覆盖（IndexTTS接口返回为24kHZ-待重采样处理）
         if not hasattr(self, 'opus_encoder') or self.opus_encoder is None:
@@ -313,17 +387,36 @@ class TTSProviderBase(ABC):
                 sample_rate=conn.sample_rate, channels=1, frame_size_ms=60
             )
 
-        # tts 消化线程
-        self.tts_priority_thread = threading.Thread(
-            target=self.tts_text_priority_thread, daemon=True
-        )
-        self.tts_priority_thread.start()
+        # tts 消化：默认的文本处理交给全局TTS工作池，
+        # 重写了文本处理线程的流式TTS需要维持自己的会话状态，仍使用独立线程
+        self.tts_text_queue.set_maxsize(conn.config.get("tts_text_queue_size", 0))
+        if type(self).tts_text_priority_thread is TTSProviderBase.tts_text_priority_thread:
+            self._tts_lane = get_tts_worker_pool().register(
+                self.tts_text_queue,
+                self._handle_text_message,
+                conn.stop_event,
+                group=type(self).__module__,
+            )
+        else:
+            self.tts_priority_thread = threading.Thread(
+                target=self.tts_text_priority_thread, daemon=True
+            )
+            self.tts_priority_thread.start()
 
-        # 音频播放 消化线程
-        self.audio_play_priority_thread = threading.Thread(
-            target=self._audio_play_priority_thread, daemon=True
+        # 音频播放 消化任务，直接在事件循环中发送
+        self._audio_ready_event = asyncio.Event()
+        self.tts_audio_queue.on_put = self._wake_audio_play_task
+        self.audio_play_priority_task = asyncio.create_task(
+            self._audio_play_priority_task()
         )
-        self.audio_play_priority_thread.start()
+
+    def _wake_audio_play_task(self):
+        """音频入队后唤醒事件循环中的音频发送任务，可在任意线程调用"""
+        try:
+            self.conn.loop.call_soon_threadsafe(self._audio_ready_event.set)
+        except RuntimeError:
+            # 事件循环已关闭
+            pass
 
     def store_tts_text(self, sentence_id, text):
         """存储指定 sentence_id 对应的文本，用于流式TTS获取正确的字幕文本
@@ -372,37 +465,7 @@ class TTSProviderBase(ABC):
         while not self.conn.stop_event.is_set():
             try:
                 message = self.tts_text_queue.get(timeout=1)
-                if self.conn.client_abort:
-                    logger.bind(tag=TAG).info("收到打断信息，终止TTS文本处理线程")
-                    continue
-                # 过滤旧消息：检查sentence_id是否匹配
-                if message.sentence_id != self.conn.sentence_id:
-                    continue
-                if message.sentence_type == SentenceType.FIRST:
-                    self.current_sentence_id = message.sentence_id
-                    self.tts_stop_request = False
-                    self.processed_chars = 0
-                    self.tts_text_buff = []
-                    self.is_first_sentence = True
-                    self.tts_audio_first_sentence = True
-                elif ContentType.TEXT == message.content_type:
-                    self.tts_text_buff.append(message.content_detail)
-                    segment_text = self._get_segment_text()
-                    if segment_text:
-                        self.to_tts_stream(segment_text, opus_handler=self.handle_opus)
-                elif ContentType.FILE == message.content_type:
-                    self._process_remaining_text_stream(opus_handler=self.handle_opus)
-                    tts_file = message.content_file
-                    if tts_file and os.path.exists(tts_file):
-                        self._process_audio_file_stream(
-                            tts_file, callback=self.handle_opus
-                        )
-                if message.sentence_type == SentenceType.LAST:
-                    self._process_remaining_text_stream(opus_handler=self.handle_opus)
-                    self.tts_audio_queue.put(
-                        (message.sentence_type, [], message.content_detail, message.sentence_id)
-                    )
-
+                self._handle_text_message(message)
             except queue.Empty:
                 continue
             except Exception as e:
@@ -411,7 +474,38 @@ class TTSProviderBase(ABC):
                 )
                 continue
 
-    def _audio_play_priority_thread(self):
+    def _handle_text_message(self, message):
+        """处理一条TTS文本消息，由全局TTS工作池按连接顺序调用"""
+        if self.conn.client_abort:
+            logger.bind(tag=TAG).info("收到打断信息，终止TTS文本处理线程")
+            return
+        # 过滤旧消息：检查sentence_id是否匹配
+        if message.sentence_id != self.conn.sentence_id:
+            return
+        if message.sentence_type == SentenceType.FIRST:
+            self.current_sentence_id = message.sentence_id
+            self.tts_stop_request = False
+            self._reset_segmenter()
+            self.tts_audio_first_sentence = True
+        elif ContentType.TEXT == message.content_type:
+            for segment_text in self.segmenter.feed(message.content_detail):
+                self.to_tts_stream(segment_text, opus_handler=self.handle_opus)
+            self._arm_first_segment_timer(message.sentence_id)
+        elif ContentType.FILE == message.content_type:
+            self._process_remaining_text_stream(opus_handler=self.handle_opus)
+            tts_file = message.content_file
+            if tts_file and os.path.exists(tts_file):
+                self._process_audio_file_stream(
+                    tts_file, callback=self.handle_opus
+                )
+        if message.sentence_type == SentenceType.LAST:
+            self._process_remaining_text_stream(opus_handler=self.handle_opus)
+            self._record_llm_rate()
+            self.tts_audio_queue.put(
+                (message.sentence_type, [], message.content_detail, message.sentence_id)
+            )
+
+    async def _audio_play_priority_task(self):
         # 需要上报的文本和音频列表
         enqueue_text = None
         enqueue_audio = []
@@ -419,15 +513,22 @@ class TTSProviderBase(ABC):
             text = None
             try:
                 try:
-                    item = self.tts_audio_queue.get(timeout=0.1)
+                    item = self.tts_audio_queue.get_nowait()
                     if len(item) == 4:
                         sentence_type, audio_datas, text, sentence_id = item
                     else:
                         sentence_type, audio_datas, text = item
                         sentence_id = None
                 except queue.Empty:
-                    if self.conn.stop_event.is_set():
-                        break
+                    # 队列为空时等待生产者唤醒，超时后重新检查停止事件
+                    self._audio_ready_event.clear()
+                    if self.tts_audio_queue.empty():
+                        try:
+                            await asyncio.wait_for(
+                                self._audio_ready_event.wait(), timeout=1
+                            )
+                        except asyncio.TimeoutError:
+                            pass
                     continue
 
                 if self.conn.client_abort:
@@ -456,20 +557,23 @@ class TTSProviderBase(ABC):
                 # 收集上报音频数据
                 if isinstance(audio_datas, bytes):
                     enqueue_audio.append(audio_datas)
+                elif isinstance(audio_datas, memoryview):
+                    # 预编码帧包的切片指向mmap，上报时需要独立的数据
+                    enqueue_audio.append(bytes(audio_datas))
 
                 # 发送音频
-                future = asyncio.run_coroutine_threadsafe(
-                    sendAudioMessage(self.conn, sentence_type, audio_datas, text, sentence_id),
-                    self.conn.loop,
+                await sendAudioMessage(
+                    self.conn, sentence_type, audio_datas, text, sentence_id
                 )
-                future.result()
 
                 # 记录输出和报告
                 if self.conn.max_output_size > 0 and text:
                     add_device_output(self.conn.headers.get("device-id"), len(text))
 
+            except asyncio.CancelledError:
+                raise
             except Exception as e:
-                logger.bind(tag=TAG).error(f"audio_play_priority_thread: {text} {e}")
+                logger.bind(tag=TAG).error(f"audio_play_priority_task: {text} {e}")
 
     async def start_session(self, session_id):
         pass
@@ -480,48 +584,22 @@ class TTSProviderBase(ABC):
     async def close(self):
         """资源清理方法"""
         self._sentence_text_map.clear()
+        if self._tts_lane is not None:
+            get_tts_worker_pool().unregister(self._tts_lane)
+            self._tts_lane = None
+        # 连接关闭后不再消费，解除上限避免生产方一直阻塞
+        self.tts_text_queue.set_maxsize(0)
+        self.tts_audio_queue.on_put = None
+        # close可能由音频发送任务自身触发（播放结束后关闭连接），此时由stop_event让其自然退出
+        if (
+            self.audio_play_priority_task
+            and not self.audio_play_priority_task.done()
+            and self.audio_play_priority_task is not asyncio.current_task()
+        ):
+            self.audio_play_priority_task.cancel()
         if hasattr(self, "ws") and self.ws:
             await self.ws.close()
 
-    def _get_segment_text(self):
-        # 合并当前全部文本并处理未分割部分
-        full_text = "".join(self.tts_text_buff)
-        current_text = full_text[self.processed_chars :]  # 从未处理的位置开始
-        last_punct_pos = -1
-
-        # 根据是否是第一句话选择不同的标点符号集合
-        punctuations_to_use = (
-            self.first_sentence_punctuations
-            if self.is_first_sentence
-            else self.punctuations
-        )
-
-        for punct in punctuations_to_use:
-            pos = current_text.rfind(punct)
-            if (pos != -1 and last_punct_pos == -1) or (
-                pos != -1 and pos < last_punct_pos
-            ):
-                last_punct_pos = pos
-
-        if last_punct_pos != -1:
-            segment_text_raw = current_text[: last_punct_pos + 1]
-            segment_text = textUtils.get_string_no_punctuation_or_emoji(
-                segment_text_raw
-            )
-            self.processed_chars += len(segment_text_raw)  # 更新已处理字符位置
-
-            # 如果是第一句话，在找到第一个逗号后，将标志设置为False
-            if self.is_first_sentence:
-                self.is_first_sentence = False
-
-            return segment_text
-        elif self.tts_stop_request and current_text:
-            segment_text = current_text
-            self.is_first_sentence = True  # 重置标志
-            return segment_text
-        else:
-            return None
-
     def _process_audio_file_stream(
         self, tts_file, callback: Callable[[Any], Any]
     ) -> None:
@@ -536,7 +614,15 @@ class TTSProviderBase(ABC):
         elif self.conn.audio_format == "pcm":
             self.audio_to_pcm_data_stream(tts_file, callback=callback)
         else:
-            self.audio_to_opus_data_stream(tts_file, callback=callback)
+            # 本地音乐等固定文件优先使用预编码Opus帧包，TTS临时文件只播放一次，不做预编码
+            pack = None
+            if not tts_file.startswith(self.output_file):
+                pack = get_opus_asset_store().get_frames(tts_file, self.conn.sample_rate)
+            if pack is not None:
+                for frame in pack:
+                    callback(frame)
+            else:
+                self.audio_to_opus_data_stream(tts_file, callback=callback)
 
         if (
             self.delete_audio_file
@@ -560,15 +646,57 @@ class TTSProviderBase(ABC):
         Returns:
             bool: 是否成功处理了文本
         """
-        full_text = "".join(self.tts_text_buff)
-        remaining_text = full_text[self.processed_chars :]
-        if remaining_text:
-            segment_text = textUtils.get_string_no_punctuation_or_emoji(remaining_text)
-            if segment_text:
-                self.to_tts_stream(segment_text, opus_handler=opus_handler)
-                self.processed_chars += len(full_text)
-                return True
-        return False
+        segments = self.segmenter.flush()
+        for segment_text in segments:
+            self.to_tts_stream(segment_text, opus_handler=opus_handler)
+        return bool(segments)
+
+    def _reset_segmenter(self):
+        """新一轮回复开始时重置分句器，自适应首句切分使用该TTS和LLM最近的延迟统计"""
+        self.segmenter.reset()
+        self._first_segment_timer_id = None
+        if self.segmenter.adaptive is not None:
+            stats = get_latency_stats()
+            self.segmenter.adaptive.prepare(
+                ttfb=stats.tts_ttfb(provider_key(self)),
+                llm_rate=stats.llm_rate(provider_key(getattr(self.conn, "llm", None))),
+            )
+
+    def _record_llm_rate(self):
+        get_latency_stats().record_llm_rate(
+            provider_key(getattr(self.conn, "llm", None)), self.segmenter.last_turn_rate
+        )
+
+    def _arm_first_segment_timer(self, sentence_id):
+        """
+        首句还在等待标点时，在最长等待时间到达后投递一条空文本，
+        让工作池再检查一次首句（LLM输出停顿时也能按时切分）
+        """
+        if self._first_segment_timer_id == sentence_id:
+            return
+        delay = self.segmenter.first_segment_deadline()
+        if delay is None:
+            return
+        self._first_segment_timer_id = sentence_id
+
+        def _on_timeout():
+            if sentence_id == self.conn.sentence_id:
+                self.tts_text_queue.put(
+                    TTSMessageDTO(
+                        sentence_id=sentence_id,
+                        sentence_type=SentenceType.MIDDLE,
+                        content_type=ContentType.TEXT,
+                        content_detail="",
+                    )
+                )
+
+        try:
+            self.conn.loop.call_soon_threadsafe(
+                self.conn.loop.call_later, delay, _on_timeout
+            )
+        except RuntimeError:
+            # 事件循环已关闭
+            pass
 
     def _apply_percentage_params(self, config):
         """根据子类定义的 TTS_PARAM_CONFIG 批量应用百分比参数"""
@@ -577,63 +705,15 @@ class TTSProviderBase(ABC):
                 val = convert_percentage_to_range(config[config_key], min_val, max_val, base_val)
                 setattr(self, attr_name, transform(val) if transform else val)
 
-    def _match_stream_text(self, text):
-        """流式文本滑动窗口匹配，用于处理跨分片的替换词
-
-        Args:
-            text: 输入的文本片段
-
-        Returns:
-            tuple: (确定的文本列表, 剩余待匹配的前缀)
-        """
-        if not self.correct_words or not text:
-            return [text] if text else [], ""
-
-        result = []
-        pending = self._pending_prefix
-        i = 0
-
-        while i < len(text):
-            char = text[i]
-
-            # 尝试：pending + 当前字符 是否能匹配替换词
-            test_text = pending + char
-
-            matched = False
-            # 遍历可能匹配的替换词
-            candidates = self._words_by_first_char.get(pending[0], []) if pending else self._words_by_first_char.get(char, [])
-            for key in candidates:
-                if test_text == key:
-                    # 完整匹配，替换后发送
-                    result.append(self.correct_words[key])
-                    pending = ""
-                    matched = True
-                    break
-                elif key.startswith(test_text):
-                    # 是替换词的前缀，继续等待
-                    pending = test_text
-                    matched = True
-                    break
-
-            if matched:
-                i += 1
-                continue
-
-            # 没有匹配到更长的词，pending 的内容确定可以发送
-            if pending:
-                result.append(pending)
-                pending = ""
-
-            # 检查当前字符是否是某个替换词的开头
-            if char in self._words_by_first_char:
-                pending = char
-            else:
-                result.append(char)
-
-            i += 1
-
-        return result, pending
+    def _flush_stream_text(self):
+        """双流式TTS结束会话前，发送过滤器中暂存的剩余文本"""
+        if not self.stream_text_filter.pending:
+            return
+        future = asyncio.run_coroutine_threadsafe(
+            self.text_to_speak("", None, final=True), loop=self.conn.loop
+        )
+        future.result(timeout=self.tts_timeout)
 
     def reset_stream_state(self):
         """重置流式处理状态，用于会话开始时清理残留状态"""
-        self._pending_prefix = ""
+        self.stream_text_filter.reset()
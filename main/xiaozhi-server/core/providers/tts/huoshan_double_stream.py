@@ -10,7 +10,7 @@ from typing import Callable, Any
 from config.logger import setup_logging
 from core.utils.util import check_model_key
 from core.providers.tts.base import TTSProviderBase
-from core.utils.tts import MarkdownCleaner, convert_percentage_to_range
+from core.utils.tts import convert_percentage_to_range
 from core.providers.tts.dto.dto import SentenceType, ContentType, InterfaceType
 
 
@@ -348,6 +348,8 @@ class TTSProvider(TTSProviderBase):
                         self._process_audio_file_stream(message.content_file, callback=lambda audio_data: self.handle_audio_file(audio_data, message.content_detail))
                 if message.sentence_type == SentenceType.LAST:
                     try:
+                        # 先发送流式过滤暂存的剩余文本
+                        self._flush_stream_text()
                         logger.bind(tag=TAG).debug("开始结束TTS会话...")
                         future = asyncio.run_coroutine_threadsafe(
                             self.finish_session(self.conn.sentence_id),
@@ -366,7 +368,7 @@ class TTSProvider(TTSProviderBase):
                 )
                 continue
 
-    async def text_to_speak(self, text, _):
+    async def text_to_speak(self, text, _, final=False):
         """发送文本到TTS服务"""
         try:
             # 建立新连接
@@ -374,13 +376,10 @@ class TTSProvider(TTSProviderBase):
                 logger.bind(tag=TAG).warning(f"WebSocket连接不存在，终止发送文本")
                 return
 
-            #  过滤Markdown
-            filtered_text = MarkdownCleaner.clean_markdown(text)
-
-            if filtered_text:
-                # 使用滑动窗口匹配处理跨分片的替换词
-                confirmed_texts, self._pending_prefix = self._match_stream_text(filtered_text)
+            # 流式过滤Markdown和替换词，跨分片的标记和替换词暂存到下一片，final时发送全部暂存文本
+            confirmed_texts = self.stream_text_filter.feed(text, final=final)
 
+            if confirmed_texts:
                 # 发送每个确定的文本片段
                 for txt in confirmed_texts:
                     if txt and self.ws:
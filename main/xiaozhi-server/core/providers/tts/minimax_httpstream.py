@@ -7,7 +7,6 @@ import aiohttp
 import requests
 import traceback
 
-from core.utils import textUtils
 from config.logger import setup_logging
 from core.utils.util import parse_string_to_list
 from core.providers.tts.base import TTSProviderBase
@@ -101,14 +100,12 @@ class TTSProvider(TTSProviderBase):
                 if message.sentence_type == SentenceType.FIRST:
                     # 初始化参数
                     self.tts_stop_request = False
-                    self.processed_chars = 0
-                    self.tts_text_buff = []
+                    self._reset_segmenter()
                     self.before_stop_play_files.clear()
                 elif ContentType.TEXT == message.content_type:
-                    self.tts_text_buff.append(message.content_detail)
-                    segment_text = self._get_segment_text()
-                    if segment_text:
+                    for segment_text in self.segmenter.feed(message.content_detail):
                         self.to_tts_single_stream(segment_text)
+                    self._arm_first_segment_timer(message.sentence_id)
 
                 elif ContentType.FILE == message.content_type:
                     logger.bind(tag=TAG).info(
@@ -120,6 +117,7 @@ class TTSProvider(TTSProviderBase):
                 if message.sentence_type == SentenceType.LAST:
                     # 处理剩余的文本
                     self._process_remaining_text_stream(True)
+                    self._record_llm_rate()
 
             except queue.Empty:
                 continue
@@ -133,15 +131,11 @@ class TTSProvider(TTSProviderBase):
         Returns:
             bool: 是否成功处理了文本
         """
-        full_text = "".join(self.tts_text_buff)
-        remaining_text = full_text[self.processed_chars :]
-        if remaining_text:
-            segment_text = textUtils.get_string_no_punctuation_or_emoji(remaining_text)
-            if segment_text:
+        segments = self.segmenter.flush()
+        if segments:
+            # 分句器一次最多输出一句剩余文本，作为最后一句处理
+            for segment_text in segments:
                 self.to_tts_single_stream(segment_text, is_last)
-                self.processed_chars += len(full_text)
-            else:
-                self._process_before_stop_play_files()
         else:
             self._process_before_stop_play_files()
 
@@ -153,6 +147,7 @@ class TTSProvider(TTSProviderBase):
             if self._correct_words_pattern:
                 text = self._correct_words_pattern.sub(lambda m: self.correct_words[m.group(0)], text)
             try:
+                self._mark_tts_request()
                 asyncio.run(self.text_to_speak(text, is_last))
             except Exception as e:
                 logger.bind(tag=TAG).warning(
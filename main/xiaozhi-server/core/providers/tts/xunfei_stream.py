@@ -223,6 +223,8 @@ class TTSProvider(TTSProviderBase):
                 # 处理会话结束
                 if message.sentence_type == SentenceType.LAST:
                     try:
+                        # 先发送流式过滤暂存的剩余文本
+                        self._flush_stream_text()
                         logger.bind(tag=TAG).debug("开始结束TTS会话...")
                         asyncio.run_coroutine_threadsafe(
                             self.finish_session(self.conn.sentence_id),
@@ -239,19 +241,17 @@ class TTSProvider(TTSProviderBase):
                     f"处理TTS文本失败: {str(e)}, 类型: {type(e).__name__}, 堆栈: {traceback.format_exc()}"
                 )
 
-    async def text_to_speak(self, text, _):
+    async def text_to_speak(self, text, _, final=False):
         """发送文本到TTS服务进行合成"""
         try:
             if self.ws is None:
                 logger.bind(tag=TAG).warning(f"WebSocket连接不存在，终止发送文本")
                 return
 
-            filtered_text = MarkdownCleaner.clean_markdown(text)
-
-            if filtered_text:
-                # 使用滑动窗口匹配处理跨分片的替换词
-                confirmed_texts, self._pending_prefix = self._match_stream_text(filtered_text)
+            # 流式过滤Markdown和替换词，跨分片的标记和替换词暂存到下一片，final时发送全部暂存文本
+            confirmed_texts = self.stream_text_filter.feed(text, final=final)
 
+            if confirmed_texts:
                 # 发送每个确定的文本片段
                 for txt in confirmed_texts:
                     if txt and self.ws:
@@ -5,5 +5,9 @@ from typing import Optional
 class VADProviderBase(ABC):
     @abstractmethod
     def is_vad(self, conn, data) -> bool:
-        """检测音频数据中的语音活动"""
+        """检测音频数据中的语音活动，data已写入conn.asr_audio，可通过conn.vad_audio_reader按块读取"""
         pass
+
+    async def is_vad_async(self, conn, data) -> bool:
+        """在事件循环中检测语音活动，默认直接调用同步实现，支持批量推理的实现可覆盖"""
+        return self.is_vad(conn, data)
@@ -1,13 +1,115 @@
 import time
 import os
+import asyncio
 import numpy as np
 import onnxruntime
+from concurrent.futures import ThreadPoolExecutor
 from config.logger import setup_logging
 from core.providers.vad.base import VADProviderBase
 
 TAG = __name__
 logger = setup_logging()
 
+# 每次推理的采样点数（16kHz下为32ms）
+CHUNK_SAMPLES = 512
+# 拼接在每个chunk前的上下文采样点数
+CONTEXT_SAMPLES = 64
+
+
+class SileroBatchScheduler:
+    """跨连接的Silero批量推理调度器
+
+    在一个很短的时间窗口内收集所有连接待推理的32ms音频块及其各自的
+    state/context，合并成一次batch推理，再把概率和新state分发回各连接。
+    同一个连接的下一个块依赖上一个块的state，所以每个连接在一个batch中最多只有一个块。
+    """
+
+    def __init__(self, session, window_ms=5, max_batch_size=64):
+        self.session = session
+        self.window_seconds = max(float(window_ms), 0.0) / 1000
+        self.max_batch_size = max(int(max_batch_size), 1)
+        self._pending = []
+        self._flush_handle = None
+        # 单线程执行推理，避免阻塞事件循环，同时保证batch按提交顺序执行
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="silero-vad-batch"
+        )
+        self._sr = np.array(16000, dtype=np.int64)
+
+        # 统计信息
+        self.total_frames = 0
+        self.total_batches = 0
+        self.max_batch_seen = 0
+        self.total_infer_seconds = 0.0
+
+    async def infer(self, audio_input, state):
+        """提交一个音频块，返回 (语音概率, 新state)"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((audio_input, state, future))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush(loop)
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.window_seconds, self._flush, loop)
+        return await future
+
+    def _flush(self, loop):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch = self._pending
+        if not batch:
+            return
+        self._pending = []
+        inputs = [item[0] for item in batch]
+        states = [item[1] for item in batch]
+        task = loop.run_in_executor(self._executor, self._run_batch, inputs, states)
+        task.add_done_callback(lambda f: self._scatter(batch, f))
+
+    def _run_batch(self, inputs, states):
+        start = time.perf_counter()
+        ort_inputs = {
+            "input": np.concatenate(inputs, axis=0),
+            "state": np.concatenate(states, axis=1),
+            "sr": self._sr,
+        }
+        out, new_state = self.session.run(None, ort_inputs)
+        return out, new_state, time.perf_counter() - start
+
+    def _scatter(self, batch, task):
+        try:
+            out, new_state, cost = task.result()
+        except Exception as e:
+            logger.bind(tag=TAG).error(f"VAD批量推理失败: {e}")
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self.total_frames += len(batch)
+        self.total_batches += 1
+        self.total_infer_seconds += cost
+        self.max_batch_seen = max(self.max_batch_seen, len(batch))
+        if self.total_batches % 10000 == 0:
+            logger.bind(tag=TAG).debug(f"VAD批量推理统计: {self.get_stats()}")
+
+        for i, (_, _, future) in enumerate(batch):
+            # 连接可能在等待期间被取消
+            if not future.done():
+                future.set_result(
+                    (float(out[i, 0]), new_state[:, i : i + 1, :].copy())
+                )
+
+    def get_stats(self):
+        batches = self.total_batches or 1
+        return {
+            "frames": self.total_frames,
+            "batches": self.total_batches,
+            "avg_batch_size": round(self.total_frames / batches, 2),
+            "max_batch_size": self.max_batch_seen,
+            "avg_infer_ms": round(self.total_infer_seconds * 1000 / batches, 3),
+        }
+
 
 class VADProvider(VADProviderBase):
     def __init__(self, config):
@@ -36,12 +138,25 @@ class VADProvider(VADProviderBase):
 
         self.frame_window_threshold = 3
 
+        # 批量推理模式：跨连接合并推理请求
+        self.batch_scheduler = None
+        if str(config.get("batch_enabled", False)).lower() in ("true", "1", "yes"):
+            self.batch_scheduler = SileroBatchScheduler(
+                self.session,
+                window_ms=config.get("batch_window_ms", 5),
+                max_batch_size=config.get("batch_max_size", 64),
+            )
+            logger.bind(tag=TAG).info(
+                f"SileroVAD已启用批量推理模式，窗口{self.batch_scheduler.window_seconds * 1000}ms，"
+                f"最大批量{self.batch_scheduler.max_batch_size}"
+            )
+
     def _init_connection_state(self, conn):
         """为连接初始化独立的 VAD 状态"""
         if not hasattr(conn, "_vad_state"):
             conn._vad_state = np.zeros((2, 1, 128), dtype=np.float32)
         if not hasattr(conn, "_vad_context"):
-            conn._vad_context = np.zeros((1, 64), dtype=np.float32)
+            conn._vad_context = np.zeros((1, CONTEXT_SAMPLES), dtype=np.float32)
 
     def release_conn_resources(self, conn):
         """释放连接的 VAD 资源（连接关闭时调用）"""
@@ -52,64 +167,95 @@ class VADProvider(VADProviderBase):
                 except Exception:
                     pass
 
+    def _chunk_input(self, conn, chunk):
+        """将连接缓冲区中的一个音频块（memoryview，不复制字节）拼接上下文作为模型输入"""
+        audio_int16 = np.frombuffer(chunk, dtype=np.int16)
+        audio_float32 = audio_int16.astype(np.float32) / 32768.0
+        return np.concatenate(
+            [conn._vad_context, audio_float32.reshape(1, -1)], axis=1
+        ).astype(np.float32)
+
+    def _update_voice_state(self, conn, audio_input, speech_prob, state):
+        """根据推理结果更新连接的VAD状态，返回当前是否有声音"""
+        conn._vad_state = state
+        conn._vad_context = audio_input[:, -CONTEXT_SAMPLES:]
+
+        # 双阈值判断
+        if speech_prob >= self.vad_threshold:
+            is_voice = True
+        elif speech_prob <= self.vad_threshold_low:
+            is_voice = False
+        else:
+            is_voice = conn.last_is_voice
+
+        # 声音没低于最低值则延续前一个状态，判断为有声音
+        conn.last_is_voice = is_voice
+
+        # 更新滑动窗口
+        conn.client_voice_window.append(is_voice)
+        client_have_voice = (
+            conn.client_voice_window.count(True) >= self.frame_window_threshold
+        )
+
+        # 如果之前有声音，但本次没有声音，且与上次有声音的时间差已经超过了静默阈值，则认为已经说完一句话
+        if conn.client_have_voice and not client_have_voice:
+            stop_duration = time.time() * 1000 - conn.vad_last_voice_time
+            if stop_duration >= self.silence_threshold_ms:
+                conn.client_voice_stop = True
+        if client_have_voice:
+            conn.client_have_voice = True
+            conn.vad_last_voice_time = time.time() * 1000
+        return client_have_voice
+
     def is_vad(self, conn, pcm_frame):
         # 手动模式：直接返回True，不进行实时VAD检测，所有音频都缓存
         if conn.client_listen_mode == "manual":
+            conn.vad_audio_reader.skip_to_end()
             return True
 
         try:
             self._init_connection_state(conn)
 
-            # pcm_frame已经是处理后的PCM数据
-            conn.client_audio_buffer.extend(pcm_frame)
-
+            # pcm_frame已经写入连接的PCM缓冲区，这里按块读取未检测的部分
             client_have_voice = False
-            while len(conn.client_audio_buffer) >= 512 * 2:
-                chunk = conn.client_audio_buffer[: 512 * 2]
-                conn.client_audio_buffer = conn.client_audio_buffer[512 * 2 :]
-
-                audio_int16 = np.frombuffer(chunk, dtype=np.int16)
-                audio_float32 = audio_int16.astype(np.float32) / 32768.0
-                audio_input = np.concatenate(
-                    [conn._vad_context, audio_float32.reshape(1, -1)], axis=1
-                ).astype(np.float32)
-
+            for chunk in conn.vad_audio_reader.chunks(CHUNK_SAMPLES * 2):
+                audio_input = self._chunk_input(conn, chunk)
                 ort_inputs = {
                     "input": audio_input,
                     "state": conn._vad_state,
                     "sr": np.array(16000, dtype=np.int64),
                 }
                 out, state = self.session.run(None, ort_inputs)
-
-                conn._vad_state = state
-                conn._vad_context = audio_input[:, -64:]
-                speech_prob = out.item()
-
-                # 双阈值判断
-                if speech_prob >= self.vad_threshold:
-                    is_voice = True
-                elif speech_prob <= self.vad_threshold_low:
-                    is_voice = False
-                else:
-                    is_voice = conn.last_is_voice
-
-                # 声音没低于最低值则延续前一个状态，判断为有声音
-                conn.last_is_voice = is_voice
-
-                # 更新滑动窗口
-                conn.client_voice_window.append(is_voice)
-                client_have_voice = (
-                    conn.client_voice_window.count(True) >= self.frame_window_threshold
+                client_have_voice = self._update_voice_state(
+                    conn, audio_input, out.item(), state
                 )
 
-                # 如果之前有声音，但本次没有声音，且与上次有声音的时间差已经超过了静默阈值，则认为已经说完一句话
-                if conn.client_have_voice and not client_have_voice:
-                    stop_duration = time.time() * 1000 - conn.vad_last_voice_time
-                    if stop_duration >= self.silence_threshold_ms:
-                        conn.client_voice_stop = True
-                if client_have_voice:
-                    conn.client_have_voice = True
-                    conn.vad_last_voice_time = time.time() * 1000
+            return client_have_voice
+        except Exception as e:
+            logger.bind(tag=TAG).error(f"Error processing audio packet: {e}")
+
+    async def is_vad_async(self, conn, pcm_frame):
+        if self.batch_scheduler is None:
+            return self.is_vad(conn, pcm_frame)
+
+        # 手动模式：直接返回True，不进行实时VAD检测，所有音频都缓存
+        if conn.client_listen_mode == "manual":
+            conn.vad_audio_reader.skip_to_end()
+            return True
+
+        try:
+            self._init_connection_state(conn)
+
+            # pcm_frame已经写入连接的PCM缓冲区，这里按块读取未检测的部分
+            client_have_voice = False
+            for chunk in conn.vad_audio_reader.chunks(CHUNK_SAMPLES * 2):
+                audio_input = self._chunk_input(conn, chunk)
+                speech_prob, state = await self.batch_scheduler.infer(
+                    audio_input, conn._vad_state
+                )
+                client_have_voice = self._update_voice_state(
+                    conn, audio_input, speech_prob, state
+                )
 
             return client_have_voice
         except Exception as e:
@@ -0,0 +1,264 @@
+"""
+服务端回声消除（AEC）
+下发给设备的TTS音频作为参考信号，按时间戳存入环形缓冲区，
+入缓冲时即计算好加窗后的幅度谱和对数功率谱，麦克风帧到达时：
+1. 二分查找最接近的参考帧时间戳
+2. 一次向量化计算前后各2帧候选的对数功率谱相关性，选出最佳参考帧
+3. 频域谱减法去除回声
+"""
+
+import time
+import bisect
+from functools import lru_cache
+
+import numpy as np
+
+# 参考帧采样率和时长（与下发的Opus帧一致：16kHz，60ms）
+REFERENCE_SAMPLE_RATE = 16000
+FRAME_SAMPLES = 960
+# 参考信号保留时长（秒）
+REFERENCE_MAX_AGE = 120
+# 环形缓冲区初始容量（帧），写满后按需翻倍，最大覆盖保留时长
+REFERENCE_INITIAL_CAPACITY = 64
+# 候选帧搜索半径：T-2 ~ T+2
+SEARCH_RADIUS = 2
+# 麦克风帧能量低于该值时不处理
+MIC_RMS_THRESHOLD = 100
+# 参考帧能量低于该值时视为静音
+REF_RMS_THRESHOLD = 50
+
+
+@lru_cache(maxsize=8)
+def _hanning(n):
+    return np.hanning(n).astype(np.float32)
+
+
+def _log_psd(mag):
+    return 10 * np.log10(mag.astype(np.float64) ** 2 + 1e-8)
+
+
+class EchoReferenceBuffer:
+    """
+    参考信号环形缓冲区，按插入顺序保存参考帧及其预计算频谱
+
+    PCM按int16保存，频谱按float32保存；容量从 initial_capacity 开始按需翻倍，
+    上限为保留时长内的帧数（max_age / 帧时长），不播放TTS的连接只占用很少的内存
+    """
+
+    def __init__(
+        self,
+        frame_samples=FRAME_SAMPLES,
+        max_age=REFERENCE_MAX_AGE,
+        sample_rate=REFERENCE_SAMPLE_RATE,
+        initial_capacity=REFERENCE_INITIAL_CAPACITY,
+    ):
+        self.frame_samples = frame_samples
+        self.max_age = max_age
+        self.max_capacity = max(int(np.ceil(max_age * sample_rate / frame_samples)), 2)
+        self.capacity = min(max(int(initial_capacity), 2), self.max_capacity)
+        self.bins = frame_samples // 2 + 1
+        self._allocate(self.capacity)
+        self._start = 0
+        self._count = 0
+
+    def _allocate(self, capacity):
+        self.timestamps = np.zeros(capacity, dtype=np.int64)
+        self.insert_times = np.zeros(capacity, dtype=np.float64)
+        self.pcm = np.zeros((capacity, self.frame_samples), dtype=np.int16)
+        self.mag = np.zeros((capacity, self.bins), dtype=np.float32)
+        self.log_psd = np.zeros((capacity, self.bins), dtype=np.float32)
+        self.log_psd_norm = np.zeros(capacity, dtype=np.float32)
+        self.rms = np.zeros(capacity, dtype=np.float32)
+
+    def _grow(self):
+        """容量翻倍（不超过上限），按逻辑顺序搬到新数组的开头"""
+        order = (self._start + np.arange(self._count)) % self.capacity
+        old = {
+            name: getattr(self, name)
+            for name in ("timestamps", "insert_times", "pcm", "mag", "log_psd", "log_psd_norm", "rms")
+        }
+        self.capacity = min(self.capacity * 2, self.max_capacity)
+        self._allocate(self.capacity)
+        for name, array in old.items():
+            getattr(self, name)[: self._count] = array[order]
+        self._start = 0
+
+    def __len__(self):
+        return self._count
+
+    def clear(self):
+        self._start = 0
+        self._count = 0
+
+    def _slot(self, index):
+        return (self._start + index) % self.capacity
+
+    def push(self, timestamp, pcm_frame):
+        """写入一帧参考信号（int16 PCM），同时计算加窗频谱"""
+        now = time.time()
+        self.expire(now)
+        if self._count:
+            last_ts = int(self.timestamps[self._slot(self._count - 1)])
+            if timestamp < last_ts:
+                # 时间戳回绕或设备重置，旧参考信号已无法对齐
+                self.clear()
+            elif timestamp == last_ts:
+                self._count -= 1
+
+        if self._count == self.capacity:
+            if self.capacity < self.max_capacity:
+                self._grow()
+            else:
+                self._start = (self._start + 1) % self.capacity
+                self._count -= 1
+        slot = self._slot(self._count)
+        self._count += 1
+
+        samples = np.frombuffer(pcm_frame, dtype=np.int16)[: self.frame_samples]
+        frame = self.pcm[slot]
+        frame[: len(samples)] = samples
+        frame[len(samples) :] = 0
+        mag = np.abs(np.fft.rfft(frame.astype(np.float32) * _hanning(self.frame_samples)))
+        log_psd = _log_psd(mag)
+
+        self.timestamps[slot] = timestamp
+        self.insert_times[slot] = now
+        self.mag[slot] = mag
+        self.log_psd[slot] = log_psd
+        self.log_psd_norm[slot] = np.sqrt(np.dot(log_psd, log_psd))
+        self.rms[slot] = np.sqrt(np.mean(samples.astype(np.float32) ** 2)) if len(samples) else 0.0
+
+    def expire(self, now=None):
+        """丢弃超过保留时长的参考帧"""
+        now = time.time() if now is None else now
+        while self._count and now - self.insert_times[self._start] > self.max_age:
+            self._start = (self._start + 1) % self.capacity
+            self._count -= 1
+
+    def closest_index(self, timestamp):
+        """二分查找时间戳最接近的参考帧，返回逻辑下标"""
+        ts = self.timestamps
+        key = lambda i: ts[(self._start + i) % self.capacity]
+        pos = bisect.bisect_left(range(self._count), timestamp, key=key)
+        if pos == 0:
+            return 0
+        if pos == self._count:
+            return self._count - 1
+        before = key(pos - 1)
+        after = key(pos)
+        return pos - 1 if timestamp - before <= after - timestamp else pos
+
+    def candidate_slots(self, timestamp, radius=SEARCH_RADIUS):
+        """返回最接近帧前后各radius帧的物理槽位"""
+        center = self.closest_index(timestamp)
+        first = max(center - radius, 0)
+        last = min(center + radius, self._count - 1)
+        return (self._start + np.arange(first, last + 1)) % self.capacity
+
+
+class ServerAEC:
+    """单个连接的服务端回声消除器"""
+
+    def __init__(self, frame_samples=FRAME_SAMPLES):
+        self.reference = EchoReferenceBuffer(frame_samples=frame_samples)
+
+        # 统计信息
+        self.frames = 0
+        self.processed_frames = 0
+        self.total_seconds = 0.0
+
+    def add_reference(self, timestamp, pcm_frame):
+        self.reference.push(timestamp, pcm_frame)
+
+    def clear(self):
+        self.reference.clear()
+
+    def process(self, timestamp, pcm_frame):
+        """对麦克风帧做回声消除，返回处理后的PCM；不需要处理时原样返回"""
+        begin = time.perf_counter()
+        self.frames += 1
+        try:
+            result = self._process(timestamp, pcm_frame)
+            if result is not pcm_frame:
+                self.processed_frames += 1
+            return result
+        finally:
+            self.total_seconds += time.perf_counter() - begin
+
+    def _process(self, timestamp, pcm_frame):
+        if not pcm_frame or len(self.reference) < 2:
+            return pcm_frame
+
+        mic_audio = np.frombuffer(pcm_frame, dtype=np.int16).astype(np.float32)
+        mic_rms = np.sqrt(np.mean(mic_audio ** 2))
+        if mic_rms < MIC_RMS_THRESHOLD:
+            return pcm_frame
+
+        n = len(mic_audio)
+        mic_fft = np.fft.rfft(mic_audio * _hanning(n))
+        mic_mag = np.abs(mic_fft)
+        mic_log_psd = _log_psd(mic_mag)
+        mic_norm = np.sqrt(np.dot(mic_log_psd, mic_log_psd))
+
+        # ========== 匹配参考帧（对数功率谱匹配，向量化计算所有候选） ==========
+        ref = self.reference
+        slots = ref.candidate_slots(timestamp)
+        rms = ref.rms[slots]
+        if n == ref.frame_samples:
+            ref_mags = ref.mag[slots]
+            ref_log_psd = ref.log_psd[slots]
+            ref_norms = ref.log_psd_norm[slots]
+        else:
+            # 麦克风帧长与参考帧不同，按麦克风帧长截取/补零后重新计算
+            frames = np.zeros((len(slots), n), dtype=np.float32)
+            width = min(n, ref.frame_samples)
+            frames[:, :width] = ref.pcm[slots, :width]
+            ref_mags = np.abs(np.fft.rfft(frames * _hanning(n), axis=1))
+            ref_log_psd = _log_psd(ref_mags)
+            ref_norms = np.sqrt(np.einsum("ij,ij->i", ref_log_psd, ref_log_psd))
+
+        corr = np.abs(ref_log_psd @ mic_log_psd) / (mic_norm * ref_norms + 1e-8)
+        corr = np.where(rms >= REF_RMS_THRESHOLD, corr, -1.0)
+        best = int(np.argmax(corr))
+        best_corr = float(corr[best])
+        if best_corr < 0:
+            return pcm_frame
+        ref_rms = float(rms[best])
+        ref_mag = ref_mags[best]
+
+        # ========== 频域 AEC 处理（谱减法） ==========
+        # 时域信号经过声学路径后相位失真，导致时域相关性低且P_xy正负不定
+        # 频域幅度谱不受相位影响，对数功率谱相关性稳定在0.97+
+        # 公式：result_mag = max(|mic_fft| - |ref_fft| * scale * coef, 0)
+        mic_phase = np.angle(mic_fft)
+
+        # 频域计算回声比例 scale
+        scale = np.sum(mic_mag * ref_mag) / (np.dot(ref_mag, ref_mag) + 1e-8)
+
+        # 自适应系数：scale大（回声强）-> coef大；相关性高（匹配准）-> coef大
+        raw_coef = 1.0 + scale * 3 + (best_corr - 0.97) * 30
+        coef = max(0.5, min(3.0, raw_coef))
+
+        # 谱减法（过减 + 半波整流）
+        echo_mag = ref_mag * scale * coef
+        result_mag = np.maximum(mic_mag - echo_mag * 1.5, mic_mag * 0.1)
+
+        # 保留相位重建信号
+        output = np.fft.irfft(result_mag * np.exp(1j * mic_phase), n)
+
+        # 高置信度是纯回声时，再压一下确保VAD检测不到
+        if best_corr >= 0.97 and ref_rms > 500:
+            output = output * 0.3
+
+        # 后处理：限幅
+        output = np.clip(output, -32768, 32767)
+        return output.astype(np.int16).tobytes()
+
+    def get_stats(self):
+        frames = self.frames or 1
+        return {
+            "reference_frames": len(self.reference),
+            "frames": self.frames,
+            "processed_frames": self.processed_frames,
+            "avg_cpu_us": round(self.total_seconds * 1e6 / frames, 2),
+        }
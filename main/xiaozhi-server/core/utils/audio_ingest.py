@@ -0,0 +1,93 @@
+"""
+音频接收队列监控模块
+统计所有连接的ASR音频队列深度和处理帧数，用于观察音频处理是否积压
+连接的音频队列有上限，积压超过上限时丢弃最早的帧：实时语音过时的音频没有意义，
+丢掉旧帧可以让识别尽快追上设备，也避免处理卡住时内存无限增长
+"""
+
+import time
+import asyncio
+import weakref
+from config.logger import setup_logging
+
+TAG = __name__
+logger = setup_logging()
+
+# 单个连接队列积压超过该帧数时告警（每帧60ms，50帧约3秒）
+QUEUE_DEPTH_WARNING = 50
+# 积压告警的最小间隔（秒），每个连接单独计算
+QUEUE_WARNING_INTERVAL = 10
+# 单个连接队列的帧数上限（500帧约30秒）
+QUEUE_MAX_FRAMES = 500
+
+
+def create_audio_queue():
+    """创建连接的ASR音频队列"""
+    return asyncio.Queue(maxsize=QUEUE_MAX_FRAMES)
+
+
+class AudioIngestMonitor:
+    """全局音频接收队列监控"""
+
+    def __init__(self):
+        self._connections = weakref.WeakSet()
+        self._last_warning = weakref.WeakKeyDictionary()
+        self.total_frames = 0
+        self.dropped_frames = 0
+        self.max_queue_depth = 0
+
+    def register(self, conn):
+        self._connections.add(conn)
+
+    def unregister(self, conn):
+        self._connections.discard(conn)
+
+    def put_frame(self, conn, item):
+        """音频帧入队，队列已满时丢弃最早的一帧"""
+        queue = conn.asr_audio_queue
+        if queue.full():
+            try:
+                queue.get_nowait()
+            except asyncio.QueueEmpty:
+                pass
+            self.dropped_frames += 1
+            self._warn(conn, f"连接 {conn.device_id} 音频队列已满，丢弃最早的音频帧")
+        queue.put_nowait(item)
+
+    def _warn(self, conn, message):
+        now = time.monotonic()
+        if now - self._last_warning.get(conn, 0.0) >= QUEUE_WARNING_INTERVAL:
+            self._last_warning[conn] = now
+            logger.bind(tag=TAG).warning(message)
+
+    def record_frame(self, conn):
+        """记录一帧已被取出处理，同时更新队列深度统计"""
+        self.total_frames += 1
+        depth = conn.asr_audio_queue.qsize()
+        if depth > self.max_queue_depth:
+            self.max_queue_depth = depth
+        if depth >= QUEUE_DEPTH_WARNING:
+            self._warn(conn, f"连接 {conn.device_id} 音频队列积压 {depth} 帧，音频处理可能过慢")
+
+    def get_stats(self):
+        depths = [conn.asr_audio_queue.qsize() for conn in list(self._connections)]
+        return {
+            "connections": len(depths),
+            "total_frames": self.total_frames,
+            "dropped_frames": self.dropped_frames,
+            "queued_frames": sum(depths),
+            "current_max_depth": max(depths) if depths else 0,
+            "max_queue_depth": self.max_queue_depth,
+        }
+
+
+# 全局单例
+_audio_ingest_monitor = None
+
+
+def get_audio_ingest_monitor():
+    """获取全局音频接收队列监控实例（单例模式）"""
+    global _audio_ingest_monitor
+    if _audio_ingest_monitor is None:
+        _audio_ingest_monitor = AudioIngestMonitor()
+    return _audio_ingest_monitor
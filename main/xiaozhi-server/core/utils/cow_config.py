@@ -0,0 +1,99 @@
+"""
+写时复制的配置字典
+
+每个连接原先对整个服务端配置（所有厂商的LLM/TTS/ASR配置、插件、提示词）做一次 deepcopy，而连接实际只读写其中很少的几段。
+CopyOnWriteDict 只浅拷贝顶层，嵌套的字典和列表在第一次通过本对象访问时才浅拷贝出一层私有副本，
+未访问的部分始终与服务端配置共享：
+
+- 对连接配置的任何修改（包括嵌套修改，如 config["selected_module"]["TTS"] = ...）都只影响本连接
+- 它是 dict 的子类，isinstance、json.dumps、deepcopy 等用法不变
+- 服务端共享的配置本身不应被原地修改（更新配置时整体替换）
+"""
+
+import copy
+
+
+def _own(value):
+    """为嵌套的字典/列表创建一层私有副本，更深层仍然共享直到被访问"""
+    if isinstance(value, dict):
+        return CopyOnWriteDict(value)
+    if isinstance(value, list):
+        return [_own(item) for item in value]
+    return value
+
+
+class CopyOnWriteDict(dict):
+    __slots__ = ("_owned",)
+
+    def __init__(self, base=None):
+        super().__init__(base or ())
+        # 已经创建私有副本（或由本对象写入）的键
+        self._owned = set()
+
+    def _own_key(self, key):
+        value = dict.__getitem__(self, key)
+        if key not in self._owned:
+            value = _own(value)
+            dict.__setitem__(self, key, value)
+            self._owned.add(key)
+        return value
+
+    def __getitem__(self, key):
+        return self._own_key(key)
+
+    def __setitem__(self, key, value):
+        dict.__setitem__(self, key, value)
+        self._owned.add(key)
+
+    def __delitem__(self, key):
+        dict.__delitem__(self, key)
+        self._owned.discard(key)
+
+    def get(self, key, default=None):
+        if key in self:
+            return self._own_key(key)
+        return default
+
+    def setdefault(self, key, default=None):
+        if key in self:
+            return self._own_key(key)
+        self[key] = default
+        return default
+
+    def pop(self, key, *default):
+        if key in self:
+            value = self._own_key(key)
+            del self[key]
+            return value
+        return dict.pop(self, key, *default)
+
+    def popitem(self):
+        key = next(reversed(self))
+        return key, self.pop(key)
+
+    def values(self):
+        return [self._own_key(key) for key in self]
+
+    def items(self):
+        return [(key, self._own_key(key)) for key in self]
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def clear(self):
+        dict.clear(self)
+        self._owned.clear()
+
+    def copy(self):
+        return CopyOnWriteDict(self)
+
+    def __copy__(self):
+        return CopyOnWriteDict(self)
+
+    def __deepcopy__(self, memo):
+        # 深拷贝得到普通字典
+        return copy.deepcopy(dict(self), memo)
+
+    def __reduce__(self):
+        return dict, (dict(self),)
@@ -22,16 +22,84 @@ class Message:
         self.is_temporary = is_temporary  # 标记临时消息（如工具调用提醒）
 
 
+# 被打断的 tool_calls 补充的工具响应
+INTERRUPTED_TOOL_CONTENT = '{"status": "interrupted", "message": "动作已取消/被打断"}'
+
+
+class _MessageSegment:
+    """
+    一段消息（few-shot示例或实际对话）的增量序列化结果
+
+    消息写入时转换一次为LLM消息字典，同时记录尚无工具响应的 tool_call id，
+    每次请求只需复制已有字典并补上悬空 tool_calls 的响应
+    """
+
+    def __init__(self):
+        self.messages: List[Dict] = []
+        # 按出现顺序保存尚无响应的 tool_call id
+        self.pending_tool_calls: Dict[str, None] = {}
+
+    def append(self, message: Message):
+        Dialogue.getMessages(message, self.messages)
+        if message.role == "assistant" and message.tool_calls:
+            for tc in message.tool_calls:
+                tc_id = tc.get("id") if isinstance(tc, dict) else getattr(tc, "id", None)
+                if tc_id:
+                    self.pending_tool_calls[tc_id] = None
+        elif message.role == "tool" and message.tool_call_id:
+            self.pending_tool_calls.pop(message.tool_call_id, None)
+
+    def render(self, dialogue: List[Dict]):
+        # LLM会直接修改消息字典（如补content、追加提示词），每次输出副本
+        dialogue.extend(message.copy() for message in self.messages)
+        for missing_id in self.pending_tool_calls:
+            dialogue.append(
+                {
+                    "role": "tool",
+                    "tool_call_id": missing_id,
+                    "content": INTERRUPTED_TOOL_CONTENT,
+                }
+            )
+
+
 class Dialogue:
     def __init__(self):
-        self.dialogue: List[Message] = []
+        self._messages: List[Message] = []
         # 获取当前时间
         self.current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        # 移出上下文窗口的早期对话摘要
+        self.summary = None
+        # 移出上下文窗口的早期消息，会话结束保存记忆时仍需要完整历史
+        self.archived: List[Message] = []
+        self._reset_cache()
+
+    def _reset_cache(self):
+        self._system_message = None
+        self._fewshot = _MessageSegment()
+        self._actual = _MessageSegment()
+        # 已同步到增量结果的消息数量及最后一条消息，用于发现列表被直接修改
+        self._synced_count = 0
+        self._synced_last = None
+        self._system_prompt_key = None
+        self._system_prompt = None
+        self._speakers_key = None
+        self._speakers_info = ""
+
+    @property
+    def dialogue(self) -> List[Message]:
+        return self._messages
+
+    @dialogue.setter
+    def dialogue(self, messages: List[Message]):
+        # 整体替换（如清理工具消息）后重新构建增量结果
+        self._messages = list(messages)
+        self._reset_cache()
 
     def put(self, message: Message):
-        self.dialogue.append(message)
+        self._messages.append(message)
 
-    def getMessages(self, m, dialogue):
+    @staticmethod
+    def getMessages(m, dialogue):
         if m.tool_calls is not None:
             dialogue.append({"role": m.role, "tool_calls": m.tool_calls})
         elif m.role == "tool":
@@ -54,110 +122,130 @@ class Dialogue:
 
     def update_system_message(self, new_content: str):
         """更新或添加系统消息"""
-        # 查找第一个系统消息
-        system_msg = next((msg for msg in self.dialogue if msg.role == "system"), None)
-        if system_msg:
-            system_msg.content = new_content
+        self._sync()
+        if self._system_message is not None:
+            self._system_message.content = new_content
         else:
             self.put(Message(role="system", content=new_content))
 
-    def _ensure_tool_calls_complete(self, messages: List[Message]) -> List[Message]:
-        """
-        确保所有 tool_calls 都有对应的 tool 响应
-        修复被打断导致的悬空 tool_calls，防止大模型 API 报 400 错误
-        """
-        pending_tool_calls = set()
-        result = []
-
-        for msg in messages:
-            result.append(msg)
-
-            if msg.role == "assistant" and msg.tool_calls:
-                for tc in msg.tool_calls:
-                    tc_id = tc.get("id") if isinstance(tc, dict) else getattr(tc, "id", None)
-                    if tc_id:
-                        pending_tool_calls.add(tc_id)
-
-            elif msg.role == "tool" and msg.tool_call_id:
-                pending_tool_calls.discard(msg.tool_call_id)
-
-        for missing_id in pending_tool_calls:
-            dummy_tool_msg = Message(
-                role="tool",
-                content='{"status": "interrupted", "message": "动作已取消/被打断"}',
-                tool_call_id=missing_id
+    def evict(self, messages: List[Message], summary: str = None):
+        """把早期消息移出上下文窗口，并用摘要替代"""
+        evicted = set(id(m) for m in messages)
+        self.archived.extend(m for m in self._messages if id(m) in evicted)
+        self.dialogue = [m for m in self._messages if id(m) not in evicted]
+        if summary:
+            self.summary = summary
+
+    def full_dialogue(self) -> List[Message]:
+        """完整对话历史（包含已移出上下文窗口的早期消息），用于保存记忆"""
+        if not self.archived:
+            return self._messages
+        system = [m for m in self._messages if m.role == "system"]
+        recent = [m for m in self._messages if m.role != "system"]
+        return system + self.archived + recent
+
+    def _sync(self):
+        """把新写入的消息转换到增量结果中，列表被直接改动过时整体重建"""
+        messages = self._messages
+        count = self._synced_count
+        if count > len(messages) or (
+            count and messages[count - 1] is not self._synced_last
+        ):
+            self._reset_cache()
+            count = 0
+        for m in messages[count:]:
+            if m.role == "system":
+                if self._system_message is None:
+                    self._system_message = m
+            elif m.is_temporary:
+                self._fewshot.append(m)
+            else:
+                self._actual.append(m)
+        if len(messages) != count:
+            self._synced_count = len(messages)
+            self._synced_last = messages[-1]
+
+    def _get_speakers_info(self, voiceprint_config, current_speaker):
+        """生成说话人信息，按 (说话人, 声纹配置) 缓存"""
+        current_speaker_name = (current_speaker or "").strip()
+        # 仅在本轮注入了有效身份时才输出 speakers_info，避免列表里的名字每轮
+        # 重复出现诱导模型反复称呼；后续轮不再注入身份，靠对话历史首轮保留
+        if not current_speaker_name or current_speaker_name == "未知说话人":
+            return ""
+        try:
+            speakers = voiceprint_config.get("speakers", [])
+            key = (current_speaker_name, tuple(speakers))
+        except:
+            return ""
+        if key == self._speakers_key:
+            return self._speakers_info
+
+        speakers_info = "\n<speakers_info>"
+        speakers_info += f"\n当前说话人：{current_speaker_name}"
+        for speaker_str in speakers:
+            try:
+                parts = speaker_str.split(",", 2)
+                if len(parts) >= 2:
+                    name = parts[1].strip()
+                    description = parts[2].strip() if len(parts) >= 3 else ""
+                    speakers_info += f"\n- {name}：{description}"
+            except:
+                pass
+        speakers_info += "\n</speakers_info>"
+        self._speakers_key, self._speakers_info = key, speakers_info
+        return speakers_info
+
+    def _render_system_prompt(self, memory_str, voiceprint_config, current_speaker):
+        """渲染系统提示词，按 (模板, 记忆, 说话人, 当前分钟, 摘要) 缓存"""
+        template = self._system_message.content
+        current_time = datetime.now().strftime("%H:%M")
+        speakers_info = self._get_speakers_info(voiceprint_config, current_speaker)
+        key = (template, memory_str, speakers_info, current_time, self.summary)
+        if key == self._system_prompt_key:
+            return self._system_prompt
+
+        # 替换时间占位符
+        full_prompt = template.replace("{{current_time}}", current_time)
+
+        # 填充记忆
+        if memory_str is not None:
+            full_prompt = re.sub(
+                r"<memory>.*?</memory>",
+                f"<memory>\n{memory_str}\n</memory>",
+                full_prompt,
+                flags=re.DOTALL,
             )
-            result.append(dummy_tool_msg)
 
-        return result
+        # 追加说话人信息
+        full_prompt += speakers_info
+
+        # 追加早期对话摘要
+        if self.summary:
+            full_prompt += f"\n<history_summary>\n{self.summary}\n</history_summary>"
+
+        self._system_prompt_key, self._system_prompt = key, full_prompt
+        return full_prompt
 
     def get_llm_dialogue_with_memory(
             self, memory_str: str = None, voiceprint_config: dict = None,
             current_speaker: str = None,
     ) -> List[Dict[str, str]]:
+        self._sync()
+
         # 构建对话
         dialogue = []
 
         # 添加系统提示和记忆
-        system_message = next(
-            (msg for msg in self.dialogue if msg.role == "system"), None
-        )
-
-        if system_message:
-            full_prompt = system_message.content
-
-            # 替换时间占位符
-            full_prompt = full_prompt.replace(
-                "{{current_time}}", datetime.now().strftime("%H:%M")
+        if self._system_message is not None:
+            full_prompt = self._render_system_prompt(
+                memory_str, voiceprint_config, current_speaker
             )
-
-            # 填充记忆
-            if memory_str is not None:
-                full_prompt = re.sub(
-                    r"<memory>.*?</memory>",
-                    f"<memory>\n{memory_str}\n</memory>",
-                    full_prompt,
-                    flags=re.DOTALL,
-                )
-
-            # 追加说话人信息
-            try:
-                current_speaker_name = (current_speaker or "").strip()
-                # 仅在本轮注入了有效身份时才输出 speakers_info，避免列表里的名字每轮
-                # 重复出现诱导模型反复称呼；后续轮不再注入身份，靠对话历史首轮保留
-                if current_speaker_name and current_speaker_name != "未知说话人":
-                    speakers = voiceprint_config.get("speakers", [])
-                    speakers_info = "\n<speakers_info>"
-                    speakers_info += f"\n当前说话人：{current_speaker_name}"
-                    for speaker_str in speakers:
-                        try:
-                            parts = speaker_str.split(",", 2)
-                            if len(parts) >= 2:
-                                name = parts[1].strip()
-                                description = (
-                                    parts[2].strip() if len(parts) >= 3 else ""
-                                )
-                                speakers_info += f"\n- {name}：{description}"
-                        except:
-                            pass
-                    speakers_info += "\n</speakers_info>"
-                    full_prompt += speakers_info
-            except:
-                pass
-
             dialogue.append({"role": "system", "content": full_prompt})
 
         # 第二段：few-shot 示例（会话内不变）
-        non_system_messages = [m for m in self.dialogue if m.role != "system"]
-        fewshot_messages = [m for m in non_system_messages if m.is_temporary]
-        complete_fewshot = self._ensure_tool_calls_complete(fewshot_messages)
-        for m in complete_fewshot:
-            self.getMessages(m, dialogue)
+        self._fewshot.render(dialogue)
 
         # 第三段：实际对话历史（不含 few-shot）
-        actual_messages = [m for m in non_system_messages if not m.is_temporary]
-        complete_actual = self._ensure_tool_calls_complete(actual_messages)
-        for m in complete_actual:
-            self.getMessages(m, dialogue)
+        self._actual.render(dialogue)
 
         return dialogue
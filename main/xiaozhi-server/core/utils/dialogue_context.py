@@ -0,0 +1,235 @@
+"""
+对话上下文窗口
+长时间会话中对话历史不断增长，每轮都把全部历史发给LLM，提示词token数、首字延迟和费用随之上涨。
+按token预算管理对话历史：超出 max_tokens 时，从最早的完整轮次开始挑出需要移出的消息，
+在后台用记忆总结模型把它们与已有摘要合并成新的摘要，完成后再从对话中移除并把摘要放入系统提示词。
+压缩在后台进行，当前这一轮仍使用完整历史，不等待摘要；摘要失败时直接移除，保证不超出预算太多。
+移出的消息保留在 Dialogue.archived 中，会话结束时长期记忆仍按完整历史保存。
+"""
+
+import re
+import json
+import asyncio
+import threading
+from typing import TYPE_CHECKING, List
+
+from config.logger import setup_logging
+from core.utils.dialogue import Message
+
+if TYPE_CHECKING:
+    from core.connection import ConnectionHandler
+
+TAG = __name__
+logger = setup_logging()
+
+_CJK_RE = re.compile(r"[\u3000-\u303f\u3400-\u9fff\uac00-\ud7af\uff00-\uffef]")
+# 每条消息的格式开销（角色、分隔符）
+MESSAGE_OVERHEAD_TOKENS = 4
+
+SUMMARY_PROMPT = (
+    "你是对话摘要助手。请把【已有摘要】和【新增对话】合并成一段新的摘要，供后续对话参考。\n"
+    "要求：\n"
+    "1. 保留用户的关键信息、偏好、提出的问题和未完成的事项，以及助手给出的重要结论\n"
+    "2. 省略寒暄和重复内容，使用第三人称陈述\n"
+    "3. 不超过{max_chars}字，直接输出摘要内容，不要任何解释"
+)
+
+
+# 所有连接的累计统计
+_totals = {"summaries": 0, "failures": 0, "evicted_messages": 0, "evicted_tokens": 0}
+_totals_lock = threading.Lock()
+
+
+def get_dialogue_context_stats():
+    """所有连接的对话上下文压缩累计统计"""
+    with _totals_lock:
+        return dict(_totals)
+
+
+def _add_totals(**counts):
+    with _totals_lock:
+        for name, value in counts.items():
+            _totals[name] += value
+
+
+def estimate_tokens(text):
+    """快速估算token数：中日韩字符约1个token，其余字符约4个1个token"""
+    if not text:
+        return 0
+    cjk = len(_CJK_RE.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def create_tokenizer(name=None):
+    """
+    创建token计数函数
+
+    Args:
+        name: heuristic 使用估算；其余视为tiktoken编码名（如 cl100k_base），未安装tiktoken时退回估算
+    """
+    if not name or name == "heuristic":
+        return estimate_tokens
+    try:
+        import tiktoken
+
+        encoding = tiktoken.get_encoding(name)
+        return lambda text: len(encoding.encode(text or "", disallowed_special=()))
+    except Exception as e:
+        logger.bind(tag=TAG).warning(f"加载分词器{name}失败，使用估算: {e}")
+        return estimate_tokens
+
+
+def _message_text(message: Message):
+    text = message.content or ""
+    if message.tool_calls:
+        text += json.dumps(message.tool_calls, ensure_ascii=False, default=str)
+    return text
+
+
+class DialogueContextManager:
+    """单个连接的对话上下文窗口管理"""
+
+    def __init__(self, conn: "ConnectionHandler", config: dict):
+        self.conn = conn
+        self.max_tokens = max(int(config.get("max_tokens", 4000)), 1)
+        self.target_tokens = int(
+            self.max_tokens * min(max(float(config.get("target_ratio", 0.6)), 0.1), 1.0)
+        )
+        self.keep_recent_turns = max(int(config.get("keep_recent_turns", 2)), 1)
+        self.summary_max_chars = int(config.get("summary_max_chars", 300))
+        self.count_tokens = create_tokenizer(config.get("tokenizer", "heuristic"))
+        self._token_cache = {}
+        self._task = None
+
+        # 统计信息
+        self.summaries = 0
+        self.failures = 0
+        self.evicted_messages = 0
+        self.evicted_tokens = 0
+
+    @classmethod
+    def for_conn(cls, conn: "ConnectionHandler"):
+        """获取连接的上下文窗口管理器，未开启时返回None"""
+        config = conn.config.get("dialogue_context", {})
+        if str(config.get("enabled", False)).lower() not in ("true", "1", "yes"):
+            return None
+        if conn.dialogue_context is None:
+            conn.dialogue_context = cls(conn, config)
+        return conn.dialogue_context
+
+    def message_tokens(self, message: Message):
+        tokens = self._token_cache.get(message.uniq_id)
+        if tokens is None:
+            tokens = self.count_tokens(_message_text(message)) + MESSAGE_OVERHEAD_TOKENS
+            self._token_cache[message.uniq_id] = tokens
+        return tokens
+
+    def _history(self) -> List[Message]:
+        """参与窗口管理的实际对话（不含系统提示词和few-shot示例）"""
+        return [
+            m
+            for m in self.conn.dialogue.dialogue
+            if m.role != "system" and not m.is_temporary
+        ]
+
+    def maintain(self):
+        """每轮用户消息写入后调用，超出预算时在后台压缩，不阻塞当前轮"""
+        if self._task is not None and not self._task.done():
+            return
+        history = self._history()
+        # 只保留仍在对话中的消息的token缓存
+        live_ids = {m.uniq_id for m in history}
+        if len(self._token_cache) > len(live_ids) * 2:
+            self._token_cache = {
+                k: v for k, v in self._token_cache.items() if k in live_ids
+            }
+        total = sum(self.message_tokens(m) for m in history)
+        if total <= self.max_tokens:
+            return
+        evicted = self._select_evicted(history, total)
+        if not evicted:
+            return
+        logger.bind(tag=TAG).info(
+            f"对话历史{total} tokens超出预算{self.max_tokens}，压缩最早的{len(evicted)}条消息"
+        )
+        self._task = asyncio.create_task(self._summarize_and_evict(evicted))
+
+    def _select_evicted(self, history: List[Message], total: int) -> List[Message]:
+        """从最早的完整轮次（以用户消息开头）开始选择，直到剩余不超过目标，且保留最近几轮"""
+        turn_starts = [i for i, m in enumerate(history) if m.role == "user"]
+        if turn_starts and turn_starts[0] != 0:
+            turn_starts.insert(0, 0)
+        # 可移出的轮次边界：保留最近 keep_recent_turns 轮
+        boundaries = turn_starts[1 : max(len(turn_starts) - self.keep_recent_turns + 1, 1)]
+        cut = 0
+        remaining = total
+        for boundary in boundaries:
+            remaining -= sum(self.message_tokens(m) for m in history[cut:boundary])
+            cut = boundary
+            if remaining <= self.target_tokens:
+                break
+        return history[:cut]
+
+    async def _summarize_and_evict(self, messages: List[Message]):
+        tokens = sum(self.message_tokens(m) for m in messages)
+        summary = None
+        try:
+            summary = await self._summarize(messages)
+            self.summaries += 1
+            _add_totals(summaries=1)
+        except Exception as e:
+            self.failures += 1
+            _add_totals(failures=1)
+            logger.bind(tag=TAG).warning(f"对话摘要失败，直接移除早期消息: {e}")
+        self.conn.dialogue.evict(messages, summary)
+        self.evicted_messages += len(messages)
+        self.evicted_tokens += tokens
+        _add_totals(evicted_messages=len(messages), evicted_tokens=tokens)
+        for m in messages:
+            self._token_cache.pop(m.uniq_id, None)
+        logger.bind(tag=TAG).debug(f"早期对话已压缩，当前摘要: {self.conn.dialogue.summary}")
+
+    async def _summarize(self, messages: List[Message]):
+        llm = getattr(self.conn.memory, "llm", None) or self.conn.llm
+        if llm is None:
+            raise RuntimeError("没有可用的LLM")
+        lines = []
+        for m in messages:
+            if m.role == "user":
+                lines.append(f"用户：{m.content}")
+            elif m.role == "assistant" and m.content:
+                lines.append(f"助手：{m.content}")
+            elif m.role == "tool" and m.content:
+                lines.append(f"工具结果：{m.content}")
+        user_prompt = (
+            f"【已有摘要】\n{self.conn.dialogue.summary or '无'}\n\n"
+            "【新增对话】\n" + "\n".join(lines)
+        )
+        # 使用 to_thread 将同步阻塞调用放到线程池中，避免阻塞事件循环
+        summary = await asyncio.to_thread(
+            llm.response_no_stream,
+            system_prompt=SUMMARY_PROMPT.format(max_chars=self.summary_max_chars),
+            user_prompt=user_prompt,
+        )
+        summary = (summary or "").strip()
+        if not summary:
+            raise ValueError("摘要为空")
+        return summary[: self.summary_max_chars * 2]
+
+    def cancel(self):
+        """连接关闭时取消进行中的摘要"""
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+
+    def get_stats(self):
+        history = self._history()
+        return {
+            "messages": len(history),
+            "tokens": sum(self.message_tokens(m) for m in history),
+            "max_tokens": self.max_tokens,
+            "summaries": self.summaries,
+            "failures": self.failures,
+            "evicted_messages": self.evicted_messages,
+            "evicted_tokens": self.evicted_tokens,
+            "summarizing": self._task is not None and not self._task.done(),
+        }
@@ -0,0 +1,73 @@
+"""
+进程级共享的异步HTTP连接池
+LLM等上游服务的流式请求都复用同一个 httpx.AsyncClient：长连接保活，安装了h2时启用HTTP/2多路复用，
+成千上万路并发流在事件循环上运行，不再每路占用一个线程和一个独立的TCP连接。
+httpx.AsyncClient 只能在创建它的事件循环中使用，因此按事件循环各保留一个实例（服务端只有一个主循环）。
+"""
+
+import asyncio
+import weakref
+import importlib.util
+
+import httpx
+
+from config.logger import setup_logging
+
+TAG = __name__
+logger = setup_logging()
+
+# HTTP/2需要额外安装h2
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+_config = {}
+_clients = weakref.WeakKeyDictionary()
+
+
+def configure_async_http_client(config=None):
+    """
+    设置连接池参数，之后新创建的连接池生效
+
+    Args:
+        config: http_client配置，支持 http2、max_connections、max_keepalive_connections、keepalive_expiry
+    """
+    global _config
+    _config = dict(config or {})
+
+
+def _create_client():
+    http2 = str(_config.get("http2", True)).lower() in ("true", "1", "yes")
+    if http2 and not HTTP2_AVAILABLE:
+        logger.bind(tag=TAG).warning("未安装h2，共享HTTP连接池使用HTTP/1.1")
+        http2 = False
+    limits = httpx.Limits(
+        max_connections=int(_config.get("max_connections", 1000)),
+        max_keepalive_connections=int(_config.get("max_keepalive_connections", 200)),
+        keepalive_expiry=float(_config.get("keepalive_expiry", 60)),
+    )
+    logger.bind(tag=TAG).info(
+        f"创建共享HTTP连接池: http2={http2}, 最大连接数={limits.max_connections}"
+    )
+    # 超时由各请求自行指定
+    return httpx.AsyncClient(http2=http2, limits=limits, timeout=None)
+
+
+def get_async_http_client():
+    """
+    获取当前事件循环的共享 httpx.AsyncClient（单例模式）
+
+    Returns:
+        httpx.AsyncClient实例，调用方不要关闭
+    """
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None or client.is_closed:
+        client = _create_client()
+        _clients[loop] = client
+    return client
+
+
+async def close_async_http_client():
+    """关闭当前事件循环的共享连接池（服务停止时调用）"""
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
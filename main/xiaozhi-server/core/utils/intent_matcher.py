@@ -0,0 +1,422 @@
+"""
+规则快速意图匹配
+退出、播放音乐、询问时间、IoT设备的音量/亮度/开关等意图句式固定，不需要请求意图识别LLM。
+根据连接当前可用的工具（插件函数注册表、设备上报的IoT描述符）和音乐文件列表编译出关键词规则，
+用Aho-Corasick自动机一次扫描找出所有关键词，再抽取数字、歌名等参数，输出与意图识别LLM相同格式的JSON。
+
+为保证准确率，只在以下条件全部满足时命中，否则交给意图识别LLM：
+1. 规则的每组关键词都出现，且必需的参数（数字、歌名）能抽取出来
+2. 去掉命中的关键词、参数和语气词后剩余不超过 MAX_RESIDUE 个字（避免“打开灯并且调高音量”之类的复合指令）；
+   退出意图会关闭会话，要求关键词覆盖整句，只允许 EXIT_FILLER_CHARS 中的语气词（“听说再见了”、“我们再见面吧”不会命中）
+3. 不含疑问、否定的词（如“怎么”、“不要”），且关键词以外不出现否定字（“不”、“没”、“别”），
+   如“不听歌了”、“我不想听稻香”、“没打开灯”；关键词本身含否定字的（如退出意图的“不聊了”）不受影响
+4. 得分最高的规则唯一
+"""
+
+import re
+import json
+import time
+import threading
+from collections import OrderedDict, deque
+from typing import TYPE_CHECKING
+
+from config.logger import setup_logging
+
+if TYPE_CHECKING:
+    from core.connection import ConnectionHandler
+
+TAG = __name__
+logger = setup_logging()
+
+# 去掉关键词和参数后允许剩余的字数
+MAX_RESIDUE = 2
+# 不参与剩余字数计算的虚词
+FILLER_CHARS = set("请帮我给你把的了吧呢啊嗯呀哦一下到为成将要想再")
+# 出现这些词时不走快速匹配
+GUARD_WORDS = ("怎么", "为什么", "如何", "不要", "别", "不用", "是不是", "能不能")
+# 出现在命中的关键词以外时不走快速匹配的否定字（覆盖“不想”、“没有”、“别再”等说法）
+NEGATION_CHARS = set("不没别")
+
+# 退出意图整句匹配时允许出现的语气词
+EXIT_FILLER_CHARS = set("好的吧啦了啊呀哦嗯喽咯那就先我你")
+
+EXIT_KEYWORDS = ("退出系统", "结束对话", "退出对话", "关闭对话", "不想和你说话了", "不聊了", "拜拜", "再见")
+CONTEXT_KEYWORDS = ("几点", "现在时间", "当前时间", "几号", "星期几", "周几", "礼拜几", "什么日期", "农历")
+MUSIC_VERBS = ("播放", "放一首", "放首", "来一首", "来首", "听", "唱一首", "唱首")
+MUSIC_OBJECTS = ("音乐", "歌曲", "歌")
+QUERY_WORDS = ("多少", "是什么", "查询", "查一下", "是几", "有多")
+# IoT方法描述的动词及其同义说法
+IOT_VERBS = {
+    "设置": ("设置", "调到", "调成", "调整到", "调整为", "调节到", "设为", "设成", "改成", "改为"),
+    "调整": ("调整", "调到", "调成", "调节到", "设置", "设为", "改成", "改为"),
+    "打开": ("打开", "开启", "点亮"),
+    "开启": ("打开", "开启", "点亮"),
+    "关闭": ("关闭", "关掉", "关上", "熄灭"),
+}
+
+_CN_DIGITS = {"零": 0, "一": 1, "二": 2, "两": 2, "三": 3, "四": 4, "五": 5, "六": 6, "七": 7, "八": 8, "九": 9}
+_NUMBER_RE = re.compile(r"(百分之)?([0-9]+|[零一二两三四五六七八九十百]+)")
+
+
+def _parse_chinese_number(text):
+    if text.isdigit():
+        return int(text)
+    total, current = 0, 0
+    for char in text:
+        if char in _CN_DIGITS:
+            current = _CN_DIGITS[char]
+        elif char == "十":
+            total += (current or 1) * 10
+            current = 0
+        elif char == "百":
+            total += (current or 1) * 100
+            current = 0
+    return total + current
+
+
+def extract_number(text):
+    """抽取句子中最后一个数字（支持阿拉伯数字、中文数字、百分之），返回 (数值, 起, 止)，没有时返回None"""
+    candidates = []
+    for match in _NUMBER_RE.finditer(text):
+        end = match.end()
+        # “一下”、“一点”、“一首”不是数值
+        if match.group(2) == "一" and text[end : end + 1] in ("下", "点", "首", "些", "个"):
+            continue
+        candidates.append(match)
+    if not candidates:
+        return None
+    match = candidates[-1]
+    return _parse_chinese_number(match.group(2)), match.start(), match.end()
+
+
+class AhoCorasick:
+    """Aho-Corasick多模式匹配自动机"""
+
+    def __init__(self):
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+
+    def add(self, keyword, payload):
+        node = 0
+        for char in keyword:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][char] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            node = next_node
+        self._output[node].append((len(keyword), payload))
+
+    def build(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(char, 0)
+                if self._fail[child] == child:
+                    self._fail[child] = 0
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+    def iter(self, text):
+        """产出 (起始位置, 结束位置, payload)"""
+        node = 0
+        for index, char in enumerate(text):
+            while node and char not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(char, 0)
+            for length, payload in self._output[node]:
+                yield index + 1 - length, index + 1, payload
+
+
+class _Rule:
+    __slots__ = ("name", "groups", "slot", "build_arguments", "whole_utterance")
+
+    def __init__(
+        self, name, groups, slot=None, build_arguments=None, whole_utterance=False
+    ):
+        self.name = name
+        # 每组至少命中一个关键词
+        self.groups = groups
+        # None / number / song
+        self.slot = slot
+        self.build_arguments = build_arguments or (lambda value: None)
+        # 关键词需覆盖整句（除 EXIT_FILLER_CHARS 语气词外不允许剩余字）
+        self.whole_utterance = whole_utterance
+
+
+def _split_iot_description(description):
+    """把“设置音量”拆成 (动词, 对象)，不认识的动词返回None"""
+    description = description.strip()
+    for verb in IOT_VERBS:
+        if description.startswith(verb) and len(description) > len(verb):
+            return verb, description[len(verb) :].lstrip("的")
+    return None
+
+
+class CompiledIntentMatcher:
+    """按工具集编译出的规则匹配器"""
+
+    def __init__(self, function_names, iot_descriptors=(), music_names=()):
+        self.rules = []
+        self._automaton = AhoCorasick()
+        function_names = set(function_names)
+
+        if "handle_exit_intent" in function_names:
+            self._add_rule(
+                _Rule(
+                    "handle_exit_intent",
+                    [EXIT_KEYWORDS],
+                    build_arguments=lambda value: {"say_goodbye": "再见，下次再聊~"},
+                    whole_utterance=True,
+                )
+            )
+        # 时间、日期等基础信息由上下文直接回答
+        self._add_rule(_Rule("result_for_context", [CONTEXT_KEYWORDS]))
+        if "play_music" in function_names:
+            self._add_music_rules(music_names)
+        for descriptor in iot_descriptors:
+            self._add_iot_rules(descriptor, function_names)
+        self._automaton.build()
+
+    def _add_rule(self, rule):
+        index = len(self.rules)
+        self.rules.append(rule)
+        for group_index, keywords in enumerate(rule.groups):
+            for keyword in keywords:
+                if keyword:
+                    self._automaton.add(keyword, (index, group_index))
+
+    def _add_music_rules(self, music_names):
+        self._add_rule(
+            _Rule(
+                "play_music",
+                [MUSIC_VERBS, MUSIC_OBJECTS],
+                build_arguments=lambda value: {"song_name": "random"},
+            )
+        )
+        songs = {}
+        for name in music_names:
+            keyword = re.sub(r"[^\w]", "", name.replace("\\", "/").split("/")[-1]).lower()
+            if len(keyword) >= 2:
+                songs[keyword] = name
+        if songs:
+            self._add_rule(
+                _Rule(
+                    "play_music",
+                    [MUSIC_VERBS, tuple(songs)],
+                    slot="song",
+                    build_arguments=lambda value: {"song_name": songs[value]},
+                )
+            )
+
+    def _add_iot_rules(self, descriptor, function_names):
+        device = descriptor.name.lower()
+        for method in descriptor.methods:
+            tool_name = f"{device}_{method['name'].lower()}"
+            split = _split_iot_description(method["description"])
+            if tool_name not in function_names or split is None:
+                continue
+            verb, target = split
+            parameters = method.get("parameters") or {}
+            if len(parameters) > 1 or any(
+                p["type"] != "number" for p in parameters.values()
+            ):
+                # 只支持无参数或单个数字参数的方法
+                continue
+            description = method["description"]
+            param_name = next(iter(parameters), None)
+
+            def build_arguments(value, param_name=param_name, description=description):
+                arguments = {
+                    "response_success": f"{description}成功",
+                    "response_failure": f"{description}失败",
+                }
+                if param_name is not None:
+                    arguments[param_name] = value
+                    arguments["response_success"] = f"已{description}为{{{param_name}}}"
+                return arguments
+
+            self._add_rule(
+                _Rule(
+                    tool_name,
+                    [IOT_VERBS[verb], (target,)],
+                    slot="number" if param_name is not None else None,
+                    build_arguments=build_arguments,
+                )
+            )
+        for prop in descriptor.properties:
+            tool_name = f"get_{device}_{prop['name'].lower()}"
+            target = prop["description"].strip()
+            if target.startswith("当前"):
+                target = target[2:]
+            for suffix in ("百分比", "值"):
+                if target.endswith(suffix):
+                    target = target[: -len(suffix)]
+            if tool_name not in function_names or len(target) < 2:
+                continue
+            self._add_rule(
+                _Rule(
+                    tool_name,
+                    [QUERY_WORDS, (target,)],
+                    build_arguments=lambda value, target=target: {
+                        "response_success": f"当前{target}是{{value}}",
+                        "response_failure": f"无法获取{target}",
+                    },
+                )
+            )
+
+    def match(self, text):
+        """匹配去掉标点的用户文本，命中时返回意图JSON字符串，否则返回None"""
+        if not text or any(word in text for word in GUARD_WORDS):
+            return None
+        # rule_index -> group_index -> 命中的关键词区间
+        hits = {}
+        for start, end, (rule_index, group_index) in self._automaton.iter(text):
+            hits.setdefault(rule_index, {}).setdefault(group_index, []).append(
+                (start, end)
+            )
+
+        negations = [i for i, char in enumerate(text) if char in NEGATION_CHARS]
+        number = None
+        best, best_score, tie = None, 0, False
+        for rule_index, groups in hits.items():
+            rule = self.rules[rule_index]
+            if len(groups) != len(rule.groups):
+                continue
+            spans = [span for group in groups.values() for span in group]
+            value = None
+            if rule.slot == "number":
+                if number is None:
+                    number = extract_number(text) or False
+                if not number:
+                    continue
+                value = number[0]
+                spans.append(number[1:])
+            elif rule.slot == "song":
+                start, end = max(
+                    groups[len(rule.groups) - 1], key=lambda span: span[1] - span[0]
+                )
+                value = text[start:end]
+            covered = set()
+            for start, end in spans:
+                covered.update(range(start, end))
+            if any(i not in covered for i in negations):
+                # 否定的指令（“不听歌了”、“没打开灯”）交给LLM
+                continue
+            if rule.whole_utterance:
+                fillers, max_residue = EXIT_FILLER_CHARS, 0
+            else:
+                fillers, max_residue = FILLER_CHARS, MAX_RESIDUE
+            residue = sum(
+                1
+                for i, char in enumerate(text)
+                if i not in covered and char not in fillers and char.isalnum()
+            )
+            if residue > max_residue:
+                continue
+            score = len(covered)
+            if best is None or score > best_score:
+                best, best_score, tie = (rule, value), score, False
+            elif score == best_score and rule.name != best[0].name:
+                tie = True
+        if best is None or tie:
+            return None
+
+        rule, value = best
+        function_call = {"name": rule.name}
+        arguments = rule.build_arguments(value)
+        if arguments:
+            function_call["arguments"] = arguments
+        return json.dumps({"function_call": function_call}, ensure_ascii=False)
+
+
+class IntentFastPath:
+    """按工具集缓存编译好的匹配器，并统计命中率和耗时"""
+
+    def __init__(self, max_matchers=32):
+        self.max_matchers = max_matchers
+        self._matchers = OrderedDict()
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.hits = 0
+        self.compiles = 0
+        self.total_match_seconds = 0.0
+
+    def get_matcher(self, function_names, iot_descriptors, music_names):
+        key = (
+            tuple(sorted(function_names)),
+            tuple(
+                (d.name, tuple(m["name"] for m in d.methods), tuple(p["name"] for p in d.properties))
+                for d in iot_descriptors
+            ),
+            tuple(music_names),
+        )
+        with self._lock:
+            matcher = self._matchers.get(key)
+            if matcher is not None:
+                self._matchers.move_to_end(key)
+                return matcher
+        matcher = CompiledIntentMatcher(function_names, iot_descriptors, music_names)
+        with self._lock:
+            self.compiles += 1
+            self._matchers[key] = matcher
+            while len(self._matchers) > self.max_matchers:
+                self._matchers.popitem(last=False)
+        return matcher
+
+    def match(self, conn: "ConnectionHandler", text):
+        """用连接当前的工具集匹配文本，未命中返回None"""
+        if conn.func_handler is None:
+            return None
+        from plugins_func.functions.play_music import initialize_music_handler
+
+        function_names = [
+            func.get("function", {}).get("name")
+            for func in conn.func_handler.get_functions() or []
+        ]
+        music_names = initialize_music_handler(conn).get("music_file_names", [])
+        matcher = self.get_matcher(
+            function_names, list(conn.iot_descriptors.values()), music_names
+        )
+
+        start = time.perf_counter()
+        result = matcher.match(text)
+        cost = time.perf_counter() - start
+        with self._lock:
+            self.lookups += 1
+            self.total_match_seconds += cost
+            if result is not None:
+                self.hits += 1
+        if result is not None:
+            logger.bind(tag=TAG).info(
+                f"快速意图匹配命中: {text} -> {result}, 耗时{cost * 1e6:.0f}μs"
+            )
+        return result
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                "lookups": self.lookups,
+                "hits": self.hits,
+                "hit_rate": round(self.hits / self.lookups, 4) if self.lookups else 0.0,
+                "compiles": self.compiles,
+                "matchers": len(self._matchers),
+                "avg_match_us": round(self.total_match_seconds * 1e6 / self.lookups, 1)
+                if self.lookups
+                else 0.0,
+            }
+
+
+_intent_fast_path = IntentFastPath()
+
+
+def get_intent_fast_path():
+    """获取全局快速意图匹配实例"""
+    return _intent_fast_path
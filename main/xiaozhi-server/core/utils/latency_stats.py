@@ -0,0 +1,156 @@
+"""
+首句语音延迟统计
+
+- TTS首包延迟：按TTS提供者统计最近N次从提交文本到收到第一帧音频的耗时
+- LLM输出速度：按LLM提供者统计最近N轮回复的输出字数/秒
+- 首句语音延迟(TTFA)：从 startToChat 开始到第一个Opus包发送给设备的耗时
+
+前两项供自适应首句切分使用，TTFA用于观察调整效果。
+"""
+
+import time
+import threading
+from collections import deque
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from core.connection import ConnectionHandler
+
+TAG = __name__
+
+# 滚动窗口大小
+WINDOW_SIZE = 50
+
+
+class RollingWindow:
+    """固定长度的滚动窗口，取中位数/分位数时才排序"""
+
+    def __init__(self, size=WINDOW_SIZE):
+        self._values = deque(maxlen=size)
+
+    def add(self, value):
+        self._values.append(value)
+
+    def __len__(self):
+        return len(self._values)
+
+    def percentile(self, p):
+        if not self._values:
+            return None
+        values = sorted(self._values)
+        index = min(int(len(values) * p / 100), len(values) - 1)
+        return values[index]
+
+    def median(self):
+        return self.percentile(50)
+
+
+def _first_str(provider, names):
+    for name in names:
+        value = getattr(provider, name, None)
+        if isinstance(value, str) and value:
+            return value
+    return None
+
+
+def provider_key(provider):
+    """
+    提供者统计键：实现模块名 + 模型 + 接口地址，如 openai:qwen-plus@https://dashscope.aliyuncs.com/compatible-mode/v1
+
+    同一实现（如所有OpenAI兼容的LLM）对接不同模型和服务时延迟差别很大，需要分开统计
+    """
+    if provider is None:
+        return None
+    key = type(provider).__module__.rsplit(".", 1)[-1]
+    model = _first_str(provider, ("model_name", "model"))
+    endpoint = _first_str(provider, ("base_url", "api_url", "url", "host"))
+    if model:
+        key += f":{model}"
+    if endpoint:
+        key += f"@{endpoint}"
+    return key
+
+
+class LatencyStats:
+    def __init__(self, window_size=WINDOW_SIZE):
+        self.window_size = window_size
+        self._tts_ttfb = {}
+        self._llm_rate = {}
+        self._first_audio = RollingWindow(window_size)
+        self._lock = threading.Lock()
+
+    def _window(self, windows, key):
+        window = windows.get(key)
+        if window is None:
+            window = windows[key] = RollingWindow(self.window_size)
+        return window
+
+    def record_tts_ttfb(self, provider, seconds):
+        if provider is None or seconds is None or seconds < 0:
+            return
+        with self._lock:
+            self._window(self._tts_ttfb, provider).add(seconds)
+
+    def tts_ttfb(self, provider):
+        """该TTS最近的首包延迟中位数(秒)，没有数据时返回None"""
+        with self._lock:
+            window = self._tts_ttfb.get(provider)
+            return window.median() if window else None
+
+    def record_llm_rate(self, provider, chars_per_sec):
+        if provider is None or not chars_per_sec or chars_per_sec <= 0:
+            return
+        with self._lock:
+            self._window(self._llm_rate, provider).add(chars_per_sec)
+
+    def llm_rate(self, provider):
+        """该LLM最近的输出速度中位数(字/秒)，没有数据时返回None"""
+        with self._lock:
+            window = self._llm_rate.get(provider)
+            return window.median() if window else None
+
+    def mark_chat_start(self, conn: "ConnectionHandler"):
+        conn.first_audio_start = time.monotonic()
+
+    def on_audio_sent(self, conn: "ConnectionHandler"):
+        """发送音频包时调用，本轮第一个包记录首句语音延迟"""
+        start = getattr(conn, "first_audio_start", None)
+        if start is None:
+            return
+        conn.first_audio_start = None
+        elapsed = time.monotonic() - start
+        with self._lock:
+            self._first_audio.add(elapsed)
+        conn.logger.bind(tag=TAG).info(f"首句语音延迟: {elapsed * 1000:.0f}ms")
+
+    def get_stats(self):
+        def _ms(value):
+            return round(value * 1000, 1) if value is not None else None
+
+        with self._lock:
+            return {
+                "first_audio_count": len(self._first_audio),
+                "first_audio_p50_ms": _ms(self._first_audio.percentile(50)),
+                "first_audio_p95_ms": _ms(self._first_audio.percentile(95)),
+                "tts_ttfb_ms": {
+                    key: _ms(window.median()) for key, window in self._tts_ttfb.items()
+                },
+                "llm_chars_per_sec": {
+                    key: round(window.median(), 1)
+                    for key, window in self._llm_rate.items()
+                },
+            }
+
+
+_latency_stats = None
+_latency_stats_lock = threading.Lock()
+
+
+def get_latency_stats():
+    """获取全局延迟统计实例（单例模式）"""
+    global _latency_stats
+    if _latency_stats is None:
+        with _latency_stats_lock:
+            if _latency_stats is None:
+                _latency_stats = LatencyStats()
+    return _latency_stats
@@ -0,0 +1,281 @@
+"""
+基于流式ASR中间结果的LLM预测请求
+流式ASR在用户说话过程中不断返回中间识别结果，中间结果保持不变超过stable_ms后，
+用它提前发起LLM请求并缓存返回的内容（不下发TTS）。最终识别结果到达后：
+1. 与预测文本一致（去掉标点后的相似度不低于match_threshold）：直接使用已缓存的内容继续流式输出，
+   节省的首字延迟即为LLM请求提前发起的时长
+2. 不一致：取消预测请求，按正常流程重新请求
+说话过程中稳定的中间结果发生较大变化时，取消旧的预测请求并用新的中间结果重新发起。
+"""
+
+import time
+import asyncio
+import difflib
+import threading
+from typing import TYPE_CHECKING
+
+from config.logger import setup_logging
+from core.utils.util import remove_punctuation_and_length
+
+if TYPE_CHECKING:
+    from core.connection import ConnectionHandler
+
+TAG = __name__
+logger = setup_logging()
+
+
+def _normalize(text):
+    return remove_punctuation_and_length(text or "")[1].lower()
+
+
+def _similarity(a, b):
+    if a == b:
+        return 1.0
+    return difflib.SequenceMatcher(None, a, b).ratio()
+
+
+class SpeculationStats:
+    """全局预测请求统计"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = 0
+        self.restarted = 0
+        self.hits = 0
+        self.misses = 0
+        self.total_saved_seconds = 0.0
+
+    def record(self, name, saved_seconds=0.0):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+            self.total_saved_seconds += saved_seconds
+
+    def get_stats(self):
+        with self._lock:
+            finished = self.hits + self.misses
+            return {
+                "started": self.started,
+                "restarted": self.restarted,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / finished, 4) if finished else 0.0,
+                "avg_saved_ms": round(self.total_saved_seconds * 1000 / self.hits, 1)
+                if self.hits
+                else 0.0,
+            }
+
+
+_speculation_stats = SpeculationStats()
+
+
+def get_speculation_stats():
+    """获取全局预测请求统计实例"""
+    return _speculation_stats
+
+
+class Speculation:
+    """一次预测请求：后台消费LLM流并缓存，提交后按顺序重放缓存内容再继续读取"""
+
+    def __init__(self, text, normalized, dialogue_length, stream):
+        self.text = text
+        self.normalized = normalized
+        self.dialogue_length = dialogue_length
+        self.start_time = time.monotonic()
+        self.first_token_time = None
+        self.items = []
+        self.done = False
+        self.error = None
+        self._updated = asyncio.Event()
+        self._stream = stream
+        self.task = asyncio.create_task(self._consume())
+
+    async def _consume(self):
+        try:
+            async for item in self._stream:
+                if self.first_token_time is None:
+                    self.first_token_time = time.monotonic()
+                self.items.append(item)
+                self._updated.set()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done = True
+            self._updated.set()
+            await self._stream.aclose()
+
+    def cancel(self):
+        self.task.cancel()
+
+    async def replay(self):
+        """先产出已缓存的内容，再等待后续内容，与直接迭代LLM流的结果一致"""
+        index = 0
+        try:
+            while True:
+                while index < len(self.items):
+                    yield self.items[index]
+                    index += 1
+                if self.done:
+                    if self.error is not None:
+                        raise self.error
+                    return
+                self._updated.clear()
+                if index < len(self.items) or self.done:
+                    continue
+                await self._updated.wait()
+        finally:
+            # 提前退出（如被打断）时停止读取
+            if not self.done:
+                self.cancel()
+
+
+class LLMSpeculator:
+    """单个连接的LLM预测请求管理"""
+
+    def __init__(self, conn: "ConnectionHandler", config: dict):
+        self.conn = conn
+        self.stable_seconds = float(config.get("stable_ms", 300)) / 1000
+        self.min_chars = int(config.get("min_chars", 4))
+        self.match_threshold = float(config.get("match_threshold", 0.9))
+        self.speculation = None
+        self._partial = ""
+        self._timer = None
+
+    @classmethod
+    def for_conn(cls, conn: "ConnectionHandler"):
+        """获取连接的预测器，未开启时返回None"""
+        config = conn.config.get("llm_speculation", {})
+        if str(config.get("enabled", False)).lower() not in ("true", "1", "yes"):
+            return None
+        if conn.llm_speculator is None:
+            conn.llm_speculator = cls(conn, config)
+        return conn.llm_speculator
+
+    def on_partial(self, text):
+        """流式ASR中间结果回调，文本保持不变stable_ms后发起预测请求"""
+        normalized = _normalize(text)
+        if normalized == self._partial:
+            return
+        self._partial = normalized
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if len(normalized) < self.min_chars:
+            return
+        self._timer = asyncio.get_running_loop().call_later(
+            self.stable_seconds, self._on_stable, text, normalized
+        )
+
+    def _on_stable(self, text, normalized):
+        self._timer = None
+        current = self.speculation
+        if current is not None:
+            if _similarity(current.normalized, normalized) >= self.match_threshold:
+                return
+            # 中间结果变化较大，用新的文本重新发起
+            current.cancel()
+            get_speculation_stats().record("restarted")
+        self.speculation = None
+        try:
+            self.speculation = self._start(text, normalized)
+            get_speculation_stats().record("started")
+        except Exception as e:
+            logger.bind(tag=TAG).warning(f"发起LLM预测请求失败: {e}")
+
+    def _start(self, text, normalized):
+        logger.bind(tag=TAG).debug(f"基于中间识别结果发起LLM预测请求: {text}")
+        return Speculation(
+            text, normalized, len(self.conn.dialogue.dialogue), self._stream(text)
+        )
+
+    async def _stream(self, text):
+        """与正常对话相同的请求（记忆、工具列表），只是用户消息为中间识别结果"""
+        conn = self.conn
+        memory_str = None
+        if conn.memory is not None:
+            memory_str = await conn.memory.query_memory(text)
+        dialogue = conn.dialogue.get_llm_dialogue_with_memory(
+            memory_str, conn.config.get("voiceprint", {}), None
+        )
+        dialogue.append({"role": "user", "content": text})
+        functions = conn.get_chat_functions(depth=0)
+        if functions is not None:
+            stream = conn.llm.response_with_functions_async(
+                conn.session_id, dialogue, functions=functions
+            )
+        else:
+            stream = conn.llm.response_async(conn.session_id, dialogue)
+        try:
+            async for item in stream:
+                yield item
+        finally:
+            await stream.aclose()
+
+    def commit(self, query, speaker=None):
+        """
+        最终识别结果到达，返回可直接迭代的LLM流；预测不可用时返回None
+
+        调用时用户消息已写入对话历史；本轮注入了说话人身份时提示词不同，不使用预测结果
+        """
+        self._reset_partial()
+        speculation, self.speculation = self.speculation, None
+        if speculation is None:
+            return None
+        matched = (
+            not speaker
+            and speculation.error is None
+            and len(self.conn.dialogue.dialogue) == speculation.dialogue_length + 1
+            and _similarity(speculation.normalized, _normalize(query))
+            >= self.match_threshold
+        )
+        if not matched:
+            speculation.cancel()
+            get_speculation_stats().record("misses")
+            logger.bind(tag=TAG).debug(
+                f"LLM预测请求未命中: 预测[{speculation.text}] 最终[{query}]"
+            )
+            return None
+
+        # 不预测时首字在 now + 首字耗时 到达，预测后在 max(now, 预测首字时间) 到达，
+        # 两者之差即为 min(now, 预测首字时间) - 预测发起时间
+        now = time.monotonic()
+        first_token_time = speculation.first_token_time or now
+        saved = min(now, first_token_time) - speculation.start_time
+        get_speculation_stats().record("hits", saved)
+        logger.bind(tag=TAG).info(
+            f"LLM预测请求命中，提前{saved * 1000:.0f}ms发起: {speculation.text}"
+        )
+        return speculation.replay()
+
+    def discard(self):
+        """本轮不再请求LLM（如意图已处理），取消预测请求"""
+        self._reset_partial()
+        speculation, self.speculation = self.speculation, None
+        if speculation is not None:
+            speculation.cancel()
+            get_speculation_stats().record("misses")
+
+    def _reset_partial(self):
+        self._partial = ""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+
+def notify_partial_transcript(conn: "ConnectionHandler", text):
+    """流式ASR收到中间识别结果时调用"""
+    if not text or conn.llm is None:
+        return
+    try:
+        speculator = LLMSpeculator.for_conn(conn)
+        if speculator is not None:
+            speculator.on_partial(text)
+    except Exception as e:
+        logger.bind(tag=TAG).warning(f"处理中间识别结果失败: {e}")
+
+
+def discard_speculation(conn: "ConnectionHandler"):
+    """本轮对话不请求LLM时调用，取消进行中的预测请求"""
+    if conn.llm_speculator is not None:
+        conn.llm_speculator.discard()
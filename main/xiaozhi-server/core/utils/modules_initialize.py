@@ -1,6 +1,7 @@
 from typing import Dict, Any
 from config.logger import setup_logging
 from core.utils import tts, llm, intent, memory, vad, asr
+from core.providers.asr.dto.dto import InterfaceType
 
 TAG = __name__
 logger = setup_logging()
@@ -15,12 +16,14 @@ def initialize_modules(
     init_tts=False,
     init_memory=False,
     init_intent=False,
+    pool=None,
 ) -> Dict[str, Any]:
     """
     初始化所有模块组件
 
     Args:
         config: 配置字典
+        pool: 提供者实例池，传入时 LLM/VAD/Intent/本地ASR 从池中获取共享实例
 
     Returns:
         Dict[str, Any]: 包含所有初始化后的模块的字典
@@ -41,10 +44,13 @@ def initialize_modules(
             if "type" not in config["LLM"][select_llm_module]
             else config["LLM"][select_llm_module]["type"]
         )
-        modules["llm"] = llm.create_instance(
-            llm_type,
-            config["LLM"][select_llm_module],
-        )
+        llm_config = config["LLM"][select_llm_module]
+        if pool is not None:
+            modules["llm"] = pool.acquire(
+                "llm", llm_config, lambda: llm.create_instance(llm_type, llm_config)
+            )
+        else:
+            modules["llm"] = llm.create_instance(llm_type, llm_config)
         logger.bind(tag=TAG).info(f"初始化组件: llm成功 {select_llm_module}")
 
     # 初始化Intent模块
@@ -55,10 +61,16 @@ def initialize_modules(
             if "type" not in config["Intent"][select_intent_module]
             else config["Intent"][select_intent_module]["type"]
         )
-        modules["intent"] = intent.create_instance(
-            intent_type,
-            config["Intent"][select_intent_module],
-        )
+        intent_config = config["Intent"][select_intent_module]
+        if pool is not None:
+            # 意图实例会绑定LLM，池键需要包含其使用的LLM配置
+            modules["intent"] = pool.acquire(
+                "intent",
+                {"intent": intent_config, "llm": _intent_llm_config(config)},
+                lambda: intent.create_instance(intent_type, intent_config),
+            )
+        else:
+            modules["intent"] = intent.create_instance(intent_type, intent_config)
         logger.bind(tag=TAG).info(f"初始化组件: intent成功 {select_intent_module}")
 
     # 初始化Memory模块
@@ -84,20 +96,46 @@ def initialize_modules(
             if "type" not in config["VAD"][select_vad_module]
             else config["VAD"][select_vad_module]["type"]
         )
-        modules["vad"] = vad.create_instance(
-            vad_type,
-            config["VAD"][select_vad_module],
-        )
+        vad_config = config["VAD"][select_vad_module]
+        if pool is not None:
+            modules["vad"] = pool.acquire(
+                "vad", vad_config, lambda: vad.create_instance(vad_type, vad_config)
+            )
+        else:
+            modules["vad"] = vad.create_instance(vad_type, vad_config)
         logger.bind(tag=TAG).info(f"初始化组件: vad成功 {select_vad_module}")
 
     # 初始化ASR模块
     if init_asr:
         select_asr_module = config["selected_module"]["ASR"]
-        modules["asr"] = initialize_asr(config)
+        if pool is not None:
+            # 远程ASR带有连接级的websocket和接收线程，创建后判断是否可共享
+            modules["asr"] = pool.acquire(
+                "asr",
+                {
+                    "asr": config["ASR"][select_asr_module],
+                    "delete_audio": str(config.get("delete_audio", True)),
+                },
+                lambda: initialize_asr(config),
+                shareable=lambda instance: getattr(instance, "interface_type", None)
+                in (InterfaceType.LOCAL, InterfaceType.LOCAL_STREAM),
+            )
+        else:
+            modules["asr"] = initialize_asr(config)
         logger.bind(tag=TAG).info(f"初始化组件: asr成功 {select_asr_module}")
     return modules
 
 
+def _intent_llm_config(config):
+    """意图识别实际使用的LLM配置：配置了专用LLM时为专用LLM，否则为主LLM"""
+    select_intent_module = config["selected_module"]["Intent"]
+    intent_llm_name = config["Intent"][select_intent_module].get("llm")
+    llm_configs = config.get("LLM", {})
+    if intent_llm_name and intent_llm_name in llm_configs:
+        return llm_configs[intent_llm_name]
+    return llm_configs.get(config["selected_module"].get("LLM"))
+
+
 def initialize_tts(config):
     select_tts_module = config["selected_module"]["TTS"]
     tts_config = config["TTS"][select_tts_module].copy()
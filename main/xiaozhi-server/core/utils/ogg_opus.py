@@ -0,0 +1,200 @@
+"""
+Ogg/Opus 封装
+设备上行和TTS下行的音频本来就是Opus数据包，上报聊天记录和声纹识别时直接把数据包封装成Ogg/Opus（RFC 7845），
+不再解码成PCM再拼WAV，音频体积约为WAV的1/10，也省去了解码的CPU开销。
+"""
+
+import struct
+
+OGG_MAGIC = b"OggS"
+# Ogg/Opus的granule position固定以48kHz采样计
+GRANULE_RATE = 48000
+# 每页最多255个分段
+MAX_SEGMENTS = 255
+VENDOR = b"xiaozhi-esp32-server"
+# libopus编码器的默认延迟（48kHz采样数），解码器据此丢弃开头的预热样本（RFC 7845 pre-skip）
+DEFAULT_PRE_SKIP = 312
+
+
+def _build_crc_table():
+    table = []
+    for i in range(256):
+        crc = i << 24
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x04C11DB7) if crc & 0x80000000 else (crc << 1)
+        table.append(crc & 0xFFFFFFFF)
+    return table
+
+
+_CRC_TABLE = _build_crc_table()
+
+
+def ogg_crc(data):
+    """Ogg页校验和：多项式0x04C11DB7，初始值0，不反转"""
+    crc = 0
+    table = _CRC_TABLE
+    for byte in data:
+        crc = ((crc << 8) & 0xFFFFFFFF) ^ table[((crc >> 24) ^ byte) & 0xFF]
+    return crc
+
+
+def is_ogg(data):
+    return bool(data) and data[:4] == OGG_MAGIC
+
+
+def opus_packet_samples(packet):
+    """根据TOC字节计算Opus数据包的时长（48kHz采样数），无法解析时返回0"""
+    if not packet:
+        return 0
+    toc = packet[0]
+    config = toc >> 3
+    if config < 12:
+        # SILK: 10/20/40/60ms
+        frame = (480, 960, 1920, 2880)[config & 3]
+    elif config < 16:
+        # Hybrid: 10/20ms
+        frame = (480, 960)[config & 1]
+    else:
+        # CELT: 2.5/5/10/20ms
+        frame = (120, 240, 480, 960)[config & 3]
+    code = toc & 3
+    if code == 0:
+        count = 1
+    elif code in (1, 2):
+        count = 2
+    else:
+        if len(packet) < 2:
+            return 0
+        count = packet[1] & 0x3F
+    return frame * count
+
+
+class OggOpusWriter:
+    """把Opus数据包逐个写入Ogg容器"""
+
+    def __init__(
+        self, sample_rate=16000, channels=1, pre_skip=DEFAULT_PRE_SKIP, serial=0x58695A68
+    ):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.pre_skip = pre_skip
+        self.serial = serial
+        self._chunks = []
+        self._sequence = 0
+        self._granule = pre_skip
+        self._segments = []
+        self._payload = []
+        self._write_headers()
+
+    def _write_page(self, segments, payload, granule, header_type=0):
+        header = struct.pack(
+            "<4sBBqIIIB",
+            OGG_MAGIC,
+            0,
+            header_type,
+            granule,
+            self.serial,
+            self._sequence,
+            0,
+            len(segments),
+        ) + bytes(segments)
+        page = bytearray(header)
+        for chunk in payload:
+            page += chunk
+        struct.pack_into("<I", page, 22, ogg_crc(page))
+        self._chunks.append(bytes(page))
+        self._sequence += 1
+
+    @staticmethod
+    def _lacing(size):
+        return [255] * (size // 255) + [size % 255]
+
+    def _write_headers(self):
+        opus_head = struct.pack(
+            "<8sBBHIhB",
+            b"OpusHead",
+            1,
+            self.channels,
+            self.pre_skip,
+            self.sample_rate,
+            0,
+            0,
+        )
+        self._write_page(self._lacing(len(opus_head)), [opus_head], 0, header_type=0x02)
+        opus_tags = (
+            b"OpusTags" + struct.pack("<I", len(VENDOR)) + VENDOR + struct.pack("<I", 0)
+        )
+        self._write_page(self._lacing(len(opus_tags)), [opus_tags], 0)
+
+    def _flush(self, last=False):
+        if not self._segments and not last:
+            return
+        self._write_page(
+            self._segments, self._payload, self._granule, header_type=0x04 if last else 0
+        )
+        self._segments = []
+        self._payload = []
+
+    def write(self, packet):
+        if not packet:
+            return
+        lacing = self._lacing(len(packet))
+        if len(self._segments) + len(lacing) > MAX_SEGMENTS:
+            self._flush()
+        self._segments.extend(lacing)
+        self._payload.append(bytes(packet))
+        self._granule += opus_packet_samples(packet)
+
+    def finish(self):
+        """写入结束页并返回完整的Ogg/Opus数据"""
+        self._flush(last=True)
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def encoder_pre_skip(encoder, sample_rate):
+    """按编码器的lookahead计算pre-skip（换算为48kHz采样数），无法获取时使用libopus默认值"""
+    try:
+        lookahead = int(encoder.lookahead)
+    except Exception:
+        return DEFAULT_PRE_SKIP
+    return lookahead * GRANULE_RATE // sample_rate
+
+
+def pack_ogg_opus(packets, sample_rate=16000, channels=1):
+    """
+    把Opus数据包列表封装为Ogg/Opus，没有有效数据包时返回None
+
+    设备和TTS下发的数据包都由libopus编码，pre-skip使用libopus的默认编码延迟
+    """
+    writer = None
+    for packet in packets or ():
+        if not packet:
+            continue
+        if writer is None:
+            writer = OggOpusWriter(sample_rate, channels)
+        writer.write(packet)
+    return writer.finish() if writer is not None else None
+
+
+def encode_pcm_to_ogg_opus(pcm_data, sample_rate=16000, frame_duration_ms=60):
+    """没有原始数据包时（如经过服务端AEC处理的音频），把16位单声道PCM编码为Ogg/Opus"""
+    import opuslib_next
+
+    if isinstance(pcm_data, list):
+        pcm_data = b"".join(pcm_data)
+    if not pcm_data:
+        return None
+    frame_size = int(sample_rate * frame_duration_ms / 1000)
+    frame_bytes = frame_size * 2
+    encoder = opuslib_next.Encoder(sample_rate, 1, opuslib_next.APPLICATION_AUDIO)
+    writer = OggOpusWriter(sample_rate, 1, pre_skip=encoder_pre_skip(encoder, sample_rate))
+    view = memoryview(pcm_data)
+    for offset in range(0, len(view), frame_bytes):
+        chunk = bytes(view[offset : offset + frame_bytes])
+        # 最后一帧不足时补零
+        if len(chunk) < frame_bytes:
+            chunk += b"\x00" * (frame_bytes - len(chunk))
+        writer.write(encoder.encode(chunk, frame_size))
+    return writer.finish()
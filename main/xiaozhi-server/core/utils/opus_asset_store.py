@@ -0,0 +1,346 @@
+"""
+预编码Opus音频资源库
+本地音乐、提示音等固定音频文件在后台一次性转码为60ms的Opus帧包并持久化到磁盘，
+播放时通过mmap直接按帧切片下发，不再每次启动ffmpeg解码、也不在内存中保留完整PCM。
+帧包按 (源文件路径, 采样率) 存放，并记录源文件的mtime和大小，源文件变化后自动失效重建。
+
+帧包文件格式（小端）：
+    头部: 魔数(4字节) 版本(2字节) 采样率(4字节) 帧数(4字节) 源文件mtime_ns(8字节) 源文件大小(8字节)
+    偏移表: (帧数 + 1) 个uint32，表示每一帧在数据区中的起始偏移
+    数据区: 连续存放的Opus帧
+"""
+
+import os
+import mmap
+import struct
+import hashlib
+import argparse
+import threading
+import subprocess
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import opuslib_next
+
+from config.logger import setup_logging
+
+TAG = __name__
+logger = setup_logging()
+
+PACK_MAGIC = b"XZOP"
+PACK_VERSION = 1
+PACK_HEADER = struct.Struct("<4sHIIqq")
+PACK_SUFFIX = ".opuspack"
+# 帧时长（毫秒）
+FRAME_DURATION_MS = 60
+# 不需要转码的源文件格式（p3本身就是Opus帧）
+SKIP_EXTENSIONS = (".p3",)
+
+
+class OpusFramePack:
+    """已映射到内存的Opus帧包，迭代时返回指向mmap的memoryview切片，不复制数据"""
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._mmap)
+        (
+            magic,
+            version,
+            self.sample_rate,
+            self.frame_count,
+            self.source_mtime_ns,
+            self.source_size,
+        ) = PACK_HEADER.unpack_from(view, 0)
+        if magic != PACK_MAGIC or version != PACK_VERSION:
+            raise ValueError(f"无效的Opus帧包: {path}")
+        offsets_start = PACK_HEADER.size
+        offsets_end = offsets_start + (self.frame_count + 1) * 4
+        self._offsets = view[offsets_start:offsets_end].cast("I")
+        self._data = view[offsets_end:]
+        if self._offsets[-1] != len(self._data):
+            raise ValueError(f"Opus帧包数据不完整: {path}")
+
+    def matches(self, stat_result):
+        return (
+            self.source_mtime_ns == stat_result.st_mtime_ns
+            and self.source_size == stat_result.st_size
+        )
+
+    def __len__(self):
+        return self.frame_count
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self.frame_count
+        if not 0 <= index < self.frame_count:
+            raise IndexError("frame index out of range")
+        return self._data[self._offsets[index] : self._offsets[index + 1]]
+
+    def __iter__(self):
+        offsets = self._offsets
+        data = self._data
+        for i in range(self.frame_count):
+            yield data[offsets[i] : offsets[i + 1]]
+
+    @property
+    def duration(self):
+        return self.frame_count * FRAME_DURATION_MS / 1000.0
+
+
+class OpusAssetStore:
+    """预编码Opus音频资源库"""
+
+    def __init__(self, config=None):
+        config = config or {}
+        self.enabled = bool(config.get("enabled", True))
+        self.store_dir = config.get("store_dir", "data/opus_assets")
+        self.max_open_packs = int(config.get("max_open_packs", 64))
+        self._packs = OrderedDict()
+        self._lock = threading.Lock()
+        self._pending = set()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(int(config.get("build_workers", 1)), 1),
+            thread_name_prefix="opus-asset-builder",
+        )
+
+        # 统计信息
+        self.hits = 0
+        self.misses = 0
+        self.builds = 0
+        self.build_failures = 0
+
+        if self.enabled:
+            os.makedirs(self.store_dir, exist_ok=True)
+
+    def _pack_path(self, source_path, sample_rate):
+        digest = hashlib.sha1(os.path.abspath(source_path).encode("utf-8")).hexdigest()
+        return os.path.join(self.store_dir, f"{digest}_{sample_rate}{PACK_SUFFIX}")
+
+    @staticmethod
+    def is_supported(source_path):
+        return not source_path.lower().endswith(SKIP_EXTENSIONS)
+
+    def get_frames(self, source_path, sample_rate, build_on_miss=True):
+        """
+        获取预编码的Opus帧包
+
+        Args:
+            source_path: 源音频文件路径
+            sample_rate: 目标采样率
+            build_on_miss: 未命中时是否提交后台转码任务
+
+        Returns:
+            OpusFramePack，未命中或源文件已变化时返回None
+        """
+        if not self.enabled or not self.is_supported(source_path):
+            return None
+        try:
+            stat_result = os.stat(source_path)
+        except OSError:
+            return None
+
+        pack_path = self._pack_path(source_path, sample_rate)
+        with self._lock:
+            pack = self._packs.get(pack_path)
+            if pack is not None:
+                if pack.matches(stat_result):
+                    self._packs.move_to_end(pack_path)
+                    self.hits += 1
+                    return pack
+                # 源文件已变化，丢弃旧映射（仍在使用的切片会保持映射直到释放）
+                del self._packs[pack_path]
+
+        pack = self._open_pack(pack_path, stat_result)
+        with self._lock:
+            if pack is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._packs[pack_path] = pack
+                while len(self._packs) > self.max_open_packs:
+                    self._packs.popitem(last=False)
+        if pack is None and build_on_miss:
+            self.schedule_build(source_path, sample_rate)
+        return pack
+
+    def _open_pack(self, pack_path, stat_result):
+        if not os.path.exists(pack_path):
+            return None
+        try:
+            pack = OpusFramePack(pack_path)
+        except (OSError, ValueError) as e:
+            logger.bind(tag=TAG).warning(f"读取Opus帧包失败: {e}")
+            return None
+        if not pack.matches(stat_result):
+            return None
+        return pack
+
+    def schedule_build(self, source_path, sample_rate):
+        """提交后台转码任务，同一文件同一采样率只会排队一次"""
+        if not self.enabled or not self.is_supported(source_path):
+            return
+        key = (os.path.abspath(source_path), sample_rate)
+        with self._lock:
+            if key in self._pending:
+                return
+            self._pending.add(key)
+        self._executor.submit(self._build_task, key)
+
+    def _build_task(self, key):
+        source_path, sample_rate = key
+        try:
+            self.build(source_path, sample_rate)
+        except Exception as e:
+            self.build_failures += 1
+            logger.bind(tag=TAG).warning(f"Opus帧包转码失败: {source_path}, {e}")
+        finally:
+            with self._lock:
+                self._pending.discard(key)
+
+    def build(self, source_path, sample_rate):
+        """
+        同步转码源文件为Opus帧包，已是最新时直接返回
+
+        ffmpeg以流的方式输出PCM，逐帧编码并写入临时文件，完成后原子替换
+        """
+        stat_result = os.stat(source_path)
+        pack_path = self._pack_path(source_path, sample_rate)
+        if self._open_pack(pack_path, stat_result) is not None:
+            return pack_path
+
+        frame_size = int(sample_rate * FRAME_DURATION_MS / 1000)
+        frame_bytes = frame_size * 2
+        encoder = opuslib_next.Encoder(sample_rate, 1, opuslib_next.APPLICATION_AUDIO)
+
+        # -nostdin 参数：不要从标准输入读取数据，否则FFmpeg会阻塞
+        process = subprocess.Popen(
+            [
+                "ffmpeg", "-nostdin", "-v", "error", "-i", source_path,
+                "-f", "s16le", "-acodec", "pcm_s16le", "-ac", "1", "-ar", str(sample_rate),
+                "-",
+            ],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+        frames = []
+        offsets = [0]
+        try:
+            while True:
+                chunk = process.stdout.read(frame_bytes)
+                if not chunk:
+                    break
+                # 最后一帧不足时补零
+                if len(chunk) < frame_bytes:
+                    chunk += b"\x00" * (frame_bytes - len(chunk))
+                frame = encoder.encode(np.frombuffer(chunk, dtype=np.int16).tobytes(), frame_size)
+                frames.append(frame)
+                offsets.append(offsets[-1] + len(frame))
+        finally:
+            process.stdout.close()
+            stderr = process.stderr.read()
+            process.stderr.close()
+            return_code = process.wait()
+        if return_code != 0 or not frames:
+            raise RuntimeError(
+                f"ffmpeg解码失败({return_code}): {stderr.decode('utf-8', 'ignore').strip()}"
+            )
+
+        tmp_path = f"{pack_path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(
+                    PACK_HEADER.pack(
+                        PACK_MAGIC,
+                        PACK_VERSION,
+                        sample_rate,
+                        len(frames),
+                        stat_result.st_mtime_ns,
+                        stat_result.st_size,
+                    )
+                )
+                f.write(struct.pack(f"<{len(offsets)}I", *offsets))
+                for frame in frames:
+                    f.write(frame)
+            os.replace(tmp_path, pack_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        self.builds += 1
+        logger.bind(tag=TAG).debug(
+            f"Opus帧包转码完成: {source_path} @ {sample_rate}Hz, {len(frames)}帧"
+        )
+        return pack_path
+
+    def prebuild_dir(self, directory, sample_rates, extensions=(".mp3", ".wav")):
+        """提交目录下所有音频文件的后台转码任务，返回提交的文件数"""
+        count = 0
+        if not os.path.isdir(directory):
+            return count
+        for root, _, files in os.walk(directory):
+            for name in files:
+                if not name.lower().endswith(tuple(extensions)):
+                    continue
+                for sample_rate in sample_rates:
+                    self.schedule_build(os.path.join(root, name), sample_rate)
+                count += 1
+        return count
+
+    def get_stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "open_packs": len(self._packs),
+                "pending_builds": len(self._pending),
+                "hits": self.hits,
+                "misses": self.misses,
+                "builds": self.builds,
+                "build_failures": self.build_failures,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+# 全局单例
+_opus_asset_store = None
+
+
+def get_opus_asset_store(config=None):
+    """
+    获取全局预编码Opus音频资源库实例（单例模式）
+
+    Args:
+        config: opus_asset_store配置，仅首次创建时生效
+
+    Returns:
+        OpusAssetStore实例
+    """
+    global _opus_asset_store
+    if _opus_asset_store is None:
+        _opus_asset_store = OpusAssetStore(config)
+    return _opus_asset_store
+
+
+if __name__ == "__main__":
+    # 离线转码：python -m core.utils.opus_asset_store ./music config/assets -r 16000 24000
+    parser = argparse.ArgumentParser(description="将音频文件预编码为Opus帧包")
+    parser.add_argument("dirs", nargs="+", help="需要转码的音频目录")
+    parser.add_argument("-r", "--sample-rates", nargs="+", type=int, default=[16000, 24000])
+    parser.add_argument("-o", "--store-dir", default="data/opus_assets")
+    args = parser.parse_args()
+
+    store = OpusAssetStore({"store_dir": args.store_dir})
+    for directory in args.dirs:
+        for root, _, files in os.walk(directory):
+            for name in files:
+                if not name.lower().endswith((".mp3", ".wav")):
+                    continue
+                for sample_rate in args.sample_rates:
+                    path = os.path.join(root, name)
+                    try:
+                        store.build(path, sample_rate)
+                        print(f"OK   {path} @ {sample_rate}")
+                    except Exception as e:
+                        print(f"FAIL {path} @ {sample_rate}: {e}")
+    print(store.get_stats())
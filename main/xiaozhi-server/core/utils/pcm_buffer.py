@@ -0,0 +1,203 @@
+"""
+连接级PCM音频缓冲区
+VAD、ASR、声纹识别和ASR上报共用同一块预分配内存：每个PCM采样只写入一次，
+VAD通过读游标按块读取视图，ASR按帧边界取出整句音频，不再反复切片和拼接字节串。
+写满时先把仍需保留的数据搬到缓冲区开头，仍不够再按2倍扩容。
+同时按帧保留设备上传的原始Opus数据包，上报和声纹识别可直接封装为Ogg/Opus，不必再编码。
+"""
+
+import struct
+from collections import deque
+
+# 16kHz 16bit 单声道，每秒字节数
+BYTES_PER_SECOND = 16000 * 2
+# 默认预分配3秒音频
+DEFAULT_CAPACITY = BYTES_PER_SECOND * 3
+
+
+def wav_header(data_size, sample_rate=16000, channels=1, sample_width=2):
+    """生成PCM数据对应的44字节WAV文件头"""
+    byte_rate = sample_rate * channels * sample_width
+    return struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF",
+        36 + data_size,
+        b"WAVE",
+        b"fmt ",
+        16,
+        1,
+        channels,
+        sample_rate,
+        byte_rate,
+        channels * sample_width,
+        sample_width * 8,
+        b"data",
+        data_size,
+    )
+
+
+class PCMReader:
+    """缓冲区上的独立读游标（VAD按512采样的块读取）"""
+
+    def __init__(self, buffer):
+        self._buffer = buffer
+        self.position = buffer._end
+
+    def available(self):
+        return self._buffer._end - self.position
+
+    def read(self, size):
+        """读取size字节，返回指向缓冲区的memoryview，下一次写入前有效"""
+        buffer = self._buffer
+        if self.position < buffer._base:
+            self.position = buffer._base
+        if buffer._end - self.position < size:
+            raise ValueError("可读数据不足")
+        offset = self.position - buffer._base
+        self.position += size
+        return buffer._view[offset : offset + size]
+
+    def chunks(self, size):
+        """依次读取所有完整的size字节块，返回memoryview，下一次写入前有效"""
+        buffer = self._buffer
+        if self.position < buffer._base:
+            self.position = buffer._base
+        view = buffer._view
+        base = buffer._base
+        while buffer._end - self.position >= size:
+            offset = self.position - base
+            self.position += size
+            yield view[offset : offset + size]
+
+    def skip_to_end(self):
+        self.position = self._buffer._end
+
+
+class PCMFrameBuffer:
+    """
+    按帧追加的PCM缓冲区，对外保持帧列表的用法（len/下标/切片/迭代），
+    兼容原来 conn.asr_audio 作为 List[bytes] 的调用方式。
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self._buf = bytearray(capacity)
+        self._view = memoryview(self._buf)
+        # _base为_buf[0]对应的绝对位置，_end为写入位置
+        self._base = 0
+        self._end = 0
+        # 每一帧的起始绝对位置
+        self._frames = deque()
+        # 每一帧对应的原始Opus数据包，没有时为None（如经过服务端AEC处理）
+        self._packets = deque()
+        self._readers = []
+
+        # 统计信息
+        self.compactions = 0
+        self.grows = 0
+
+    def reader(self):
+        reader = PCMReader(self)
+        self._readers.append(reader)
+        return reader
+
+    def append(self, frame, packet=None):
+        size = len(frame)
+        end = self._end
+        offset = end - self._base
+        if offset + size > len(self._buf):
+            if size == 0:
+                return
+            self._make_room(size)
+            offset = end - self._base
+        self._view[offset : offset + size] = frame
+        self._frames.append(end)
+        self._packets.append(packet)
+        self._end = end + size
+
+    def _live_start(self):
+        start = self._frames[0] if self._frames else self._end
+        for reader in self._readers:
+            if self._base <= reader.position < start:
+                start = reader.position
+        return start
+
+    def _make_room(self, size):
+        live_start = self._live_start()
+        live = self._end - live_start
+        src = live_start - self._base
+        if live + size <= len(self._buf):
+            # 仍需保留的数据搬到开头
+            if live and src:
+                self._view[0:live] = self._view[src : src + live]
+            self.compactions += 1
+        else:
+            capacity = len(self._buf) * 2
+            while capacity < live + size:
+                capacity *= 2
+            buf = bytearray(capacity)
+            buf[0:live] = self._view[src : src + live]
+            self._buf = buf
+            self._view = memoryview(buf)
+            self.grows += 1
+        self._base = live_start
+
+    def keep_last(self, count):
+        """只保留最后count帧"""
+        while len(self._frames) > count:
+            self._frames.popleft()
+            self._packets.popleft()
+
+    def clear(self):
+        self._frames.clear()
+        self._packets.clear()
+        self._base = self._end = 0
+        for reader in self._readers:
+            reader.position = 0
+
+    def _frame_range(self, index):
+        start = self._frames[index]
+        end = self._frames[index + 1] if index + 1 < len(self._frames) else self._end
+        return start - self._base, end - self._base
+
+    def __len__(self):
+        return len(self._frames)
+
+    def __bool__(self):
+        return bool(self._frames)
+
+    def __getitem__(self, index):
+        """下标返回单帧bytes，切片返回帧bytes列表（独立副本，可跨await持有）"""
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self._frames)))]
+        if index < 0:
+            index += len(self._frames)
+        if not 0 <= index < len(self._frames):
+            raise IndexError("frame index out of range")
+        start, end = self._frame_range(index)
+        return bytes(self._view[start:end])
+
+    def __iter__(self):
+        """逐帧返回memoryview，仅供立即消费（如b"".join），下一次写入后失效"""
+        for i in range(len(self._frames)):
+            start, end = self._frame_range(i)
+            yield self._view[start:end]
+
+    def tobytes(self):
+        """当前所有帧的连续PCM副本"""
+        if not self._frames:
+            return b""
+        return bytes(self._view[self._frames[0] - self._base : self._end - self._base])
+
+    def copy(self):
+        """整句音频快照，返回只含一段连续PCM的列表"""
+        return [self.tobytes()] if self._frames else []
+
+    def packets(self):
+        """当前所有帧对应的原始Opus数据包列表，有任一帧缺少数据包时返回None"""
+        if not self._packets or None in self._packets:
+            return None
+        return list(self._packets)
+
+    @property
+    def capacity(self):
+        return len(self._buf)
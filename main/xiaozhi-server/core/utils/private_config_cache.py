@@ -0,0 +1,204 @@
+"""
+设备差异化配置缓存
+
+每个新连接和每次视觉分析都要向智控台请求智能体模型配置和替换词，网络抖动后大量设备同时重连时会集中压到智控台。
+缓存按 设备ID + 客户端ID + selected_module 保存获取结果：
+
+- 未超过 ttl 的结果直接返回
+- 超过 ttl 但未超过 stale_ttl 的结果先返回，同时在后台刷新（stale-while-revalidate）
+- 同一设备的并发请求共用一次获取
+- 智控台请求失败（非设备未找到/未绑定）时，返回已有的旧结果
+- 收到 update_config / invalidate_config 服务端消息时失效；智控台保存智能体配置时不会自动发送这些消息，
+  因此一般情况下配置修改在 ttl 过期后生效
+"""
+
+import copy
+import json
+import time
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict
+
+from config.logger import setup_logging
+from config.manage_api_client import DeviceNotFoundException, DeviceBindException
+from core.utils.latency_stats import RollingWindow
+
+TAG = __name__
+logger = setup_logging()
+
+
+class _CacheEntry:
+    __slots__ = ("value", "fetched_at")
+
+    def __init__(self, value):
+        self.value = value
+        self.fetched_at = time.monotonic()
+
+
+class PrivateConfigCache:
+    def __init__(self, config: Dict[str, Any] = None):
+        config = config or {}
+        self.enabled = str(config.get("enabled", False)).lower() in ("true", "1", "yes")
+        self.ttl = max(float(config.get("ttl", 60)), 0.0)
+        self.stale_ttl = max(float(config.get("stale_ttl", 600)), self.ttl)
+        self.max_entries = max(int(config.get("max_entries", 10000)), 1)
+        self._entries: Dict[tuple, _CacheEntry] = {}
+        self._inflight: Dict[tuple, asyncio.Task] = {}
+        self._fetch_latency = RollingWindow(200)
+        # 失效时递增，失效前发起的获取结果不再写入缓存
+        self._generation = 0
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.refreshes = 0
+        self.fetch_failures = 0
+        self.stale_on_error = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def make_key(device_id, client_id, selected_module):
+        return (
+            device_id,
+            client_id,
+            json.dumps(selected_module or {}, sort_keys=True, ensure_ascii=False),
+        )
+
+    async def get(
+        self,
+        device_id,
+        client_id,
+        selected_module,
+        fetcher: Callable[[], Awaitable[Dict[str, Any]]],
+    ) -> Dict[str, Any]:
+        """获取差异化配置，返回的是副本，调用方可以直接修改"""
+        if not self.enabled:
+            return await fetcher()
+
+        key = self.make_key(device_id, client_id, selected_module)
+        entry = self._entries.get(key)
+        if entry is not None:
+            age = time.monotonic() - entry.fetched_at
+            if age < self.ttl:
+                self.hits += 1
+                return copy.deepcopy(entry.value)
+            if age < self.stale_ttl:
+                self.stale_hits += 1
+                if key not in self._inflight:
+                    self.refreshes += 1
+                    self._start_fetch(key, fetcher)
+                return copy.deepcopy(entry.value)
+
+        task = self._inflight.get(key)
+        if task is None:
+            self.misses += 1
+            task = self._start_fetch(key, fetcher)
+        else:
+            self.coalesced += 1
+        try:
+            # shield：单个连接取消时不影响其他等待同一结果的连接
+            value = await asyncio.shield(task)
+        except (DeviceNotFoundException, DeviceBindException):
+            raise
+        except Exception:
+            entry = self._entries.get(key)
+            if entry is None:
+                raise
+            self.stale_on_error += 1
+            logger.bind(tag=TAG).warning(f"获取差异化配置失败，使用缓存的旧配置: {device_id}")
+            return copy.deepcopy(entry.value)
+        return copy.deepcopy(value)
+
+    def _start_fetch(self, key, fetcher):
+        task = asyncio.ensure_future(self._fetch(key, fetcher))
+        self._inflight[key] = task
+        # 后台刷新无人等待时，避免未获取的异常告警
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        return task
+
+    async def _fetch(self, key, fetcher):
+        begin = time.monotonic()
+        generation = self._generation
+        task = asyncio.current_task()
+        try:
+            value = await fetcher()
+        except (DeviceNotFoundException, DeviceBindException):
+            # 设备状态变化（解绑、待绑定），旧配置不再有效
+            self._entries.pop(key, None)
+            raise
+        except Exception as e:
+            self.fetch_failures += 1
+            logger.bind(tag=TAG).warning(f"获取差异化配置失败: {e}")
+            raise
+        finally:
+            self._fetch_latency.add(time.monotonic() - begin)
+            if self._inflight.get(key) is task:
+                del self._inflight[key]
+        if generation == self._generation:
+            self._store(key, value)
+        return value
+
+    def _store(self, key, value):
+        self._entries.pop(key, None)
+        self._entries[key] = _CacheEntry(value)
+        # 按写入顺序淘汰最早的条目
+        while len(self._entries) > self.max_entries:
+            self._entries.pop(next(iter(self._entries)))
+
+    def invalidate(self, device_id=None):
+        """失效指定设备的缓存，不传设备ID时全部失效"""
+        self._generation += 1
+        if device_id is None:
+            count = len(self._entries)
+            self._entries.clear()
+            self._inflight.clear()
+        else:
+            keys = [key for key in self._entries if key[0] == device_id]
+            for key in keys:
+                del self._entries[key]
+            for key in [key for key in self._inflight if key[0] == device_id]:
+                del self._inflight[key]
+            count = len(keys)
+        self.invalidations += count
+        logger.bind(tag=TAG).info(
+            f"差异化配置缓存已失效 {count} 条: {device_id or '全部'}"
+        )
+        return count
+
+    def get_stats(self):
+        lookups = self.hits + self.stale_hits + self.misses + self.coalesced
+        p50 = self._fetch_latency.percentile(50)
+        p95 = self._fetch_latency.percentile(95)
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "inflight": len(self._inflight),
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_rate": (
+                round((self.hits + self.stale_hits) / lookups, 4) if lookups else 0.0
+            ),
+            "refreshes": self.refreshes,
+            "fetch_failures": self.fetch_failures,
+            "stale_on_error": self.stale_on_error,
+            "invalidations": self.invalidations,
+            "fetch_p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "fetch_p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+        }
+
+
+_private_config_cache = None
+_private_config_cache_lock = threading.Lock()
+
+
+def get_private_config_cache(config=None):
+    """获取全局差异化配置缓存（单例模式），首次调用时的配置生效"""
+    global _private_config_cache
+    if _private_config_cache is None:
+        with _private_config_cache_lock:
+            if _private_config_cache is None:
+                _private_config_cache = PrivateConfigCache(config)
+    return _private_config_cache
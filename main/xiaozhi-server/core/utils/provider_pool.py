@@ -0,0 +1,197 @@
+"""
+智能体级提供者实例池
+
+从接口读取差异化配置时，每个连接都会重新创建 LLM/VAD/ASR/Intent 实例，而同一智能体下的大量设备配置完全相同。
+实例池按模块有效配置的哈希共享实例：
+
+- 只池化无连接状态的实例：LLM、VAD（连接状态保存在conn上）、本地ASR、Intent（按其绑定的LLM配置区分）
+- TTS、远程ASR、Memory 带有连接级状态（会话、接收线程、role_id），仍按连接创建
+- 引用计数：连接关闭时释放，引用为0的实例空闲超过 idle_ttl 秒后淘汰，空闲实例超过 max_idle 个时淘汰最久未用的
+"""
+
+import json
+import time
+import hashlib
+import threading
+from typing import Any, Callable, Dict
+
+from config.logger import setup_logging
+
+TAG = __name__
+logger = setup_logging()
+
+
+def config_fingerprint(kind, module_config):
+    """模块有效配置的稳定哈希，键顺序不影响结果"""
+    raw = json.dumps(
+        {"kind": kind, "config": module_config},
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str,
+    )
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+class _PoolEntry:
+    __slots__ = ("instance", "kind", "refs", "created_at", "last_used")
+
+    def __init__(self, instance, kind):
+        self.instance = instance
+        self.kind = kind
+        self.refs = 0
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+
+
+class ProviderPool:
+    def __init__(self, config: Dict[str, Any] = None):
+        config = config or {}
+        self.enabled = str(config.get("enabled", False)).lower() in ("true", "1", "yes")
+        self.idle_ttl = max(float(config.get("idle_ttl", 600)), 0.0)
+        self.max_idle = max(int(config.get("max_idle", 100)), 0)
+        self._entries: Dict[str, _PoolEntry] = {}
+        # id(instance) -> key，用于按实例释放
+        self._keys: Dict[int, str] = {}
+        # 同一配置并发创建时，只创建一次
+        self._creating: Dict[str, threading.Event] = {}
+        # 创建后发现不能共享的配置，之后直接创建不再排队
+        self._unshareable_keys = set()
+        self._lock = threading.Lock()
+        self._last_evict = time.monotonic()
+
+        self.hits = 0
+        self.misses = 0
+        self.unshareable = 0
+        self.evicted = 0
+        self.create_seconds = 0.0
+
+    def acquire(
+        self,
+        kind,
+        module_config,
+        factory: Callable[[], Any],
+        shareable: Callable[[Any], bool] = None,
+    ):
+        """
+        获取共享实例，没有时调用factory创建
+
+        Args:
+            kind: 模块类型，如 llm、vad
+            module_config: 决定实例行为的有效配置
+            factory: 创建实例的函数
+            shareable: 创建后判断实例能否共享，不能共享时直接返回给调用方且不计入池
+        """
+        key = config_fingerprint(kind, module_config)
+        if key in self._unshareable_keys:
+            self.unshareable += 1
+            return factory()
+        while True:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    entry.refs += 1
+                    entry.last_used = time.monotonic()
+                    self.hits += 1
+                    return entry.instance
+                waiter = self._creating.get(key)
+                if waiter is None:
+                    self._creating[key] = threading.Event()
+                    self.misses += 1
+                    break
+            waiter.wait()
+
+        try:
+            begin = time.monotonic()
+            instance = factory()
+            elapsed = time.monotonic() - begin
+        except BaseException:
+            with self._lock:
+                self._creating.pop(key).set()
+            raise
+
+        with self._lock:
+            self.create_seconds += elapsed
+            if instance is not None and (shareable is None or shareable(instance)):
+                entry = _PoolEntry(instance, kind)
+                entry.refs = 1
+                self._entries[key] = entry
+                self._keys[id(instance)] = key
+            else:
+                self.unshareable += 1
+                self._unshareable_keys.add(key)
+            self._creating.pop(key).set()
+        logger.bind(tag=TAG).info(f"实例池创建{kind}实例，耗时 {elapsed:.3f} 秒")
+        self._evict_idle()
+        return instance
+
+    def release(self, instance):
+        """连接关闭时释放实例引用，非池中实例忽略"""
+        if instance is None:
+            return
+        with self._lock:
+            key = self._keys.get(id(instance))
+            entry = self._entries.get(key) if key else None
+            if entry is None or entry.instance is not instance:
+                return
+            entry.refs = max(entry.refs - 1, 0)
+            entry.last_used = time.monotonic()
+        self._evict_idle()
+
+    def _evict_idle(self, force=False):
+        now = time.monotonic()
+        # 最多每秒检查一次
+        if not force and now - self._last_evict < 1:
+            return
+        self._last_evict = now
+        with self._lock:
+            idle = [
+                (entry.last_used, key)
+                for key, entry in self._entries.items()
+                if entry.refs == 0
+            ]
+            expired = [key for last_used, key in idle if now - last_used >= self.idle_ttl]
+            if len(idle) - len(expired) > self.max_idle:
+                alive = sorted(item for item in idle if item[1] not in expired)
+                expired.extend(key for _, key in alive[: len(alive) - self.max_idle])
+            for key in expired:
+                entry = self._entries.pop(key)
+                self._keys.pop(id(entry.instance), None)
+                self.evicted += 1
+        if expired:
+            logger.bind(tag=TAG).debug(f"实例池淘汰空闲实例 {len(expired)} 个")
+
+    def get_stats(self):
+        with self._lock:
+            by_kind = {}
+            in_use = 0
+            for entry in self._entries.values():
+                by_kind[entry.kind] = by_kind.get(entry.kind, 0) + 1
+                if entry.refs:
+                    in_use += 1
+            requests = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "instances": len(self._entries),
+                "in_use": in_use,
+                "by_kind": by_kind,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / requests, 4) if requests else 0.0,
+                "unshareable": self.unshareable,
+                "evicted": self.evicted,
+                "create_seconds": round(self.create_seconds, 3),
+            }
+
+
+_provider_pool = None
+_provider_pool_lock = threading.Lock()
+
+
+def get_provider_pool(config=None):
+    """获取全局提供者实例池（单例模式），首次调用时的配置生效"""
+    global _provider_pool
+    if _provider_pool is None:
+        with _provider_pool_lock:
+            if _provider_pool is None:
+                _provider_pool = ProviderPool(config)
+    return _provider_pool
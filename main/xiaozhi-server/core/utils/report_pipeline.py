@@ -0,0 +1,445 @@
+"""
+进程级聊天记录上报管道
+原来每个连接一个上报线程，每条记录在线程池中 asyncio.run 新建事件循环上报，音频转WAV也在其中同步完成。
+现在所有连接共用一条管道，在主事件循环上运行：
+1. 有界队列接收上报记录，可在任意线程调用 enqueue，队列满时丢弃并计数
+2. 音频转WAV和Base64编码在线程池中并行完成（encode_workers 个线程）
+3. 多条记录合并成一次批量请求上报到 manager-api（/agent/chat-history/report/batch），
+   批量接口返回非网络类错误时（旧版本 manager-api 没有该接口，可能返回404/405，也可能被鉴权过滤器拦截返回 code 401），
+   该批记录改为逐条上报，一段时间后再尝试批量接口
+4. 音频可按WAV或Ogg/Opus上报，Ogg/Opus直接封装设备上传和TTS下发的原始Opus数据包，不再解码
+5. 上报失败按指数退避重试；超过重试次数或待上报积压过多（manager-api 变慢）时写入磁盘，恢复后再补报。
+   批量接口返回处理失败的记录下标，这些记录改为逐条上报；磁盘文件在其中的记录全部处理完后才删除，
+   补报过程中进程退出时该文件下次启动会重新补报（可能重复，不会丢失）
+"""
+
+import os
+import json
+import time
+import glob
+import uuid
+import base64
+import asyncio
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING
+
+from config.logger import setup_logging
+from core.utils.ogg_opus import pack_ogg_opus, encode_pcm_to_ogg_opus
+from config.manage_api_client import (
+    ManageApiClient,
+    report_batch as manage_report_batch,
+    report_payload as manage_report_payload,
+)
+
+if TYPE_CHECKING:
+    from core.connection import ConnectionHandler
+
+TAG = __name__
+logger = setup_logging()
+
+
+class _ReportItem:
+    __slots__ = (
+        "conn",
+        "chat_type",
+        "text",
+        "audio_data",
+        "report_time",
+        "opus_packets",
+        "enqueue_time",
+    )
+
+    def __init__(self, conn, chat_type, text, audio_data, report_time, opus_packets=None):
+        self.conn = conn
+        self.chat_type = chat_type
+        self.text = text
+        self.audio_data = audio_data
+        self.report_time = report_time
+        self.opus_packets = opus_packets
+        self.enqueue_time = time.monotonic()
+
+
+class ReportPipeline:
+    """聊天记录上报管道"""
+
+    def __init__(self, config=None):
+        config = config or {}
+        self.max_queue_size = max(int(config.get("max_queue_size", 2000)), 1)
+        self.batch_size = max(int(config.get("batch_size", 20)), 1)
+        self.batch_interval = max(float(config.get("batch_interval_ms", 500)), 0.0) / 1000
+        self.max_retries = max(int(config.get("max_retries", 5)), 0)
+        self.retry_base_delay = max(float(config.get("retry_base_delay", 1)), 0.01)
+        self.retry_max_delay = max(float(config.get("retry_max_delay", 30)), 0.01)
+        self.max_pending = max(int(config.get("max_pending", 500)), self.batch_size)
+        self.spill_dir = config.get("spill_dir", "tmp/report_spill")
+        self.encode_workers = max(int(config.get("encode_workers", 2)), 1)
+        self.audio_format = str(config.get("audio_format", "wav")).lower()
+
+        self._loop = None
+        self._queue = None
+        self._pending = deque()
+        self._pending_event = None
+        self._uploading = []
+        self._tasks = []
+        self._executor = None
+        self._batch_supported = True
+        self._batch_probe_at = 0.0
+        # 批量接口不可用后，间隔该时间(秒)再尝试
+        self.batch_probe_interval = max(float(config.get("batch_probe_interval", 600)), 0.0)
+        self._lock = threading.Lock()
+
+        # 统计信息
+        self.enqueued = 0
+        self.uploaded = 0
+        self.batches = 0
+        self.retries = 0
+        self.dropped = 0
+        self.failed = 0
+        self.spilled = 0
+        self.restored = 0
+        self.total_lag_seconds = 0.0
+        self.max_lag_seconds = 0.0
+
+    @property
+    def running(self):
+        return self._loop is not None
+
+    def start(self):
+        """在主事件循环中启动上报管道"""
+        if self.running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._pending_event = asyncio.Event()
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.encode_workers, thread_name_prefix="report-encode"
+        )
+        # 每个编码线程对应一个消费协程，多个连接的音频编码并行进行
+        self._tasks = [
+            self._loop.create_task(self._encode_loop())
+            for _ in range(self.encode_workers)
+        ]
+        self._tasks.append(self._loop.create_task(self._upload_loop()))
+        if self._spill_files():
+            self._pending_event.set()
+        logger.bind(tag=TAG).info(
+            f"聊天记录上报管道已启动: 批量{self.batch_size}条, 队列上限{self.max_queue_size}"
+        )
+
+    async def stop(self):
+        """停止上报管道，未上报的记录写入磁盘，下次启动后补报"""
+        if not self.running:
+            return
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        leftover = self._uploading + list(self._pending)
+        self._uploading = []
+        self._pending.clear()
+        while not self._queue.empty():
+            item = self._queue.get_nowait()
+            try:
+                leftover.append(self._encode(item))
+            except Exception:
+                self.dropped += 1
+        if leftover:
+            self._spill(leftover)
+        self._executor.shutdown(wait=False)
+        self._loop = None
+        self._tasks = []
+
+    def enqueue(
+        self,
+        conn: "ConnectionHandler",
+        chat_type,
+        text,
+        audio_data,
+        report_time,
+        opus_packets=None,
+    ):
+        """加入上报队列，可在任意线程调用"""
+        if not text or not self.running:
+            return
+        item = _ReportItem(conn, chat_type, text, audio_data, report_time, opus_packets)
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        if running_loop is self._loop:
+            self._put(item)
+        else:
+            try:
+                self._loop.call_soon_threadsafe(self._put, item)
+            except RuntimeError:
+                # 事件循环已关闭
+                self._count_drop()
+
+    def _put(self, item):
+        try:
+            self._queue.put_nowait(item)
+            self.enqueued += 1
+        except asyncio.QueueFull:
+            self._count_drop()
+
+    def _count_drop(self):
+        with self._lock:
+            self.dropped += 1
+            dropped = self.dropped
+        if dropped == 1 or dropped % 100 == 0:
+            logger.bind(tag=TAG).warning(f"上报队列已满，累计丢弃{dropped}条聊天记录")
+
+    def _encode_audio(self, item: _ReportItem):
+        from core.handle.reportHandle import opus_to_wav, pcm_to_wav
+
+        if self.audio_format != "ogg_opus":
+            if item.chat_type == 1:
+                return pcm_to_wav(item.conn, item.audio_data)
+            if item.chat_type == 2:
+                return opus_to_wav(item.conn, item.audio_data)
+            return None
+
+        if item.chat_type == 1:
+            if item.opus_packets:
+                return pack_ogg_opus(item.opus_packets)
+            # 没有完整的原始数据包（如经过服务端AEC处理）时编码PCM
+            pcm_data = (
+                b"".join(item.audio_data)
+                if isinstance(item.audio_data, list)
+                else item.audio_data
+            )
+            if pcm_data[:4] == b"RIFF":
+                pcm_data = pcm_data[44:]
+            return encode_pcm_to_ogg_opus(pcm_data)
+        if item.chat_type == 2:
+            # TTS下发的音频本来就是Opus数据包，直接封装
+            packets = (
+                item.audio_data if isinstance(item.audio_data, list) else [item.audio_data]
+            )
+            return pack_ogg_opus(packets, getattr(item.conn, "sample_rate", 16000))
+        return None
+
+    def _encode(self, item: _ReportItem):
+        """音频编码并生成上报内容（在线程池中执行）"""
+        audio = None
+        if item.audio_data:
+            try:
+                audio = self._encode_audio(item)
+            except Exception as e:
+                logger.bind(tag=TAG).error(f"上报音频编码失败，仅上报文本: {e}")
+        return {
+            "macAddress": item.conn.device_id,
+            "sessionId": item.conn.session_id,
+            "chatType": item.chat_type,
+            "content": item.text,
+            "reportTime": item.report_time,
+            "audioBase64": base64.b64encode(audio).decode("utf-8") if audio else None,
+            "_enqueue_time": item.enqueue_time,
+        }
+
+    async def _encode_loop(self):
+        while True:
+            item = await self._queue.get()
+            try:
+                payload = await self._loop.run_in_executor(
+                    self._executor, self._encode, item
+                )
+            except Exception as e:
+                logger.bind(tag=TAG).error(f"生成上报内容失败: {e}")
+                self.failed += 1
+                continue
+            finally:
+                item.conn = None
+            self._pending.append(payload)
+            # manager-api 变慢导致积压时写入磁盘，避免占用内存
+            if len(self._pending) > self.max_pending:
+                overflow = [
+                    self._pending.popleft()
+                    for _ in range(len(self._pending) - self.max_pending // 2)
+                ]
+                await self._loop.run_in_executor(self._executor, self._spill, overflow)
+            self._pending_event.set()
+
+    async def _upload_loop(self):
+        while True:
+            await self._pending_event.wait()
+            if not self._pending:
+                path, restored = await self._loop.run_in_executor(
+                    self._executor, self._restore
+                )
+                if path is None:
+                    self._pending_event.clear()
+                    continue
+                await self._upload_restored(path, restored)
+                continue
+            elif len(self._pending) < self.batch_size and self.batch_interval:
+                # 等待更多记录合并成一批
+                await asyncio.sleep(self.batch_interval)
+
+            batch = [
+                self._pending.popleft()
+                for _ in range(min(self.batch_size, len(self._pending)))
+            ]
+            self._uploading = batch
+            remaining = await self._upload_with_retry(batch)
+            self._uploading = []
+            if remaining:
+                await self._loop.run_in_executor(self._executor, self._spill, remaining)
+                # manager-api 暂不可用，等待一段时间再补报
+                await asyncio.sleep(self.retry_max_delay)
+
+    async def _upload_restored(self, path, payloads):
+        """补报一个磁盘文件中的记录，全部上报完成或重新写入磁盘后才删除该文件"""
+        remaining = []
+        for start in range(0, len(payloads), self.batch_size):
+            remaining += await self._upload_with_retry(payloads[start : start + self.batch_size])
+        if remaining:
+            await self._loop.run_in_executor(self._executor, self._spill, remaining)
+        try:
+            os.remove(path)
+        except OSError as e:
+            logger.bind(tag=TAG).error(f"删除已补报的聊天记录文件失败: {path}, {e}")
+        if remaining:
+            await asyncio.sleep(self.retry_max_delay)
+
+    async def _upload_with_retry(self, batch):
+        """上报一批记录，返回需要写入磁盘稍后补报的记录（全部完成时为空）"""
+        attempt = 0
+        failed = self.failed
+        records = [
+            {k: v for k, v in payload.items() if not k.startswith("_")}
+            for payload in batch
+        ]
+        while True:
+            try:
+                await self._upload(records)
+                break
+            except Exception as e:
+                if attempt >= self.max_retries:
+                    logger.bind(tag=TAG).warning(
+                        f"聊天记录上报重试{attempt}次仍失败，{len(records)}条写入磁盘稍后补报: {e}"
+                    )
+                    return records
+                delay = min(self.retry_base_delay * (2**attempt), self.retry_max_delay)
+                attempt += 1
+                self.retries += 1
+                await asyncio.sleep(delay)
+
+        now = time.monotonic()
+        for payload in batch:
+            enqueue_time = payload.get("_enqueue_time")
+            if enqueue_time is not None:
+                lag = now - enqueue_time
+                self.total_lag_seconds += lag
+                self.max_lag_seconds = max(self.max_lag_seconds, lag)
+        self.uploaded += len(batch) - (self.failed - failed)
+        self.batches += 1
+        return []
+
+    async def _upload(self, records):
+        """上报记录，已完成的记录从 records 中移除，网络类错误时抛出异常由调用方重试剩余记录"""
+        if not self._batch_supported and time.monotonic() >= self._batch_probe_at:
+            self._batch_supported = True
+        if self._batch_supported and len(records) > 1:
+            try:
+                failed_indices = await manage_report_batch(records)
+            except Exception as e:
+                if ManageApiClient._should_retry(e):
+                    raise
+                self._batch_supported = False
+                self._batch_probe_at = time.monotonic() + self.batch_probe_interval
+                logger.bind(tag=TAG).warning(f"批量上报接口不可用，改为逐条上报: {e}")
+            else:
+                if isinstance(failed_indices, int):
+                    # 旧版本批量接口返回成功条数，无法得知失败的记录，差额计为失败
+                    shortfall = max(len(records) - failed_indices, 0)
+                    if shortfall:
+                        self.failed += shortfall
+                        logger.bind(tag=TAG).error(f"批量上报有{shortfall}条处理失败，已丢弃")
+                    records.clear()
+                    return
+                failed = {int(i) for i in failed_indices or ()}
+                records[:] = [r for i, r in enumerate(records) if i in failed]
+                if not records:
+                    return
+                logger.bind(tag=TAG).warning(f"批量上报有{len(records)}条处理失败，改为逐条上报")
+        while records:
+            try:
+                await manage_report_payload(records[0])
+            except Exception as e:
+                if ManageApiClient._should_retry(e):
+                    raise
+                self.failed += 1
+                logger.bind(tag=TAG).error(f"聊天记录上报失败，丢弃1条: {e}")
+            records.pop(0)
+
+    def _spill_files(self):
+        return sorted(glob.glob(os.path.join(self.spill_dir, "report-*.jsonl")))
+
+    def _spill(self, payloads):
+        """把记录写入磁盘（在线程池中执行）"""
+        try:
+            os.makedirs(self.spill_dir, exist_ok=True)
+            path = os.path.join(
+                self.spill_dir,
+                f"report-{int(time.time() * 1000)}-{uuid.uuid4().hex[:8]}.jsonl",
+            )
+            with open(path, "w", encoding="utf-8") as f:
+                for payload in payloads:
+                    record = {k: v for k, v in payload.items() if not k.startswith("_")}
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self.spilled += len(payloads)
+        except Exception as e:
+            self.failed += len(payloads)
+            logger.bind(tag=TAG).error(f"聊天记录写入磁盘失败，丢弃{len(payloads)}条: {e}")
+
+    def _restore(self):
+        """读取最早的一个磁盘文件（在线程池中执行），返回 (文件路径, 记录)，文件在上报后由调用方删除"""
+        for path in self._spill_files():
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    payloads = [json.loads(line) for line in f if line.strip()]
+            except Exception as e:
+                logger.bind(tag=TAG).error(f"读取待补报聊天记录失败: {path}, {e}")
+                # 损坏的文件改名保留，避免反复读取
+                try:
+                    os.replace(path, path + ".bad")
+                except OSError:
+                    pass
+                continue
+            self.restored += len(payloads)
+            return path, payloads
+        return None, []
+
+    def get_stats(self):
+        uploaded = self.uploaded or 1
+        return {
+            "enqueued": self.enqueued,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "pending": len(self._pending),
+            "uploaded": self.uploaded,
+            "batches": self.batches,
+            "retries": self.retries,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "spilled": self.spilled,
+            "restored": self.restored,
+            "spill_files": len(self._spill_files()),
+            "avg_lag_ms": round(self.total_lag_seconds * 1000 / uploaded, 1),
+            "max_lag_ms": round(self.max_lag_seconds * 1000, 1),
+        }
+
+
+_report_pipeline = None
+_report_pipeline_lock = threading.Lock()
+
+
+def get_report_pipeline(config=None):
+    """获取全局聊天记录上报管道实例（单例模式），首次调用时的配置生效"""
+    global _report_pipeline
+    if _report_pipeline is None:
+        with _report_pipeline_lock:
+            if _report_pipeline is None:
+                _report_pipeline = ReportPipeline(config)
+    return _report_pipeline
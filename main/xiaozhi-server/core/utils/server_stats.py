@@ -0,0 +1,96 @@
+"""
+服务运行统计汇总
+
+汇总各全局组件（音频接收、TTS工作池、短语缓存、上报管道、实例池、配置缓存、视觉分析、声纹识别等）的 get_stats，
+通过HTTP接口 /xiaozhi/stats 查询，也可按 server_stats.log_interval 定期输出到日志。
+只读取已经加载的模块中已经创建的组件，不会因为查询统计而导入模块或创建组件。
+"""
+
+import sys
+import json
+import asyncio
+
+from config.logger import setup_logging
+
+TAG = __name__
+logger = setup_logging()
+
+# (统计名称, 模块, 全局单例变量名)
+_SINGLETON_SOURCES = (
+    ("audio_ingest", "core.utils.audio_ingest", "_audio_ingest_monitor"),
+    ("tts_worker_pool", "core.utils.tts_worker_pool", "_tts_worker_pool"),
+    ("tts_cache", "core.utils.tts_cache", "_tts_cache"),
+    ("opus_asset_store", "core.utils.opus_asset_store", "_opus_asset_store"),
+    ("report_pipeline", "core.utils.report_pipeline", "_report_pipeline"),
+    ("intent_fast_path", "core.utils.intent_matcher", "_intent_fast_path"),
+    ("intent_engine", "core.providers.intent.intent_llm.intent_engine", "_intent_engine"),
+    ("llm_speculation", "core.utils.llm_speculation", "_speculation_stats"),
+    ("latency", "core.utils.latency_stats", "_latency_stats"),
+    ("provider_pool", "core.utils.provider_pool", "_provider_pool"),
+    ("private_config_cache", "core.utils.private_config_cache", "_private_config_cache"),
+    ("vision_pipeline", "core.utils.vision_pipeline", "_vision_pipeline"),
+    ("server_mcp_pool", "core.providers.tools.server_mcp.mcp_pool", "_server_mcp_pool"),
+)
+
+# (统计名称, 模块, 汇总函数名)
+_FUNCTION_SOURCES = (
+    ("dialogue_context", "core.utils.dialogue_context", "get_dialogue_context_stats"),
+    ("voiceprint", "core.utils.voiceprint_client", "get_voiceprint_stats"),
+)
+
+
+def collect_server_stats():
+    """收集各组件的统计信息，单个组件出错不影响其他组件"""
+    stats = {}
+    for name, module_name, attr in _SINGLETON_SOURCES:
+        instance = getattr(sys.modules.get(module_name), attr, None)
+        if instance is None:
+            continue
+        try:
+            stats[name] = instance.get_stats()
+        except Exception as e:
+            stats[name] = {"error": str(e)}
+    for name, module_name, attr in _FUNCTION_SOURCES:
+        func = getattr(sys.modules.get(module_name), attr, None)
+        if func is None:
+            continue
+        try:
+            stats[name] = func()
+        except Exception as e:
+            stats[name] = {"error": str(e)}
+    return stats
+
+
+class ServerStatsReporter:
+    """定期把汇总统计输出到日志"""
+
+    def __init__(self, interval_seconds=300):
+        self.interval_seconds = interval_seconds
+        self._task = None
+
+    def start(self):
+        if self._task is not None or not self.interval_seconds:
+            return
+        logger.bind(tag=TAG).info(f"启动服务统计日志，间隔{self.interval_seconds}秒")
+        self._task = asyncio.create_task(self._log_loop())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _log_loop(self):
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            try:
+                stats = collect_server_stats()
+                logger.bind(tag=TAG).info(
+                    f"服务统计: {json.dumps(stats, ensure_ascii=False, default=str)}"
+                )
+            except Exception as e:
+                logger.bind(tag=TAG).error(f"收集服务统计失败: {e}")
@@ -0,0 +1,526 @@
+"""
+流式文本分句
+LLM逐个token输出文本，原来每来一个token都要把已收到的全部文本重新拼接、从未处理位置重新查找标点，
+一轮回复的分句开销随长度平方增长。这里的过滤器和分句器都是有状态的单遍扫描：
+每个字符只扫描一次，只有可能跨分片的少量字符（Markdown标记、替换词前缀）暂存到下一片。
+
+- StreamingMarkdownFilter：流式去除代码块、粗体、标题、引用、列表、链接和图片等Markdown标记
+- StreamingWordReplacer：流式替换词，结果与整段文本按最长匹配一次性替换一致
+- StreamingTextFilter：双流式TTS逐片发送前的过滤（Markdown + 替换词）
+- SentenceSegmenter：把token流切分成TTS分句，首句可使用更激进的切分
+- AdaptiveFirstSegment：根据LLM输出速度和TTS首包延迟决定首句何时提前切分
+"""
+
+import re
+import math
+import time
+from typing import Dict, List
+
+from core.utils.textUtils import get_string_no_punctuation_or_emoji
+
+# 分句标点
+PUNCTUATIONS = ("。", "？", "?", "！", "!", "；", ";", "：")
+# 首句额外使用的弱分句标点，尽早送入TTS以缩短首句语音的延迟
+FIRST_SENTENCE_PUNCTUATIONS = ("，", "~", "、", ",") + PUNCTUATIONS
+# 强制切分时优先选择的断点
+_SOFT_BREAKS = set(" \t\n，,、~")
+
+# Markdown过滤需要特殊处理的字符，其余字符整段复制
+_MARKDOWN_SPECIAL = re.compile(r"[`*_!\[\]\n]")
+
+
+class StreamingMarkdownFilter:
+    """流式Markdown过滤器，feed返回可以确定的文本，可能跨分片的标记暂存到下一次"""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self._carry = ""
+        self._line_start = True
+        self._in_code_block = False
+        # 正在跳过的内容：None / "alt"（图片描述） / "url"（链接地址）
+        self._skip = None
+
+    @property
+    def pending(self):
+        return bool(self._carry)
+
+    def feed(self, text, final=False):
+        data = self._carry + text if self._carry else text
+        self._carry = ""
+        if not data:
+            return ""
+        out = []
+        i = 0
+        n = len(data)
+        while i < n:
+            if self._in_code_block:
+                end = data.find("```", i)
+                if end == -1:
+                    # 结尾可能是不完整的结束标记
+                    tail = len(data) - len(data.rstrip("`"))
+                    if tail and not final:
+                        self._carry = data[n - min(tail, 2) :]
+                    return "".join(out)
+                self._in_code_block = False
+                i = end + 3
+                continue
+            if self._skip is not None:
+                i = self._skip_content(data, i, final)
+                if i < 0:
+                    return "".join(out)
+                continue
+            if self._line_start:
+                i = self._skip_line_marker(data, i, final)
+                if i < 0:
+                    return "".join(out)
+                self._line_start = False
+                continue
+
+            match = _MARKDOWN_SPECIAL.search(data, i)
+            if match is None:
+                out.append(data[i:])
+                break
+            start = match.start()
+            if start > i:
+                out.append(data[i:start])
+            i = self._handle_special(data, start, out, final)
+            if i < 0:
+                break
+        return "".join(out)
+
+    def _need_more(self, data, i, final):
+        """数据不足以判断时暂存，返回-1；final时不再等待"""
+        if final:
+            return False
+        self._carry = data[i:]
+        return True
+
+    def _handle_special(self, data, i, out, final):
+        """处理特殊字符，返回下一个位置，需要等待更多数据时返回-1"""
+        char = data[i]
+        n = len(data)
+        if char == "\n":
+            out.append(char)
+            self._line_start = True
+            return i + 1
+        if char == "`":
+            if data.startswith("```", i):
+                self._in_code_block = True
+                return i + 3
+            if n - i < 3 and data[i:] == "`" * (n - i) and self._need_more(data, i, final):
+                return -1
+            # 行内代码只去掉标记
+            return i + 1
+        if char in "*_":
+            if i + 1 >= n:
+                if self._need_more(data, i, final):
+                    return -1
+                out.append(char)
+                return i + 1
+            if data[i + 1] == char:
+                # 粗体标记
+                return i + 2
+            out.append(char)
+            return i + 1
+        if char == "!":
+            if i + 1 >= n:
+                if self._need_more(data, i, final):
+                    return -1
+                out.append(char)
+                return i + 1
+            if data[i + 1] == "[":
+                # 图片：描述和地址都不朗读
+                self._skip = "alt"
+                return i + 2
+            out.append(char)
+            return i + 1
+        if char == "[":
+            return i + 1
+        # char == "]"
+        if i + 1 >= n:
+            if self._need_more(data, i, final):
+                return -1
+            return i + 1
+        if data[i + 1] == "(":
+            # 链接地址不朗读
+            self._skip = "url"
+            return i + 2
+        return i + 1
+
+    def _skip_content(self, data, i, final):
+        n = len(data)
+        if self._skip == "alt":
+            end = data.find("]", i)
+            if end == -1:
+                return -1
+            if end + 1 >= n and not final:
+                self._carry = "]"
+                self._skip = None
+                # 暂存的"]"重新处理时会判断后面是否为链接地址
+                return -1
+            if end + 1 < n and data[end + 1] == "(":
+                self._skip = "url"
+                return end + 2
+            self._skip = None
+            return end + 1
+        end = data.find(")", i)
+        if end == -1:
+            return -1
+        self._skip = None
+        return end + 1
+
+    def _skip_line_marker(self, data, i, final):
+        """跳过行首的标题、引用和列表标记，返回下一个位置，需要等待更多数据时返回-1"""
+        n = len(data)
+        j = i
+        while j < n and data[j] in " \t":
+            j += 1
+        if j >= n:
+            if self._need_more(data, i, final):
+                return -1
+            return n
+        char = data[j]
+        if char in "#>":
+            while j < n and data[j] == char:
+                j += 1
+            if j >= n and self._need_more(data, i, final):
+                return -1
+            while j < n and data[j] in " \t":
+                j += 1
+            return j
+        if char in "-+*":
+            if j + 1 >= n:
+                if self._need_more(data, i, final):
+                    return -1
+                return i
+            if data[j + 1] in " \t":
+                return j + 2
+        return i
+
+
+class StreamingWordReplacer:
+    """流式替换词：按最长匹配替换，可能是替换词前缀的结尾暂存到下一次"""
+
+    def __init__(self, words: Dict[str, str]):
+        self.words = {k: v for k, v in (words or {}).items() if k}
+        self._prefixes = set()
+        for key in self.words:
+            for end in range(1, len(key)):
+                self._prefixes.add(key[:end])
+        self._first_chars = {key[0] for key in self.words}
+        self._pending = ""
+
+    def reset(self):
+        self._pending = ""
+
+    @property
+    def pending(self):
+        return bool(self._pending)
+
+    def feed(self, text, final=False):
+        data = self._pending + text if self._pending else text
+        self._pending = ""
+        if not self.words or not data:
+            return data
+        out = []
+        words = self.words
+        prefixes = self._prefixes
+        first_chars = self._first_chars
+        n = len(data)
+        i = 0
+        plain_start = 0
+        while i < n:
+            if data[i] not in first_chars:
+                i += 1
+                continue
+            # 从i开始查找最长的替换词
+            best = 0
+            j = i + 1
+            while True:
+                piece = data[i:j]
+                if piece in words:
+                    best = j
+                if piece not in prefixes:
+                    break
+                if j >= n:
+                    if not final:
+                        # 可能还会组成更长的替换词，等待下一片
+                        out.append(data[plain_start:i])
+                        self._pending = data[i:]
+                        return "".join(out)
+                    break
+                j += 1
+            if best:
+                out.append(data[plain_start:i])
+                out.append(words[data[i:best]])
+                i = plain_start = best
+            else:
+                i += 1
+        out.append(data[plain_start:])
+        return "".join(out)
+
+
+class StreamingTextFilter:
+    """双流式TTS逐片发送前的过滤：Markdown标记和替换词"""
+
+    def __init__(self, words: Dict[str, str] = None):
+        self.markdown = StreamingMarkdownFilter()
+        self.replacer = StreamingWordReplacer(words)
+
+    def reset(self):
+        self.markdown.reset()
+        self.replacer.reset()
+
+    @property
+    def pending(self):
+        return self.markdown.pending or self.replacer.pending
+
+    def feed(self, text, final=False) -> List[str]:
+        """返回可以发送的文本片段列表，final为True时输出全部暂存文本"""
+        text = self.markdown.feed(text or "", final=final)
+        text = self.replacer.feed(text, final=final)
+        return [text] if text else []
+
+
+class AdaptiveFirstSegment:
+    """
+    自适应首句切分
+
+    首句语音延迟 = 等待首句文本的时间 + TTS首包延迟。还没等到标点时，只要已收到的文本朗读时长足以覆盖
+    下一句的TTS首包延迟（LLM输出慢于语速时按比例加长，避免首句播完后出现停顿），就提前切分；
+    等待超过 max_wait_ms 时直接切分。
+    """
+
+    def __init__(
+        self,
+        min_chars=4,
+        max_chars=30,
+        max_wait_ms=800,
+        speech_chars_per_sec=4.5,
+        default_ttfb_ms=400,
+    ):
+        self.min_chars = max(int(min_chars), 1)
+        self.max_chars = max(int(max_chars), self.min_chars)
+        self.max_wait = max(float(max_wait_ms), 0.0) / 1000
+        self.speech_chars_per_sec = max(float(speech_chars_per_sec), 0.1)
+        self.default_ttfb = max(float(default_ttfb_ms), 0.0) / 1000
+        self.ttfb = self.default_ttfb
+        self.prior_rate = None
+
+    def prepare(self, ttfb=None, llm_rate=None):
+        """每轮开始时传入该TTS最近的首包延迟(秒)和该LLM最近的输出速度(字/秒)"""
+        self.ttfb = ttfb if ttfb is not None else self.default_ttfb
+        self.prior_rate = llm_rate
+
+    def target_chars(self, rate=None):
+        """不等标点即可切分的首句字数"""
+        needed = self.ttfb * self.speech_chars_per_sec
+        rate = rate or self.prior_rate
+        if rate and rate < self.speech_chars_per_sec:
+            needed *= self.speech_chars_per_sec / rate
+        return min(max(math.ceil(needed), self.min_chars), self.max_chars)
+
+    def should_flush(self, chars, elapsed, rate=None):
+        if chars < self.min_chars:
+            return False
+        if elapsed >= self.max_wait:
+            return True
+        return chars >= self.target_chars(rate)
+
+
+class SentenceSegmenter:
+    """
+    把LLM的token流切分成TTS分句
+
+    首句遇到逗号等弱标点即切分（短于 first_min_chars 时继续等待），之后在已收到文本的最后一个分句标点处切分，
+    把同时到达的多句合并成一次TTS请求。超过 first_max_chars / max_chars 仍没有标点时强制切分。
+    设置 adaptive 后首句还会按 AdaptiveFirstSegment 提前切分。
+    """
+
+    def __init__(
+        self,
+        punctuations=PUNCTUATIONS,
+        first_punctuations=FIRST_SENTENCE_PUNCTUATIONS,
+        first_min_chars=0,
+        first_max_chars=0,
+        max_chars=0,
+        clean_markdown=True,
+        adaptive: AdaptiveFirstSegment = None,
+    ):
+        self.punctuations = frozenset(punctuations)
+        self.first_punctuations = frozenset(first_punctuations)
+        self.first_min_chars = max(int(first_min_chars), 0)
+        self.first_max_chars = max(int(first_max_chars), 0)
+        self.max_chars = max(int(max_chars), 0)
+        self.markdown = StreamingMarkdownFilter() if clean_markdown else None
+        self.adaptive = adaptive
+        # 上一轮回复测得的LLM输出速度(字/秒)
+        self.last_turn_rate = None
+        self.reset()
+
+    @classmethod
+    def from_config(cls, config=None):
+        config = config or {}
+        adaptive = None
+        if str(config.get("adaptive_first_segment", False)).lower() in ("true", "1", "yes"):
+            adaptive = AdaptiveFirstSegment(
+                min_chars=config.get("adaptive_min_chars", 4),
+                max_chars=config.get("adaptive_max_chars", 30),
+                max_wait_ms=config.get("first_max_wait_ms", 800),
+                speech_chars_per_sec=config.get("speech_chars_per_sec", 4.5),
+                default_ttfb_ms=config.get("default_tts_ttfb_ms", 400),
+            )
+        return cls(
+            first_min_chars=config.get("first_min_chars", 0),
+            first_max_chars=config.get("first_max_chars", 0),
+            max_chars=config.get("max_chars", 0),
+            clean_markdown=str(config.get("clean_markdown", True)).lower()
+            in ("true", "1", "yes"),
+            adaptive=adaptive,
+        )
+
+    def reset(self):
+        """新一轮回复开始时重置"""
+        self._text = ""
+        self._scan = 0
+        self._last_break = -1
+        self.is_first_sentence = True
+        self._first_token_time = None
+        self._last_token_time = None
+        self._received_chars = 0
+        if self.markdown is not None:
+            self.markdown.reset()
+
+    def feed(self, token, now=None) -> List[str]:
+        """
+        输入一个token，返回可以送入TTS的分句列表（已去除首尾标点和表情）
+
+        开启自适应首句时可以传入空token，用于首句等待超时后的检查
+        """
+        if token:
+            now = now if now is not None else time.monotonic()
+            if self._first_token_time is None:
+                self._first_token_time = now
+            self._last_token_time = now
+            self._received_chars += len(token)
+        if self.markdown is not None:
+            token = self.markdown.feed(token or "")
+        if token:
+            self._text += token
+        elif not (self.adaptive is not None and self.is_first_sentence and self._text):
+            return []
+        segments = []
+        if self.is_first_sentence:
+            self._scan_first(segments)
+            if self.is_first_sentence and self.adaptive is not None:
+                self._adaptive_first(segments, now)
+        if not self.is_first_sentence:
+            self._scan_rest(segments)
+        return segments
+
+    def flush(self) -> List[str]:
+        """一轮回复结束时输出剩余文本"""
+        if self.markdown is not None and self.markdown.pending:
+            self._text += self.markdown.feed("", final=True)
+        segments = []
+        self._emit(len(self._text), segments)
+        self.last_turn_rate = None
+        if self._first_token_time is not None:
+            span = self._last_token_time - self._first_token_time
+            if span >= 0.5:
+                self.last_turn_rate = self._received_chars / span
+        self.reset()
+        return segments
+
+    def token_rate(self, now=None):
+        """本轮已测得的LLM输出速度(字/秒)，数据不足时返回None"""
+        if self._first_token_time is None:
+            return None
+        now = now if now is not None else time.monotonic()
+        span = now - self._first_token_time
+        if span < 0.2:
+            return None
+        return self._received_chars / span
+
+    def first_segment_deadline(self, now=None):
+        """首句还在等待时，距离最长等待时间的秒数；无需等待时返回None"""
+        if (
+            self.adaptive is None
+            or not self.is_first_sentence
+            or not self._text
+            or self._first_token_time is None
+        ):
+            return None
+        now = now if now is not None else time.monotonic()
+        return max(self.adaptive.max_wait - (now - self._first_token_time), 0.0)
+
+    def _adaptive_first(self, segments, now):
+        now = now if now is not None else time.monotonic()
+        chars = len(get_string_no_punctuation_or_emoji(self._text))
+        elapsed = now - self._first_token_time
+        if not self.adaptive.should_flush(chars, elapsed, self.token_rate(now)):
+            return
+        end = len(self._text)
+        # 不在英文单词中间切分
+        if self._text[-1].isascii() and self._text[-1].isalnum():
+            end = max(self._text.rfind(" "), self._text.rfind("\t")) + 1
+        if end > 0:
+            self._emit(end, segments)
+
+    def _emit(self, end, segments):
+        raw = self._text[:end]
+        self._text = self._text[end:]
+        self._scan = 0
+        self._last_break = -1
+        segment = get_string_no_punctuation_or_emoji(raw)
+        if segment:
+            segments.append(segment)
+            self.is_first_sentence = False
+
+    def _scan_first(self, segments):
+        text = self._text
+        punctuations = self.first_punctuations
+        strong = self.punctuations
+        for i in range(self._scan, len(text)):
+            char = text[i]
+            if char not in punctuations:
+                continue
+            if (
+                char not in strong
+                and self.first_min_chars
+                and len(get_string_no_punctuation_or_emoji(text[: i + 1]))
+                < self.first_min_chars
+            ):
+                continue
+            self._emit(i + 1, segments)
+            if not self.is_first_sentence:
+                return
+            # 只有标点没有内容，继续在剩余文本中查找首句
+            return self._scan_first(segments)
+        self._scan = len(text)
+        if self.first_max_chars and len(text) >= self.first_max_chars:
+            self._emit(self._force_break(self.first_max_chars), segments)
+
+    def _scan_rest(self, segments):
+        text = self._text
+        punctuations = self.punctuations
+        last_break = self._last_break
+        for i in range(self._scan, len(text)):
+            if text[i] in punctuations:
+                last_break = i
+        self._scan = len(text)
+        self._last_break = last_break
+        if last_break >= 0:
+            self._emit(last_break + 1, segments)
+        elif self.max_chars and len(text) >= self.max_chars:
+            self._emit(self._force_break(self.max_chars), segments)
+
+    def _force_break(self, limit):
+        """没有标点时的强制切分位置：优先在空格或逗号处切分"""
+        text = self._text
+        for i in range(min(limit, len(text)) - 1, limit // 2, -1):
+            if text[i] in _SOFT_BREAKS:
+                return i + 1
+        return min(limit, len(text))
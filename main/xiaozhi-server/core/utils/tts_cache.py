@@ -0,0 +1,245 @@
+"""
+TTS短语音频缓存
+按 提供者/音色/语速音调等参数/清洗后的文本 计算内容地址，缓存已经编码好的Opus帧，
+命中时直接下发，跳过远程TTS请求和ffmpeg解码/编码。
+缓存分为内存和磁盘两级，均按最近最少使用（LRU）和总字节数淘汰。
+"""
+
+import os
+import struct
+import hashlib
+import threading
+from collections import OrderedDict
+from config.logger import setup_logging
+
+TAG = __name__
+logger = setup_logging()
+
+# 磁盘缓存文件后缀，文件内容为p3格式：每帧 [1字节类型，1字节保留，2字节长度] + Opus数据
+CACHE_FILE_SUFFIX = ".p3"
+
+
+class TTSAudioCache:
+    """TTS短语音频缓存（内存 + 磁盘两级）"""
+
+    def __init__(self, config=None):
+        config = config or {}
+        self.enabled = bool(config.get("enabled", False))
+        self.max_text_length = int(config.get("max_text_length", 50))
+        self.max_memory_bytes = int(float(config.get("max_memory_mb", 64)) * 1024 * 1024)
+        self.max_disk_bytes = int(float(config.get("max_disk_mb", 512)) * 1024 * 1024)
+        self.disk_dir = config.get("disk_dir", "data/tts_cache")
+
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._disk_bytes = 0
+
+        # 统计信息
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+        if self.enabled and self.max_disk_bytes > 0:
+            self._init_disk()
+
+    def _init_disk(self):
+        """创建磁盘缓存目录并统计已有缓存大小"""
+        try:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            for name in os.listdir(self.disk_dir):
+                if name.endswith(CACHE_FILE_SUFFIX):
+                    self._disk_bytes += os.path.getsize(os.path.join(self.disk_dir, name))
+            self._evict_disk()
+        except OSError as e:
+            logger.bind(tag=TAG).warning(f"初始化TTS磁盘缓存失败，仅使用内存缓存: {e}")
+            self.max_disk_bytes = 0
+
+    def make_key(self, voice_fingerprint, sample_rate, audio_format, text):
+        """
+        生成缓存键
+
+        Args:
+            voice_fingerprint: 提供者及音色参数组成的元组
+            sample_rate: 客户端采样率
+            audio_format: 客户端音频格式（opus/pcm）
+            text: 清洗和替换词处理后的文本
+
+        Returns:
+            缓存键，文本不适合缓存时返回None
+        """
+        if not self.enabled or not text or len(text) > self.max_text_length:
+            return None
+        raw = repr((voice_fingerprint, sample_rate, audio_format, text.strip()))
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """获取缓存的音频帧列表，未命中返回None"""
+        with self._lock:
+            frames = self._memory.get(key)
+            if frames is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return frames
+
+        frames = self._load_from_disk(key)
+        with self._lock:
+            if frames is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._put_memory(key, frames)
+        return frames
+
+    def put(self, key, frames):
+        """写入缓存，frames为已编码的音频帧列表"""
+        if not key or not frames:
+            return
+        frames = list(frames)
+        with self._lock:
+            self.stores += 1
+            self._put_memory(key, frames)
+        self._save_to_disk(key, frames)
+
+    def _put_memory(self, key, frames):
+        """调用方需持有锁"""
+        size = sum(len(frame) for frame in frames)
+        if size > self.max_memory_bytes:
+            return
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._memory_bytes -= sum(len(frame) for frame in old)
+        self._memory[key] = frames
+        self._memory_bytes += size
+        while self._memory_bytes > self.max_memory_bytes and self._memory:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= sum(len(frame) for frame in evicted)
+            self.evictions += 1
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, key + CACHE_FILE_SUFFIX)
+
+    def _load_from_disk(self, key):
+        if self.max_disk_bytes <= 0:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            # 更新访问时间，磁盘淘汰按mtime从旧到新进行
+            os.utime(path, None)
+        except OSError:
+            return None
+
+        frames = []
+        offset = 0
+        try:
+            while offset < len(data):
+                _, _, data_len = struct.unpack_from(">BBH", data, offset)
+                offset += 4
+                frame = data[offset : offset + data_len]
+                if len(frame) != data_len:
+                    raise ValueError("数据长度不匹配")
+                frames.append(frame)
+                offset += data_len
+        except (struct.error, ValueError) as e:
+            logger.bind(tag=TAG).warning(f"TTS磁盘缓存文件损坏，已删除: {path}, {e}")
+            self._remove_disk_file(path)
+            return None
+        return frames or None
+
+    def _save_to_disk(self, key, frames):
+        if self.max_disk_bytes <= 0:
+            return
+        path = self._disk_path(key)
+        if os.path.exists(path):
+            return
+        data = b"".join(struct.pack(">BBH", 0, 0, len(frame)) + frame for frame in frames)
+        if len(data) > self.max_disk_bytes:
+            return
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.bind(tag=TAG).warning(f"写入TTS磁盘缓存失败: {e}")
+            self._remove_disk_file(tmp_path)
+            return
+        with self._lock:
+            self._disk_bytes += len(data)
+            if self._disk_bytes > self.max_disk_bytes:
+                self._evict_disk()
+
+    def _evict_disk(self):
+        """按最近访问时间淘汰磁盘缓存，直到总大小低于上限的90%"""
+        if self._disk_bytes <= self.max_disk_bytes:
+            return
+        entries = []
+        for name in os.listdir(self.disk_dir):
+            if not name.endswith(CACHE_FILE_SUFFIX):
+                continue
+            path = os.path.join(self.disk_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+
+        target = self.max_disk_bytes * 0.9
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= target:
+                break
+            if self._remove_disk_file(path):
+                total -= size
+                self.evictions += 1
+        self._disk_bytes = total
+
+    @staticmethod
+    def _remove_disk_file(path):
+        try:
+            os.remove(path)
+            return True
+        except OSError:
+            return False
+
+    def get_stats(self):
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "disk_bytes": self._disk_bytes,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "stores": self.stores,
+                "evictions": self.evictions,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+# 全局单例
+_tts_cache = None
+
+
+def get_tts_cache(config=None):
+    """
+    获取全局TTS短语音频缓存实例（单例模式）
+
+    Args:
+        config: tts_cache配置，仅首次创建时生效
+
+    Returns:
+        TTSAudioCache实例
+    """
+    global _tts_cache
+    if _tts_cache is None:
+        _tts_cache = TTSAudioCache(config)
+    return _tts_cache
@@ -0,0 +1,321 @@
+"""
+全局TTS工作池
+所有连接的TTS文本消息由一组有上限的工作线程处理，不再为每个连接创建线程。
+每个连接对应一个通道（lane），同一通道的消息严格按顺序处理，同一时刻最多占用一个工作线程，
+不同通道之间轮转调度，每轮最多处理固定数量的消息（单条耗时超过 turn_budget 时提前让出），避免单个连接长期占用工作线程。
+通道按TTS提供者分组，每组同时占用的工作线程数有上限，某个上游服务卡住（超时重试）时不会占满整个工作池。
+连接的消息队列有上限，TTS处理不过来时生产方（事件循环上的LLM输出）通过 put_async 异步等待，形成背压。
+"""
+
+import sys
+import time
+import queue
+import asyncio
+import threading
+import traceback
+from collections import deque
+from config.logger import setup_logging
+
+TAG = __name__
+logger = setup_logging()
+
+# 通道状态
+_IDLE = 0
+_SCHEDULED = 1
+_RUNNING = 2
+
+_worker_local = threading.local()
+
+
+def _in_event_loop():
+    try:
+        asyncio.get_running_loop()
+        return True
+    except RuntimeError:
+        return False
+
+
+def _set_waiter(waiter):
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+class NotifyQueue(queue.Queue):
+    """
+    put之后触发回调的队列，用于事件驱动地唤醒消费者
+
+    设置maxsize后，队列满时工作线程中的put阻塞等待，事件循环中的生产方应使用 put_async 异步等待；
+    事件循环中的put（控制消息）不能阻塞，忽略上限直接入队
+    """
+
+    def __init__(self, maxsize=0):
+        super().__init__(maxsize)
+        self.on_put = None
+        # 等待队列空出位置的事件循环生产方: [(loop, future)]
+        self._async_putters = []
+
+    def _get(self):
+        item = super()._get()
+        if self._async_putters:
+            self._wake_async_putters()
+        return item
+
+    def _wake_async_putters(self):
+        # 调用方持有mutex；工作线程取走消息后唤醒事件循环中等待的生产方，由其重新判断
+        putters, self._async_putters = self._async_putters, []
+        for loop, waiter in putters:
+            try:
+                loop.call_soon_threadsafe(_set_waiter, waiter)
+            except RuntimeError:
+                # 事件循环已关闭
+                pass
+
+    async def put_async(self, item):
+        """事件循环中的生产方使用：队列满时异步等待工作线程取走消息，不阻塞事件循环"""
+        loop = asyncio.get_running_loop()
+        while True:
+            with self.mutex:
+                if self.maxsize <= 0 or self._qsize() < self.maxsize:
+                    break
+                waiter = loop.create_future()
+                self._async_putters.append((loop, waiter))
+            await waiter
+        self.put(item)
+
+    def put(self, item, block=True, timeout=None):
+        if self.maxsize > 0 and _in_event_loop():
+            with self.not_full:
+                self._put(item)
+                self.unfinished_tasks += 1
+                self.not_empty.notify()
+        else:
+            super().put(item, block, timeout)
+        callback = self.on_put
+        if callback is not None:
+            callback()
+
+    def set_maxsize(self, maxsize):
+        """调整队列上限，0为不限制，并唤醒等待中的生产方"""
+        maxsize = max(int(maxsize or 0), 0)
+        with self.not_full:
+            if maxsize == 0 and self.maxsize > 0:
+                # 阻塞中的put会按maxsize重新判断，设为极大值才能放行
+                maxsize = sys.maxsize
+            self.maxsize = maxsize
+            self.not_full.notify_all()
+            self._wake_async_putters()
+
+
+class TTSLane:
+    """单个连接的TTS消息通道"""
+
+    def __init__(self, message_queue, handler, stop_event, group=None):
+        self.queue = message_queue
+        self.handler = handler
+        self.stop_event = stop_event
+        self.group = group
+        self.state = _IDLE
+        self.closed = False
+        self.scheduled_at = 0.0
+
+
+class TTSWorkerPool:
+    """全局TTS工作池"""
+
+    def __init__(
+        self, max_workers=32, max_jobs_per_turn=4, max_workers_per_group=0, turn_budget=2.0
+    ):
+        self.max_workers = max(int(max_workers), 1)
+        self.max_jobs_per_turn = max(int(max_jobs_per_turn), 1)
+        # 每个分组（TTS提供者）同时占用的工作线程上限，0为不限制
+        self.max_workers_per_group = max(int(max_workers_per_group or 0), 0)
+        self.turn_budget = max(float(turn_budget), 0.0)
+        self._cond = threading.Condition()
+        self._ready = deque()
+        self._workers = []
+        self._idle_workers = 0
+        # 分组 -> 正在运行的通道数
+        self._running_groups = {}
+
+        # 统计信息
+        self.total_jobs = 0
+        self.total_wait_seconds = 0.0
+        self.total_turns = 0
+        self.active_lanes = 0
+        self.deferred = 0
+
+    def register(self, message_queue, handler, stop_event, group=None):
+        """
+        注册连接的消息通道，消息入队后自动调度到工作线程处理
+
+        Args:
+            group: 通道分组（如TTS提供者），同组同时占用的工作线程数受 max_workers_per_group 限制
+        """
+        lane = TTSLane(message_queue, handler, stop_event, group)
+        message_queue.on_put = lambda: self._schedule(lane)
+        with self._cond:
+            self.active_lanes += 1
+        # 注册前已经入队的消息
+        if message_queue.qsize() > 0:
+            self._schedule(lane)
+        return lane
+
+    def unregister(self, lane):
+        """注销通道，未处理的消息将被丢弃"""
+        with self._cond:
+            if lane.closed:
+                return
+            lane.closed = True
+            lane.queue.on_put = None
+            self.active_lanes -= 1
+            if lane.state == _SCHEDULED:
+                try:
+                    self._ready.remove(lane)
+                except ValueError:
+                    pass
+                lane.state = _IDLE
+
+    def _schedule(self, lane):
+        with self._cond:
+            if lane.closed or lane.state != _IDLE:
+                # 正在运行的通道会在本轮结束时检查队列，无需重复调度
+                return
+            self._enqueue_ready(lane)
+
+    def _enqueue_ready(self, lane):
+        """调用方需持有锁"""
+        lane.state = _SCHEDULED
+        lane.scheduled_at = time.monotonic()
+        self._ready.append(lane)
+        if self._idle_workers == 0 and len(self._workers) < self.max_workers:
+            worker = threading.Thread(
+                target=self._worker_loop,
+                name=f"tts-worker-{len(self._workers)}",
+                daemon=True,
+            )
+            self._workers.append(worker)
+            worker.start()
+        else:
+            self._cond.notify()
+
+    def _worker_loop(self):
+        # 每个工作线程持有一个常驻事件循环，避免每句话都新建事件循环
+        _worker_local.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(_worker_local.loop)
+        while True:
+            with self._cond:
+                lane = self._next_lane()
+                while lane is None:
+                    self._idle_workers += 1
+                    self._cond.wait()
+                    self._idle_workers -= 1
+                    lane = self._next_lane()
+                lane.state = _RUNNING
+                self._running_groups[lane.group] = (
+                    self._running_groups.get(lane.group, 0) + 1
+                )
+                self.total_turns += 1
+                self.total_wait_seconds += time.monotonic() - lane.scheduled_at
+
+            handled = self._run_lane(lane)
+
+            with self._cond:
+                self.total_jobs += handled
+                running = self._running_groups[lane.group] - 1
+                if running:
+                    self._running_groups[lane.group] = running
+                else:
+                    del self._running_groups[lane.group]
+                if self.max_workers_per_group and self._ready:
+                    # 同组被推迟的通道可能可以执行了
+                    self._cond.notify()
+                if lane.closed:
+                    lane.state = _IDLE
+                elif lane.queue.qsize() > 0:
+                    # 还有消息，排到队尾，让其他连接先执行
+                    self._enqueue_ready(lane)
+                else:
+                    lane.state = _IDLE
+
+    def _next_lane(self):
+        """取出下一个可执行的通道，所在分组已达上限的通道留在队列中（调用方需持有锁）"""
+        if not self.max_workers_per_group:
+            return self._ready.popleft() if self._ready else None
+        for index, lane in enumerate(self._ready):
+            if self._running_groups.get(lane.group, 0) < self.max_workers_per_group:
+                del self._ready[index]
+                return lane
+        if self._ready:
+            self.deferred += 1
+        return None
+
+    def _run_lane(self, lane):
+        handled = 0
+        begin = time.monotonic()
+        for _ in range(self.max_jobs_per_turn):
+            if lane.closed or lane.stop_event.is_set():
+                break
+            if handled and time.monotonic() - begin > self.turn_budget:
+                # 本轮耗时过长（上游变慢或重试），让出工作线程
+                break
+            try:
+                message = lane.queue.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                lane.handler(message)
+            except Exception as e:
+                logger.bind(tag=TAG).error(
+                    f"处理TTS消息失败: {str(e)}, 类型: {type(e).__name__}, 堆栈: {traceback.format_exc()}"
+                )
+            handled += 1
+        return handled
+
+    def get_stats(self):
+        with self._cond:
+            turns = self.total_turns or 1
+            return {
+                "workers": len(self._workers),
+                "idle_workers": self._idle_workers,
+                "active_lanes": self.active_lanes,
+                "ready_lanes": len(self._ready),
+                "running_groups": dict(self._running_groups),
+                "deferred": self.deferred,
+                "total_jobs": self.total_jobs,
+                "avg_wait_ms": round(self.total_wait_seconds * 1000 / turns, 3),
+            }
+
+
+def run_tts_coroutine(coro):
+    """同步执行TTS协程：在工作池线程中复用常驻事件循环，其他线程中临时创建事件循环"""
+    loop = getattr(_worker_local, "loop", None)
+    if loop is None:
+        return asyncio.run(coro)
+    return loop.run_until_complete(coro)
+
+
+# 全局单例
+_tts_worker_pool = None
+
+
+def get_tts_worker_pool(
+    max_workers=32, max_jobs_per_turn=4, max_workers_per_group=0, turn_budget=2.0
+):
+    """
+    获取全局TTS工作池实例（单例模式）
+
+    Args:
+        max_workers: 最大工作线程数，仅首次创建时生效
+        max_jobs_per_turn: 每个连接每轮调度最多处理的消息数，仅首次创建时生效
+        max_workers_per_group: 每个TTS提供者同时占用的工作线程上限，0为不限制，仅首次创建时生效
+        turn_budget: 每轮调度的耗时预算(秒)，超出后处理完当前消息即让出，仅首次创建时生效
+
+    Returns:
+        TTSWorkerPool实例
+    """
+    global _tts_worker_pool
+    if _tts_worker_pool is None:
+        _tts_worker_pool = TTSWorkerPool(
+            max_workers, max_jobs_per_turn, max_workers_per_group, turn_budget
+        )
+    return _tts_worker_pool
@@ -258,6 +258,13 @@ async def audio_to_data(
     """
     from core.utils.cache.manager import cache_manager
     from core.utils.cache.config import CacheType
+    from core.utils.opus_asset_store import get_opus_asset_store
+
+    # 优先使用预编码的Opus帧包，未命中时会在后台转码，本次仍走实时转码
+    if is_opus:
+        pack = get_opus_asset_store().get_frames(audio_file_path, 16000)
+        if pack is not None:
+            return list(pack)
 
     # 生成缓存键，包含文件路径和编码类型
     cache_key = f"{audio_file_path}:{is_opus}"
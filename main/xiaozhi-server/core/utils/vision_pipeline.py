@@ -0,0 +1,246 @@
+"""
+视觉分析处理管道
+
+- VLLM实例按有效配置共享（复用HTTP客户端），不再每次请求创建
+- 限制同时进行的VLLM请求数，VLLM的同步调用放到线程池执行，不阻塞事件循环
+- 图片在线程池中按 max_image_side 缩小并重新编码为JPEG后再base64编码，减少上传体积和模型处理耗时
+- 可选的结果缓存：同一设备短时间内对相似画面（感知哈希相近）问相同问题时直接返回上次结果
+
+图片处理依赖 Pillow（已列入 requirements.txt），未安装时原图直接上传，结果缓存只匹配完全相同的图片。
+"""
+
+import io
+import time
+import base64
+import asyncio
+import hashlib
+import threading
+from collections import deque, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict
+
+from config.logger import setup_logging
+from core.utils.provider_pool import ProviderPool, config_fingerprint
+from core.utils.vllm import create_instance
+
+TAG = __name__
+logger = setup_logging()
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+    ImageOps = None
+
+
+def dhash(image, size=8):
+    """差值感知哈希：缩成(size+1)*size灰度图，比较相邻像素，画面轻微变化时哈希只差几位"""
+    small = image.convert("L").resize((size + 1, size))
+    pixels = list(small.getdata())
+    value = 0
+    for row in range(size):
+        offset = row * (size + 1)
+        for col in range(size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+class _ResultEntry:
+    __slots__ = ("image_hash", "question", "config_key", "result", "created_at")
+
+    def __init__(self, image_hash, question, config_key, result):
+        self.image_hash = image_hash
+        self.question = question
+        self.config_key = config_key
+        self.result = result
+        self.created_at = time.monotonic()
+
+
+class VisionPipeline:
+    def __init__(self, config: Dict[str, Any] = None):
+        config = config or {}
+        self.max_concurrency = max(int(config.get("max_concurrency", 4)), 1)
+        self.max_image_side = max(int(config.get("max_image_side", 1024)), 0)
+        self.jpeg_quality = min(max(int(config.get("jpeg_quality", 85)), 1), 95)
+        self.cache_enabled = str(config.get("result_cache", False)).lower() in (
+            "true",
+            "1",
+            "yes",
+        )
+        self.cache_ttl = max(float(config.get("result_cache_ttl", 30)), 0.0)
+        self.hash_distance = max(int(config.get("hash_distance", 4)), 0)
+        self.cache_per_device = max(int(config.get("cache_per_device", 8)), 1)
+        self.max_devices = max(int(config.get("max_devices", 1000)), 1)
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(int(config.get("preprocess_workers", 2)), 1),
+            thread_name_prefix="vision-preprocess",
+        )
+        # VLLM请求的同步调用在独立线程池中执行，线程数与并发上限一致
+        self._request_executor = ThreadPoolExecutor(
+            max_workers=self.max_concurrency, thread_name_prefix="vision-request"
+        )
+        self._semaphore = None
+        self._providers = ProviderPool(
+            {
+                "enabled": True,
+                "idle_ttl": config.get("provider_idle_ttl", 600),
+                "max_idle": config.get("provider_max_idle", 20),
+            }
+        )
+        self._results: "OrderedDict[str, deque]" = OrderedDict()
+        self._results_lock = threading.Lock()
+        if Image is None:
+            logger.bind(tag=TAG).warning("未安装Pillow，视觉分析将直接上传原图")
+
+        self.requests = 0
+        self.cache_hits = 0
+        self.waiting = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.preprocess_seconds = 0.0
+
+    def _exact_hash(self, image_data):
+        return hashlib.sha1(image_data).hexdigest() if self.cache_enabled else None
+
+    def _preprocess(self, image_data):
+        """缩小并重新编码图片，返回 (图片数据, 图片哈希)，未开启结果缓存时哈希为None"""
+        begin = time.monotonic()
+        try:
+            if Image is None:
+                return image_data, self._exact_hash(image_data)
+            try:
+                with Image.open(io.BytesIO(image_data)) as opened:
+                    source_format = opened.format
+                    image = ImageOps.exif_transpose(opened)
+                    image_hash = dhash(image) if self.cache_enabled else None
+                    resized = bool(self.max_image_side) and (
+                        max(image.size) > self.max_image_side
+                    )
+                    if not resized and source_format == "JPEG":
+                        return image_data, image_hash
+                    if resized:
+                        image.thumbnail(
+                            (self.max_image_side, self.max_image_side),
+                            Image.LANCZOS,
+                        )
+                    if image.mode not in ("RGB", "L"):
+                        image = image.convert("RGB")
+                    buffer = io.BytesIO()
+                    image.save(
+                        buffer, format="JPEG", quality=self.jpeg_quality, optimize=True
+                    )
+                    return buffer.getvalue(), image_hash
+            except Exception as e:
+                logger.bind(tag=TAG).warning(f"图片预处理失败，使用原图: {e}")
+                return image_data, self._exact_hash(image_data)
+        finally:
+            self.preprocess_seconds += time.monotonic() - begin
+
+    def _is_similar(self, left, right):
+        if isinstance(left, int) and isinstance(right, int):
+            return (left ^ right).bit_count() <= self.hash_distance
+        return left == right
+
+    def _lookup(self, device_id, image_hash, question, config_key):
+        if image_hash is None:
+            return None
+        now = time.monotonic()
+        with self._results_lock:
+            entries = self._results.get(device_id)
+            if not entries:
+                return None
+            for entry in reversed(entries):
+                if now - entry.created_at > self.cache_ttl:
+                    continue
+                if (
+                    entry.question == question
+                    and entry.config_key == config_key
+                    and self._is_similar(entry.image_hash, image_hash)
+                ):
+                    return entry.result
+        return None
+
+    def _store(self, device_id, image_hash, question, config_key, result):
+        if image_hash is None or not result:
+            return
+        with self._results_lock:
+            entries = self._results.get(device_id)
+            if entries is None:
+                entries = self._results[device_id] = deque(maxlen=self.cache_per_device)
+            else:
+                self._results.move_to_end(device_id)
+            entries.append(_ResultEntry(image_hash, question, config_key, result))
+            while len(self._results) > self.max_devices:
+                self._results.popitem(last=False)
+
+    async def explain(self, device_id, question, image_data, vllm_type, vllm_config):
+        """对图片进行视觉分析，返回VLLM的回答"""
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self.requests += 1
+        self.bytes_in += len(image_data)
+
+        image_data, image_hash = await loop.run_in_executor(
+            self._executor, self._preprocess, image_data
+        )
+        self.bytes_out += len(image_data)
+        config_key = config_fingerprint(vllm_type, vllm_config)
+        cached = self._lookup(device_id, image_hash, question, config_key)
+        if cached is not None:
+            self.cache_hits += 1
+            logger.bind(tag=TAG).debug(f"视觉分析命中缓存: {device_id}")
+            return cached
+
+        image_base64 = base64.b64encode(image_data).decode("utf-8")
+        self.waiting += 1
+        started = False
+        try:
+            async with self._semaphore:
+                self.waiting -= 1
+                started = True
+                # 首次创建实例可能较慢（初始化SDK客户端），同样放到线程池执行
+                vllm = await loop.run_in_executor(
+                    self._request_executor,
+                    self._providers.acquire,
+                    "vllm",
+                    {"type": vllm_type, "config": vllm_config},
+                    lambda: create_instance(vllm_type, vllm_config),
+                )
+                try:
+                    result = await loop.run_in_executor(
+                        self._request_executor, vllm.response, question, image_base64
+                    )
+                finally:
+                    self._providers.release(vllm)
+        finally:
+            if not started:
+                self.waiting -= 1
+        self._store(device_id, image_hash, question, config_key, result)
+        return result
+
+    def get_stats(self):
+        return {
+            "requests": self.requests,
+            "cache_hits": self.cache_hits,
+            "waiting": self.waiting,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "preprocess_seconds": round(self.preprocess_seconds, 3),
+            "providers": self._providers.get_stats(),
+        }
+
+
+_vision_pipeline = None
+_vision_pipeline_lock = threading.Lock()
+
+
+def get_vision_pipeline(config=None):
+    """获取全局视觉分析管道（单例模式），首次调用时的配置生效"""
+    global _vision_pipeline
+    if _vision_pipeline is None:
+        with _vision_pipeline_lock:
+            if _vision_pipeline is None:
+                _vision_pipeline = VisionPipeline(config)
+    return _vision_pipeline
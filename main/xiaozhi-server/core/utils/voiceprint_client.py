@@ -0,0 +1,326 @@
+"""
+进程级共享的声纹识别客户端
+
+- 所有连接复用共享的 httpx.AsyncClient 长连接，不再每句话新建会话
+- 服务健康状态按服务地址集中缓存，异步检查，并发检查只请求一次
+- 相同音频的并发识别请求只请求一次
+- 可选的本地声纹向量（sherpa-onnx 说话人向量模型）：远程服务高置信度识别出的说话人，其本地向量按设备保存，
+  之后的语音先在本地做余弦匹配，命中时立即返回，远程结果在后台继续更新索引
+"""
+
+import time
+import asyncio
+import hashlib
+import threading
+from collections import deque
+from urllib.parse import urlparse
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from config.logger import setup_logging
+from core.utils.cache.manager import cache_manager
+from core.utils.cache.config import CacheType
+from core.utils.http_client import get_async_http_client
+
+TAG = __name__
+logger = setup_logging()
+
+_config = {}
+_clients: Dict[Tuple[str, str], "VoiceprintClient"] = {}
+_clients_lock = threading.Lock()
+_matcher = None
+_matcher_lock = threading.Lock()
+
+
+def configure_voiceprint_client(config=None):
+    """
+    设置声纹识别客户端参数，之后新创建的客户端和本地匹配器生效
+
+    Args:
+        config: voiceprint_client配置
+    """
+    global _config
+    _config = dict(config or {})
+
+
+class VoiceprintClient:
+    """单个声纹服务（地址+密钥）的共享客户端"""
+
+    def __init__(self, api_url, api_key):
+        self.api_url = api_url
+        self.api_key = api_key
+        parsed_url = urlparse(api_url)
+        self.health_url = (
+            f"{parsed_url.scheme}://{parsed_url.netloc}/voiceprint/health?key={api_key}"
+        )
+        self.timeout = float(_config.get("timeout", 10))
+        self._health_key = f"{api_url}:{api_key}"
+        self._health_task = None
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+        self.requests = 0
+        self.coalesced = 0
+        self.failures = 0
+
+    def health_status(self) -> Optional[bool]:
+        """缓存的健康状态，未检查或已过期时返回None"""
+        return cache_manager.get(CacheType.VOICEPRINT_HEALTH, self._health_key)
+
+    def ensure_health_check(self):
+        """健康状态未知时在后台检查，不阻塞调用方"""
+        if self.health_status() is not None:
+            return
+        if self._health_task is None or self._health_task.done():
+            self._health_task = asyncio.ensure_future(self.check_health())
+
+    async def check_health(self) -> bool:
+        """检查声纹服务健康状态并缓存结果"""
+        cached = self.health_status()
+        if cached is not None:
+            return cached
+        logger.bind(tag=TAG).info("执行声纹服务器健康检查")
+        try:
+            response = await get_async_http_client().get(self.health_url, timeout=3)
+            if response.status_code == 200:
+                result = response.json()
+                is_healthy = result.get("status") == "healthy"
+                if not is_healthy:
+                    logger.bind(tag=TAG).warning(f"声纹识别服务器状态异常: {result}")
+            else:
+                logger.bind(tag=TAG).warning(
+                    f"声纹识别服务器健康检查失败: HTTP {response.status_code}"
+                )
+                is_healthy = False
+        except Exception as e:
+            logger.bind(tag=TAG).warning(f"声纹识别服务器健康检查异常: {e}")
+            is_healthy = False
+        cache_manager.set(CacheType.VOICEPRINT_HEALTH, self._health_key, is_healthy)
+        logger.bind(tag=TAG).info(f"声纹识别服务器健康检查结果已缓存: {is_healthy}")
+        return is_healthy
+
+    async def identify(self, speaker_ids, audio_data, audio_format="wav"):
+        """
+        请求远程声纹识别
+
+        Returns:
+            (speaker_id, score)，请求失败时返回None
+        """
+        key = hashlib.sha1(
+            ",".join(speaker_ids).encode("utf-8") + b"\0" + audio_data
+        ).hexdigest()
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(
+                self._identify(speaker_ids, audio_data, audio_format)
+            )
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.coalesced += 1
+        # shield：调用方取消时不影响其他等待同一结果的调用方
+        return await asyncio.shield(task)
+
+    async def _identify(self, speaker_ids, audio_data, audio_format):
+        self.requests += 1
+        if audio_format == "ogg_opus":
+            file_field = ("audio.ogg", audio_data, "audio/ogg")
+        else:
+            file_field = ("audio.wav", audio_data, "audio/wav")
+        try:
+            response = await get_async_http_client().post(
+                self.api_url,
+                headers={
+                    "Authorization": f"Bearer {self.api_key}",
+                    "Accept": "application/json",
+                },
+                data={"speaker_ids": ",".join(speaker_ids)},
+                files={"file": file_field},
+                timeout=self.timeout,
+            )
+        except Exception as e:
+            self.failures += 1
+            logger.bind(tag=TAG).error(f"声纹识别请求失败: {e}")
+            return None
+        if response.status_code != 200:
+            self.failures += 1
+            logger.bind(tag=TAG).error(f"声纹识别API错误: HTTP {response.status_code}")
+            return None
+        result = response.json()
+        return result.get("speaker_id"), float(result.get("score", 0) or 0)
+
+    def get_stats(self):
+        return {
+            "health": self.health_status(),
+            "requests": self.requests,
+            "coalesced": self.coalesced,
+            "failures": self.failures,
+            "inflight": len(self._inflight),
+        }
+
+
+def get_voiceprint_client(api_url, api_key) -> VoiceprintClient:
+    """获取声纹服务的共享客户端（按服务地址和密钥单例）"""
+    key = (api_url, api_key)
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                client = _clients[key] = VoiceprintClient(api_url, api_key)
+    return client
+
+
+class LocalSpeakerMatcher:
+    """
+    本地声纹向量匹配
+
+    向量由远程服务高置信度的识别结果登记：每个设备的每个说话人保留最近 max_samples 个归一化向量，
+    匹配时与各说话人向量均值做余弦相似度比较。
+    """
+
+    def __init__(self, config):
+        import sherpa_onnx
+
+        self.match_threshold = float(config.get("local_match_threshold", 0.6))
+        self.enroll_threshold = float(config.get("local_enroll_threshold", 0.6))
+        self.margin = float(config.get("local_margin", 0.1))
+        self.max_samples = max(int(config.get("local_max_samples", 5)), 1)
+        self.max_devices = max(int(config.get("local_max_devices", 10000)), 1)
+        # 至少需要这么长的语音才做本地匹配，太短的语音向量不稳定
+        self.min_seconds = float(config.get("local_min_seconds", 1.0))
+
+        extractor_config = sherpa_onnx.SpeakerEmbeddingExtractorConfig(
+            model=config.get("local_model"),
+            num_threads=int(config.get("local_num_threads", 1)),
+            debug=False,
+        )
+        if not extractor_config.validate():
+            raise ValueError(f"声纹向量模型配置无效: {config.get('local_model')}")
+        self._extractor = sherpa_onnx.SpeakerEmbeddingExtractor(extractor_config)
+        self._lock = threading.Lock()
+        # device_id -> {speaker_id: deque[np.ndarray]}
+        self._index: Dict[str, Dict[str, deque]] = {}
+
+        self.local_hits = 0
+        self.local_misses = 0
+        self.enrolled = 0
+        self.corrections = 0
+        self.extract_seconds = 0.0
+
+    def extract(self, pcm_data, sample_rate=16000):
+        """从16位单声道PCM提取归一化的声纹向量，语音过短时返回None（耗时操作，在线程池中调用）"""
+        if len(pcm_data) < self.min_seconds * sample_rate * 2:
+            return None
+        begin = time.monotonic()
+        samples = np.frombuffer(pcm_data, dtype=np.int16).astype(np.float32) / 32768.0
+        stream = self._extractor.create_stream()
+        stream.accept_waveform(sample_rate=sample_rate, waveform=samples)
+        stream.input_finished()
+        embedding = np.asarray(self._extractor.compute(stream), dtype=np.float32)
+        self.extract_seconds += time.monotonic() - begin
+        norm = np.linalg.norm(embedding)
+        return embedding / norm if norm > 0 else None
+
+    def match(self, device_id, embedding, speaker_ids):
+        """
+        在设备索引中匹配说话人
+
+        Returns:
+            (speaker_id, score)，没有足够置信度的匹配时返回None
+        """
+        if embedding is None or not device_id:
+            return None
+        with self._lock:
+            speakers = self._index.get(device_id)
+            candidates = [
+                (speaker_id, np.mean(samples, axis=0))
+                for speaker_id, samples in (speakers or {}).items()
+                if speaker_id in speaker_ids and samples
+            ]
+        scores = []
+        for speaker_id, centroid in candidates:
+            norm = np.linalg.norm(centroid)
+            if norm > 0:
+                scores.append((float(np.dot(embedding, centroid) / norm), speaker_id))
+        scores.sort(reverse=True)
+        if not scores or scores[0][0] < self.match_threshold:
+            self.local_misses += 1
+            return None
+        # 与第二名差距太小时交给远程服务判断
+        if len(scores) > 1 and scores[0][0] - scores[1][0] < self.margin:
+            self.local_misses += 1
+            return None
+        self.local_hits += 1
+        return scores[0][1], scores[0][0]
+
+    def enroll(self, device_id, speaker_id, embedding, score):
+        """远程识别置信度足够高时，登记本地向量"""
+        if embedding is None or not device_id or not speaker_id:
+            return
+        if score < self.enroll_threshold:
+            return
+        with self._lock:
+            speakers = self._index.pop(device_id, None) or {}
+            # 重新插入，按最近使用顺序淘汰设备
+            self._index[device_id] = speakers
+            samples = speakers.get(speaker_id)
+            if samples is None:
+                samples = speakers[speaker_id] = deque(maxlen=self.max_samples)
+            samples.append(embedding)
+            while len(self._index) > self.max_devices:
+                self._index.pop(next(iter(self._index)))
+        self.enrolled += 1
+
+    def forget(self, device_id, speaker_id):
+        """清除设备上某个说话人的本地向量（本地匹配被声纹服务结果否定时调用）"""
+        with self._lock:
+            speakers = self._index.get(device_id)
+            if speakers and speakers.pop(speaker_id, None) is not None:
+                self.corrections += 1
+                if not speakers:
+                    del self._index[device_id]
+
+    def get_stats(self):
+        with self._lock:
+            devices = len(self._index)
+        return {
+            "devices": devices,
+            "local_hits": self.local_hits,
+            "local_misses": self.local_misses,
+            "enrolled": self.enrolled,
+            "corrections": self.corrections,
+            "extract_seconds": round(self.extract_seconds, 3),
+        }
+
+
+def get_local_speaker_matcher() -> Optional[LocalSpeakerMatcher]:
+    """获取本地声纹匹配器（单例模式），未开启或模型加载失败时返回None"""
+    global _matcher
+    enabled = str(_config.get("local_embedding", False)).lower() in ("true", "1", "yes")
+    if not enabled:
+        return None
+    if _matcher is None:
+        with _matcher_lock:
+            if _matcher is None:
+                try:
+                    _matcher = LocalSpeakerMatcher(_config)
+                    logger.bind(tag=TAG).info(
+                        f"本地声纹向量模型已加载: {_config.get('local_model')}"
+                    )
+                except Exception as e:
+                    logger.bind(tag=TAG).error(f"加载本地声纹向量模型失败: {e}")
+                    # 加载失败后不再重试
+                    _config["local_embedding"] = False
+                    return None
+    return _matcher
+
+
+def get_voiceprint_stats():
+    """所有声纹服务客户端和本地匹配器的统计"""
+    with _clients_lock:
+        clients = dict(_clients)
+    return {
+        "clients": {url: client.get_stats() for (url, _), client in clients.items()},
+        "local_matcher": _matcher.get_stats() if _matcher is not None else None,
+    }
@@ -1,12 +1,9 @@
 import asyncio
 import time
-import aiohttp
-import requests
 from urllib.parse import urlparse, parse_qs
 from typing import Optional, Dict
 from config.logger import setup_logging
-from core.utils.cache.manager import cache_manager
-from core.utils.cache.config import CacheType
+from core.utils.voiceprint_client import get_voiceprint_client, get_local_speaker_matcher
 
 TAG = __name__
 logger = setup_logging()
@@ -21,11 +18,15 @@ class VoiceprintProvider:
         self.speaker_map = self._parse_speakers()
         # 声纹识别相似度阈值，默认0.4
         self.similarity_threshold = float(config.get("similarity_threshold", 0.4))
+        # 上传音频格式：wav 或 ogg_opus（直接封装设备上传的Opus数据包，需声纹服务支持解码Ogg/Opus）
+        self.audio_format = str(config.get("audio_format", "wav")).lower()
         
         # 解析API地址和密钥
         self.api_url = None
         self.api_key = None
         self.speaker_ids = []
+        self.client = None
+        self.local_matcher = None
         
         if not self.original_url:
             logger.bind(tag=TAG).warning("声纹识别URL未配置，声纹识别将被禁用")
@@ -61,13 +62,13 @@ class VoiceprintProvider:
                     logger.bind(tag=TAG).warning("未配置有效的说话人，声纹识别将被禁用")
                     self.enabled = False
                 else:
-                    # 进行健康检查，验证服务器是否可用
-                    if self._check_server_health():
-                        self.enabled = True
-                        logger.bind(tag=TAG).info(f"声纹识别已启用: API={self.api_url}, 说话人={len(self.speaker_ids)}个, 相似度阈值={self.similarity_threshold}")
-                    else:
-                        self.enabled = False
-                        logger.bind(tag=TAG).warning(f"声纹识别服务器不可用，声纹识别已禁用: {self.api_url}")
+                    # 共享客户端：健康状态集中缓存，未知时在首次识别时后台检查，不阻塞连接初始化
+                    self.client = get_voiceprint_client(self.api_url, self.api_key)
+                    self.local_matcher = get_local_speaker_matcher()
+                    self.enabled = True
+                    if self.client.health_status() is False:
+                        logger.bind(tag=TAG).warning(f"声纹识别服务器不可用，恢复前跳过识别: {self.api_url}")
+                    logger.bind(tag=TAG).info(f"声纹识别已启用: API={self.api_url}, 说话人={len(self.speaker_ids)}个, 相似度阈值={self.similarity_threshold}")
     
     def _parse_speakers(self) -> Dict[str, Dict[str, str]]:
         """解析说话人配置"""
@@ -85,114 +86,108 @@ class VoiceprintProvider:
                 logger.bind(tag=TAG).warning(f"解析说话人配置失败: {speaker_str}, 错误: {e}")
         return speaker_map
     
-    def _check_server_health(self) -> bool:
-        """检查声纹识别服务器健康状态"""
-        if not self.api_url or not self.api_key:
-            return False
-    
-        cache_key = f"{self.api_url}:{self.api_key}"
-        
-        # 检查缓存
-        cached_result = cache_manager.get(CacheType.VOICEPRINT_HEALTH, cache_key)
-        if cached_result is not None:
-            logger.bind(tag=TAG).debug(f"使用缓存的健康状态: {cached_result}")
-            return cached_result
-        
-        # 缓存过期或不存在
-        logger.bind(tag=TAG).info("执行声纹服务器健康检查")
-        
-        try:
-            # 健康检查URL
-            parsed_url = urlparse(self.api_url)
-            health_url = f"{parsed_url.scheme}://{parsed_url.netloc}/voiceprint/health?key={self.api_key}"
-            
-            # 发送健康检查请求
-            response = requests.get(health_url, timeout=3)
-            
-            if response.status_code == 200:
-                result = response.json()
-                if result.get("status") == "healthy":
-                    logger.bind(tag=TAG).info("声纹识别服务器健康检查通过")
-                    is_healthy = True
-                else:
-                    logger.bind(tag=TAG).warning(f"声纹识别服务器状态异常: {result}")
-                    is_healthy = False
-            else:
-                logger.bind(tag=TAG).warning(f"声纹识别服务器健康检查失败: HTTP {response.status_code}")
-                is_healthy = False
-                
-        except requests.exceptions.ConnectTimeout:
-            logger.bind(tag=TAG).warning("声纹识别服务器连接超时")
-            is_healthy = False
-        except requests.exceptions.ConnectionError:
-            logger.bind(tag=TAG).warning("声纹识别服务器连接被拒绝")
-            is_healthy = False
-        except Exception as e:
-            logger.bind(tag=TAG).warning(f"声纹识别服务器健康检查异常: {e}")
-            is_healthy = False
-        
-        # 使用全局缓存管理器缓存结果
-        cache_manager.set(CacheType.VOICEPRINT_HEALTH, cache_key, is_healthy)
-        logger.bind(tag=TAG).info(f"健康检查结果已缓存: {is_healthy}")
-        
-        return is_healthy
-    
-    async def identify_speaker(self, audio_data: bytes, session_id: str) -> Optional[str]:
-        """识别说话人"""
+    def _speaker_name(self, speaker_id, score, local=False):
+        """
+        按相似度阈值和说话人配置把识别结果转换为名称
+
+        本地匹配的余弦相似度与声纹服务的分数不在同一尺度，已由 local_match_threshold/local_margin 判断过，不再按 similarity_threshold 判断
+        """
+        if not local and score < self.similarity_threshold:
+            logger.bind(tag=TAG).warning(f"声纹识别相似度{score:.3f}低于阈值{self.similarity_threshold}")
+            return "未知说话人"
+        if speaker_id and speaker_id in self.speaker_map:
+            result_name = self.speaker_map[speaker_id]["name"]
+            logger.bind(tag=TAG).info(f"声纹识别成功: {result_name} (相似度: {score:.3f})")
+            return result_name
+        logger.bind(tag=TAG).warning(f"未识别的说话人ID: {speaker_id}")
+        return "未知说话人"
+
+    def _enroll_from_remote(self, task, device_id, embedding, local_speaker_id):
+        """远程识别完成后登记本地向量，与本地匹配结果不一致时清除该说话人在本设备的本地向量"""
+        if task.cancelled() or task.exception() is not None:
+            return
+        result = task.result()
+        if result and self.local_matcher is not None:
+            speaker_id, score = result
+            if speaker_id != local_speaker_id:
+                logger.bind(tag=TAG).warning(
+                    f"本地声纹匹配{local_speaker_id}与声纹服务结果{speaker_id}不一致，清除本地向量"
+                )
+                self.local_matcher.forget(device_id, local_speaker_id)
+            self.local_matcher.enroll(device_id, speaker_id, embedding, score)
+
+    async def identify_speaker(
+        self,
+        audio_data: bytes,
+        session_id: str,
+        audio_format: str = "wav",
+        pcm_data: bytes = None,
+        device_id: str = None,
+    ) -> Optional[str]:
+        """
+        识别说话人，audio_format为wav或ogg_opus
+
+        开启本地声纹向量时需要传入整句PCM和设备ID：本地匹配命中时立即返回，远程识别在后台继续用于更新本地索引
+        """
         if not self.enabled or not self.api_url or not self.api_key:
             logger.bind(tag=TAG).debug("声纹识别功能已禁用或未配置，跳过识别")
             return None
-            
+
+        api_start_time = time.monotonic()
+        healthy = self.client.health_status()
+        if healthy is None:
+            self.client.ensure_health_check()
+
+        embedding_task = None
+        if self.local_matcher is not None and pcm_data and device_id:
+            embedding_task = asyncio.get_running_loop().run_in_executor(
+                None, self.local_matcher.extract, pcm_data
+            )
+
+        remote_task = None
+        if healthy is not False:
+            remote_task = asyncio.ensure_future(
+                self.client.identify(self.speaker_ids, audio_data, audio_format)
+            )
+
         try:
-            api_start_time = time.monotonic()
-            
-            # 准备请求头
-            headers = {
-                'Authorization': f'Bearer {self.api_key}',
-                'Accept': 'application/json'
-            }
-            
-            # 准备multipart/form-data数据
-            data = aiohttp.FormData()
-            data.add_field('speaker_ids', ','.join(self.speaker_ids))
-            data.add_field('file', audio_data, filename='audio.wav', content_type='audio/wav')
-            
-            timeout = aiohttp.ClientTimeout(total=10)
-            
-            # 网络请求
-            async with aiohttp.ClientSession(timeout=timeout) as session:
-                async with session.post(self.api_url, headers=headers, data=data) as response:
-                    
-                    if response.status == 200:
-                        result = await response.json()
-                        speaker_id = result.get("speaker_id")
-                        score = result.get("score", 0)
-                        total_elapsed_time = time.monotonic() - api_start_time
-                        
-                        logger.bind(tag=TAG).info(f"声纹识别耗时: {total_elapsed_time:.3f}s")
-                        
-                        # 相似度阈值检查
-                        if score < self.similarity_threshold:
-                            logger.bind(tag=TAG).warning(f"声纹识别相似度{score:.3f}低于阈值{self.similarity_threshold}")
-                            return "未知说话人"
-                        
-                        if speaker_id and speaker_id in self.speaker_map:
-                            result_name = self.speaker_map[speaker_id]["name"]
-                            logger.bind(tag=TAG).info(f"声纹识别成功: {result_name} (相似度: {score:.3f})")
-                            return result_name
-                        else:
-                            logger.bind(tag=TAG).warning(f"未识别的说话人ID: {speaker_id}")
-                            return "未知说话人"
-                    else:
-                        logger.bind(tag=TAG).error(f"声纹识别API错误: HTTP {response.status}")
-                        return None
-                        
-        except asyncio.TimeoutError:
-            elapsed = time.monotonic() - api_start_time
-            logger.bind(tag=TAG).error(f"声纹识别超时: {elapsed:.3f}s")
-            return None
+            embedding = None
+            if embedding_task is not None:
+                try:
+                    embedding = await embedding_task
+                except Exception as e:
+                    logger.bind(tag=TAG).warning(f"本地声纹向量提取失败: {e}")
+                local = self.local_matcher.match(device_id, embedding, self.speaker_ids)
+                if local is not None:
+                    speaker_id, score = local
+                    logger.bind(tag=TAG).info(
+                        f"本地声纹匹配耗时: {time.monotonic() - api_start_time:.3f}s"
+                    )
+                    if remote_task is not None:
+                        remote_task.add_done_callback(
+                            lambda task: self._enroll_from_remote(
+                                task, device_id, embedding, speaker_id
+                            )
+                        )
+                        remote_task = None
+                    return self._speaker_name(speaker_id, score, local=True)
+
+            if remote_task is None:
+                logger.bind(tag=TAG).debug("声纹识别服务器不可用，跳过识别")
+                return None
+            result = await remote_task
+            remote_task = None
+            if result is None:
+                return None
+            speaker_id, score = result
+            logger.bind(tag=TAG).info(f"声纹识别耗时: {time.monotonic() - api_start_time:.3f}s")
+            if embedding is not None:
+                self.local_matcher.enroll(device_id, speaker_id, embedding, score)
+            return self._speaker_name(speaker_id, score)
         except Exception as e:
-            elapsed = time.monotonic() - api_start_time
             logger.bind(tag=TAG).error(f"声纹识别失败: {e}")
             return None
-
+        finally:
+            # 未被使用的远程请求（如本地提取异常退出）由共享客户端完成，这里只取消等待
+            if remote_task is not None and not remote_task.done():
+                remote_task.cancel()
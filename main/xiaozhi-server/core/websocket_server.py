@@ -35,6 +35,15 @@ from config.config_loader import get_config_from_api_async
 from core.auth import AuthManager, AuthenticationError
 from core.utils.modules_initialize import initialize_modules
 from core.utils.util import check_vad_update, check_asr_update
+from core.utils.tts_worker_pool import get_tts_worker_pool
+from core.providers.llm.base import get_llm_sync_stream_executor
+from core.utils.tts_cache import get_tts_cache
+from core.utils.opus_asset_store import get_opus_asset_store
+from core.utils.http_client import configure_async_http_client
+from core.utils.report_pipeline import get_report_pipeline
+from core.utils.provider_pool import get_provider_pool
+from core.utils.private_config_cache import get_private_config_cache
+from core.utils.voiceprint_client import configure_voiceprint_client
 
 TAG = __name__
 
@@ -59,6 +68,29 @@ class WebSocketServer:
         self._llm = modules["llm"] if "llm" in modules else None
         self._intent = modules["intent"] if "intent" in modules else None
         self._memory = modules["memory"] if "memory" in modules else None
+        # 初始化全局TTS工作池，所有连接共享
+        get_tts_worker_pool(
+            max_workers=self.config.get("tts_max_workers", 32),
+            max_jobs_per_turn=self.config.get("tts_max_jobs_per_turn", 4),
+            max_workers_per_group=self.config.get("tts_max_workers_per_provider", 0),
+            turn_budget=self.config.get("tts_turn_budget", 2.0),
+        )
+        # 没有原生异步实现的LLM在共享线程池中迭代同步流式响应
+        get_llm_sync_stream_executor(self.config.get("llm_sync_stream_workers", 32))
+        # 共享HTTP连接池参数（LLM异步流式请求复用）
+        configure_async_http_client(self.config.get("http_client", {}))
+        # 共享声纹识别客户端和本地声纹向量参数
+        configure_voiceprint_client(self.config.get("voiceprint_client", {}))
+        # 初始化全局TTS短语音频缓存
+        get_tts_cache(self.config.get("tts_cache", {}))
+        # 初始化全局聊天记录上报管道，所有连接共享
+        get_report_pipeline(self.config.get("report_pipeline", {}))
+        # 初始化全局提供者实例池，差异化配置相同的连接共享实例
+        get_provider_pool(self.config.get("provider_pool", {}))
+        # 初始化全局差异化配置缓存，设备重连时不必每次请求智控台
+        get_private_config_cache(self.config.get("private_config_cache", {}))
+        # 初始化预编码Opus音频资源库，并在后台预编码本地音乐和提示音
+        self._init_opus_asset_store()
 
         auth_config = self.config["server"].get("auth", {})
         self.auth_enable = auth_config.get("enabled", False)
@@ -68,10 +100,27 @@ class WebSocketServer:
         expire_seconds = auth_config.get("expire_seconds", None)
         self.auth = AuthManager(secret_key=secret_key, expire_seconds=expire_seconds)
 
+    def _init_opus_asset_store(self):
+        store_config = self.config.get("opus_asset_store", {})
+        store = get_opus_asset_store(store_config)
+        if not store.enabled:
+            return
+        sample_rates = store_config.get("prebuild_sample_rates", [16000, 24000])
+        music_dir = (
+            self.config.get("plugins", {}).get("play_music", {}).get("music_dir", "./music")
+        )
+        count = 0
+        for directory in (music_dir, "config/assets"):
+            count += store.prebuild_dir(directory, sample_rates)
+        if count:
+            self.logger.bind(tag=TAG).info(f"后台预编码Opus音频文件: {count}个")
+
     async def start(self):
         server_config = self.config["server"]
         host = server_config.get("ip", "0.0.0.0")
         port = int(server_config.get("port", 8000))
+        # 上报管道运行在主事件循环上
+        get_report_pipeline().start()
 
         async with websockets.serve(
             self._handle_connection, host, port, process_request=self._http_response
@@ -197,6 +246,8 @@ class WebSocketServer:
                     self._intent = modules["intent"]
                 if "memory" in modules:
                     self._memory = modules["memory"]
+                # 服务端配置变化可能影响各设备的差异化配置
+                get_private_config_cache().invalidate()
                 self.logger.bind(tag=TAG).info(f"更新配置任务执行完毕")
                 return True
         except Exception as e:
@@ -0,0 +1,186 @@
+import os
+import time
+import wave
+
+import numpy as np
+from tabulate import tabulate
+
+from core.utils.aec import ServerAEC, FRAME_SAMPLES, REFERENCE_SAMPLE_RATE
+
+description = "服务端AEC逐帧CPU耗时测试（旧实现与环形缓冲+预计算频谱实现对比）"
+
+# 录制的麦克风/参考信号（16kHz单声道16bit wav），不存在时使用合成信号
+MIC_WAV = "test/aec_mic.wav"
+REF_WAV = "test/aec_ref.wav"
+# 帧时长（毫秒）
+FRAME_DURATION_MS = 60
+# 合成信号时长（秒）
+SYNTH_SECONDS = 180
+# 参考信号缓存的帧数（对应旧实现2分钟内的缓存规模）
+CACHE_FRAMES = [100, 500, 2000]
+
+
+def _read_wav(path):
+    with wave.open(path, "rb") as f:
+        if f.getframerate() != REFERENCE_SAMPLE_RATE or f.getnchannels() != 1:
+            raise ValueError(f"{path} 需要为16kHz单声道wav")
+        return np.frombuffer(f.readframes(f.getnframes()), dtype=np.int16)
+
+
+def _synthesize(seconds):
+    """合成参考信号和带回声的麦克风信号：回声 = 参考信号经过延迟和衰减的声学路径 + 近端噪声"""
+    rng = np.random.default_rng(0)
+    total = seconds * REFERENCE_SAMPLE_RATE
+    t = np.arange(total) / REFERENCE_SAMPLE_RATE
+    envelope = 0.5 + 0.5 * np.sin(2 * np.pi * 3 * t) ** 2
+    ref = sum(np.sin(2 * np.pi * f * t) for f in (180, 360, 720, 1300)) * envelope
+    ref = (ref / np.max(np.abs(ref)) * 8000).astype(np.int16)
+    impulse = np.zeros(400)
+    impulse[[40, 160, 390]] = [0.6, 0.25, 0.1]
+    echo = np.convolve(ref.astype(np.float32), impulse)[:total]
+    mic = echo + rng.standard_normal(total) * 300
+    return np.clip(mic, -32768, 32767).astype(np.int16), ref
+
+
+def _legacy_apply_aec(cache, timestamp, pcm_frame):
+    """旧实现：每帧排序时间戳、线性查找最近帧、重复计算参考帧窗函数和FFT"""
+    mic_audio = np.frombuffer(pcm_frame, dtype=np.int16).astype(np.float32)
+    if np.sqrt(np.mean(mic_audio ** 2)) < 100:
+        return pcm_frame
+    sorted_timestamps = sorted(cache.keys())
+    if len(sorted_timestamps) < 2:
+        return pcm_frame
+    n = len(mic_audio)
+    closest_idx = min(range(len(sorted_timestamps)), key=lambda i: abs(sorted_timestamps[i] - timestamp))
+    mic_fft = np.fft.rfft(mic_audio * np.hanning(n))
+    mic_log_psd = 10 * np.log10(np.abs(mic_fft) ** 2 + 1e-8)
+    mic_P_xx = np.dot(mic_log_psd, mic_log_psd)
+    best_corr, best_ref_idx, best_ref_rms = -1, closest_idx, 0.0
+    for offset in range(-2, 3):
+        test_idx = closest_idx + offset
+        if test_idx < 0 or test_idx >= len(sorted_timestamps):
+            continue
+        test_ref = np.frombuffer(cache[sorted_timestamps[test_idx]], dtype=np.int16).astype(np.float32)
+        test_ref_rms = np.sqrt(np.mean(test_ref ** 2))
+        if test_ref_rms < 50:
+            continue
+        test_log_psd = 10 * np.log10(np.abs(np.fft.rfft(test_ref * np.hanning(len(test_ref)))) ** 2 + 1e-8)
+        P_xy = np.dot(mic_log_psd, test_log_psd)
+        P_yy = np.dot(test_log_psd, test_log_psd)
+        corr = abs(P_xy) / (np.sqrt(mic_P_xx) * np.sqrt(P_yy) + 1e-8)
+        if corr > best_corr:
+            best_corr, best_ref_idx, best_ref_rms = corr, test_idx, test_ref_rms
+    if best_ref_rms < 50:
+        return pcm_frame
+    aligned_ref = np.frombuffer(cache[sorted_timestamps[best_ref_idx]], dtype=np.int16).astype(np.float32)[:n]
+    mic_mag = np.abs(mic_fft)
+    ref_mag = np.abs(np.fft.rfft(aligned_ref * np.hanning(n)))
+    scale = np.sum(mic_mag * ref_mag) / (np.dot(ref_mag, ref_mag) + 1e-8)
+    coef = max(0.5, min(3.0, 1.0 + scale * 3 + (best_corr - 0.97) * 30))
+    result_mag = np.maximum(mic_mag - ref_mag * scale * coef * 1.5, mic_mag * 0.1)
+    output = np.fft.irfft(result_mag * np.exp(1j * np.angle(mic_fft)), n)
+    if best_corr >= 0.97 and best_ref_rms > 500:
+        output = output * 0.3
+    return np.clip(output, -32768, 32767).astype(np.int16).tobytes()
+
+
+def _frames(signal):
+    count = len(signal) // FRAME_SAMPLES
+    return [signal[i * FRAME_SAMPLES : (i + 1) * FRAME_SAMPLES].tobytes() for i in range(count)]
+
+
+def _energy_db(frames):
+    data = np.frombuffer(b"".join(frames), dtype=np.int16).astype(np.float64)
+    return 10 * np.log10(np.mean(data ** 2) + 1e-8)
+
+
+def _run_case(mic_frames, ref_frames, cache_frames):
+    """参考信号预先写入cache_frames帧，之后每帧先写入参考再处理麦克风，统计处理麦克风帧的CPU耗时"""
+    legacy_cache = {}
+    aec = ServerAEC()
+    legacy_cpu = new_cpu = 0.0
+    legacy_out, new_out = [], []
+    warmup = min(cache_frames, len(ref_frames) - 1)
+
+    for i in range(len(ref_frames)):
+        timestamp = (i + 1) * FRAME_DURATION_MS
+        legacy_cache[timestamp] = ref_frames[i]
+        if len(legacy_cache) > cache_frames:
+            legacy_cache.pop(next(iter(legacy_cache)))
+        aec.add_reference(timestamp, ref_frames[i])
+        if i < warmup:
+            continue
+
+        begin = time.process_time()
+        legacy_out.append(_legacy_apply_aec(legacy_cache, timestamp, mic_frames[i]))
+        legacy_cpu += time.process_time() - begin
+
+        begin = time.process_time()
+        new_out.append(aec.process(timestamp, mic_frames[i]))
+        new_cpu += time.process_time() - begin
+
+    processed = len(new_out) or 1
+    mic_in = mic_frames[warmup : warmup + len(new_out)]
+    diff = max(
+        (np.max(np.abs(np.frombuffer(a, np.int16).astype(np.int32) - np.frombuffer(b, np.int16)))
+         for a, b in zip(legacy_out, new_out)),
+        default=0,
+    )
+    return {
+        "frames": len(new_out),
+        "legacy_us": legacy_cpu * 1e6 / processed,
+        "new_us": new_cpu * 1e6 / processed,
+        "reduction_db": _energy_db(mic_in) - _energy_db(new_out) if new_out else 0.0,
+        "max_diff": int(diff),
+    }
+
+
+def main():
+    if os.path.exists(MIC_WAV) and os.path.exists(REF_WAV):
+        mic, ref = _read_wav(MIC_WAV), _read_wav(REF_WAV)
+        source = f"{MIC_WAV} / {REF_WAV}"
+    else:
+        mic, ref = _synthesize(SYNTH_SECONDS)
+        source = f"合成信号 {SYNTH_SECONDS}秒"
+    mic_frames, ref_frames = _frames(mic), _frames(ref)
+    total = min(len(mic_frames), len(ref_frames))
+    mic_frames, ref_frames = mic_frames[:total], ref_frames[:total]
+
+    table = []
+    for cache_frames in CACHE_FRAMES:
+        result = _run_case(mic_frames, ref_frames, cache_frames)
+        table.append(
+            [
+                cache_frames,
+                result["frames"],
+                f"{result['legacy_us']:.1f}",
+                f"{result['new_us']:.1f}",
+                f"{result['legacy_us'] / max(result['new_us'], 1e-9):.1f}x",
+                f"{result['reduction_db']:.1f}",
+                result["max_diff"],
+            ]
+        )
+        print(f"参考缓存 {cache_frames} 帧测试完成")
+
+    print("\n" + "=" * 50)
+    print(f"服务端AEC 性能测试结果（{source}）")
+    print("=" * 50)
+    print(
+        tabulate(
+            table,
+            headers=[
+                "参考缓存帧数",
+                "处理帧数",
+                "旧实现CPU(us/帧)",
+                "新实现CPU(us/帧)",
+                "加速比",
+                "回声衰减(dB)",
+                "输出最大差异",
+            ],
+            tablefmt="grid",
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+import asyncio
+import glob
+import time
+import wave
+
+import numpy as np
+from tabulate import tabulate
+
+from core.utils.asr import create_instance
+from core.providers.asr.batch_scheduler import LocalASRBatchScheduler
+
+description = "本地ASR逐句识别与跨连接批量识别性能对比"
+
+# 使用的本地ASR（需提前下载模型），可换成 fun_local / vosk 对应的配置
+ASR_TYPE = "sherpa_onnx_local"
+ASR_CONFIG = {
+    "type": ASR_TYPE,
+    "model_dir": "models/sherpa-onnx-sense-voice-zh-en-ja-ko-yue-2024-07-17",
+    "output_dir": "tmp/",
+    "model_type": "sense_voice",
+}
+# 测试音频目录，音频会被转换为16kHz单声道
+WAV_GLOB = "config/assets/*.wav"
+# 模拟的并发说话人数
+SPEAKER_COUNTS = [1, 8, 32]
+# 每个说话人依次说的句子数
+UTTERANCES_PER_SPEAKER = 4
+# 批量识别参数
+BATCH_WINDOW_MS = 20
+BATCH_MAX_SIZE = 16
+# 批量推理线程数（对应配置项 batch_workers）
+BATCH_WORKERS = [1, 2]
+
+
+def _load_utterances():
+    utterances = []
+    for path in sorted(glob.glob(WAV_GLOB)):
+        with wave.open(path, "rb") as f:
+            if f.getsampwidth() != 2:
+                continue
+            channels, rate = f.getnchannels(), f.getframerate()
+            data = np.frombuffer(f.readframes(f.getnframes()), dtype=np.int16)
+        samples = data.reshape(-1, channels).mean(axis=1)
+        if rate != 16000:
+            positions = np.arange(0, len(samples), rate / 16000)
+            samples = np.interp(positions, np.arange(len(samples)), samples)
+        utterances.append(samples.astype(np.int16).tobytes())
+    return utterances
+
+
+async def _run_case(recognize, utterances, speaker_count):
+    """每个说话人依次提交若干句音频，统计吞吐和每句的识别延迟"""
+    latencies = []
+
+    async def speaker(index):
+        for i in range(UTTERANCES_PER_SPEAKER):
+            pcm = utterances[(index + i) % len(utterances)]
+            begin = time.perf_counter()
+            await recognize(pcm)
+            latencies.append(time.perf_counter() - begin)
+
+    begin = time.perf_counter()
+    await asyncio.gather(*(speaker(i) for i in range(speaker_count)))
+    elapsed = time.perf_counter() - begin
+
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "utterances_per_sec": len(latencies) / elapsed,
+        "p50_ms": float(np.percentile(latencies_ms, 50)),
+        "p99_ms": float(np.percentile(latencies_ms, 99)),
+    }
+
+
+async def main():
+    utterances = _load_utterances()
+    if not utterances:
+        print(f"没有找到测试音频: {WAV_GLOB}")
+        return
+    provider = create_instance(ASR_TYPE, ASR_CONFIG, True)
+
+    async def recognize_single(pcm):
+        # 原实现：每句话单独提交到默认线程池
+        return await asyncio.to_thread(provider._recognize_batch, [pcm])
+
+    table = []
+    stats = []
+    for speaker_count in SPEAKER_COUNTS:
+        single = await _run_case(recognize_single, utterances, speaker_count)
+        for workers in BATCH_WORKERS:
+            scheduler = LocalASRBatchScheduler(
+                ASR_TYPE,
+                provider._recognize_batch,
+                window_ms=BATCH_WINDOW_MS,
+                max_batch_size=BATCH_MAX_SIZE,
+                workers=workers,
+            )
+            batch = await _run_case(scheduler.submit, utterances, speaker_count)
+            stats.append((speaker_count, workers, scheduler.get_stats()))
+            table.append(
+                [
+                    speaker_count,
+                    workers,
+                    f"{single['utterances_per_sec']:.2f}",
+                    f"{batch['utterances_per_sec']:.2f}",
+                    f"{single['p50_ms']:.0f} / {single['p99_ms']:.0f}",
+                    f"{batch['p50_ms']:.0f} / {batch['p99_ms']:.0f}",
+                ]
+            )
+        print(f"并发说话人 {speaker_count} 测试完成")
+
+    print("\n" + "=" * 50)
+    print(f"本地ASR批量识别性能测试结果（{ASR_TYPE}，{len(utterances)}条测试音频）")
+    print("=" * 50)
+    print(
+        tabulate(
+            table,
+            headers=[
+                "并发说话人",
+                "批量推理线程",
+                "逐句识别(句/秒)",
+                "批量识别(句/秒)",
+                "逐句识别延迟p50/p99(ms)",
+                "批量识别延迟p50/p99(ms)",
+            ],
+            tablefmt="grid",
+        )
+    )
+    for speaker_count, workers, stat in stats:
+        print(f"并发说话人 {speaker_count}，批量推理线程 {workers} 批量统计: {stat}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
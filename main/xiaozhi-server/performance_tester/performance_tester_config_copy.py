@@ -0,0 +1,131 @@
+import copy
+import time
+import tracemalloc
+
+from tabulate import tabulate
+
+from config.config_loader import get_project_dir, read_config
+from core.utils.cow_config import CopyOnWriteDict
+
+description = "连接配置复制开销测试（每连接deepcopy vs 写时复制），对比每连接内存占用和建连CPU耗时"
+
+# 模拟的并发连接数
+CONNECTION_COUNTS = [100, 1000]
+# 测量建连耗时的重复次数
+TIMING_ROUNDS = 500
+
+
+def _private_config(config):
+    """模拟智控台下发的差异化配置：各模块只有选中的一个供应器"""
+    private = {"selected_module": {}}
+    for module in ("TTS", "LLM", "Memory", "Intent"):
+        selected = config["selected_module"].get(module)
+        if selected and selected in config.get(module, {}):
+            private[module] = {selected: copy.deepcopy(config[module][selected])}
+            private["selected_module"][module] = selected
+    private["prompt"] = "你是一个叫小智的台湾女孩"
+    private["correct_words"] = ["小智|小志"]
+    return private
+
+
+def _connect(conn_config, private_config):
+    """按 _initialize_private_config_async 的方式合并差异化配置，并做建连时的典型读取"""
+    for module in ("TTS", "LLM", "Memory", "Intent"):
+        if module in private_config:
+            conn_config[module] = private_config[module]
+            conn_config["selected_module"][module] = private_config["selected_module"][
+                module
+            ]
+    conn_config["prompt"] = private_config["prompt"]
+    select_tts_module = conn_config["selected_module"]["TTS"]
+    conn_config["TTS"][select_tts_module]["correct_words"] = private_config[
+        "correct_words"
+    ]
+    conn_config.get("xiaozhi", {})
+    conn_config.get("exit_commands", [])
+    conn_config.get("tts_segment", {})
+    conn_config["selected_module"].get("VAD")
+    return conn_config
+
+
+def _legacy(config, private_config):
+    return _connect(copy.deepcopy(config), private_config)
+
+
+def _cow(config, private_config):
+    return _connect(CopyOnWriteDict(config), private_config)
+
+
+def _measure_memory(factory, config, private_configs):
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    conns = [factory(config, private) for private in private_configs]
+    used = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+    del conns
+    return used
+
+
+def _measure_time(factory, config, private_configs):
+    start = time.perf_counter()
+    for i in range(TIMING_ROUNDS):
+        factory(config, private_configs[i % len(private_configs)])
+    return (time.perf_counter() - start) / TIMING_ROUNDS
+
+
+def _check_isolation(config):
+    """写时复制的连接修改不影响服务端配置，也不影响其他连接"""
+    snapshot = copy.deepcopy(config)
+    first = _cow(config, _private_config(config))
+    second = CopyOnWriteDict(config)
+    first["selected_module"]["ASR"] = "changed"
+    return config == snapshot and second["selected_module"].get("ASR") != "changed"
+
+
+def main():
+    config = read_config(get_project_dir() + "config.yaml")
+    rows = []
+    for count in CONNECTION_COUNTS:
+        # 差异化配置由接口返回，不计入连接配置本身的占用
+        private_configs = [_private_config(config) for _ in range(count)]
+        legacy_memory = _measure_memory(_legacy, config, private_configs)
+        cow_memory = _measure_memory(_cow, config, private_configs)
+        legacy_time = _measure_time(_legacy, config, private_configs)
+        cow_time = _measure_time(_cow, config, private_configs)
+        rows.append(
+            [
+                count,
+                f"{legacy_memory / count / 1024:.1f}",
+                f"{cow_memory / count / 1024:.1f}",
+                f"{legacy_memory / 1024 / 1024:.2f}",
+                f"{cow_memory / 1024 / 1024:.2f}",
+                f"{legacy_time * 1e6:.0f}",
+                f"{cow_time * 1e6:.0f}",
+                f"{legacy_time / cow_time:.1f}x" if cow_time else "-",
+            ]
+        )
+
+    print("\n" + "=" * 50)
+    print("连接配置复制测试结果")
+    print("=" * 50)
+    print(
+        tabulate(
+            rows,
+            headers=[
+                "连接数",
+                "deepcopy每连接(KB)",
+                "写时复制每连接(KB)",
+                "deepcopy总计(MB)",
+                "写时复制总计(MB)",
+                "deepcopy建连(μs)",
+                "写时复制建连(μs)",
+                "加速比",
+            ],
+            tablefmt="grid",
+        )
+    )
+    print(f"\n连接之间及与服务端配置隔离: {'通过' if _check_isolation(config) else '失败'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+import json
+import time
+
+import numpy as np
+from tabulate import tabulate
+
+from core.utils.util import remove_punctuation_and_length
+from core.utils.intent_matcher import CompiledIntentMatcher
+from core.providers.tools.device_iot.iot_descriptor import IotDescriptor
+
+description = "规则快速意图匹配准确率与耗时测试"
+
+# 每条语料重复匹配的次数
+REPEAT = 2000
+
+# 与固件上报格式一致的IoT描述符
+IOT_DESCRIPTORS = [
+    IotDescriptor(
+        "Speaker",
+        "扬声器",
+        {"volume": {"description": "当前音量值", "type": "number"}},
+        {
+            "SetVolume": {
+                "description": "设置音量",
+                "parameters": {
+                    "volume": {"description": "0到100之间的整数", "type": "number"}
+                },
+            }
+        },
+    ),
+    IotDescriptor(
+        "Screen",
+        "这是一个屏幕，可设置主题和亮度",
+        {"brightness": {"description": "当前亮度百分比", "type": "number"}},
+        {
+            "SetBrightness": {
+                "description": "设置亮度",
+                "parameters": {
+                    "brightness": {"description": "0到100之间的整数", "type": "number"}
+                },
+            },
+            "SetTheme": {
+                "description": "设置屏幕主题",
+                "parameters": {"theme_name": {"description": "主题名称", "type": "string"}},
+            },
+        },
+    ),
+    IotDescriptor(
+        "Lamp",
+        "一个测试用的灯",
+        {"power": {"description": "灯是否打开", "type": "boolean"}},
+        {"TurnOn": {"description": "打开灯"}, "TurnOff": {"description": "关闭灯"}},
+    ),
+]
+FUNCTION_NAMES = [
+    "handle_exit_intent",
+    "play_music",
+    "get_weather",
+    "get_news_from_newsnow",
+    "get_lunar",
+    "speaker_setvolume",
+    "get_speaker_volume",
+    "screen_setbrightness",
+    "screen_settheme",
+    "get_screen_brightness",
+    "lamp_turnon",
+    "lamp_turnoff",
+    "get_lamp_power",
+]
+MUSIC_NAMES = ["两只老虎", "小星星", "儿歌/虫儿飞", "稻香"]
+
+# (用户输入, 期望的函数名)，期望为None表示应交给意图识别LLM
+CORPUS = [
+    ("现在几点了", "result_for_context"),
+    ("今天几号", "result_for_context"),
+    ("今天星期几？", "result_for_context"),
+    ("今天农历几号", "result_for_context"),
+    ("北京现在几点", None),
+    ("音量调到50", "speaker_setvolume"),
+    ("把音量调到百分之三十", "speaker_setvolume"),
+    ("音量设为八十", "speaker_setvolume"),
+    ("音量是多少", "get_speaker_volume"),
+    ("亮度调到20", "screen_setbrightness"),
+    ("把屏幕亮度设置为一百", "screen_setbrightness"),
+    ("亮度是多少", "get_screen_brightness"),
+    ("打开灯", "lamp_turnon"),
+    ("帮我关掉灯", "lamp_turnoff"),
+    ("打开灯并且把音量调到50", None),
+    ("音量大一点", None),
+    ("把主题换成黑色", None),
+    ("播放两只老虎", "play_music"),
+    ("我想听稻香", "play_music"),
+    ("来首虫儿飞", "play_music"),
+    ("播放音乐", "play_music"),
+    ("随便放首歌吧", "play_music"),
+    ("播放周杰伦的歌", None),
+    ("再见", "handle_exit_intent"),
+    ("拜拜啦", "handle_exit_intent"),
+    ("我不想和你说话了", "handle_exit_intent"),
+    ("怎么退出了", None),
+    ("你好啊", None),
+    ("讲个故事", None),
+    ("今天天气怎么样", None),
+    ("明天上海会下雨吗", None),
+    ("帮我查一下新闻", None),
+    ("不要播放音乐", None),
+    ("不听歌了", None),
+    ("我不想听歌", None),
+    ("不听稻香", None),
+    ("我不想听小星星", None),
+    ("没打开灯", None),
+    ("灯没有关掉", None),
+    ("别再放音乐了", None),
+    ("不聊了", "handle_exit_intent"),
+    ("听说再见了", None),
+    ("我们再见面吧", None),
+    ("你觉得两只老虎好听吗", None),
+]
+
+
+def main():
+    matcher = CompiledIntentMatcher(FUNCTION_NAMES, IOT_DESCRIPTORS, MUSIC_NAMES)
+
+    rows = []
+    latencies_us = []
+    true_hits = false_hits = missed = 0
+    for text, expected in CORPUS:
+        _, filtered = remove_punctuation_and_length(text)
+        start = time.perf_counter()
+        for _ in range(REPEAT):
+            result = matcher.match(filtered)
+        latency = (time.perf_counter() - start) / REPEAT * 1e6
+        latencies_us.append(latency)
+
+        actual = json.loads(result)["function_call"]["name"] if result else None
+        if actual is None:
+            verdict = "正确(交给LLM)" if expected is None else "漏匹配"
+            missed += expected is not None
+        elif actual == expected:
+            verdict = "正确"
+            true_hits += 1
+        else:
+            verdict = "误匹配"
+            false_hits += 1
+        rows.append([text, expected or "-", actual or "-", verdict, f"{latency:.1f}"])
+
+    print(
+        tabulate(
+            rows,
+            headers=["用户输入", "期望", "快速匹配结果", "判定", "耗时(μs)"],
+            tablefmt="grid",
+        )
+    )
+
+    expected_hits = sum(1 for _, expected in CORPUS if expected is not None)
+    hits = true_hits + false_hits
+    summary = [
+        [
+            len(CORPUS),
+            f"{true_hits / hits * 100:.1f}%" if hits else "-",
+            f"{true_hits / expected_hits * 100:.1f}%" if expected_hits else "-",
+            false_hits,
+            missed,
+            f"{np.percentile(latencies_us, 50):.1f}",
+            f"{np.percentile(latencies_us, 99):.1f}",
+        ]
+    ]
+    print("\n" + "=" * 50)
+    print("快速意图匹配测试结果")
+    print("=" * 50)
+    print(
+        tabulate(
+            summary,
+            headers=[
+                "语料数",
+                "准确率",
+                "召回率",
+                "误匹配",
+                "漏匹配",
+                "耗时p50(μs)",
+                "耗时p99(μs)",
+            ],
+            tablefmt="grid",
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+import io
+import time
+import wave
+import tracemalloc
+
+from tabulate import tabulate
+
+from core.utils.pcm_buffer import PCMFrameBuffer, wav_header
+
+description = "连接PCM缓冲区微基准（旧的bytearray切片+列表拼接 vs 共享缓冲区）"
+
+# 每帧60ms，16kHz 16bit
+FRAME_BYTES = 1920
+FRAMES_PER_SECOND = 1000 // 60
+# VAD每次读取512个采样
+VAD_CHUNK_BYTES = 1024
+# 模拟的音频总时长（秒）
+AUDIO_SECONDS = 600
+# 说话模式：静音2秒 + 说话3秒，循环
+SILENCE_FRAMES = 2 * FRAMES_PER_SECOND
+SPEECH_FRAMES = 3 * FRAMES_PER_SECOND
+
+
+def _is_speech(index):
+    return index % (SILENCE_FRAMES + SPEECH_FRAMES) >= SILENCE_FRAMES
+
+
+def _utterance_end(index):
+    return index % (SILENCE_FRAMES + SPEECH_FRAMES) == SILENCE_FRAMES + SPEECH_FRAMES - 1
+
+
+def _legacy_wav(pcm):
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(16000)
+        wav_file.writeframes(pcm)
+    buffer.seek(0)
+    return buffer.read()
+
+
+def _run_legacy(frames):
+    """原实现：VAD缓冲区每块切片复制，ASR帧列表反复重建，整句多次拼接"""
+    vad_buffer = bytearray()
+    asr_audio = []
+    results = 0
+    for i, frame in enumerate(frames):
+        vad_buffer.extend(frame)
+        while len(vad_buffer) >= VAD_CHUNK_BYTES:
+            chunk = vad_buffer[:VAD_CHUNK_BYTES]
+            vad_buffer = vad_buffer[VAD_CHUNK_BYTES:]
+            results += len(chunk)
+        asr_audio.append(frame)
+        if not _is_speech(i):
+            asr_audio = asr_audio[-10:]
+            continue
+        if _utterance_end(i):
+            pcm_bytes = b"".join(asr_audio)  # receive_audio
+            task = [pcm_bytes]
+            combined = b"".join(task)  # handle_voice_stop
+            wav = _legacy_wav(combined)  # 声纹识别
+            report = task.copy()  # ASR上报快照
+            results += len(wav) + len(b"".join(report))
+            vad_buffer.clear()
+            asr_audio.clear()
+    return results
+
+
+def _run_buffer(frames):
+    """共享缓冲区：每帧写入一次，VAD读视图，整句只取一次快照"""
+    asr_audio = PCMFrameBuffer()
+    reader = asr_audio.reader()
+    results = 0
+    for i, frame in enumerate(frames):
+        asr_audio.append(frame)
+        for chunk in reader.chunks(VAD_CHUNK_BYTES):
+            results += len(chunk)
+        if not _is_speech(i):
+            asr_audio.keep_last(10)
+            continue
+        if _utterance_end(i):
+            combined = asr_audio.tobytes()  # receive_audio / handle_voice_stop
+            task = [combined]
+            wav = wav_header(len(combined)) + combined  # 声纹识别
+            report = task.copy()  # ASR上报快照
+            results += len(wav) + len(b"".join(report))
+            asr_audio.clear()
+    return results
+
+
+def _measure(func, frames):
+    begin = time.process_time()
+    func(frames)
+    cpu = time.process_time() - begin
+
+    tracemalloc.start()
+    func(frames)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return cpu, peak
+
+
+def main():
+    frames = [bytes([i % 256]) * FRAME_BYTES for i in range(AUDIO_SECONDS * FRAMES_PER_SECOND)]
+
+    table = []
+    for name, func in (("旧实现", _run_legacy), ("共享缓冲区", _run_buffer)):
+        cpu, peak = _measure(func, frames)
+        table.append(
+            [
+                name,
+                f"{cpu * 1e6 / AUDIO_SECONDS:.1f}",
+                f"{peak / 1024:.1f}",
+            ]
+        )
+
+    print("\n" + "=" * 50)
+    print(f"PCM缓冲区微基准（{AUDIO_SECONDS}秒音频，静音2秒+说话3秒循环）")
+    print("=" * 50)
+    print(
+        tabulate(
+            table,
+            headers=["实现", "CPU(us/秒音频)", "内存峰值(KB)"],
+            tablefmt="grid",
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+import time
+
+from tabulate import tabulate
+
+from core.utils import textUtils
+from core.utils.text_segmenter import (
+    FIRST_SENTENCE_PUNCTUATIONS,
+    PUNCTUATIONS,
+    AdaptiveFirstSegment,
+    SentenceSegmenter,
+    StreamingTextFilter,
+)
+
+description = "TTS流式分句耗时测试（旧的整段重扫 vs 单遍扫描分句器），验证长回复下耗时线性增长；并模拟自适应首句切分的首句语音延迟"
+
+# 模拟LLM输出的回复长度（字数）
+REPLY_LENGTHS = [500, 2000, 8000, 32000]
+# 每个token的平均字数
+TOKEN_CHARS = 2
+# 一段典型回复，含标点、Markdown和替换词
+PARAGRAPH = (
+    "好的，下面为你介绍一下**北京**的几个景点。首先是故宫，它是明清两代的皇宫，"
+    "有将近六百年的历史；其次是长城，其中八达岭长城最有名！另外还有颐和园、天坛等等，"
+    "都很值得一去。如果你喜欢美食的话，北京烤鸭一定不能错过"
+)
+CORRECT_WORDS = {"北京烤鸭": "北京烤鸭子", "八达岭": "八达岭儿"}
+# 首句语音延迟模拟：(LLM输出速度 字/秒, TTS首包延迟 秒)
+FIRST_AUDIO_CASES = [(40, 0.3), (15, 0.3), (15, 0.8), (6, 0.5)]
+# 首句很长、迟迟等不到标点的回复
+LONG_FIRST_SENTENCE = "我来帮你查一下明天从北京到上海的高铁票还有没有余票以及大概的价格，请稍等"
+
+
+class LegacySegmenter:
+    """原实现：每个token都拼接全部文本，并从未处理位置对每个标点执行rfind"""
+
+    def __init__(self):
+        self.tts_text_buff = []
+        self.processed_chars = 0
+        self.is_first_sentence = True
+
+    def feed(self, token):
+        self.tts_text_buff.append(token)
+        full_text = "".join(self.tts_text_buff)
+        current_text = full_text[self.processed_chars :]
+        last_punct_pos = -1
+        punctuations_to_use = (
+            FIRST_SENTENCE_PUNCTUATIONS if self.is_first_sentence else PUNCTUATIONS
+        )
+        for punct in punctuations_to_use:
+            pos = current_text.rfind(punct)
+            if (pos != -1 and last_punct_pos == -1) or (
+                pos != -1 and pos < last_punct_pos
+            ):
+                last_punct_pos = pos
+        if last_punct_pos != -1:
+            segment_text_raw = current_text[: last_punct_pos + 1]
+            self.processed_chars += len(segment_text_raw)
+            self.is_first_sentence = False
+            segment = textUtils.get_string_no_punctuation_or_emoji(segment_text_raw)
+            return [segment] if segment else []
+        return []
+
+    def flush(self):
+        full_text = "".join(self.tts_text_buff)
+        segment = textUtils.get_string_no_punctuation_or_emoji(
+            full_text[self.processed_chars :]
+        )
+        return [segment] if segment else []
+
+
+def _make_tokens(length):
+    text = (PARAGRAPH * (length // len(PARAGRAPH) + 1))[:length]
+    return [text[i : i + TOKEN_CHARS] for i in range(0, len(text), TOKEN_CHARS)]
+
+
+def _run(segmenter, tokens):
+    start = time.perf_counter()
+    segments = 0
+    for token in tokens:
+        segments += len(segmenter.feed(token))
+    segments += len(segmenter.flush())
+    return time.perf_counter() - start, segments
+
+
+def _run_filter(tokens):
+    text_filter = StreamingTextFilter(CORRECT_WORDS)
+    start = time.perf_counter()
+    for token in tokens:
+        text_filter.feed(token)
+    text_filter.feed("", final=True)
+    return time.perf_counter() - start
+
+
+def _first_audio_time(segmenter, tokens, chars_per_sec, ttfb):
+    """模拟按固定速度到达的token，返回首句送入TTS的时间加上TTS首包延迟，以及首句内容"""
+    segmenter.reset()
+    if segmenter.adaptive is not None:
+        segmenter.adaptive.prepare(ttfb=ttfb, llm_rate=chars_per_sec)
+    now = 0.0
+    for token in tokens:
+        now += len(token) / chars_per_sec
+        deadline = segmenter.first_segment_deadline(now)
+        # 两个token之间到达最长等待时间时，由定时器触发检查
+        if deadline is not None and deadline < len(token) / chars_per_sec:
+            segments = segmenter.feed("", now=now - len(token) / chars_per_sec + deadline)
+            if segments:
+                return now - len(token) / chars_per_sec + deadline + ttfb, segments[0]
+        segments = segmenter.feed(token, now=now)
+        if segments:
+            return now + ttfb, segments[0]
+    return now + ttfb, "".join(segmenter.flush())
+
+
+def main():
+    rows = []
+    for length in REPLY_LENGTHS:
+        tokens = _make_tokens(length)
+        legacy_time, legacy_segments = _run(LegacySegmenter(), tokens)
+        new_time, new_segments = _run(SentenceSegmenter(), tokens)
+        filter_time = _run_filter(tokens)
+        rows.append(
+            [
+                length,
+                len(tokens),
+                legacy_segments,
+                new_segments,
+                f"{legacy_time * 1000:.2f}",
+                f"{new_time * 1000:.2f}",
+                f"{legacy_time / length * 1e6:.2f}",
+                f"{new_time / length * 1e6:.2f}",
+                f"{filter_time / length * 1e6:.2f}",
+                f"{legacy_time / new_time:.1f}x" if new_time else "-",
+            ]
+        )
+
+    print("\n" + "=" * 50)
+    print("TTS流式分句测试结果")
+    print("=" * 50)
+    print(
+        tabulate(
+            rows,
+            headers=[
+                "回复字数",
+                "token数",
+                "旧分句数",
+                "新分句数",
+                "旧耗时(ms)",
+                "新耗时(ms)",
+                "旧每字(μs)",
+                "新每字(μs)",
+                "双流式过滤每字(μs)",
+                "加速比",
+            ],
+            tablefmt="grid",
+        )
+    )
+    print("\n每字耗时不随回复长度增长即为线性开销；新分句器包含流式Markdown过滤")
+
+    rows = []
+    tokens = [
+        LONG_FIRST_SENTENCE[i : i + TOKEN_CHARS]
+        for i in range(0, len(LONG_FIRST_SENTENCE), TOKEN_CHARS)
+    ]
+    for chars_per_sec, ttfb in FIRST_AUDIO_CASES:
+        fixed_time, fixed_text = _first_audio_time(
+            SentenceSegmenter(), tokens, chars_per_sec, ttfb
+        )
+        adaptive_time, adaptive_text = _first_audio_time(
+            SentenceSegmenter(adaptive=AdaptiveFirstSegment()),
+            tokens,
+            chars_per_sec,
+            ttfb,
+        )
+        rows.append(
+            [
+                chars_per_sec,
+                int(ttfb * 1000),
+                f"{fixed_time * 1000:.0f}",
+                f"{adaptive_time * 1000:.0f}",
+                len(fixed_text),
+                adaptive_text,
+            ]
+        )
+    print("\n首句语音延迟模拟（首句很长、没有逗号）")
+    print(
+        tabulate(
+            rows,
+            headers=[
+                "LLM速度(字/秒)",
+                "TTS首包(ms)",
+                "按标点切分(ms)",
+                "自适应切分(ms)",
+                "按标点首句字数",
+                "自适应首句",
+            ],
+            tablefmt="grid",
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
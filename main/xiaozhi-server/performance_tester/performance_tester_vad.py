@@ -0,0 +1,116 @@
+import asyncio
+import time
+from collections import deque
+from types import SimpleNamespace
+
+import numpy as np
+from tabulate import tabulate
+
+from core.providers.vad.silero import VADProvider, CHUNK_SAMPLES
+from core.utils.pcm_buffer import PCMFrameBuffer
+
+description = "SileroVAD逐次推理与跨连接批量推理性能对比"
+
+MODEL_DIR = "models/snakers4_silero-vad"
+# 模拟的并发连接数
+CONNECTION_COUNTS = [1, 50, 200, 500]
+# 每个连接推理的音频块数量（每块32ms）
+ROUNDS = 50
+
+
+def _new_conn():
+    asr_audio = PCMFrameBuffer()
+    return SimpleNamespace(
+        client_listen_mode="auto",
+        asr_audio=asr_audio,
+        vad_audio_reader=asr_audio.reader(),
+        client_voice_window=deque(maxlen=5),
+        client_have_voice=False,
+        client_voice_stop=False,
+        last_is_voice=False,
+        vad_last_voice_time=0.0,
+    )
+
+
+def _make_chunk(seed):
+    rng = np.random.default_rng(seed)
+    return (rng.standard_normal(CHUNK_SAMPLES) * 2000).astype(np.int16).tobytes()
+
+
+async def _run_case(vad, conn_count):
+    """所有连接在同一时刻各送入一个32ms音频块，统计吞吐和每块增加的延迟"""
+    conns = [_new_conn() for _ in range(conn_count)]
+    chunks = [_make_chunk(i) for i in range(conn_count)]
+    latencies = []
+
+    async def feed(conn, chunk, tick_start):
+        conn.asr_audio.append(chunk)
+        await vad.is_vad_async(conn, chunk)
+        conn.asr_audio.keep_last(10)
+        latencies.append(time.perf_counter() - tick_start)
+
+    begin = time.perf_counter()
+    for _ in range(ROUNDS):
+        tick_start = time.perf_counter()
+        await asyncio.gather(
+            *(feed(conn, chunk, tick_start) for conn, chunk in zip(conns, chunks))
+        )
+    elapsed = time.perf_counter() - begin
+
+    frames = conn_count * ROUNDS
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "frames_per_sec": frames / elapsed,
+        "p50_ms": float(np.percentile(latencies_ms, 50)),
+        "p99_ms": float(np.percentile(latencies_ms, 99)),
+    }
+
+
+async def main():
+    base_config = {
+        "model_dir": MODEL_DIR,
+        "threshold": 0.5,
+        "threshold_low": 0.3,
+        "min_silence_duration_ms": 200,
+    }
+    single_vad = VADProvider(base_config)
+    batch_vad = VADProvider(
+        {**base_config, "batch_enabled": True, "batch_window_ms": 5, "batch_max_size": 64}
+    )
+
+    table = []
+    for conn_count in CONNECTION_COUNTS:
+        single = await _run_case(single_vad, conn_count)
+        batch = await _run_case(batch_vad, conn_count)
+        table.append(
+            [
+                conn_count,
+                f"{single['frames_per_sec']:.0f}",
+                f"{batch['frames_per_sec']:.0f}",
+                f"{single['p50_ms']:.2f} / {single['p99_ms']:.2f}",
+                f"{batch['p50_ms']:.2f} / {batch['p99_ms']:.2f}",
+            ]
+        )
+        print(f"连接数 {conn_count} 测试完成")
+
+    print("\n" + "=" * 50)
+    print("SileroVAD 性能测试结果")
+    print("=" * 50)
+    print(
+        tabulate(
+            table,
+            headers=[
+                "并发连接数",
+                "逐次推理(帧/秒)",
+                "批量推理(帧/秒)",
+                "逐次推理延迟p50/p99(ms)",
+                "批量推理延迟p50/p99(ms)",
+            ],
+            tablefmt="grid",
+        )
+    )
+    print(f"\n批量推理统计: {batch_vad.batch_scheduler.get_stats()}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())